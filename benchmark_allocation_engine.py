@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Benchmark do motor de alocação: tempo de solução (risk parity e média-variância com
+limites por par) em função do número de pares candidatos.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core.capital_management import EqualWeightEngine, MeanVarianceEngine, RiskParityEngine
+from test_account_snapshot import load_config
+from test_allocation_engine import _returns
+
+PAIR_COUNTS = [5, 10, 25, 50, 100]
+REPEATS = 20
+
+
+def _time_ms(engine, symbols, history) -> float:
+    budget = 100.0 * len(symbols)
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        engine.allocate(symbols, budget, min_amount=10.0, max_amount=0.3 * budget, returns=history)
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def run_benchmark():
+    config = load_config()
+    engines = [EqualWeightEngine(config), RiskParityEngine(config), MeanVarianceEngine(config)]
+    print(f"{'pares':>6} | " + " | ".join(f"{engine.name:>13}" for engine in engines))
+    print("-" * 55)
+    for count in PAIR_COUNTS:
+        symbols = [f"P{i}USDT" for i in range(count)]
+        history = (symbols, _returns(count=count, samples=100))
+        timings = [_time_ms(engine, symbols, history) for engine in engines]
+        print(f"{count:>6} | " + " | ".join(f"{ms:>10.2f} ms" for ms in timings))
+
+
+if __name__ == "__main__":
+    run_benchmark()
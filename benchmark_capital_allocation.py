@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark de chamadas REST por rodada de alocação de capital: padrão de chamadas da
+implementação anterior (saldos + posições + tickers por símbolo, repetido em cada
+worker) vs AccountSnapshotService + compute_allocations.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core.capital_management import MAJOR_PAIRS, CapitalManager
+from test_account_snapshot import CountingAPIClient, _symbols, load_config
+from utils.account_snapshot import AccountSnapshotService
+
+SYMBOL_COUNTS = [5, 20, 50, 150]
+
+
+def _legacy_round(api, symbols):
+    """Sequência de REST da calculate_optimal_allocations anterior (uma rodada)."""
+    api.get_spot_account_balance()                  # detect_and_convert_brl_balance
+    api.get_spot_account_balance()                  # get_available_balances
+    api.get_futures_account_balance()
+    api.get_futures_account_balance()               # _get_existing_positions_value
+    api.get_spot_account_balance()
+    for symbol in symbols:                          # decide_optimal_market_for_symbol
+        api.get_futures_ticker(symbol)
+        api.get_spot_ticker_legacy(symbol)
+        if symbol not in MAJOR_PAIRS:               # fallback por saldo
+            api.get_spot_account_balance()
+            api.get_futures_account_balance()
+
+
+class LegacyCountingAPIClient(CountingAPIClient):
+    def get_spot_ticker_legacy(self, symbol):
+        self.calls["get_spot_ticker"] += 1
+        return {"symbol": symbol, "price": "1.0"}
+
+
+def run_benchmark():
+    config = load_config()
+    config["trading"]["max_concurrent_pairs"] = 500
+    config["capital_management_advanced"]["min_capital_per_pair_usd"] = 1.0
+
+    print(f"{'símbolos':>8} | {'antes/rodada':>12} | {'snapshot/rodada':>15} | {'antes/workers':>13} | {'snapshot/workers':>16} | {'alocação':>9}")
+    print("-" * 90)
+    for count in SYMBOL_COUNTS:
+        symbols = _symbols(count)
+
+        legacy = LegacyCountingAPIClient(symbols)
+        _legacy_round(legacy, symbols)
+        legacy_round = sum(legacy.calls.values())
+
+        legacy_workers = LegacyCountingAPIClient(symbols)
+        for symbol in symbols:  # cada worker com o próprio CapitalManager
+            _legacy_round(legacy_workers, [symbol])
+        legacy_worker_calls = sum(legacy_workers.calls.values())
+
+        api = CountingAPIClient(symbols)
+        manager = CapitalManager(api, config, snapshot_service=AccountSnapshotService(api, config))
+        started = time.perf_counter()
+        manager.calculate_optimal_allocations(symbols)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        snapshot_round = sum(api.calls.values())
+
+        # Workers semeados com o snapshot do processo principal
+        snapshot = manager.get_account_snapshot()
+        for symbol in symbols:
+            service = AccountSnapshotService(api, config)
+            service.seed(snapshot)
+            CapitalManager(api, config, snapshot_service=service).calculate_optimal_allocations([symbol])
+        snapshot_worker_calls = sum(api.calls.values()) - snapshot_round
+
+        print(f"{count:>8} | {legacy_round:>12} | {snapshot_round:>15} | {legacy_worker_calls:>13} | "
+              f"{snapshot_worker_calls:>16} | {elapsed_ms:>6.1f} ms")
+
+
+if __name__ == "__main__":
+    import logging
+    logging.disable(logging.INFO)
+    run_benchmark()
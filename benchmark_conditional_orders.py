@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark das ordens condicionais: custo de uma passada de avaliação com N ordens de RSI
+no mesmo símbolo - cálculo por ordem (comportamento anterior, 1 busca de klines + 1 RSI
+por ordem) vs grupo compartilhado no IndicatorFeed (1 busca + 1 cálculo por versão).
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from test_conditional_orders_feed import _closes, _manager, _order
+from utils.conditional_orders import ConditionType
+from utils.streaming_indicators import rsi
+
+ORDER_COUNTS = [10, 100, 1000]
+
+
+def _per_order(api, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        klines = api.get_futures_klines("ADAUSDT", "1h", 100)
+        rsi([float(k[4]) for k in klines], 14)
+    return (time.perf_counter() - started) * 1000
+
+
+def _grouped(count):
+    manager, api, feed = _manager(_closes(300))
+    for i in range(count):
+        manager.add_conditional_order(_order(f"rsi{i}", ConditionType.RSI_OVERSOLD, rsi_threshold=0))
+    started = time.perf_counter()
+    for key in list(manager.groups):
+        manager._process_group(key, time.time())
+    return (time.perf_counter() - started) * 1000, api.calls["get_futures_klines"], feed.stats["computations"]
+
+
+def run_benchmark():
+    print(f"{'ordens':>6} | {'por ordem':>10} | {'agrupado':>9} | {'klines REST':>11} | {'cálculos':>8}")
+    print("-" * 58)
+    for count in ORDER_COUNTS:
+        manager, api, _ = _manager(_closes(300))
+        per_order_ms = _per_order(api, count)
+        grouped_ms, requests, computations = _grouped(count)
+        print(f"{count:>6} | {per_order_ms:>7.1f} ms | {grouped_ms:>6.1f} ms | "
+              f"{count:>4} -> {requests:<4} | {computations:>8}")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark da geração de níveis do grid: caminho Decimal legado vs ticks inteiros (NumPy).
+
+Mede, para 10-200 níveis, a definição dos níveis e a montagem das ordens
+(formatação de preço/quantidade + checagem de notional mínimo).
+"""
+
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core.grid_logic import GridLogic
+from utils.order_index import OrderIndex
+from utils.tick_math import TickRules
+
+LEVEL_COUNTS = [10, 25, 50, 100, 200]
+REPEATS = 200
+CENTER_PRICE = 0.6123
+SPACING = Decimal("0.003")
+
+
+def _grid(fast: bool) -> GridLogic:
+    grid = GridLogic.__new__(GridLogic)
+    grid.symbol = "ADAUSDT"
+    grid.tick_size = Decimal("0.0001")
+    grid.step_size = Decimal("1")
+    grid.min_notional = Decimal("5")
+    grid.price_precision = 4
+    grid.quantity_precision = 0
+    grid.tick_rules = TickRules(grid.tick_size, grid.step_size, grid.min_notional, 4, 0) if fast else None
+    grid.active_grid_orders = OrderIndex()
+    grid.grid_levels = []
+    return grid
+
+
+def _time_per_call(func, repeats: int = REPEATS) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats * 1e6  # µs
+
+
+def run_benchmark():
+    legacy, fast = _grid(False), _grid(True)
+    quantity = Decimal("25")
+    price = Decimal(str(CENTER_PRICE))
+
+    print(f"{'níveis':>7} | {'definir Decimal':>15} | {'definir ticks':>13} | {'ordens Decimal':>14} | {'ordens ticks':>12} | {'speedup':>7}")
+    print("-" * 84)
+    for num_levels in LEVEL_COUNTS:
+        half = num_levels // 2
+
+        def define_legacy():
+            legacy.grid_levels = legacy._grid_levels_from_decimal(CENTER_PRICE, SPACING, half, num_levels - half)
+
+        def define_fast():
+            fast.grid_levels = fast._grid_levels_from_ticks(CENTER_PRICE, SPACING, half, num_levels - half)
+
+        define_old_us = _time_per_call(define_legacy)
+        define_new_us = _time_per_call(define_fast)
+        orders_old_us = _time_per_call(lambda: legacy._build_grid_orders_decimal(quantity, price))
+        orders_new_us = _time_per_call(lambda: fast._build_grid_orders_ticks(quantity, price))
+        speedup = (define_old_us + orders_old_us) / (define_new_us + orders_new_us)
+        print(
+            f"{num_levels:>7} | {define_old_us:>12.1f} µs | {define_new_us:>10.1f} µs | "
+            f"{orders_old_us:>11.1f} µs | {orders_new_us:>9.1f} µs | {speedup:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    import logging
+
+    logging.disable(logging.WARNING)  # Logs de notional/formatação distorcem o tempo
+    run_benchmark()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark das métricas de risco por passada de monitoramento: implementação anterior do
+RiskMetrics (deques convertidas em arrays por símbolo e correlação com np.corrcoef par a
+par) vs RiskEngine (ring buffers símbolos x janela e operações matriciais).
+"""
+
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.risk_engine import RiskEngine
+
+SYMBOL_COUNTS = [10, 50, 200]
+WINDOW = 100
+REPEATS = 3
+
+
+def _legacy_pass(price_history, pnl_history):
+    """VaR/Sharpe/drawdown por símbolo e correlação em laço duplo (código anterior)."""
+    for symbol, history in pnl_history.items():
+        pnl = np.array(list(history))
+        returns = np.diff(pnl) / np.abs(pnl[:-1])
+        returns = returns[~np.isnan(returns)]
+        np.percentile(returns, 5)
+        pnl = np.array(list(history))
+        returns = np.diff(pnl) / np.abs(pnl[:-1])
+        returns = returns[~np.isnan(returns)]
+        (np.mean(returns) * 365 - 0.02) / (np.std(returns) * np.sqrt(365))
+        cumulative = np.cumsum(np.array(list(history)))
+        running_max = np.maximum.accumulate(cumulative)
+        np.min(np.where(running_max == 0, 0, (cumulative - running_max) / np.abs(running_max)))
+
+    symbols = list(price_history)
+    length = min(len(price_history[s]) for s in symbols)
+    returns = {}
+    for symbol in symbols:
+        prices = np.array(list(price_history[symbol])[-length:])
+        returns[symbol] = np.diff(prices) / prices[:-1]
+    matrix = {}
+    for symbol1 in symbols:
+        matrix[symbol1] = {}
+        for symbol2 in symbols:
+            matrix[symbol1][symbol2] = np.corrcoef(returns[symbol1], returns[symbol2])[0, 1]
+    return matrix
+
+
+def _engine_pass(engine, weights):
+    engine.pnl_metrics()
+    return engine.risk_report(weights=weights)
+
+
+def _time_ms(fn, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(*args)
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def run_benchmark():
+    rng = np.random.default_rng(0)
+    print(f"{'símbolos':>8} | {'anterior':>11} | {'RiskEngine':>11} | {'speedup':>8}")
+    print("-" * 50)
+    for count in SYMBOL_COUNTS:
+        symbols = [f"S{i}USDT" for i in range(count)]
+        prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, (count, WINDOW)), axis=1)
+        pnls = np.cumsum(rng.normal(0.1, 2.0, (count, WINDOW)), axis=1) + 50
+
+        price_history = {s: deque(prices[i], maxlen=WINDOW) for i, s in enumerate(symbols)}
+        pnl_history = {s: deque(pnls[i], maxlen=WINDOW) for i, s in enumerate(symbols)}
+        engine = RiskEngine(window=WINDOW)
+        for t in range(WINDOW):
+            engine.update_many(symbols, prices[:, t], pnls[:, t])
+        weights = {s: 1.0 / count for s in symbols}
+
+        legacy_ms = _time_ms(_legacy_pass, price_history, pnl_history)
+        engine_ms = _time_ms(_engine_pass, engine, weights)
+        print(f"{count:>8} | {legacy_ms:>8.1f} ms | {engine_ms:>8.2f} ms | {legacy_ms / engine_ms:>7.0f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
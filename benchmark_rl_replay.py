@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark do replay do RLTradingAgent: passos de replay por segundo com o laço por amostra
+anterior (2 predict + 1 fit por experiência = 3*batch_size chamadas ao TensorFlow) vs o
+replay vetorizado (2 predict + 1 train_on_batch por minibatch).
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.agent import RLTradingAgent
+from test_rl_replay import _fill
+
+STATE_SIZE = 30
+BATCH_SIZES = [32, 64, 128]
+STEPS = 5
+
+
+def _per_sample_replay(agent, batch_size):
+    """Replay anterior: uma experiência por vez."""
+    batch = agent.memory.sample(batch_size)
+    m = agent.market_choice_actions
+    for state, (first, grid), reward, next_state, done in zip(
+            batch["states"], batch["actions"], batch["rewards"], batch["next_states"], batch["dones"]):
+        state = np.reshape(state, [1, agent.state_size, 1])
+        next_state = np.reshape(next_state, [1, agent.state_size, 1])
+        next_q = agent.model.predict(next_state, verbose=0)[0]
+        target_f = agent.model.predict(state, verbose=0)
+        if grid >= 0:
+            target_f[0][first] = reward + (0 if done else agent.gamma * np.amax(next_q[:m]))
+            target_f[0][grid] = reward + (0 if done else agent.gamma * np.amax(next_q[m:]))
+        else:
+            target_f[0][first] = reward + (0 if done else agent.gamma * np.amax(next_q))
+        agent.model.fit(state, target_f, epochs=1, verbose=0)
+
+
+def _steps_per_second(replay, agent, batch_size):
+    replay(agent, batch_size)  # aquecimento (grafo/tracing)
+    started = time.perf_counter()
+    for _ in range(STEPS):
+        replay(agent, batch_size)
+    return STEPS / (time.perf_counter() - started)
+
+
+def run_benchmark():
+    agent = RLTradingAgent(STATE_SIZE, 3, target_update_steps=100)
+    _fill(agent, 2000)
+    print(f"{'batch':>5} | {'por amostra':>14} | {'vetorizado':>14} | {'ganho':>6}")
+    print("-" * 50)
+    for batch_size in BATCH_SIZES:
+        before = _steps_per_second(_per_sample_replay, agent, batch_size)
+        after = _steps_per_second(RLTradingAgent.replay, agent, batch_size)
+        print(f"{batch_size:>5} | {before:>8.2f} pass/s | {after:>8.2f} pass/s | {after / before:>5.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
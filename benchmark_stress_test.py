@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark do stress test Monte Carlo: tempo por execução em função do número de pares,
+caminhos e passos do horizonte (posições + 24 ordens de grid por par).
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from test_account_snapshot import load_config
+from utils.stress_test import Exposure, StressTester
+
+CASES = [(5, 10000, 10), (20, 10000, 10), (20, 10000, 30), (50, 10000, 10), (20, 50000, 10)]
+
+
+def _portfolio(pairs, rng):
+    exposures = []
+    levels = np.arange(1, 13)
+    for i in range(pairs):
+        mark = 10.0 * (i + 1)
+        exposures.append(Exposure(
+            f"P{i}USDT", mark, quantity=rng.choice([-1.0, 1.0]), entry_price=mark, leverage=10,
+            buy_prices=mark * (1 - 0.004 * levels), buy_quantities=np.full(12, 0.1),
+            sell_prices=mark * (1 + 0.004 * levels), sell_quantities=np.full(12, 0.1),
+        ))
+    factors = rng.normal(0, 0.003, (pairs, 3))
+    return exposures, factors @ factors.T + np.eye(pairs) * 1e-5
+
+
+def run_benchmark():
+    tester = StressTester(load_config())
+    rng = np.random.default_rng(0)
+    print(f"{'pares':>6} | {'caminhos':>8} | {'passos':>6} | {'tempo':>9} | {'VaR 99%':>9} | {'liquidação':>10}")
+    print("-" * 65)
+    for pairs, paths, steps in CASES:
+        exposures, cov = _portfolio(pairs, rng)
+        tester.run(exposures, cov, equity=100.0 * pairs, paths=1000, horizon_steps=steps)  # aquecimento
+        report = tester.run(exposures, cov, equity=100.0 * pairs, paths=paths, horizon_steps=steps)
+        print(f"{pairs:>6} | {paths:>8} | {steps:>6} | {report['elapsed_ms']:>6.0f} ms | "
+              f"{report['pnl']['var']:>9.2f} | {report['account_liquidation_probability']*100:>9.2f}%")
+
+
+if __name__ == "__main__":
+    run_benchmark()
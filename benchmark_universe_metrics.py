@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark das métricas de seleção de pares: laço por símbolo (indicadores de Wilder +
+Decimal, como o _calculate_metrics antigo) vs passada vetorizada do universo inteiro.
+"""
+
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from test_universe_metrics import _universe
+from utils.streaming_indicators import WilderADX, WilderATR
+from utils.universe_metrics import compute_universe_metrics
+
+UNIVERSE_SIZES = [50, 150, 300, 600]
+REPEATS = 5
+
+
+def _per_symbol_metrics(kline_data, tickers):
+    metrics = {}
+    for symbol, series in kline_data.items():
+        atr, adx = WilderATR(14), WilderADX(14)
+        for row in series.view(100, include_forming=False).tolist():
+            atr.update(row[2], row[3], row[4])
+            adx.update(row[2], row[3], row[4])
+        last_close = Decimal(str(series.closes(include_forming=False)[-1]))
+        atr_value = Decimal(str(atr.value)) if atr.value is not None else Decimal("0")
+        metrics[symbol] = {
+            "volume": Decimal(tickers[symbol]["quoteVolume"]),
+            "atr_perc": atr_value / last_close if last_close > 0 else Decimal("0"),
+            "adx": Decimal(str(adx.value)) if adx.value is not None else Decimal("100"),
+            "last_price": Decimal(tickers[symbol]["lastPrice"]),
+        }
+    ranked = sorted(metrics, key=lambda s: (-metrics[s]["atr_perc"], metrics[s]["adx"]))
+    return ranked
+
+
+def _vectorized_metrics(kline_data, tickers):
+    import numpy as np
+
+    table = compute_universe_metrics(kline_data, tickers, period=14, limit=100)
+    return table.symbols[np.lexsort((table["adx"], -table["atr_perc"]))].tolist()
+
+
+def _time_ms(func, *args) -> float:
+    started = time.perf_counter()
+    for _ in range(REPEATS):
+        func(*args)
+    return (time.perf_counter() - started) / REPEATS * 1000
+
+
+def run_benchmark():
+    print(f"{'símbolos':>8} | {'por símbolo':>12} | {'vetorizado':>11} | {'speedup':>7}")
+    print("-" * 50)
+    for size in UNIVERSE_SIZES:
+        kline_data, tickers = _universe(size)
+        legacy_ms = _time_ms(_per_symbol_metrics, kline_data, tickers)
+        batch_ms = _time_ms(_vectorized_metrics, kline_data, tickers)
+        print(f"{size:>8} | {legacy_ms:>9.1f} ms | {batch_ms:>8.1f} ms | {legacy_ms / batch_ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Benchmark do ambiente de RL: passos de ambiente por segundo (num único core) do
+TradingEnvironment (um episódio por chamada) vs VectorTradingEnv com K episódios em lockstep.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.environment import TradingEnvironment
+from rl.vector_env import VectorTradingEnv
+from test_vector_env import _ohlcv
+
+WINDOW = 30
+STEPS = 2000
+NUM_ENVS = [1, 16, 64]
+
+
+def _single_env_rate(data, actions):
+    env = TradingEnvironment(data, features_window=WINDOW)
+    env.reset()
+    started = time.perf_counter()
+    for action in actions:
+        _, _, terminated, _, _ = env.step(int(action))
+        if terminated:
+            env.reset()
+    return len(actions) / (time.perf_counter() - started)
+
+
+def _vector_env_rate(data, num_envs, rng):
+    env = VectorTradingEnv(data, num_envs=num_envs, features_window=WINDOW, random_start=True)
+    env.reset(seed=0)
+    actions = rng.integers(0, 6, (STEPS, num_envs))
+    started = time.perf_counter()
+    for batch in actions:
+        env.step(batch)
+    return STEPS * num_envs / (time.perf_counter() - started)
+
+
+def run_benchmark():
+    rng = np.random.default_rng(0)
+    data = _ohlcv(5000)
+    baseline = _single_env_rate(data, rng.integers(0, 6, STEPS))
+    print(f"{'ambiente':>22} | {'passos/s':>12} | {'ganho':>7}")
+    print("-" * 48)
+    print(f"{'TradingEnvironment':>22} | {baseline:>12,.0f} | {1.0:>6.1f}x")
+    for num_envs in NUM_ENVS:
+        rate = _vector_env_rate(data, num_envs, rng)
+        print(f"{f'VectorTradingEnv K={num_envs}':>22} | {rate:>12,.0f} | {rate / baseline:>6.1f}x")
+
+
+if __name__ == "__main__":
+    run_benchmark()
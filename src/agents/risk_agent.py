@@ -11,6 +11,8 @@ import pandas as pd
 from utils.alerter import Alerter
 from utils.api_client import APIClient
 from utils.logger import setup_logger
+from utils.risk_engine import RiskEngine
+from utils.stress_test import account_equity, exposures_from_account, get_stress_tester
 
 log = setup_logger("risk_agent")
 
@@ -22,106 +24,75 @@ except ImportError:
 
 
 class RiskMetrics:
-    """Calculates and tracks various risk metrics."""
+    """Calculates and tracks various risk metrics.
+    
+    Os históricos ficam nos ring buffers alinhados do RiskEngine; as métricas de todos os
+    símbolos saem de uma única passada vetorizada (risk_report / pnl_metrics).
+    """
     
     def __init__(self, history_length: int = 100):
         self.history_length = history_length
-        self.price_history = defaultdict(lambda: deque(maxlen=history_length))
-        self.pnl_history = defaultdict(lambda: deque(maxlen=history_length))
+        self.engine = RiskEngine(window=history_length)
         self.volume_history = defaultdict(lambda: deque(maxlen=history_length))
         self.correlation_matrix = {}
         self.last_calculation = {}
     
+    @property
+    def price_history(self) -> Dict[str, np.ndarray]:
+        """Histórico de preços por símbolo (cópias das janelas do ring buffer)."""
+        return self._history(self.engine.prices)
+    
+    @property
+    def pnl_history(self) -> Dict[str, np.ndarray]:
+        """Histórico de PnL por símbolo (cópias das janelas do ring buffer)."""
+        return self._history(self.engine.pnl)
+    
+    def _history(self, data: np.ndarray) -> Dict[str, np.ndarray]:
+        history = {}
+        for symbol in list(self.engine.symbols):
+            row = self.engine._rows[symbol]
+            values = self.engine._window(data, np.array([row]), self.engine.window)[0]
+            history[symbol] = values[~np.isnan(values)]
+        return history
+    
     def update_data(self, symbol: str, price: float, pnl: float, volume: float) -> None:
         """Update historical data for risk calculations."""
-        self.price_history[symbol].append(price)
-        self.pnl_history[symbol].append(pnl)
+        self.engine.update(symbol, price, pnl)
         self.volume_history[symbol].append(volume)
         self.last_calculation[symbol] = time.time()
     
-    def calculate_var(self, symbol: str, confidence_level: float = 0.95, time_horizon: int = 1) -> Optional[float]:
-        """Calculate Value at Risk (VaR)."""
-        if symbol not in self.pnl_history or len(self.pnl_history[symbol]) < 30:
-            return None
-        
+    def aligned_returns(self, symbols: List[str], window: int = None, min_length: int = 30) -> Tuple[List[str], np.ndarray]:
+        """Retornos simples alinhados (símbolos x amostras) dos símbolos com histórico suficiente."""
+        return self.engine.aligned_returns(symbols, window, min_length)
+    
+    def risk_report(self, symbols: List[str] = None, confidence_level: float = 0.95, time_horizon: int = 1,
+                    weights: Dict[str, float] = None) -> Dict:
+        """VaR histórico/paramétrico, CVaR, correlação e VaR do portfólio de todos os símbolos."""
+        return self.engine.risk_report(symbols, confidence_level, time_horizon, weights)
+    
+    def pnl_metrics(self, symbols: List[str] = None, confidence_level: float = 0.95,
+                    time_horizon: int = 1) -> Dict[str, Dict[str, Optional[float]]]:
+        """VaR, Sharpe e drawdown máximo (sobre o PnL) de todos os símbolos em uma passada."""
+        return self.engine.pnl_metrics(symbols, confidence_level, time_horizon)
+    
+    def _pnl_metric(self, symbol: str, name: str, **kwargs) -> Optional[float]:
         try:
-            pnl_returns = list(self.pnl_history[symbol])
-            pnl_array = np.array(pnl_returns)
-            
-            # Calculate daily returns
-            returns = np.diff(pnl_array) / np.abs(pnl_array[:-1])
-            returns = returns[~np.isnan(returns)]
-            
-            if len(returns) < 10:
-                return None
-            
-            # Calculate VaR
-            var_percentile = (1 - confidence_level) * 100
-            var = np.percentile(returns, var_percentile)
-            
-            # Scale for time horizon
-            var_scaled = var * np.sqrt(time_horizon)
-            
-            return float(var_scaled)
-        
+            return self.engine.pnl_metrics([symbol], **kwargs).get(symbol, {}).get(name)
         except Exception as e:
-            log.error(f"Error calculating VaR for {symbol}: {e}")
+            log.error(f"Error calculating {name} for {symbol}: {e}")
             return None
     
+    def calculate_var(self, symbol: str, confidence_level: float = 0.95, time_horizon: int = 1) -> Optional[float]:
+        """Calculate Value at Risk (VaR)."""
+        return self._pnl_metric(symbol, "var", confidence=confidence_level, horizon=time_horizon)
+    
     def calculate_sharpe_ratio(self, symbol: str, risk_free_rate: float = 0.02) -> Optional[float]:
         """Calculate Sharpe ratio."""
-        if symbol not in self.pnl_history or len(self.pnl_history[symbol]) < 30:
-            return None
-        
-        try:
-            pnl_returns = list(self.pnl_history[symbol])
-            pnl_array = np.array(pnl_returns)
-            
-            # Calculate returns
-            returns = np.diff(pnl_array) / np.abs(pnl_array[:-1])
-            returns = returns[~np.isnan(returns)]
-            
-            if len(returns) < 10:
-                return None
-            
-            # Annualized return and volatility
-            mean_return = np.mean(returns) * 365  # Daily to annual
-            volatility = np.std(returns) * np.sqrt(365)  # Daily to annual
-            
-            if volatility == 0:
-                return None
-            
-            sharpe = (mean_return - risk_free_rate) / volatility
-            return float(sharpe)
-        
-        except Exception as e:
-            log.error(f"Error calculating Sharpe ratio for {symbol}: {e}")
-            return None
+        return self._pnl_metric(symbol, "sharpe", risk_free_rate=risk_free_rate)
     
     def calculate_max_drawdown(self, symbol: str) -> Optional[float]:
         """Calculate maximum drawdown."""
-        if symbol not in self.pnl_history or len(self.pnl_history[symbol]) < 10:
-            return None
-        
-        try:
-            pnl_values = np.array(list(self.pnl_history[symbol]))
-            
-            # Calculate cumulative PnL
-            cumulative_pnl = np.cumsum(pnl_values)
-            
-            # Calculate running maximum
-            running_max = np.maximum.accumulate(cumulative_pnl)
-            
-            # Calculate drawdown
-            drawdown = (cumulative_pnl - running_max) / np.abs(running_max)
-            drawdown = np.where(running_max == 0, 0, drawdown)
-            
-            max_dd = np.min(drawdown)
-            return float(max_dd)
-        
-        except Exception as e:
-            log.error(f"Error calculating max drawdown for {symbol}: {e}")
-            return None
+        return self._pnl_metric(symbol, "max_drawdown")
     
     def calculate_correlation(self, symbols: List[str]) -> Dict:
         """Calculate correlation matrix between symbols."""
@@ -129,37 +100,13 @@ class RiskMetrics:
             return {}
         
         try:
-            # Prepare price data
-            price_data = {}
-            min_length = float('inf')
-            
-            for symbol in symbols:
-                if symbol in self.price_history and len(self.price_history[symbol]) > 30:
-                    prices = list(self.price_history[symbol])
-                    price_data[symbol] = prices
-                    min_length = min(min_length, len(prices))
-            
-            if len(price_data) < 2 or min_length < 30:
+            chosen, matrix = self.engine.correlation(symbols, min_length=30)
+            if len(chosen) < 2:
                 return {}
-            
-            # Calculate returns for each symbol
-            returns_data = {}
-            for symbol, prices in price_data.items():
-                prices_array = np.array(prices[-min_length:])
-                returns = np.diff(prices_array) / prices_array[:-1]
-                returns_data[symbol] = returns[~np.isnan(returns)]
-            
-            # Calculate correlation matrix
-            correlation_matrix = {}
-            for i, symbol1 in enumerate(returns_data.keys()):
-                correlation_matrix[symbol1] = {}
-                for j, symbol2 in enumerate(returns_data.keys()):
-                    if i == j:
-                        correlation_matrix[symbol1][symbol2] = 1.0
-                    else:
-                        corr = np.corrcoef(returns_data[symbol1], returns_data[symbol2])[0, 1]
-                        correlation_matrix[symbol1][symbol2] = float(corr) if not np.isnan(corr) else 0.0
-            
+            correlation_matrix = {
+                symbol1: {symbol2: float(matrix[i, j]) for j, symbol2 in enumerate(chosen)}
+                for i, symbol1 in enumerate(chosen)
+            }
             self.correlation_matrix = correlation_matrix
             return correlation_matrix
         
@@ -232,13 +179,20 @@ class PortfolioRiskManager:
             # Check correlation risk
             correlation_risk = self._check_correlation_risk(risk_metrics, symbols)
             
+            # VaR histórico/paramétrico e CVaR dos retornos ponderados do portfólio
+            weights = {symbol: float(weight) for symbol, weight in self.position_weights.items()}
+            portfolio_tail = risk_metrics.risk_report(symbols, weights=weights).get("portfolio", {}) if weights else {}
+            
             return {
                 "diversification_score": float(self.diversification_score or 0),
                 "portfolio_var": float(self.portfolio_var or 0),
                 "concentration_risk": concentration_risk,
                 "correlation_risk": correlation_risk,
                 "total_portfolio_value": float(self.total_portfolio_value),
-                "position_count": len(self.position_weights)
+                "position_count": len(self.position_weights),
+                "portfolio_historical_var": portfolio_tail.get("historical_var"),
+                "portfolio_parametric_var": portfolio_tail.get("parametric_var"),
+                "portfolio_cvar": portfolio_tail.get("cvar")
             }
         
         except Exception as e:
@@ -270,41 +224,26 @@ class PortfolioRiskManager:
             return None
     
     def _calculate_portfolio_var(self, risk_metrics: RiskMetrics, symbols: List[str]) -> Optional[Decimal]:
-        """Calculate portfolio Value at Risk."""
+        """Calculate portfolio Value at Risk (sqrt(v' C v) com v = peso * VaR individual)."""
         if not self.position_weights or len(symbols) < 2:
             return None
         
         try:
-            # Get individual VaRs
-            individual_vars = {}
-            for symbol in symbols:
-                var = risk_metrics.calculate_var(symbol)
-                if var is not None:
-                    individual_vars[symbol] = var
-            
+            # VaRs individuais de todos os símbolos em uma passada
+            metrics = risk_metrics.pnl_metrics(symbols)
+            individual_vars = {s: m["var"] for s, m in metrics.items() if m["var"] is not None}
             if len(individual_vars) < 2:
                 return None
             
-            # Get correlation matrix
-            correlation_matrix = risk_metrics.calculate_correlation(list(individual_vars.keys()))
-            if not correlation_matrix:
+            chosen, correlation = risk_metrics.engine.correlation(list(individual_vars), min_length=30)
+            if len(chosen) < 2:
                 return None
             
-            # Calculate portfolio VaR using correlation
-            portfolio_var_squared = Decimal("0")
-            
-            for symbol1 in individual_vars:
-                for symbol2 in individual_vars:
-                    weight1 = self.position_weights.get(symbol1, Decimal("0"))
-                    weight2 = self.position_weights.get(symbol2, Decimal("0"))
-                    var1 = Decimal(str(individual_vars[symbol1]))
-                    var2 = Decimal(str(individual_vars[symbol2]))
-                    corr = Decimal(str(correlation_matrix.get(symbol1, {}).get(symbol2, 0)))
-                    
-                    portfolio_var_squared += weight1 * weight2 * var1 * var2 * corr
-            
-            portfolio_var = portfolio_var_squared.sqrt() if portfolio_var_squared > 0 else Decimal("0")
-            return portfolio_var
+            scaled = np.array([
+                float(self.position_weights.get(s, Decimal("0"))) * individual_vars[s] for s in chosen
+            ])
+            portfolio_var_squared = float(scaled @ correlation @ scaled)
+            return Decimal(str(np.sqrt(portfolio_var_squared))) if portfolio_var_squared > 0 else Decimal("0")
         
         except Exception as e:
             log.error(f"Error calculating portfolio VaR: {e}")
@@ -324,26 +263,24 @@ class PortfolioRiskManager:
         """Check for correlation risk."""
         risks = []
         
-        correlation_matrix = risk_metrics.calculate_correlation(symbols)
-        if not correlation_matrix:
+        chosen, correlation = risk_metrics.engine.correlation(symbols, min_length=30)
+        if len(chosen) < 2:
             return risks
         
-        # Check for high correlations
-        high_corr_threshold = self.high_correlation_threshold
-        for symbol1 in correlation_matrix:
-            for symbol2 in correlation_matrix[symbol1]:
-                if symbol1 != symbol2:
-                    corr = correlation_matrix[symbol1][symbol2]
-                    if abs(corr) > high_corr_threshold:
-                        weight1 = self.position_weights.get(symbol1, Decimal("0"))
-                        weight2 = self.position_weights.get(symbol2, Decimal("0"))
-                        combined_weight = weight1 + weight2
-                        
-                        if combined_weight > self.max_correlation_exposure:
-                            risks.append(
-                                f"High correlation risk: {symbol1}-{symbol2} "
-                                f"(corr: {corr:.2f}, combined weight: {combined_weight*100:.1f}%)"
-                            )
+        # Pares acima do limite de correlação (máscara sobre a matriz inteira)
+        high = np.abs(correlation) > self.high_correlation_threshold
+        np.fill_diagonal(high, False)
+        for i, j in zip(*np.nonzero(high)):
+            symbol1, symbol2 = chosen[i], chosen[j]
+            weight1 = self.position_weights.get(symbol1, Decimal("0"))
+            weight2 = self.position_weights.get(symbol2, Decimal("0"))
+            combined_weight = weight1 + weight2
+            
+            if combined_weight > self.max_correlation_exposure:
+                risks.append(
+                    f"High correlation risk: {symbol1}-{symbol2} "
+                    f"(corr: {correlation[i, j]:.2f}, combined weight: {combined_weight*100:.1f}%)"
+                )
         
         return risks
 
@@ -409,6 +346,14 @@ class RiskAgent:
         self.risk_metrics_history_days = advanced_config.get("risk_metrics_history_days", 30)
         self.correlation_window_days = advanced_config.get("correlation_window_days", 21)
         
+        # Stress test Monte Carlo (posições + ordens de grid em aberto)
+        stress_config = risk_agent_config.get("stress_test", {})
+        self.stress_test_enabled = stress_config.get("enabled", True)
+        self.stress_test_every_checks = max(1, int(stress_config.get("run_every_checks", 10)))
+        self.max_liquidation_probability = stress_config.get("max_liquidation_probability", 0.05)
+        self.stress_tester = get_stress_tester(config)
+        self.last_stress_report = None
+        
         log.info("RiskAgent initialized")
     
     def start(self) -> None:
@@ -458,6 +403,10 @@ class RiskAgent:
                 # Monitor portfolio risks
                 self._monitor_portfolio_risks()
                 
+                # Stress test Monte Carlo periódico
+                if self.stress_test_enabled and self.stats["risk_checks"] % self.stress_test_every_checks == 0:
+                    self._monitor_stress_risks()
+                
                 # Check for system-wide risks
                 self._monitor_system_risks()
                 
@@ -486,8 +435,9 @@ class RiskAgent:
     def _monitor_individual_risks(self) -> None:
         """Monitor risks for individual positions."""
         positions_checked = 0
+        updated = {}
         
-        for symbol in self.monitored_symbols:
+        for symbol in list(self.monitored_symbols):
             try:
                 # Get position data
                 position = self.api_client.get_futures_position(symbol)
@@ -510,20 +460,29 @@ class RiskAgent:
                     float(notional)
                 )
                 
-                # Check individual risk metrics
-                self._check_individual_risk_limits(symbol, position)
-                positions_checked += 1
+                updated[symbol] = position
                 
             except Exception as e:
                 log.error(f"Error monitoring individual risk for {symbol}: {e}")
         
+        # Métricas de todos os símbolos em uma passada vetorizada
+        metrics = self.risk_metrics.pnl_metrics(list(updated), self.var_confidence_level, self.var_time_horizon_days)
+        for symbol, position in updated.items():
+            self._check_individual_risk_limits(symbol, position, metrics.get(symbol))
+            positions_checked += 1
+        
         self.stats["positions_monitored"] = positions_checked
     
-    def _check_individual_risk_limits(self, symbol: str, position: Dict) -> None:
+    def _check_individual_risk_limits(self, symbol: str, position: Dict, metrics: Optional[Dict] = None) -> None:
         """Check risk limits for an individual position."""
         try:
+            if metrics is None:
+                metrics = self.risk_metrics.pnl_metrics(
+                    [symbol], self.var_confidence_level, self.var_time_horizon_days
+                ).get(symbol, {})
+            
             # Check drawdown
-            max_dd = self.risk_metrics.calculate_max_drawdown(symbol)
+            max_dd = metrics.get("max_drawdown")
             if max_dd is not None and max_dd < -self.max_drawdown_perc:
                 self._send_risk_alert(
                     symbol,
@@ -532,7 +491,7 @@ class RiskAgent:
                 )
             
             # Check VaR
-            var = self.risk_metrics.calculate_var(symbol, self.var_confidence_level, self.var_time_horizon_days)
+            var = metrics.get("var")
             if var is not None and var < -self.max_daily_var_perc:
                 self._send_risk_alert(
                     symbol,
@@ -541,7 +500,7 @@ class RiskAgent:
                 )
             
             # Check Sharpe ratio
-            sharpe = self.risk_metrics.calculate_sharpe_ratio(symbol)
+            sharpe = metrics.get("sharpe")
             if sharpe is not None and sharpe < self.min_sharpe_ratio:
                 self._send_risk_alert(
                     symbol,
@@ -643,6 +602,61 @@ class RiskAgent:
         except Exception as e:
             log.error(f"Error checking portfolio risk limits: {e}")
     
+    def run_stress_test(self, shocks: Optional[Dict[str, float]] = None, paths: int = None,
+                        horizon_steps: int = None, seed: int = None) -> Dict:
+        """Stress test Monte Carlo das posições e ordens abertas atuais.
+        
+        A covariância vem do histórico do RiskMetrics, então cada passo do horizonte equivale
+        a um intervalo do loop de risco (check_interval_seconds).
+        """
+        shocks = shocks or {}
+        positions = self.api_client.get_futures_positions() or []
+        open_orders = self.api_client.get_open_futures_orders() or []
+        equity = account_equity(self.api_client.get_futures_account_balance())
+        default_leverage = self.config.get("grid", {}).get("futures", {}).get("leverage", 10)
+        exposures = exposures_from_account(positions, open_orders, default_leverage, include=shocks)
+        
+        symbols = [exposure.symbol for exposure in exposures]
+        history_symbols, returns = self.risk_metrics.aligned_returns(symbols)
+        covariance = self.stress_tester.covariance_for(symbols, history_symbols, returns)
+        report = self.stress_tester.run(exposures, covariance, equity, shocks, paths, horizon_steps, seed)
+        if not shocks:
+            self.last_stress_report = report
+        return report
+    
+    def _monitor_stress_risks(self) -> None:
+        """Alerta sobre probabilidades de liquidação do stress test."""
+        try:
+            report = self.run_stress_test()
+            if not report.get("paths"):
+                return
+            
+            account_probability = report["account_liquidation_probability"]
+            if account_probability > self.max_liquidation_probability:
+                self._send_risk_alert(
+                    "PORTFOLIO",
+                    f"Stress test: {account_probability*100:.1f}% liquidation probability "
+                    f"(VaR {report['pnl']['var']:.2f} USDT, limit: {self.max_liquidation_probability*100:.1f}%)",
+                    "CRITICAL"
+                )
+            
+            for symbol, metrics in report["per_symbol"].items():
+                if metrics["liquidation_probability"] > self.max_liquidation_probability:
+                    self._send_risk_alert(
+                        symbol,
+                        f"Stress test: {metrics['liquidation_probability']*100:.1f}% chance of reaching "
+                        f"liquidation price {metrics['liquidation_price']}",
+                        "WARNING"
+                    )
+            
+            log.info(
+                f"🧪 Stress test: {report['paths']} caminhos em {report['elapsed_ms']:.0f} ms, "
+                f"VaR {report['pnl']['var']:.2f} USDT, liquidação {account_probability*100:.2f}%"
+            )
+        
+        except Exception as e:
+            log.error(f"Error running stress test: {e}")
+    
     def _monitor_system_risks(self) -> None:
         """Monitor system-wide risks."""
         try:
@@ -763,17 +777,14 @@ class RiskAgent:
             )
             
             # Get individual risk metrics
-            individual_risks = {}
-            for symbol in self.monitored_symbols:
-                individual_risks[symbol] = {
-                    "var": self.risk_metrics.calculate_var(symbol),
-                    "sharpe": self.risk_metrics.calculate_sharpe_ratio(symbol),
-                    "max_drawdown": self.risk_metrics.calculate_max_drawdown(symbol)
-                }
+            metrics = self.risk_metrics.pnl_metrics(list(self.monitored_symbols))
+            empty = {"var": None, "sharpe": None, "max_drawdown": None}
+            individual_risks = {symbol: metrics.get(symbol, empty) for symbol in self.monitored_symbols}
             
             return {
                 "portfolio_risk": portfolio_risk,
                 "individual_risks": individual_risks,
+                "stress_test": self.last_stress_report,
                 "monitored_symbols": list(self.monitored_symbols),
                 "last_update": time.time()
             }
@@ -4,9 +4,13 @@ Capital Management - Gestão inteligente de capital baseada em saldo disponível
 import math
 import time
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, field
 
+import numpy as np
+
+from utils.account_snapshot import AccountSnapshot, AccountSnapshotService, get_account_snapshot_service
+from utils.kline_store import get_kline_store
 from utils.logger import setup_logger
 from utils.api_client import APIClient
 
@@ -36,15 +40,431 @@ class CapitalAllocation:
         }
 
 
+@dataclass
+class AllocationPlan:
+    """Resultado de compute_allocations para uma rodada de alocação."""
+    status: str = "ok"  # 'ok', 'insufficient_capital' ou 'no_pairs'
+    allocations: List[CapitalAllocation] = field(default_factory=list)
+    capital_per_pair: float = 0.0
+    available_capital: float = 0.0
+    effective_max_pairs: int = 0
+    allocated: Dict[str, float] = field(default_factory=lambda: {"spot": 0.0, "futures": 0.0})
+    # Capital total que cada mercado precisa ter para a rodada e quanto viria de transferência
+    required_capital: Dict[str, float] = field(default_factory=lambda: {"spot": 0.0, "futures": 0.0})
+    transfers: Dict[str, float] = field(default_factory=lambda: {"spot": 0.0, "futures": 0.0})
+    market_decisions: Dict[str, Tuple[str, str]] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+
+    @property
+    def transfers_needed(self) -> bool:
+        return self.transfers["spot"] > 0 or self.transfers["futures"] > 0
+
+
+HIGH_VOLATILITY_SYMBOLS = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
+MAJOR_PAIRS = ["BTCUSDT", "ETHUSDT", "ADAUSDT", "BNBUSDT", "SOLUSDT"]
+
+
+def decide_market(symbol: str, snapshot: AccountSnapshot) -> Tuple[str, str]:
+    """Escolhe 'spot' ou 'futures' para o símbolo a partir do snapshot: (mercado, motivo)."""
+    decision_factors = {
+        "volatility": 0,
+        "volume": 0,
+        "spread": 0,  # será implementado se necessário
+        "liquidity": 0,
+        "fees": 0.5,  # Futures podem ter taxas menores para trading frequente
+    }
+    
+    # Volume (maior volume = melhor liquidez)
+    futures_volume = snapshot.futures_volume.get(symbol, 0.0)
+    spot_volume = snapshot.spot_volume.get(symbol, 0.0)
+    if futures_volume > spot_volume * 1.2:  # 20% maior
+        decision_factors["volume"] = 1  # Favorece futures
+    elif spot_volume > futures_volume * 1.2:
+        decision_factors["volume"] = -1  # Favorece spot
+    
+    # Volatilidade e liquidez - Futures geralmente melhores para os pares principais
+    if symbol in HIGH_VOLATILITY_SYMBOLS:
+        decision_factors["volatility"] = 1
+    if symbol in MAJOR_PAIRS:
+        decision_factors["liquidity"] = 1
+    
+    total_score = sum(decision_factors.values())
+    if total_score > 0.5:
+        return "futures", "Higher volume/liquidity in futures market"
+    if total_score < -0.5:
+        return "spot", "Better conditions in spot market"
+    # Fallback: usar mercado com mais capital disponível
+    if snapshot.futures_usdt > snapshot.spot_usdt:
+        return "futures", "More capital available in futures"
+    return "spot", "More capital available in spot"
+
+
+def grid_parameters(config: dict, allocated_capital: float, market_type: str = "spot") -> Dict:
+    """Parâmetros do grid para o capital alocado e tipo de mercado."""
+    # Configurações base do grid
+    grid_config = config["grid"]
+    advanced = config["capital_management_advanced"]
+    base_grid_levels = grid_config["initial_levels"]
+    base_spacing = float(grid_config["initial_spacing_perc"])
+    
+    # Para futures, considerar alavancagem
+    if market_type == "futures":
+        leverage = grid_config["futures"]["leverage"]
+        effective_capital = allocated_capital * leverage
+        
+        # Com alavancagem, podemos ter grids mais densos - Configurável
+        capital_thresholds = advanced["futures_capital_thresholds"]
+        
+        if effective_capital < capital_thresholds["low"]:
+            grid_levels = max(grid_config["min_levels"], base_grid_levels)
+            spacing_percentage = base_spacing * advanced["futures_spacing_multipliers"]["low"]
+            max_position_size = allocated_capital * advanced["futures_position_sizes"]["low"]
+        elif effective_capital < capital_thresholds["medium"]:
+            grid_levels = base_grid_levels + advanced["futures_level_adjustments"]["medium"]
+            spacing_percentage = base_spacing * advanced["futures_spacing_multipliers"]["medium"]
+            max_position_size = allocated_capital * advanced["futures_position_sizes"]["medium"]
+        else:
+            grid_levels = min(grid_config["max_levels"], base_grid_levels + advanced["futures_level_adjustments"]["high"])
+            spacing_percentage = base_spacing * advanced["futures_spacing_multipliers"]["high"]
+            max_position_size = allocated_capital * advanced["futures_position_sizes"]["high"]
+            
+    else:  # spot
+        # Para spot, usar configurações do config.yaml
+        spot_thresholds = advanced["spot_capital_thresholds"]
+        
+        if allocated_capital < spot_thresholds["low"]:
+            grid_levels = max(grid_config["min_levels"] // 2, base_grid_levels // 2)
+            spacing_percentage = base_spacing * advanced["spot_spacing_multipliers"]["low"]
+            max_position_size = allocated_capital * advanced["spot_position_sizes"]["low"]
+        elif allocated_capital < spot_thresholds["medium"]:
+            grid_levels = base_grid_levels
+            spacing_percentage = base_spacing
+            max_position_size = allocated_capital * advanced["spot_position_sizes"]["medium"]
+        else:
+            grid_levels = min(grid_config["max_levels"] // 2, base_grid_levels + advanced["spot_level_adjustments"]["high"])
+            spacing_percentage = base_spacing * advanced["spot_spacing_multipliers"]["high"]
+            max_position_size = allocated_capital * advanced["spot_position_sizes"]["high"]
+    
+    return {
+        "grid_levels": grid_levels,
+        "spacing_percentage": spacing_percentage,
+        "max_position_size": max_position_size,
+        "market_type": market_type,
+        "leverage": leverage if market_type == "futures" else grid_config["leverage"]
+    }
+
+
+# --- Motores de alocação entre pares (NumPy puro) --- #
+
+def project_capped_simplex(v: np.ndarray, lower: float, upper: float) -> np.ndarray:
+    """Projeção euclidiana de v em {w : sum(w) = 1, lower <= w <= upper}.
+    
+    sum(clip(v - tau, lower, upper)) é linear por partes em tau, com quebras em v - lower
+    e v - upper: avalia todas as quebras de uma vez e interpola no segmento que cruza 1.
+    """
+    n = len(v)
+    if n * upper <= 1.0:
+        return np.full(n, upper)
+    if n * lower >= 1.0:
+        return np.full(n, 1.0 / n)
+    breaks = np.sort(np.concatenate([v - lower, v - upper]))
+    totals = np.clip(v[None, :] - breaks[:, None], lower, upper).sum(axis=1)  # decrescente
+    k = int(np.searchsorted(-totals, -1.0))
+    if k == 0:
+        tau = breaks[0]
+    else:
+        drop = totals[k - 1] - totals[k]
+        tau = breaks[k - 1] + (totals[k - 1] - 1.0) * (breaks[k] - breaks[k - 1]) / drop if drop > 0 else breaks[k]
+    return np.clip(v - tau, lower, upper)
+
+
+def shrunk_covariance(returns: np.ndarray, shrinkage: float = 0.1) -> np.ndarray:
+    """Covariância amostral (símbolos x amostras) encolhida em direção à diagonal."""
+    centered = returns - returns.mean(axis=1, keepdims=True)
+    cov = centered @ centered.T / max(returns.shape[1] - 1, 1)
+    diag = np.diag(np.diag(cov))
+    cov = (1.0 - shrinkage) * cov + shrinkage * diag
+    # Piso na variância para séries constantes
+    cov[np.diag_indices_from(cov)] = np.maximum(np.diag(cov), 1e-12)
+    return cov
+
+
+def time_aligned_returns(klines: Dict[str, np.ndarray], window: int,
+                         min_history: int) -> Tuple[List[str], np.ndarray]:
+    """Retornos simples (símbolos x amostras) dos closes numa grade comum de open_time.
+
+    `klines` mapeia símbolo -> candles fechados (registros KLINE_DTYPE, ordem cronológica,
+    mesmo intervalo). A grade termina no último candle fechado comum a todos; símbolos com
+    menos de `min_history` retornos nessa grade ficam de fora (recebem a fatia igual).
+    """
+    eligible = {s: k for s, k in klines.items() if k is not None and len(k) > min_history}
+    if len(eligible) < 2:
+        return [], np.empty((0, 0))
+    end = min(k["open_time"][-1] for k in eligible.values())
+    grids = {}
+    for symbol, k in eligible.items():
+        times = k["open_time"][k["open_time"] <= end][-(window + 1):]
+        if len(times) > min_history:
+            grids[symbol] = times
+    if len(grids) < 2:
+        return [], np.empty((0, 0))
+    grid = grids[next(iter(grids))]
+    for times in grids.values():
+        grid = np.intersect1d(grid, times, assume_unique=True)
+    if len(grid) <= min_history:
+        return [], np.empty((0, 0))
+    symbols = list(grids)
+    closes = np.vstack([
+        eligible[s]["close"][np.searchsorted(eligible[s]["open_time"], grid)] for s in symbols
+    ])
+    return symbols, closes[:, 1:] / closes[:, :-1] - 1.0
+
+
+class AllocationEngine:
+    """Divide o orçamento da rodada entre os pares; subclasses definem os pesos."""
+    
+    name = "equal"
+    
+    def __init__(self, config: dict = None):
+        engine_config = (config or {}).get("capital_management_advanced", {}).get("allocation_engine", {})
+        self.interval = engine_config.get("interval", "15m")
+        self.lookback = int(engine_config.get("lookback", 100))
+        self.min_history = int(engine_config.get("min_history", 30))
+        self.shrinkage = float(engine_config.get("shrinkage", 0.1))
+        self.risk_aversion = float(engine_config.get("risk_aversion", 5.0))
+        self.max_iterations = int(engine_config.get("max_iterations", 500))
+        self.tolerance = float(engine_config.get("tolerance", 1e-10))
+    
+    def weights(self, returns: np.ndarray, lower: float, upper: float) -> np.ndarray:
+        """Pesos (somam 1, dentro de [lower, upper]) para uma matriz símbolos x retornos."""
+        return project_capped_simplex(np.full(len(returns), 1.0 / len(returns)), lower, upper)
+    
+    def allocate(self, symbols: List[str], budget: float, min_amount: float, max_amount: float,
+                 returns: Optional[Tuple[List[str], np.ndarray]] = None) -> Dict[str, float]:
+        """
+        Capital por símbolo para a rodada.
+        
+        Args:
+            symbols: Pares selecionados
+            budget: Capital total da rodada
+            min_amount: Mínimo por par (notional mínimo da exchange)
+            max_amount: Máximo por par (max_capital_per_pair_percentage)
+            returns: (símbolos, matriz símbolos x retornos alinhados), ex. time_aligned_returns
+        """
+        n = len(symbols)
+        if n == 0 or budget <= 0:
+            return {}
+        lower, upper = min(min_amount / budget, 1.0 / n), max_amount / budget
+        history_symbols, matrix = returns if returns is not None else ([], np.empty((0, 0)))
+        rows = {s: i for i, s in enumerate(history_symbols)}
+        known = [i for i, s in enumerate(symbols) if s in rows]
+        if len(known) < 2 or matrix.shape[1] < self.min_history:
+            return {symbol: budget / n for symbol in symbols}
+        
+        # Pares sem histórico mantêm a fatia igual; os demais dividem o restante
+        w = np.full(n, 1.0 / n)
+        share = len(known) / n
+        sub = matrix[[rows[symbols[i]] for i in known], -self.lookback:]
+        w[known] = share * self.weights(sub, lower / share, min(upper / share, 1.0))
+        w = project_capped_simplex(w, lower, upper)
+        return {symbol: float(amount) for symbol, amount in zip(symbols, w * budget)}
+
+
+class EqualWeightEngine(AllocationEngine):
+    """Orçamento dividido igualmente (comportamento original)."""
+    
+    name = "equal"
+
+
+class RiskParityEngine(AllocationEngine):
+    """Contribuições de risco iguais: Newton na formulação convexa de Spinu."""
+    
+    name = "risk_parity"
+    
+    def weights(self, returns: np.ndarray, lower: float, upper: float) -> np.ndarray:
+        cov = shrunk_covariance(returns, self.shrinkage)
+        n = len(cov)
+        budget = np.full(n, 1.0 / n)
+        # min 0.5 y'Σy - Σ b log y  =>  y ∝ pesos com Σy ⊙ y = b
+        y = 1.0 / np.sqrt(np.diag(cov))
+        y /= np.sqrt(y @ cov @ y)
+        for _ in range(50):
+            grad = cov @ y - budget / y
+            if np.abs(grad * y).max() < self.tolerance:  # contribuições de risco - b
+                break
+            hessian = cov + np.diag(budget / y ** 2)
+            step = np.linalg.solve(hessian, grad)
+            # Passo amortecido mantém y > 0
+            ratio = step / y
+            scale = 1.0 if ratio.max() < 0.5 else 0.5 / ratio.max()
+            y -= scale * step
+        return project_capped_simplex(y / y.sum(), lower, upper)
+
+
+class MeanVarianceEngine(AllocationEngine):
+    """max μ'w - (γ/2) w'Σw com sum(w) = 1 e limites por par: gradiente projetado acelerado."""
+    
+    name = "mean_variance"
+    
+    def weights(self, returns: np.ndarray, lower: float, upper: float) -> np.ndarray:
+        cov = shrunk_covariance(returns, self.shrinkage)
+        mu = returns.mean(axis=1)
+        gamma = self.risk_aversion
+        step = 1.0 / (gamma * np.linalg.eigvalsh(cov)[-1])
+        
+        w = project_capped_simplex(np.full(len(cov), 1.0 / len(cov)), lower, upper)
+        z, t = w, 1.0
+        for _ in range(self.max_iterations):
+            grad = gamma * (cov @ z) - mu
+            w_next = project_capped_simplex(z - step * grad, lower, upper)
+            if np.abs(w_next - w).max() < self.tolerance:
+                w = w_next
+                break
+            t_next = 0.5 * (1.0 + np.sqrt(1.0 + 4.0 * t * t))
+            z = w_next + ((t - 1.0) / t_next) * (w_next - w)
+            w, t = w_next, t_next
+        return w
+
+
+ALLOCATION_ENGINES = {
+    "equal": EqualWeightEngine,
+    "risk_parity": RiskParityEngine,
+    "mean_variance": MeanVarianceEngine,
+}
+
+
+def get_allocation_engine(config: dict) -> AllocationEngine:
+    """Motor configurado em capital_management_advanced.allocation_engine.method."""
+    engine_config = config.get("capital_management_advanced", {}).get("allocation_engine", {})
+    method = engine_config.get("method", "equal")
+    if method not in ALLOCATION_ENGINES:
+        log.warning(f"Unknown allocation engine '{method}', using equal weights")
+        method = "equal"
+    return ALLOCATION_ENGINES[method](config)
+
+
+def compute_allocations(snapshot: AccountSnapshot,
+                        symbols: List[str],
+                        config: dict,
+                        market_types: Dict[str, str] = None,
+                        use_proportional_allocation: bool = True,
+                        allow_transfers: bool = True,
+                        engine: Optional[AllocationEngine] = None,
+                        returns: Optional[Tuple[List[str], np.ndarray]] = None) -> AllocationPlan:
+    """
+    Calcula as alocações de todos os símbolos a partir de um AccountSnapshot (sem I/O).
+    
+    Args:
+        snapshot: Estado da conta da rodada
+        symbols: Símbolos em ordem de prioridade
+        market_types: Mercado forçado por símbolo (opcional)
+        allow_transfers: Se True, símbolos sem saldo no mercado escolhido consomem saldo
+            do outro mercado e a transferência necessária é registrada no plano; se False,
+            o símbolo passa a usar o outro mercado.
+        engine: Motor que divide o orçamento da rodada entre os pares (padrão: igual)
+        returns: Histórico de retornos alinhados para o motor (time_aligned_returns)
+    """
+    advanced = config["capital_management_advanced"]
+    min_capital_per_pair = advanced["min_capital_per_pair_usd"]
+    safety_buffer = advanced["safety_buffer_percentage"]
+    max_capital_percentage = advanced["max_capital_per_pair_percentage"]
+    min_notional = max(advanced.get("min_notional_limits", {}).values(), default=0.0)
+    market_allocation = config["trading"]["market_allocation"]
+    
+    plan = AllocationPlan()
+    balances = snapshot.balances()
+    total_capital = balances["total_usdt"]
+    if total_capital < min_capital_per_pair:
+        plan.status = "insufficient_capital"
+        return plan
+    
+    # Aplicar buffer de segurança e determinar número máximo de pares
+    plan.available_capital = total_capital * (1 - safety_buffer / 100)
+    max_pairs_by_capital = int(plan.available_capital / min_capital_per_pair)
+    plan.effective_max_pairs = min(config["trading"]["max_concurrent_pairs"], max_pairs_by_capital, len(symbols))
+    if plan.effective_max_pairs == 0:
+        plan.status = "no_pairs"
+        return plan
+    
+    # Alocação por par, limitada ao máximo por par
+    capital_per_pair = plan.available_capital / plan.effective_max_pairs
+    capital_per_pair = min(capital_per_pair, total_capital * (max_capital_percentage / 100))
+    plan.capital_per_pair = capital_per_pair
+    
+    # Capital por par: o motor redistribui o mesmo orçamento respeitando mínimo e teto por par
+    selected_symbols = symbols[:plan.effective_max_pairs]
+    amounts = {symbol: capital_per_pair for symbol in selected_symbols}
+    if engine is not None and returns is not None:
+        amounts = engine.allocate(
+            selected_symbols,
+            budget=capital_per_pair * plan.effective_max_pairs,
+            min_amount=max(min_capital_per_pair, min_notional),
+            max_amount=total_capital * (max_capital_percentage / 100),
+            returns=returns,
+        )
+    
+    # Alocação proporcional entre mercados se ambos têm saldo
+    target = {"spot": 0.0, "futures": 0.0}
+    if use_proportional_allocation and balances["spot_usdt"] > 0 and balances["futures_usdt"] > 0:
+        total_to_allocate = capital_per_pair * plan.effective_max_pairs
+        target["spot"] = min(total_to_allocate * market_allocation["spot_percentage"] / 100, balances["spot_usdt"])
+        target["futures"] = min(total_to_allocate * market_allocation["futures_percentage"] / 100, balances["futures_usdt"])
+    
+    for symbol in selected_symbols:
+        amount = amounts[symbol]
+        if market_types and symbol in market_types:
+            market_type = market_types[symbol]
+        else:
+            market_type, reason = decide_market(symbol, snapshot)
+            plan.market_decisions[symbol] = (market_type, reason)
+        other = "futures" if market_type == "spot" else "spot"
+        
+        # Ajustar para cumprir a proporção configurada
+        if target["spot"] > 0 and target["futures"] > 0:
+            if plan.allocated[market_type] >= target[market_type] and plan.allocated[other] < target[other]:
+                market_type, other = other, market_type
+        
+        # Capital insuficiente no mercado escolhido: transferir do outro ou trocar de mercado
+        if balances[f"{market_type}_usdt"] < amount:
+            if balances[f"{other}_usdt"] < amount:
+                plan.skipped.append(symbol)
+                continue
+            if allow_transfers:
+                balances[f"{other}_usdt"] -= amount
+                balances[f"{market_type}_usdt"] += amount
+                plan.transfers[market_type] += amount
+            else:
+                market_type, other = other, market_type
+        
+        params = grid_parameters(config, amount, market_type)
+        plan.allocations.append(CapitalAllocation(
+            symbol=symbol,
+            allocated_amount=amount,
+            max_position_size=params["max_position_size"],
+            grid_levels=params["grid_levels"],
+            spacing_percentage=params["spacing_percentage"],
+            market_type=market_type,
+            leverage=params["leverage"]
+        ))
+        balances[f"{market_type}_usdt"] -= amount
+        plan.allocated[market_type] += amount
+    
+    plan.required_capital = dict(plan.allocated)
+    return plan
+
+
 class CapitalManager:
     """
     Gerencia a alocação de capital baseada no saldo disponível.
     Adapta automaticamente o grid ao capital disponível.
     """
     
-    def __init__(self, api_client: APIClient, config: dict):
+    def __init__(self, api_client: APIClient, config: dict,
+                 snapshot_service: Optional[AccountSnapshotService] = None):
         self.api_client = api_client
         self.config = config
+        # Saldos/posições/tickers compartilhados por todos os CapitalManagers do processo
+        self.snapshot_service = snapshot_service or get_account_snapshot_service(api_client, config)
         
         # Cache for symbol validation
         self.valid_symbols_cache = {
@@ -65,6 +485,9 @@ class CapitalManager:
         self.min_capital_per_pair_usd = self.capital_advanced_config["min_capital_per_pair_usd"]
         self.safety_buffer_percentage = self.capital_advanced_config["safety_buffer_percentage"]
         
+        # Motor de alocação entre pares (histórico de retornos vem do KlineStore)
+        self.allocation_engine = get_allocation_engine(config)
+        
         # Cache
         self.last_balance_check = 0
         self.cached_balances = {}
@@ -117,51 +540,53 @@ class CapitalManager:
         except Exception as e:
             log.error(f"Failed to update symbols cache: {e}")
         
-    def get_available_balances(self) -> Dict[str, float]:
+    def _allocation_returns(self, symbols: List[str]) -> Optional[Tuple[List[str], np.ndarray]]:
+        """Retornos alinhados no tempo dos candidatos, a partir dos klines de futuros do KlineStore.
+
+        Só os candles que faltam são buscados; com menos de 2 símbolos não há o que otimizar.
+        """
+        if len(symbols) < 2 or self.allocation_engine.name == "equal":
+            return None
+        engine = self.allocation_engine
+        kline_store = get_kline_store()
+        klines = {}
+        try:
+            for symbol in symbols[:self.max_concurrent_pairs]:
+                series = kline_store.fetch(self.api_client, symbol, engine.interval, engine.lookback + 2, "futures")
+                if series is not None:
+                    klines[symbol] = series.view(include_forming=False)
+            return time_aligned_returns(klines, engine.lookback, engine.min_history)
+        except Exception as e:
+            log.warning(f"Could not read return history for allocation: {e}")
+            return None
+    
+    def seed_allocations(self, allocations: Iterable[CapitalAllocation]) -> None:
+        """Adota alocações calculadas pelo processo principal para a carteira inteira.
+
+        Workers recebem a fatia do seu par em vez de recalcular com um único símbolo
+        (que sempre cairia na divisão igual).
+        """
+        for allocation in allocations:
+            if allocation is not None:
+                self.current_allocations[allocation.symbol] = allocation
+    
+    def get_account_snapshot(self, force_refresh: bool = False) -> AccountSnapshot:
+        """Snapshot da conta (saldos, posições, tickers 24h) compartilhado no processo."""
+        return self.snapshot_service.get(force_refresh)
+    
+    def _record_balances(self, snapshot: AccountSnapshot) -> Dict[str, float]:
+        """Atualiza cache e estatísticas de saldo a partir do snapshot."""
+        balances = snapshot.balances()
+        self.cached_balances = balances
+        self.last_balance_check = time.time()
+        self.stats["balance_checks"] += 1
+        self.stats["last_total_balance"] = balances["total_usdt"]
+        return balances
+    
+    def get_available_balances(self, force_refresh: bool = False) -> Dict[str, float]:
         """Obtém saldos disponíveis para spot e futures."""
         try:
-            balances = {
-                "spot_usdt": 0.0,
-                "futures_usdt": 0.0,
-                "total_usdt": 0.0
-            }
-            
-            # Saldo Spot
-            try:
-                spot_balance = self.api_client.get_spot_account_balance()
-                if spot_balance and 'balances' in spot_balance:
-                    for asset in spot_balance['balances']:
-                        if asset.get("asset") == "USDT":
-                            balances["spot_usdt"] = float(asset.get("free", "0"))
-                            break
-                elif isinstance(spot_balance, dict):
-                    usdt_balance = spot_balance.get("USDT", {})
-                    balances["spot_usdt"] = float(usdt_balance.get("free", "0"))
-            except Exception as e:
-                log.warning(f"Failed to get spot balance: {e}")
-            
-            # Saldo Futures
-            try:
-                futures_balance = self.api_client.get_futures_account_balance()
-                if isinstance(futures_balance, list):
-                    for asset in futures_balance:
-                        if asset.get("asset") == "USDT":
-                            balances["futures_usdt"] = float(asset.get("availableBalance", "0"))
-                            break
-                elif isinstance(futures_balance, dict):
-                    balances["futures_usdt"] = float(futures_balance.get("availableBalance", "0"))
-            except Exception as e:
-                log.warning(f"Failed to get futures balance: {e}")
-            
-            # Total
-            balances["total_usdt"] = balances["spot_usdt"] + balances["futures_usdt"]
-            
-            # Cache e estatísticas
-            self.cached_balances = balances
-            self.last_balance_check = time.time()
-            self.stats["balance_checks"] += 1
-            self.stats["last_total_balance"] = balances["total_usdt"]
-            
+            balances = self._record_balances(self.get_account_snapshot(force_refresh))
             log.info(f"Available balances - Spot: ${balances['spot_usdt']:.2f}, Futures: ${balances['futures_usdt']:.2f}, Total: ${balances['total_usdt']:.2f}")
             return balances
             
@@ -179,18 +604,8 @@ class CapitalManager:
         try:
             log.info("Checking for BRL balance to convert to USDT...")
             
-            # Verificar saldo spot completo para encontrar BRL
-            spot_balances = self.api_client.get_account_balance()
-            brl_balance = 0.0
-            
-            if isinstance(spot_balances, list):
-                for asset in spot_balances:
-                    if asset.get("asset") == "BRL":
-                        brl_balance = float(asset.get("free", "0"))
-                        break
-            elif isinstance(spot_balances, dict):
-                brl_data = spot_balances.get("BRL", {})
-                brl_balance = float(brl_data.get("free", "0"))
+            # Saldo spot completo já vem no snapshot da conta
+            brl_balance = self.get_account_snapshot().spot_free.get("BRL", 0.0)
             
             # Configurável via config.yaml
             min_brl_to_convert = self.capital_advanced_config["min_brl_to_convert"]
@@ -228,6 +643,7 @@ class CapitalManager:
             success = self._execute_brl_to_usdt_conversion(brl_balance, brl_usdt_price)
             
             if success:
+                self.snapshot_service.invalidate()
                 log.info(f"✅ Successfully converted R$ {brl_balance:.2f} to USDT")
                 return True
             else:
@@ -288,6 +704,10 @@ class CapitalManager:
         """
         Calcula alocações ótimas de capital baseadas no saldo disponível.
         
+        Todas as alocações saem de um único AccountSnapshot (saldos, posições e tickers
+        obtidos uma vez) via compute_allocations; transferências entre mercados, se
+        necessárias, são feitas de uma vez para a rodada inteira.
+        
         Args:
             symbols: Lista de símbolos para trading
             market_types: Dict mapeando símbolo para tipo de mercado (spot/futures)
@@ -298,156 +718,64 @@ class CapitalManager:
         except Exception as e:
             log.warning(f"BRL conversion check failed: {e}")
         
-        balances = self.get_available_balances()
-        total_capital = balances["total_usdt"]
+        snapshot = self.get_account_snapshot()
+        self._record_balances(snapshot)
+        total_capital = snapshot.total_usdt
         
         # Verificar se há posições existentes que devem ser consideradas
-        existing_positions = self._get_existing_positions_value()
+        existing_positions = snapshot.positions_value
         if existing_positions > 0:
             log.info(f"📊 POSIÇÕES EXISTENTES: ${existing_positions:.2f} em capital já alocado")
             log.info(f"💡 CAPITAL DISPONÍVEL REAL: ${total_capital:.2f} (saldo livre) + ${existing_positions:.2f} (posições) = ${total_capital + existing_positions:.2f} total")
         
-        if total_capital < self.min_capital_per_pair_usd:
+        returns = self._allocation_returns(symbols)
+        plan = compute_allocations(snapshot, symbols, self.config, market_types, use_proportional_allocation,
+                                   engine=self.allocation_engine, returns=returns)
+        
+        if plan.transfers_needed:
+            # Uma única transferência para a rodada; depois recalcular sem transferências
+            # (símbolos sem saldo no mercado escolhido caem para o outro mercado)
+            log.info(f"Attempting transfer for optimal allocation - Spot: ${plan.required_capital['spot']:.2f}, Futures: ${plan.required_capital['futures']:.2f}")
+            if not self.transfer_capital_for_optimal_allocation(plan.required_capital["spot"], plan.required_capital["futures"]):
+                log.info("Transfer failed, allocating with current market balances")
+            self.snapshot_service.invalidate()
+            snapshot = self.get_account_snapshot()
+            self._record_balances(snapshot)
+            plan = compute_allocations(snapshot, symbols, self.config, market_types,
+                                       use_proportional_allocation, allow_transfers=False,
+                                       engine=self.allocation_engine, returns=returns)
+        
+        if plan.status == "insufficient_capital":
             log.warning(f"❌ CAPITAL INSUFICIENTE: ${total_capital:.2f} < ${self.min_capital_per_pair_usd:.2f} mínimo da Binance")
             log.warning(f"🛑 SISTEMA PAUSADO: Não é possível operar novos pares sem risco de erro 'notional'")
             log.info(f"💡 SOLUÇÃO: Deposite mais fundos ou aguarde lucros de posições existentes")
             self.stats["insufficient_capital_events"] += 1
             return []
         
-        # Aplicar buffer de segurança
-        available_capital = total_capital * (1 - self.safety_buffer_percentage / 100)
-        
-        # Determinar número máximo de pares baseado no capital
-        max_pairs_by_capital = int(available_capital / self.min_capital_per_pair_usd)
-        effective_max_pairs = min(self.max_concurrent_pairs, max_pairs_by_capital, len(symbols))
-        
-        if effective_max_pairs == 0:
-            log.warning(f"❌ NENHUM PAR PODE SER OPERADO: Capital disponível ${available_capital:.2f} insuficiente")
+        if plan.status == "no_pairs":
+            log.warning(f"❌ NENHUM PAR PODE SER OPERADO: Capital disponível ${plan.available_capital:.2f} insuficiente")
             log.info(f"📊 STATUS: Capital total: ${total_capital:.2f} | Buffer segurança: {self.safety_buffer_percentage}% | Mínimo por par: ${self.min_capital_per_pair_usd}")
             log.info(f"🎯 NECESSÁRIO: Mínimo ${self.min_capital_per_pair_usd + (self.min_capital_per_pair_usd * self.safety_buffer_percentage / 100):.2f} para operar 1 par com segurança")
             return []
         
-        # Selecionar símbolos prioritários (primeiros da lista)
-        selected_symbols = symbols[:effective_max_pairs]
-        
-        # Calcular alocação por par
-        capital_per_pair = available_capital / effective_max_pairs
-        
-        # Limitar alocação máxima por par
-        max_capital_per_pair = total_capital * (self.max_capital_per_pair_percentage / 100)
-        capital_per_pair = min(capital_per_pair, max_capital_per_pair)
-        
-        # Calcular alocação proporcional entre mercados se solicitado
-        target_spot_capital = 0
-        target_futures_capital = 0
+        for symbol, (market_type, reason) in plan.market_decisions.items():
+            log.info(f"Market decision for {symbol}: {market_type} ({reason})")
+        for symbol in plan.skipped:
+            log.warning(f"Insufficient balance for {symbol} in both markets")
         
-        if use_proportional_allocation and balances["spot_usdt"] > 0 and balances["futures_usdt"] > 0:
-            # Ambos mercados têm saldo - aplicar proporção configurada
-            total_to_allocate = capital_per_pair * effective_max_pairs
-            spot_percentage = self.market_allocation["spot_percentage"] / 100
-            futures_percentage = self.market_allocation["futures_percentage"] / 100
-            
-            target_spot_capital = min(total_to_allocate * spot_percentage, balances["spot_usdt"])
-            target_futures_capital = min(total_to_allocate * futures_percentage, balances["futures_usdt"])
-            
-            log.info(f"Proportional allocation target - Spot: ${target_spot_capital:.2f}, Futures: ${target_futures_capital:.2f}")
-        
-        allocations = []
-        spot_allocated = 0
-        futures_allocated = 0
-        
-        for i, symbol in enumerate(selected_symbols):
-            # Determinar tipo de mercado
-            if market_types and symbol in market_types:
-                # Usuário especificou mercado manualmente
-                market_type = market_types[symbol]
-            else:
-                # Decisão automática baseada em análise de mercado
-                market_type = self.decide_optimal_market_for_symbol(symbol)
-            
-            # Se usando alocação proporcional, considerar targets
-            if use_proportional_allocation and target_spot_capital > 0 and target_futures_capital > 0:
-                # Verificar se devemos ajustar para cumprir proporção
-                if market_type == "spot" and spot_allocated >= target_spot_capital:
-                    if futures_allocated < target_futures_capital:
-                        market_type = "futures"  # Mudar para futures para balancear
-                elif market_type == "futures" and futures_allocated >= target_futures_capital:
-                    if spot_allocated < target_spot_capital:
-                        market_type = "spot"  # Mudar para spot para balancear
-            
-            # Verificar se há capital suficiente para este mercado
-            original_market_type = market_type
-            transfer_attempted = False
-            
-            if market_type == "spot" and balances["spot_usdt"] < capital_per_pair:
-                # Tentar transferir de Futures para Spot
-                if balances["futures_usdt"] >= capital_per_pair:
-                    log.info(f"[{symbol}] Attempting transfer from Futures to Spot for optimal allocation")
-                    if self.transfer_capital_for_optimal_allocation(capital_per_pair, 0):
-                        # Atualizar saldos após transferência
-                        balances = self.get_available_balances()
-                        transfer_attempted = True
-                    else:
-                        market_type = "futures"  # Fallback para futures
-                        log.info(f"[{symbol}] Transfer failed, using futures instead")
-                else:
-                    log.warning(f"Insufficient balance for {symbol} in both markets")
-                    continue
-                    
-            elif market_type == "futures" and balances["futures_usdt"] < capital_per_pair:
-                # Tentar transferir de Spot para Futures
-                if balances["spot_usdt"] >= capital_per_pair:
-                    log.info(f"[{symbol}] Attempting transfer from Spot to Futures for optimal allocation")
-                    if self.transfer_capital_for_optimal_allocation(0, capital_per_pair):
-                        # Atualizar saldos após transferência
-                        balances = self.get_available_balances()
-                        transfer_attempted = True
-                    else:
-                        market_type = "spot"  # Fallback para spot
-                        log.info(f"[{symbol}] Transfer failed, using spot instead")
-                else:
-                    log.warning(f"Insufficient balance for {symbol} in both markets")
-                    continue
-            
-            # Verificação final após possível transferência
-            if market_type == "spot" and balances["spot_usdt"] < capital_per_pair:
-                log.warning(f"[{symbol}] Still insufficient spot balance after transfer attempt")
-                continue
-            elif market_type == "futures" and balances["futures_usdt"] < capital_per_pair:
-                log.warning(f"[{symbol}] Still insufficient futures balance after transfer attempt")
-                continue
-            
-            if transfer_attempted:
-                log.info(f"[{symbol}] Successfully allocated to {market_type} after transfer")
-            
-            # Adaptar parâmetros do grid baseado no capital e tipo de mercado
-            grid_params = self._calculate_grid_parameters(capital_per_pair, market_type)
-            
-            allocation = CapitalAllocation(
-                symbol=symbol,
-                allocated_amount=capital_per_pair,
-                max_position_size=grid_params["max_position_size"],
-                grid_levels=grid_params["grid_levels"],
-                spacing_percentage=grid_params["spacing_percentage"],
-                market_type=market_type,
-                leverage=grid_params["leverage"]
-            )
-            
-            allocations.append(allocation)
-            
-            # Atualizar saldos disponíveis e contadores
-            if market_type == "spot":
-                balances["spot_usdt"] -= capital_per_pair
-                spot_allocated += capital_per_pair
-            else:
-                balances["futures_usdt"] -= capital_per_pair
-                futures_allocated += capital_per_pair
+        allocations = plan.allocations
+        capital_per_pair = plan.capital_per_pair
+        spot_allocated = plan.allocated["spot"]
+        futures_allocated = plan.allocated["futures"]
         
         # Atualizar cache e estatísticas
         self.current_allocations = {alloc.symbol: alloc for alloc in allocations}
         self.stats["allocation_updates"] += 1
         
         log.info(f"✅ ALOCAÇÃO CALCULADA: {len(allocations)} pares de {len(symbols)} solicitados")
+        if returns is not None and len(allocations) > 1:
+            amounts = [a.allocated_amount for a in allocations]
+            log.info(f"⚖️ Motor {self.allocation_engine.name}: ${min(amounts):.2f} - ${max(amounts):.2f} por par")
         log.info(f"💰 CAPITAL: ${capital_per_pair:.2f} por par | Total alocado: ${sum(a.allocated_amount for a in allocations):.2f} | Disponível: ${total_capital:.2f}")
         
         if len(allocations) < len(symbols):
@@ -472,59 +800,10 @@ class CapitalManager:
     
     def _calculate_grid_parameters(self, allocated_capital: float, market_type: str = "spot") -> Dict:
         """Calcula parâmetros do grid baseados no capital alocado e tipo de mercado."""
-        
-        # Configurações base do grid
-        grid_config = self.config["grid"]
-        base_grid_levels = grid_config["initial_levels"]
-        base_spacing = float(grid_config["initial_spacing_perc"])
-        
-        # Para futures, considerar alavancagem
+        params = grid_parameters(self.config, allocated_capital, market_type)
         if market_type == "futures":
-            leverage = grid_config["futures"]["leverage"]
-            effective_capital = allocated_capital * leverage
-            
-            log.info(f"Futures market - Capital: ${allocated_capital:.2f}, Leverage: {leverage}x, Effective: ${effective_capital:.2f}")
-            
-            # Com alavancagem, podemos ter grids mais densos - Configurável
-            capital_thresholds = self.capital_advanced_config["futures_capital_thresholds"]
-            
-            if effective_capital < capital_thresholds["low"]:
-                grid_levels = max(grid_config["min_levels"], base_grid_levels)
-                spacing_percentage = base_spacing * self.capital_advanced_config["futures_spacing_multipliers"]["low"]
-                max_position_size = allocated_capital * self.capital_advanced_config["futures_position_sizes"]["low"]
-            elif effective_capital < capital_thresholds["medium"]:
-                grid_levels = base_grid_levels + self.capital_advanced_config["futures_level_adjustments"]["medium"]
-                spacing_percentage = base_spacing * self.capital_advanced_config["futures_spacing_multipliers"]["medium"]
-                max_position_size = allocated_capital * self.capital_advanced_config["futures_position_sizes"]["medium"]
-            else:
-                grid_levels = min(grid_config["max_levels"], base_grid_levels + self.capital_advanced_config["futures_level_adjustments"]["high"])
-                spacing_percentage = base_spacing * self.capital_advanced_config["futures_spacing_multipliers"]["high"]
-                max_position_size = allocated_capital * self.capital_advanced_config["futures_position_sizes"]["high"]
-                
-        else:  # spot
-            # Para spot, usar configurações do config.yaml
-            spot_thresholds = self.capital_advanced_config["spot_capital_thresholds"]
-            
-            if allocated_capital < spot_thresholds["low"]:
-                grid_levels = max(grid_config["min_levels"] // 2, base_grid_levels // 2)
-                spacing_percentage = base_spacing * self.capital_advanced_config["spot_spacing_multipliers"]["low"]
-                max_position_size = allocated_capital * self.capital_advanced_config["spot_position_sizes"]["low"]
-            elif allocated_capital < spot_thresholds["medium"]:
-                grid_levels = base_grid_levels
-                spacing_percentage = base_spacing
-                max_position_size = allocated_capital * self.capital_advanced_config["spot_position_sizes"]["medium"]
-            else:
-                grid_levels = min(grid_config["max_levels"] // 2, base_grid_levels + self.capital_advanced_config["spot_level_adjustments"]["high"])
-                spacing_percentage = base_spacing * self.capital_advanced_config["spot_spacing_multipliers"]["high"]
-                max_position_size = allocated_capital * self.capital_advanced_config["spot_position_sizes"]["high"]
-        
-        return {
-            "grid_levels": grid_levels,
-            "spacing_percentage": spacing_percentage,
-            "max_position_size": max_position_size,
-            "market_type": market_type,
-            "leverage": leverage if market_type == "futures" else grid_config["leverage"]
-        }
+            log.info(f"Futures market - Capital: ${allocated_capital:.2f}, Leverage: {params['leverage']}x, Effective: ${allocated_capital * params['leverage']:.2f}")
+        return params
     
     def get_allocation_for_symbol(self, symbol: str) -> Optional[CapitalAllocation]:
         """Obtém alocação de capital para um símbolo específico."""
@@ -679,55 +958,14 @@ class CapitalManager:
             log.info(f"Transfer amounts too small or insufficient buffer. Spot deficit: ${spot_deficit:.2f}, Futures deficit: ${futures_deficit:.2f}")
             transfers_successful = True  # Não é um erro, apenas não necessário
         
+        # Saldos mudaram (ou podem ter mudado): próxima consulta relê a conta
+        self.snapshot_service.invalidate()
         return transfers_successful
     
     def _get_existing_positions_value(self) -> float:
         """Calcula o valor total das posições existentes."""
         try:
-            total_position_value = 0.0
-            
-            # Verificar posições em Futures
-            try:
-                futures_positions = self.api_client.get_futures_account_balance()
-                if isinstance(futures_positions, list):
-                    for asset in futures_positions:
-                        if asset.get("asset") == "USDT":
-                            # Valor em posições = balance - availableBalance
-                            total_balance = float(asset.get("balance", "0"))
-                            available_balance = float(asset.get("availableBalance", "0"))
-                            position_value = total_balance - available_balance
-                            total_position_value += max(0, position_value)
-                            break
-                elif isinstance(futures_positions, dict):
-                    # Formato alternativo
-                    total_balance = float(futures_positions.get("totalWalletBalance", "0"))
-                    available_balance = float(futures_positions.get("availableBalance", "0"))
-                    position_value = total_balance - available_balance
-                    total_position_value += max(0, position_value)
-            except Exception as e:
-                log.warning(f"Error checking futures positions value: {e}")
-            
-            # Verificar posições em Spot (saldos não-USDT)
-            try:
-                spot_account = self.api_client.get_spot_account_balance()
-                if spot_account and 'balances' in spot_account:
-                    for asset in spot_account['balances']:
-                        if asset.get("asset") != "USDT":
-                            free_balance = float(asset.get("free", "0"))
-                            locked_balance = float(asset.get("locked", "0"))
-                            if free_balance > 0 or locked_balance > 0:
-                                # Estimar valor em USDT (simplificado)
-                                # Em um sistema real, buscaríamos o preço atual
-                                asset_total = free_balance + locked_balance
-                                if asset_total > 1:  # Ignorar quantidades muito pequenas
-                                    log.debug(f"Detected spot position: {asset_total} {asset.get('asset')}")
-                                    # Estimativa conservadora: assumir que vale pelo menos algum USDT
-                                    total_position_value += 1.0  # Placeholder
-            except Exception as e:
-                log.warning(f"Error checking spot positions value: {e}")
-            
-            return total_position_value
-            
+            return self.get_account_snapshot().positions_value
         except Exception as e:
             log.error(f"Error calculating existing positions value: {e}")
             return 0.0
@@ -744,71 +982,7 @@ class CapitalManager:
             str: 'spot' ou 'futures'
         """
         try:
-            # Fatores para decisão automática
-            decision_factors = {
-                "volatility": 0,
-                "volume": 0,
-                "spread": 0,
-                "liquidity": 0,
-                "fees": 0
-            }
-            
-            # Analisar dados de mercado
-            try:
-                # Obter dados de Futures
-                futures_ticker = self.api_client.get_futures_ticker(symbol)
-                futures_volume = float(futures_ticker.get("volume", "0")) if futures_ticker else 0
-                
-                # Obter dados de Spot
-                spot_ticker = self.api_client.get_spot_ticker(symbol)
-                spot_volume = float(spot_ticker.get("volume", "0")) if spot_ticker else 0
-                
-                # Fator 1: Volume (maior volume = melhor liquidez)
-                if futures_volume > spot_volume * 1.2:  # 20% maior
-                    decision_factors["volume"] = 1  # Favorece futures
-                elif spot_volume > futures_volume * 1.2:
-                    decision_factors["volume"] = -1  # Favorece spot
-                
-                # Fator 2: Spread (será implementado se necessário)
-                decision_factors["spread"] = 0
-                
-                # Fator 3: Volatilidade - Futures geralmente melhor para alta volatilidade
-                # Para símbolos como BTC, ETH que são muito voláteis
-                high_volatility_symbols = ["BTCUSDT", "ETHUSDT", "BNBUSDT"]
-                if symbol in high_volatility_symbols:
-                    decision_factors["volatility"] = 1  # Favorece futures
-                
-                # Fator 4: Liquidez - Futures geralmente têm mais liquidez para pares principais
-                major_pairs = ["BTCUSDT", "ETHUSDT", "ADAUSDT", "BNBUSDT", "SOLUSDT"]
-                if symbol in major_pairs:
-                    decision_factors["liquidity"] = 1  # Favorece futures
-                
-                # Fator 5: Taxas - Futures podem ter taxas menores para trading frequente
-                decision_factors["fees"] = 0.5  # Leve preferência por futures
-                
-            except Exception as e:
-                log.warning(f"Error analyzing market data for {symbol}: {e}")
-            
-            # Calcular score total
-            total_score = sum(decision_factors.values())
-            
-            # Decisão baseada no score
-            if total_score > 0.5:
-                decision = "futures"
-                reason = "Higher volume/liquidity in futures market"
-            elif total_score < -0.5:
-                decision = "spot"
-                reason = "Better conditions in spot market"
-            else:
-                # Fallback: usar mercado com mais capital disponível
-                balances = self.get_available_balances()
-                if balances["futures_usdt"] > balances["spot_usdt"]:
-                    decision = "futures"
-                    reason = "More capital available in futures"
-                else:
-                    decision = "spot"
-                    reason = "More capital available in spot"
-            
+            decision, reason = decide_market(symbol, self.get_account_snapshot())
             log.info(f"Market decision for {symbol}: {decision} ({reason})")
             return decision
             
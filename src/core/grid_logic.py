@@ -1,6 +1,7 @@
 # Lógica central para Grid Trading
 # Suporta mercado Spot e Futuros, com RL decidindo entre os mercados
 
+import queue
 import time
 from decimal import ROUND_DOWN, ROUND_UP, ROUND_HALF_UP, Decimal
 
@@ -26,6 +27,11 @@ from utils.trade_logger import get_trade_logger
 from utils.global_tp_sl_manager import get_global_tpsl_manager, add_position_to_global_tpsl, remove_position_from_global_tpsl
 from utils.trading_state_recovery import TradingStateRecovery
 from utils.market_order_manager import MarketOrderManager
+from utils.streaming_indicators import get_indicator_engine
+from utils.kline_store import get_kline_store
+from utils.indicator_feed import get_indicator_feed
+from utils.order_index import OrderIndex
+from utils.tick_math import TickRules
 log = setup_logger("grid_logic")
 
 # Tentativa de importar TA-Lib
@@ -60,11 +66,14 @@ class GridLogic:
         operation_mode: str = "production",
         market_type: str = "futures",  # "futures" ou "spot"
         ws_client=None,  # WebSocket client for real-time data
+        user_stream=None,  # UserDataStream for real-time order/fill events
+        market_data=None,  # SharedMarketDataReader (market data hub em shared memory)
     ):
         self.symbol = symbol
         self.config = config
         self.api_client = api_client
         self.ws_client = ws_client  # WebSocket for real-time price updates
+        self.market_data = market_data  # Leitura zero-IPC dos dados publicados pelo hub
         self.operation_mode = operation_mode.lower()
         self.market_type = market_type.lower()  # "futures" ou "spot"
         self.grid_config = config.get("grid", {})
@@ -79,6 +88,7 @@ class GridLogic:
         self.min_notional = None
         self.quantity_precision = None
         self.price_precision = None
+        self.tick_rules = None  # Preço/quantidade em ticks/steps inteiros (ver _initialize_symbol_info)
 
         # Parâmetros do grid - sempre priorizar valores do frontend
         initial_levels = int(config.get("initial_levels") or self.grid_config.get("initial_levels", 25))
@@ -117,10 +127,16 @@ class GridLogic:
         self._stopped = False
         self.grid_direction = "neutral"
         self.current_spacing_percentage = self.base_spacing_percentage
-        self.active_grid_orders = {}
+        self.active_grid_orders = OrderIndex()  # nível -> orderId, com lookup reverso O(1)
         self.open_orders = {}
         self.grid_levels = []  # Initialize grid_levels
 
+        # Fills via user data stream; REST polling vira reconciliação periódica
+        self.user_stream = user_stream
+        self.order_event_queue = user_stream.register_symbol(symbol) if user_stream else None
+        self.fill_reconciliation_interval = float(self.grid_config.get("fill_reconciliation_interval_seconds", 60))
+        self._last_fill_reconciliation = 0.0
+
         # Inicializar parâmetros de espaçamento dinâmico
         self.use_dynamic_spacing = self.grid_config.get("use_dynamic_spacing", False)
         self.dynamic_spacing_atr_period = self.grid_config.get("dynamic_spacing_atr_period", 14)
@@ -178,6 +194,8 @@ class GridLogic:
         self.current_rsi = 0.0
         self.current_atr = 0.0
         self.current_adx = 0.0
+        # Indicadores incrementais (O(1) por candle fechado): ver a propriedade indicators
+        self.kline_store = get_kline_store()  # Klines colunares (fonte única no processo)
 
         log.info(
             f"[{self.symbol}] GridLogic inicializado no modo {self.operation_mode.upper()} para mercado {self.market_type.upper()}. Espaçamento Dinâmico (ATR): {self.use_dynamic_spacing}"
@@ -193,6 +211,14 @@ class GridLogic:
             )
             self.use_dynamic_spacing = False
 
+    @property
+    def indicators(self):
+        """IndicatorSet do mercado atual, compartilhado com RiskManager/PairSelector.
+
+        Resolvido a cada acesso porque a recuperação do grid pode trocar o market_type.
+        """
+        return get_indicator_engine().get(self.symbol, self.kline_interval, self.market_type)
+
     def _initialize_leverage(self):
         """Initialize leverage for futures trading to ensure proper configuration."""
         try:
@@ -388,6 +414,17 @@ class GridLogic:
                 f"[{self.symbol}] Falha ao inicializar todos os filtros/precisão necessários do símbolo."
             )
             return False
+
+        tick_rules = TickRules(
+            self.tick_size, self.step_size, self.min_notional, self.price_precision, self.quantity_precision
+        )
+        if tick_rules.supported:
+            self.tick_rules = tick_rules
+        else:
+            self.tick_rules = None
+            log.warning(
+                f"[{self.symbol}] Precisão declarada menor que tick/step - usando formatação Decimal"
+            )
         return True
     
     def _initialize_state_recovery(self):
@@ -452,6 +489,12 @@ class GridLogic:
         """Formata preço de acordo com as regras do símbolo com validação de precisão."""
         if self.tick_size is None or self.price_precision is None:
             return None
+        if self.tick_rules is not None:
+            try:
+                return self.tick_rules.ticks_to_str(self.tick_rules.price_to_ticks(price))
+            except Exception as e:
+                log.error(f"[{self.symbol}] Erro ao formatar preço {price}: {e}")
+                return None
         try:
             # Use ROUND_HALF_UP para arredondar corretamente para o tick size mais próximo
             price_decimal = Decimal(str(price))
@@ -484,6 +527,13 @@ class GridLogic:
         """Formata quantidade de acordo com as regras do símbolo com verificação de notional."""
         if self.step_size is None or self.quantity_precision is None:
             return None
+        if self.tick_rules is not None:
+            try:
+                steps = self.tick_rules.qty_to_steps(quantity, current_price or None)
+                return self.tick_rules.steps_to_str(steps)
+            except Exception as e:
+                log.error(f"[{self.symbol}] Erro ao formatar quantidade {quantity}: {e}")
+                return None
         try:
             # Calculate proper precision based on step_size
             step_size_decimal = Decimal(str(self.step_size))
@@ -558,6 +608,10 @@ class GridLogic:
 
     def _get_ticker(self):
         """Obtém ticker baseado no tipo de mercado."""
+        if self.market_data:
+            ticker = self.market_data.get_ticker(self.symbol)
+            if ticker:
+                return ticker
         if self.market_type == "spot":
             return self.api_client.get_spot_ticker(symbol=self.symbol)
         else:  # futures
@@ -586,6 +640,19 @@ class GridLogic:
 
     def _get_real_time_price(self):
         """Get real-time price from WebSocket if available, otherwise fallback to API."""
+        price = self._fetch_real_time_price()
+        if price is not None:
+            # Publica no feed compartilhado (ordens condicionais de preço reagem ao tick)
+            get_indicator_feed().on_price(self.symbol, price, self.market_type)
+        return price
+
+    def _fetch_real_time_price(self):
+        if self.market_data:
+            price = self.market_data.get_price(self.symbol)
+            if price is not None:
+                log.debug(f"[{self.symbol}] Using market data hub price: ${price}")
+                return price
+
         if self.ws_client:
             # Try to get real-time price from simple WebSocket
             price = self.ws_client.get_price(self.symbol)
@@ -600,17 +667,16 @@ class GridLogic:
         
         return None
 
-    def _get_klines(self, interval="1h", limit=50):
-        """Obtém klines baseado no tipo de mercado."""
-        if self.market_type == "spot":
-            return self.api_client.get_spot_klines(symbol=self.symbol, interval=interval, limit=limit)
-        else:  # futures
-            return self.api_client.get_futures_klines(symbol=self.symbol, interval=interval, limit=limit)
+    def _get_kline_series(self, interval="3m", limit=100):
+        """KlineSeries atualizada (hub em shared memory primeiro, depois só os klines que faltam via REST)."""
+        if self.market_data:
+            klines = self.market_data.get_klines_array(self.symbol, interval, limit)
+            if klines is not None:
+                return self.kline_store.update(self.symbol, interval, klines, market_type=self.market_type)
+        return self.kline_store.fetch(self.api_client, self.symbol, interval, limit, self.market_type)
 
-    def _place_order_unified(self, side, price_str, qty_str):
-        """Coloca ordem baseado no tipo de mercado com proteção contra margem insuficiente."""
-        
-        # 🚨 HFT: Verificar se posição já está no limite ANTES de colocar ordem
+    def _position_limit_reached(self, price_str):
+        """🚨 HFT: Verifica se a posição já está no limite ANTES de colocar ordem."""
         current_position = self._get_position()
         if current_position:
             position_size = abs(float(current_position.get('positionAmt', 0)))
@@ -621,7 +687,77 @@ class GridLogic:
             max_notional = 60.0
             if position_value > max_notional:
                 log.warning(f"[{self.symbol}] 🚨 POSIÇÃO MÁXIMA ATINGIDA: ${position_value:.2f} > ${max_notional} - BLOQUEANDO nova ordem")
-                return None
+                return True
+        return False
+
+    def _futures_margin_insufficient(self):
+        """Verifica saldo futures antes de colocar ordens (menos de $1 disponível bloqueia)."""
+        if self.market_type != "futures":
+            return False
+        try:
+            futures_balance = self.api_client.get_futures_balance()
+            if futures_balance:
+                for asset in futures_balance:
+                    if asset.get("asset") == "USDT":
+                        available = float(asset.get("availableBalance", "0"))
+                        if available < 1.0:  # Menos de $1 disponível
+                            log.warning(f"[{self.symbol}] 🚨 MARGEM INSUFICIENTE: Apenas ${available:.2f} disponível - PAUSANDO colocação de ordens")
+                            self.pair_logger.log_error(f"⚠️ Margem insuficiente: ${available:.2f} - Ordem cancelada")
+                            return True
+                        break
+        except Exception as e:
+            log.debug(f"[{self.symbol}] Erro ao verificar saldo futures: {e}")
+        return False
+
+    def _is_market_order(self, price_str, qty_str):
+        """🚀 MODO HFT: ordens com valor acima do mínimo configurado vão a mercado."""
+        if not self.market_order_manager:
+            return False
+        market_config = self.config.get("market_orders", {})
+        min_capital = market_config.get("min_capital_for_market_orders", 6.0)
+        order_value = float(price_str) * float(qty_str)
+        return order_value >= min_capital
+
+    def _flag_margin_insufficient(self):
+        log.error(f"[{self.symbol}] 🚨 MARGEM INSUFICIENTE detectada - parando colocação de ordens")
+        self.pair_logger.log_error("🛑 Sistema pausado: Margem insuficiente detectada")
+        
+        # Marcar que este par tem problemas de margem
+        if not hasattr(self, '_margin_insufficient_flag'):
+            self._margin_insufficient_flag = True
+            log.error(f"[{self.symbol}] 💡 AÇÃO NECESSÁRIA: Transferir USDT para conta Futures ou fechar posições")
+
+    def _track_grid_order(self, level_price, order_id):
+        """Registra a ordem no índice do grid (com o clientOrderId retornado pela exchange)."""
+        order = self.open_orders.get(order_id) or {}
+        self.active_grid_orders.set(level_price, order_id, order.get("clientOrderId"))
+
+    def _register_placed_order(self, order, side, price_str, qty_str):
+        """Armazena a ordem aceita pela exchange e registra o evento no pair_logger."""
+        order_id = order["orderId"]
+        log.info(
+            f"[{self.symbol}] Ordem {side} colocada com sucesso {order_id} em {price_str} no mercado {self.market_type.upper()}"
+        )
+        # Armazena detalhes da ordem
+        self.open_orders[order_id] = order
+        
+        # Log order event to pair_logger
+        try:
+            self.pair_logger.log_order_event(
+                side=side,
+                price=float(price_str),
+                quantity=float(qty_str),
+                order_type="GRID"
+            )
+        except Exception as e:
+            log.debug(f"[{self.symbol}] Erro ao registrar ordem no pair_logger: {e}")
+        return order_id
+
+    def _place_order_unified(self, side, price_str, qty_str):
+        """Coloca ordem baseado no tipo de mercado com proteção contra margem insuficiente."""
+        
+        if self._position_limit_reached(price_str):
+            return None
         
         # Determinar tipo de ordem baseado na configuração e condições
         order_type = ORDER_TYPE_LIMIT  # Padrão
@@ -629,14 +765,8 @@ class GridLogic:
         
         # 🚀 MODO HFT: SEMPRE usar ordens de mercado quando ativo
         if self.market_order_manager:
-            market_config = self.config.get("market_orders", {})
-            min_capital = market_config.get("min_capital_for_market_orders", 6.0)
-            
-            # Estimar capital disponível
-            current_price = float(price_str)
-            order_value = current_price * float(qty_str)
-            
-            if order_value >= min_capital:
+            order_value = float(price_str) * float(qty_str)
+            if self._is_market_order(price_str, qty_str):
                 # 🎯 SEMPRE USAR MERCADO para HFT (execução instantânea)
                 order_type = ORDER_TYPE_MARKET
                 
@@ -651,7 +781,7 @@ class GridLogic:
                 
                 log.info(f"[{self.symbol}] 🚀 HFT: Ordem de MERCADO (urgência: {urgency_level}, valor: ${order_value:.2f})")
             else:
-                log.debug(f"[{self.symbol}] Capital insuficiente para HFT (${order_value:.2f} < ${min_capital}) - usando LIMITE")
+                log.debug(f"[{self.symbol}] Capital insuficiente para HFT (${order_value:.2f}) - usando LIMITE")
         
         log.info(
             f"[{self.symbol} - {self.operation_mode.upper()}] Colocando ordem {side} {order_type} no mercado {self.market_type.upper()} em {price_str}, Qtd: {qty_str}"
@@ -659,20 +789,8 @@ class GridLogic:
         
         try:
             # NOVO: Verificar saldo antes de tentar colocar ordem
-            if self.market_type == "futures":
-                try:
-                    futures_balance = self.api_client.get_futures_balance()
-                    if futures_balance:
-                        for asset in futures_balance:
-                            if asset.get("asset") == "USDT":
-                                available = float(asset.get("availableBalance", "0"))
-                                if available < 1.0:  # Menos de $1 disponível
-                                    log.warning(f"[{self.symbol}] 🚨 MARGEM INSUFICIENTE: Apenas ${available:.2f} disponível - PAUSANDO colocação de ordens")
-                                    self.pair_logger.log_error(f"⚠️ Margem insuficiente: ${available:.2f} - Ordem cancelada")
-                                    return None
-                                break
-                except Exception as e:
-                    log.debug(f"[{self.symbol}] Erro ao verificar saldo futures: {e}")
+            if self._futures_margin_insufficient():
+                return None
             
             # Colocar ordem baseada no tipo determinado
             if order_type == ORDER_TYPE_MARKET and self.market_order_manager:
@@ -711,25 +829,7 @@ class GridLogic:
                     order = self.api_client.place_futures_order(**order_params)
             
             if order and "orderId" in order:
-                order_id = order["orderId"]
-                log.info(
-                    f"[{self.symbol}] Ordem {side} colocada com sucesso {order_id} em {price_str} no mercado {self.market_type.upper()}"
-                )
-                # Armazena detalhes da ordem
-                self.open_orders[order_id] = order
-                
-                # Log order event to pair_logger
-                try:
-                    self.pair_logger.log_order_event(
-                        side=side,
-                        price=float(price_str),
-                        quantity=float(qty_str),
-                        order_type="GRID"
-                    )
-                except Exception as e:
-                    log.debug(f"[{self.symbol}] Erro ao registrar ordem no pair_logger: {e}")
-                
-                return order_id
+                return self._register_placed_order(order, side, price_str, qty_str)
             else:
                 log.error(
                     f"[{self.symbol}] Falha ao colocar ordem {side} em {price_str}. Resposta: {order}"
@@ -739,14 +839,7 @@ class GridLogic:
             # NOVO: Tratamento específico para erro de margem insuficiente
             error_str = str(e)
             if "2019" in error_str or "Margin is insufficient" in error_str:
-                log.error(f"[{self.symbol}] 🚨 MARGEM INSUFICIENTE detectada - parando colocação de ordens")
-                self.pair_logger.log_error("🛑 Sistema pausado: Margem insuficiente detectada")
-                
-                # Marcar que este par tem problemas de margem
-                if not hasattr(self, '_margin_insufficient_flag'):
-                    self._margin_insufficient_flag = True
-                    log.error(f"[{self.symbol}] 💡 AÇÃO NECESSÁRIA: Transferir USDT para conta Futures ou fechar posições")
-                
+                self._flag_margin_insufficient()
                 return None
             else:
                 log.error(
@@ -754,6 +847,64 @@ class GridLogic:
                 )
                 return None
 
+    def _place_orders_batch(self, orders):
+        """Coloca várias ordens de uma vez. `orders` = [(side, price_str, qty_str), ...].
+
+        Em futures, as ordens LIMIT vão em lotes de 5 pelo endpoint batchOrders (lotes em
+        pipeline); ordens de mercado HFT e spot seguem o caminho individual. Retorna a lista
+        de order_ids (ou None) alinhada com `orders`.
+        """
+        if not orders:
+            return []
+        if self.market_type != "futures":
+            return [self._place_order_unified(*order) for order in orders]
+
+        # Verificações de posição/margem uma vez por lote, não por ordem
+        if self._position_limit_reached(orders[0][1]) or self._futures_margin_insufficient():
+            return [None] * len(orders)
+
+        results = [None] * len(orders)
+        batch_indexes = []
+        for i, (side, price_str, qty_str) in enumerate(orders):
+            if self._is_market_order(price_str, qty_str):
+                results[i] = self._place_order_unified(side, price_str, qty_str)
+            else:
+                batch_indexes.append(i)
+
+        if not batch_indexes:
+            return results
+
+        log.info(
+            f"[{self.symbol} - {self.operation_mode.upper()}] Colocando {len(batch_indexes)} ordens LIMIT em lote no mercado FUTURES"
+        )
+        try:
+            responses = self.api_client.place_futures_batch_orders([
+                {
+                    "symbol": self.symbol,
+                    "side": orders[i][0],
+                    "type": ORDER_TYPE_LIMIT,
+                    "quantity": orders[i][2],
+                    "price": orders[i][1],
+                    "timeInForce": TIME_IN_FORCE_GTC,
+                }
+                for i in batch_indexes
+            ])
+        except Exception as e:
+            log.error(f"[{self.symbol}] Exceção ao colocar ordens em lote: {e}")
+            return results
+
+        for i, order in zip(batch_indexes, responses):
+            side, price_str, qty_str = orders[i]
+            if order and "orderId" in order:
+                results[i] = self._register_placed_order(order, side, price_str, qty_str)
+            else:
+                if order and order.get("code") == -2019:
+                    self._flag_margin_insufficient()
+                log.error(
+                    f"[{self.symbol}] Falha ao colocar ordem {side} em {price_str}. Resposta: {order}"
+                )
+        return results
+
     def _cancel_order_unified(self, order_id):
         """Cancela ordem baseado no tipo de mercado."""
         try:
@@ -770,6 +921,27 @@ class GridLogic:
             log.error(f"[{self.symbol}] Erro ao cancelar ordem {order_id}: {e}")
             return False
 
+    def _cancel_orders_batch(self, order_ids):
+        """Cancela várias ordens (futures: DELETE batchOrders, 10 por requisição).
+
+        Retorna lista de bool alinhada com `order_ids`. Ordens já inexistentes (-2011)
+        contam como canceladas.
+        """
+        order_ids = list(order_ids)
+        if not order_ids:
+            return []
+        if self.market_type != "futures":
+            return [bool(self._cancel_order_unified(order_id)) for order_id in order_ids]
+        try:
+            responses = self.api_client.cancel_futures_batch_orders(self.symbol, order_ids)
+        except Exception as e:
+            log.error(f"[{self.symbol}] Erro ao cancelar ordens em lote: {e}")
+            return [False] * len(order_ids)
+        return [
+            bool(response) and ("orderId" in response or response.get("code") == -2011)
+            for response in responses
+        ]
+
     def _get_order_status_unified(self, order_id):
         """Obtém status da ordem baseado no tipo de mercado."""
         try:
@@ -838,35 +1010,19 @@ class GridLogic:
             limit = self.dynamic_spacing_atr_period + 5  # Adiciona buffer
             # Use configured interval from config
             interval = getattr(self, 'kline_interval', '3m')
-            klines = self._get_klines(interval=interval, limit=limit)
-            if not klines or len(klines) < self.dynamic_spacing_atr_period:
+            series = self._get_kline_series(interval=interval, limit=limit)
+            if series is None or len(series) < self.dynamic_spacing_atr_period:
                 log.warning(
-                    f"[{self.symbol}] Dados de kline insuficientes ({len(klines) if klines else 0}) para espaçamento ATR dinâmico. Usando espaçamento base."
+                    f"[{self.symbol}] Dados de kline insuficientes ({len(series) if series else 0}) para espaçamento ATR dinâmico. Usando espaçamento base."
                 )
                 self.current_spacing_percentage = self.base_spacing_percentage
                 return
 
-            # Prepara dados para TA-Lib
-            df = pd.DataFrame(
-                klines,
-                columns=[
-                    "Open time",
-                    "Open",
-                    "High",
-                    "Low",
-                    "Close",
-                    "Volume",
-                    "Close time",
-                    "Quote asset volume",
-                    "Number of trades",
-                    "Taker buy base asset volume",
-                    "Taker buy quote asset volume",
-                    "Ignore",
-                ],
-            )
-            high_prices = pd.to_numeric(df["High"]).values
-            low_prices = pd.to_numeric(df["Low"]).values
-            close_prices = pd.to_numeric(df["Close"]).values
+            # Views colunares (sem conversão de strings) para o TA-Lib
+            klines = series.view(limit)
+            high_prices = klines["high"]
+            low_prices = klines["low"]
+            close_prices = klines["close"]
 
             # Calcula ATR
             atr_series = talib.ATR(
@@ -1081,12 +1237,6 @@ class GridLogic:
             return
         
         self.grid_levels = []
-        center_price_str = self._format_price(center_price_hft)
-        if not center_price_str:
-            log.error(f"[{self.symbol}] Não foi possível formatar preço central {center_price_hft}.")
-            return
-        center_price = Decimal(center_price_str)
-
         levels_above = self.num_levels // 2
         levels_below = self.num_levels // 2
         if self.grid_direction == "long":
@@ -1101,6 +1251,22 @@ class GridLogic:
         # Usa current_spacing_percentage que pode ser dinâmico
         spacing = self.current_spacing_percentage
 
+        if self.tick_rules is not None:
+            self.grid_levels = self._grid_levels_from_ticks(center_price_hft, spacing, levels_below, levels_above)
+        else:
+            self.grid_levels = self._grid_levels_from_decimal(center_price_hft, spacing, levels_below, levels_above)
+        log.info(f"[{self.symbol}] Definidos {len(self.grid_levels)} níveis de grid.")
+
+    def _grid_levels_from_decimal(self, center_price_hft, spacing, levels_below, levels_above):
+        """Gera os níveis nível a nível com Decimal - caminho legado (sem tick_rules)."""
+        grid_levels = []
+        center_price_str = self._format_price(center_price_hft)
+        if not center_price_str:
+            log.error(f"[{self.symbol}] Não foi possível formatar preço central {center_price_hft}.")
+            return grid_levels
+        center_price = Decimal(center_price_str)
+        spacing = Decimal(str(spacing))
+
         last_price = center_price
         for i in range(levels_below):
             # Usa espaçamento geométrico: Price_n = Price_n-1 * (1 - spacing)
@@ -1108,7 +1274,7 @@ class GridLogic:
             level_price_str = self._format_price(level_price_raw)
             if level_price_str:
                 level_price = Decimal(level_price_str)
-                self.grid_levels.append({"price": level_price, "type": "buy"})
+                grid_levels.append({"price": level_price, "type": "buy"})
                 last_price = level_price  # Atualiza último preço para próximo cálculo
             else:
                 log.warning(
@@ -1123,7 +1289,7 @@ class GridLogic:
             level_price_str = self._format_price(level_price_raw)
             if level_price_str:
                 level_price = Decimal(level_price_str)
-                self.grid_levels.append({"price": level_price, "type": "sell"})
+                grid_levels.append({"price": level_price, "type": "sell"})
                 last_price = level_price  # Atualiza último preço para próximo cálculo
             else:
                 log.warning(
@@ -1131,8 +1297,24 @@ class GridLogic:
                 )
                 break
 
-        self.grid_levels.sort(key=lambda x: x["price"])
-        log.info(f"[{self.symbol}] Definidos {len(self.grid_levels)} níveis de grid.")
+        grid_levels.sort(key=lambda x: x["price"])
+        return grid_levels
+
+    def _grid_levels_from_ticks(self, center_price, spacing, levels_below, levels_above):
+        """Gera os níveis em ticks inteiros (vetorizado), ordenados por preço."""
+        rules = self.tick_rules
+        center_ticks = rules.price_to_ticks(center_price)
+        if center_ticks <= 0:
+            log.error(f"[{self.symbol}] Preço central {center_price} abaixo de um tick.")
+            return []
+        buy_ticks, sell_ticks = rules.geometric_levels(center_ticks, spacing, levels_below, levels_above)
+        if len(buy_ticks) < levels_below or len(sell_ticks) < levels_above:
+            log.warning(
+                f"[{self.symbol}] Espaçamento menor que o tick: {levels_below + levels_above - len(buy_ticks) - len(sell_ticks)} níveis descartados."
+            )
+        levels = [{"price": rules.ticks_to_decimal(t), "type": "buy", "ticks": int(t)} for t in buy_ticks]
+        levels.extend({"price": rules.ticks_to_decimal(t), "type": "sell", "ticks": int(t)} for t in sell_ticks)
+        return levels
 
     def _calculate_quantity_per_order(self, current_price: Decimal) -> Decimal:
         # ... (no changes) ...
@@ -1195,7 +1377,30 @@ class GridLogic:
             log.error(f"[{self.symbol}] Quantity is zero.")
             return
 
+        # Monta todas as ordens do grid antes de enviar (lotes batchOrders em futures)
+        if self.tick_rules is not None:
+            pending_levels, pending_orders = self._build_grid_orders_ticks(quantity_per_order, current_price)
+        else:
+            pending_levels, pending_orders = self._build_grid_orders_decimal(quantity_per_order, current_price)
+
+        started = time.time()
         placed_count = 0
+        for level_price, order_id in zip(pending_levels, self._place_orders_batch(pending_orders)):
+            if order_id:
+                self._track_grid_order(level_price, order_id)
+                placed_count += 1
+        log.info(
+            f"[{self.symbol}] Placed {placed_count}/{len(pending_orders)} initial grid orders in {time.time() - started:.2f}s."
+        )
+        
+        # Save state after placing initial orders
+        if placed_count > 0:
+            self._save_grid_state()
+
+    def _build_grid_orders_decimal(self, quantity_per_order, current_price):
+        """Ordens do grid (lado, preço, quantidade) via formatação Decimal - caminho legado."""
+        pending_levels = []
+        pending_orders = []
         for level in self.grid_levels:
             level_price = level["price"]
             order_type = level["type"]
@@ -1210,21 +1415,117 @@ class GridLogic:
                 continue
 
             side = SIDE_BUY if order_type == "buy" else SIDE_SELL
-            order_id = self._place_order(side, formatted_price_str, formatted_qty_str)
-            if order_id:
-                self.active_grid_orders[level_price] = order_id
-                placed_count += 1
-            time.sleep(0.1)
-        log.info(f"[{self.symbol}] Placed {placed_count} initial grid orders.")
-        
-        # Save state after placing initial orders
-        if placed_count > 0:
-            self._save_grid_state()
+            pending_levels.append(level_price)
+            pending_orders.append((side, formatted_price_str, formatted_qty_str))
+        return pending_levels, pending_orders
+
+    def _build_grid_orders_ticks(self, quantity_per_order, current_price):
+        """Ordens do grid em ticks/steps inteiros: um arredondamento de quantidade e checagem de notional vetorizada."""
+        rules = self.tick_rules
+        levels = [level for level in self.grid_levels if level["price"] not in self.active_grid_orders]
+        if not levels:
+            return [], []
+        qty_steps = rules.qty_to_steps(quantity_per_order, current_price)
+        qty_str = rules.steps_to_str(qty_steps)
+        ticks = np.fromiter(
+            (level["ticks"] if "ticks" in level else rules.price_to_ticks(level["price"]) for level in levels),
+            dtype=np.int64, count=len(levels),
+        )
+        meets = rules.meets_min_notional(ticks, qty_steps)
+        if not meets.all():
+            log.warning(
+                f"[{self.symbol}] {int((~meets).sum())} níveis abaixo do notional mínimo {rules.min_notional} USDT (Qty: {qty_str})"
+            )
+        pending_levels = []
+        pending_orders = []
+        for level, level_ticks, ok in zip(levels, ticks, meets):
+            if not ok or level_ticks <= 0:
+                continue
+            side = SIDE_BUY if level["type"] == "buy" else SIDE_SELL
+            pending_levels.append(level["price"])
+            pending_orders.append((side, rules.ticks_to_str(level_ticks), qty_str))
+        return pending_levels, pending_orders
 
     def check_and_handle_fills(self):
-        # ... (rest of the file remains unchanged for now) ...
-        # Add TA-Lib pattern checks here later if needed
+        # Eventos do user data stream são processados a cada ciclo (sem custo REST).
+        # O polling REST só roda como reconciliação periódica ou se o stream cair.
+        if self.order_event_queue is not None:
+            self._process_order_events()
+            stream_healthy = self.user_stream.is_healthy()
+            reconciliation_due = (
+                time.time() - self._last_fill_reconciliation >= self.fill_reconciliation_interval
+            )
+            if stream_healthy and not reconciliation_due:
+                return
+            if not stream_healthy:
+                log.debug(f"[{self.symbol}] User data stream indisponível - usando polling REST")
         self._check_fills_production()
+        self._last_fill_reconciliation = time.time()
+
+    def _process_order_events(self):
+        """Drena a fila de eventos de ordem do user data stream."""
+        filled_count = 0
+        while True:
+            try:
+                update = self.order_event_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            order_id = update["orderId"]
+            if order_id not in self.open_orders:
+                continue  # Ordem não pertence ao grid (TP/SL, mercado, outro worker)
+
+            status = update["status"]
+            if status == ORDER_STATUS_FILLED:
+                log.info(f"[{self.symbol}] ⚡ Order {order_id} FILLED (user stream).")
+                self._on_order_filled(order_id, update)
+                filled_count += 1
+            elif status in [ORDER_STATUS_CANCELED, ORDER_STATUS_EXPIRED, ORDER_STATUS_REJECTED]:
+                self._on_order_canceled(order_id, status)
+            else:  # NEW, PARTIALLY_FILLED
+                self.open_orders[order_id] = update
+
+        if filled_count:
+            self._save_grid_state()
+
+    def _on_order_filled(self, order_id, status):
+        """Remove a ordem preenchida do tracking e dispara a lógica de fill."""
+        if order_id in self.open_orders:
+            del self.open_orders[order_id]
+        # Find which grid level this corresponds to
+        filled_level_price = self.active_grid_orders.pop_order(order_id)
+        if filled_level_price:
+            self._handle_filled_order(status, filled_level_price)
+        else:
+            log.warning(
+                f"[{self.symbol}] Filled order {order_id} not found in active grid levels."
+            )
+
+    def _on_order_canceled(self, order_id, order_status):
+        """Remove ordem cancelada/expirada/rejeitada e recria o nível se necessário."""
+        log.warning(
+            f"[{self.symbol}] Order {order_id} has status {order_status}. Removing from tracking and recreating if needed."
+        )
+        if order_id in self.open_orders:
+            del self.open_orders[order_id]
+
+        # Find and remove from active grid orders, then recreate
+        canceled_price = self.active_grid_orders.pop_order(order_id)
+
+        # Recreate the canceled order if it was part of our grid
+        if canceled_price and not self._stopped:
+            try:
+                log.info(f"[{self.symbol}] Recreating canceled order at price {canceled_price}")
+                # Determine order side based on current price
+                current_price = self.current_price
+                if current_price and canceled_price < current_price:
+                    # Buy order
+                    self._place_grid_order_at_level(canceled_price, "buy")
+                elif current_price and canceled_price > current_price:
+                    # Sell order
+                    self._place_grid_order_at_level(canceled_price, "sell")
+            except Exception as e:
+                log.error(f"[{self.symbol}] Failed to recreate canceled order at {canceled_price}: {e}")
 
     def _check_fills_production(self):
         if not self.open_orders:
@@ -1245,55 +1546,13 @@ class GridLogic:
                     if status["status"] == ORDER_STATUS_FILLED:
                         log.info(f"[{self.symbol}] Order {order_id} FILLED.")
                         filled_orders_data.append(status)
-                        # Remove from open orders immediately
-                        if order_id in self.open_orders:
-                            del self.open_orders[order_id]
-                        # Find which grid level this corresponds to
-                        filled_level_price = None
-                        for price, oid in list(self.active_grid_orders.items()):
-                            if oid == order_id:
-                                filled_level_price = price
-                                del self.active_grid_orders[price]
-                                break
-                        if filled_level_price:
-                            self._handle_filled_order(status, filled_level_price)
-                        else:
-                            log.warning(
-                                f"[{self.symbol}] Filled order {order_id} not found in active grid levels."
-                            )
+                        self._on_order_filled(order_id, status)
                     elif status["status"] in [
                         ORDER_STATUS_CANCELED,
                         ORDER_STATUS_EXPIRED,
                         ORDER_STATUS_REJECTED,
                     ]:
-                        log.warning(
-                            f"[{self.symbol}] Order {order_id} has status {status['status']}. Removing from tracking and recreating if needed."
-                        )
-                        if order_id in self.open_orders:
-                            del self.open_orders[order_id]
-                        
-                        # Find and remove from active grid orders, then recreate
-                        canceled_price = None
-                        for price, oid in list(self.active_grid_orders.items()):
-                            if oid == order_id:
-                                canceled_price = price
-                                del self.active_grid_orders[price]
-                                break
-                        
-                        # Recreate the canceled order if it was part of our grid
-                        if canceled_price and not self._stopped:
-                            try:
-                                log.info(f"[{self.symbol}] Recreating canceled order at price {canceled_price}")
-                                # Determine order side based on current price
-                                current_price = self.current_price
-                                if current_price and canceled_price < current_price:
-                                    # Buy order
-                                    self._place_grid_order_at_level(canceled_price, "buy")
-                                elif current_price and canceled_price > current_price:
-                                    # Sell order
-                                    self._place_grid_order_at_level(canceled_price, "sell")
-                            except Exception as e:
-                                log.error(f"[{self.symbol}] Failed to recreate canceled order at {canceled_price}: {e}")
+                        self._on_order_canceled(order_id, status["status"])
                     else:  # Still open (NEW, PARTIALLY_FILLED)
                         still_open_orders[order_id] = status
                 else:
@@ -1311,6 +1570,10 @@ class GridLogic:
                 if order_id in self.open_orders:
                     still_open_orders[order_id] = self.open_orders[order_id]
 
+        # Preserve orders placed during this check (e.g. recreated canceled levels)
+        for order_id, order in self.open_orders.items():
+            if order_id not in order_ids_to_check:
+                still_open_orders[order_id] = order
         self.open_orders = still_open_orders  # Update open orders list
         log.info(
             f"[{self.symbol}] Finished checking orders. {len(filled_orders_data)} filled, {len(self.open_orders)} still open."
@@ -1466,7 +1729,7 @@ class GridLogic:
                 )
                 if tp_order_id:
                     # Add this TP order to the grid tracking
-                    self.active_grid_orders[tp_price] = tp_order_id
+                    self._track_grid_order(tp_price, tp_order_id)
             else:
                 log.warning(
                     f"[{self.symbol}] Could not place TP order for fill {fill_data['orderId']}. Price/Qty/Notional issue."
@@ -1616,27 +1879,17 @@ class GridLogic:
         orders_to_cancel = list(self.active_grid_orders.values())
         cancelled_count = 0
         failed_count = 0
-        for order_id in orders_to_cancel:
-            try:
-                # APIClient lida com simulação
-                success = self._cancel_order_unified(order_id)
-                time.sleep(0.1)
-                if success:
-                    log.info(f"[{self.symbol}] Cancelled order {order_id}.")
-                    cancelled_count += 1
-                    # Remove from tracking
-                    if order_id in self.open_orders:
-                        del self.open_orders[order_id]
-                    # Remove from active_grid_orders by value
-                    for price, oid in list(self.active_grid_orders.items()):
-                        if oid == order_id:
-                            del self.active_grid_orders[price]
-                            break
-                else:
-                    log.error(f"[{self.symbol}] Failed to cancel order {order_id}.")
-                    failed_count += 1
-            except Exception as e:
-                log.error(f"[{self.symbol}] Exception cancelling order {order_id}: {e}")
+        # APIClient lida com simulação; futures cancela em lotes de 10 (batchOrders DELETE)
+        for order_id, success in zip(orders_to_cancel, self._cancel_orders_batch(orders_to_cancel)):
+            if success:
+                log.info(f"[{self.symbol}] Cancelled order {order_id}.")
+                cancelled_count += 1
+                # Remove from tracking
+                if order_id in self.open_orders:
+                    del self.open_orders[order_id]
+                self.active_grid_orders.pop_order(order_id)
+            else:
+                log.error(f"[{self.symbol}] Failed to cancel order {order_id}.")
                 failed_count += 1
         log.warning(
             f"[{self.symbol}] Order cancellation finished. Cancelled: {cancelled_count}, Failed: {failed_count}. Remaining active: {len(self.active_grid_orders)}"
@@ -1713,146 +1966,75 @@ class GridLogic:
             else:
                 log.warning(f"[{self.symbol}] Falha ao obter ticker")
             
-            # 2. Atualizar dados de klines para indicadores técnicos
-            # Use configured interval from config
+            # 2. Atualizar indicadores incrementais com os candles fechados novos
+            # (histórico completo só na primeira vez; depois apenas 2-3 klines por ciclo)
             interval = getattr(self, 'kline_interval', '3m')
-            klines = self._get_klines(interval=interval, limit=100)
-            if klines and len(klines) > 0:
-                # Extrair preços de fechamento para indicadores
-                close_prices = []
-                high_prices = []
-                low_prices = []
-                
-                for kline in klines:
-                    close_price = float(kline[4])  # Close price é o índice 4
-                    high_price = float(kline[2])   # High price é o índice 2
-                    low_price = float(kline[3])    # Low price é o índice 3
-                    
-                    close_prices.append(close_price)
-                    high_prices.append(high_price)
-                    low_prices.append(low_price)
-                
-                # Reverter para ordem cronológica (mais antigo primeiro)
-                close_prices.reverse()
-                high_prices.reverse()
-                low_prices.reverse()
-                
-                self.kline_closes = close_prices
-                
+            indicators = self.indicators
+            series = self._get_kline_series(interval=interval, limit=indicators.warmup + 1)
+            if series is not None:
+                indicators.update_from_series(series)
+
+                # Klines em ordem cronológica (mais antigo primeiro)
+                self.kline_closes = list(indicators.closes)
+
                 # Calcular volume recente se não obtido do ticker
-                if volume_24h == 0.0 and len(klines) >= 24:  # Últimas 24 horas
-                    volumes = [float(kline[5]) for kline in klines[:24]]
-                    self.recent_volume = sum(volumes)
+                if volume_24h == 0.0 and len(indicators.volumes) >= 24:  # Últimos 24 candles
+                    self.recent_volume = sum(list(indicators.volumes)[-24:])
                     volume_24h = self.recent_volume
                 else:
                     self.recent_volume = volume_24h
-                
-                # 3. Calcular indicadores técnicos se TA-Lib disponível
-                if talib_available and len(close_prices) >= 20:
-                    # RSI
-                    try:
-                        rsi_values = talib.RSI(np.array(close_prices), timeperiod=14)
-                        if not np.isnan(rsi_values[-1]):
-                            self.current_rsi = float(rsi_values[-1])
-                    except Exception as e:
-                        log.debug(f"[{self.symbol}] Erro ao calcular RSI: {e}")
-                    
-                    # ATR (Average True Range) - Com precisão melhorada para tokens de baixo valor
-                    try:
-                        atr_values = talib.ATR(
-                            np.array(high_prices), 
-                            np.array(low_prices), 
-                            np.array(close_prices), 
-                            timeperiod=14
-                        )
-                        if len(atr_values) > 0 and not np.isnan(atr_values[-1]):
-                            new_atr = float(atr_values[-1])
-                            
-                            # Verificar se ATR é extremamente baixo para o preço atual
-                            current_price = close_prices[-1] if close_prices else 1.0
-                            atr_percentage = (new_atr / current_price) * 100 if current_price > 0 else 0
-                            
-                            # Log para debug quando ATR é muito baixo
-                            if atr_percentage < 0.1:  # Menos de 0.1% de volatilidade
-                                log.warning(f"[{self.symbol}] ATR extremamente baixo: {new_atr:.6f} ({atr_percentage:.3f}%) - Preço: ${current_price:.6f}")
-                            
-                            # Só atualizar se ATR for válido e não zero
-                            if new_atr > 0:
-                                self.current_atr = new_atr
-                                log.debug(f"[{self.symbol}] ATR atualizado: {new_atr:.6f} ({atr_percentage:.3f}% do preço)")
-                            else:
-                                log.warning(f"[{self.symbol}] ATR calculado é zero, mantendo valor anterior: {self.current_atr:.6f}")
-                        else:
-                            log.warning(f"[{self.symbol}] ATR inválido ou NaN, mantendo valor anterior: {self.current_atr:.6f}")
-                    except Exception as e:
-                        log.error(f"[{self.symbol}] Erro ao calcular ATR: {e}")
-                    
-                    # ADX (Average Directional Index)
-                    try:
-                        adx_values = talib.ADX(
-                            np.array(high_prices), 
-                            np.array(low_prices), 
-                            np.array(close_prices), 
-                            timeperiod=14
-                        )
-                        if not np.isnan(adx_values[-1]):
-                            self.current_adx = float(adx_values[-1])
-                    except Exception as e:
-                        log.debug(f"[{self.symbol}] Erro ao calcular ADX: {e}")
-                    
-                    # BOLLINGER BANDS - Para HFT Range Trading
-                    try:
-                        bb_upper, bb_middle, bb_lower = talib.BBANDS(
-                            np.array(close_prices), 
-                            timeperiod=20, 
-                            nbdevup=2, 
-                            nbdevdn=2, 
-                            matype=0
-                        )
-                        if not (np.isnan(bb_upper[-1]) or np.isnan(bb_lower[-1]) or np.isnan(bb_middle[-1])):
-                            self.bb_upper = float(bb_upper[-1])
-                            self.bb_lower = float(bb_lower[-1])
-                            self.bb_middle = float(bb_middle[-1])
-                            # BB Width para medir volatilidade
-                            self.bb_width = (self.bb_upper - self.bb_lower) / self.bb_middle * 100
-                    except Exception as e:
-                        log.debug(f"[{self.symbol}] Erro ao calcular Bollinger Bands: {e}")
-                    
-                    # KELTNER CHANNELS - Para canais de volatilidade
-                    try:
-                        # EMA e ATR para Keltner Channels
-                        ema_values = talib.EMA(np.array(close_prices), timeperiod=20)
-                        keltner_atr = talib.ATR(
-                            np.array(high_prices), 
-                            np.array(low_prices), 
-                            np.array(close_prices), 
-                            timeperiod=10
-                        )
-                        if not (np.isnan(ema_values[-1]) or np.isnan(keltner_atr[-1])):
-                            kc_multiplier = 2.0
-                            self.kc_upper = float(ema_values[-1] + (keltner_atr[-1] * kc_multiplier))
-                            self.kc_lower = float(ema_values[-1] - (keltner_atr[-1] * kc_multiplier))
-                            self.kc_middle = float(ema_values[-1])
-                    except Exception as e:
-                        log.debug(f"[{self.symbol}] Erro ao calcular Keltner Channels: {e}")
-                    
-                    # VWAP - Para intraday anchor price
-                    try:
-                        # Simplified VWAP calculation
-                        volumes = np.array([float(k[5]) for k in klines])
-                        typical_prices = (np.array(high_prices) + np.array(low_prices) + np.array(close_prices)) / 3
-                        cumulative_volume = np.cumsum(volumes)
-                        cumulative_pv = np.cumsum(typical_prices * volumes)
-                        vwap_values = cumulative_pv / cumulative_volume
-                        if len(vwap_values) > 0 and not np.isnan(vwap_values[-1]):
-                            self.vwap = float(vwap_values[-1])
-                    except Exception as e:
-                        log.debug(f"[{self.symbol}] Erro ao calcular VWAP: {e}")
-                
-                log.debug(f"[{self.symbol}] Klines atualizados: {len(close_prices)} preços, volume 24h: {volume_24h:.2f}")
+
+                # 3. Ler indicadores técnicos atuais (equivalentes ao TA-Lib)
+                values = indicators.values()
+                if values["rsi"] is not None:
+                    self.current_rsi = values["rsi"]
+
+                # ATR (Average True Range) - Com precisão melhorada para tokens de baixo valor
+                new_atr = values["atr"]
+                if new_atr is not None:
+                    # Verificar se ATR é extremamente baixo para o preço atual
+                    current_price = values["last_close"] or 1.0
+                    atr_percentage = (new_atr / current_price) * 100 if current_price > 0 else 0
+
+                    # Log para debug quando ATR é muito baixo
+                    if atr_percentage < 0.1:  # Menos de 0.1% de volatilidade
+                        log.warning(f"[{self.symbol}] ATR extremamente baixo: {new_atr:.6f} ({atr_percentage:.3f}%) - Preço: ${current_price:.6f}")
+
+                    # Só atualizar se ATR for válido e não zero
+                    if new_atr > 0:
+                        self.current_atr = new_atr
+                        log.debug(f"[{self.symbol}] ATR atualizado: {new_atr:.6f} ({atr_percentage:.3f}% do preço)")
+                    else:
+                        log.warning(f"[{self.symbol}] ATR calculado é zero, mantendo valor anterior: {self.current_atr:.6f}")
+                else:
+                    log.warning(f"[{self.symbol}] ATR ainda em warm-up, mantendo valor anterior: {self.current_atr:.6f}")
+
+                # ADX (Average Directional Index)
+                if values["adx"] is not None:
+                    self.current_adx = values["adx"]
+
+                # BOLLINGER BANDS - Para HFT Range Trading
+                if values["bb_middle"]:
+                    self.bb_upper = values["bb_upper"]
+                    self.bb_lower = values["bb_lower"]
+                    self.bb_middle = values["bb_middle"]
+                    # BB Width para medir volatilidade
+                    self.bb_width = (self.bb_upper - self.bb_lower) / self.bb_middle * 100
+
+                # KELTNER CHANNELS (EMA20 ± 2 x ATR10) - Para canais de volatilidade
+                if values["kc_middle"] is not None:
+                    self.kc_upper = values["kc_upper"]
+                    self.kc_lower = values["kc_lower"]
+                    self.kc_middle = values["kc_middle"]
+
+                # VWAP - Para intraday anchor price (cumulativo desde o início da sessão UTC)
+                if values["vwap"] is not None:
+                    self.vwap = values["vwap"]
+
+                log.debug(f"[{self.symbol}] Indicadores atualizados: {indicators.candles_processed} candles processados, volume 24h: {volume_24h:.2f}")
             else:
                 log.warning(f"[{self.symbol}] Falha ao obter klines")
-            
+
             # 4. Verificar e atualizar TP/SL ativos
             self._update_active_tp_sl()
             
@@ -2155,42 +2337,22 @@ class GridLogic:
             min(1.0, max(-1.0, unrealized_pnl / 0.1))
         )  # Clip to [-1, 1]
 
-        # 4. Technical indicators (if TA-Lib available)
-        if talib_available:
-            # Usar dados de klines se disponíveis, senão price_history
-            prices_data = None
-            if hasattr(self, "kline_closes") and len(self.kline_closes) >= 30:
-                prices_data = np.array(self.kline_closes[-30:])  # Últimos 30 preços
-            elif hasattr(self, "price_history") and len(self.price_history) >= 30:
-                prices_data = np.array(self.price_history[:30])  # Primeiros 30 (mais recentes)
-                
-            if prices_data is not None and len(prices_data) >= 14:
-                # RSI
-                try:
-                    rsi = talib.RSI(prices_data, timeperiod=14)[-1] / 100.0
-                    state_features.append(rsi)
-                except BaseException:
-                    state_features.append(0.5)  # Neutral RSI
-
-                # MACD
-                try:
-                    macd, signal, hist = talib.MACD(prices_data)
-                    if len(hist) > 0 and not np.isnan(hist[-1]):
-                        # Normalize histogram
-                        norm_hist = np.clip(
-                            (hist[-1] / (prices_data.mean() * 0.01)) / 2.0 + 0.5, 0, 1
-                        )
-                        state_features.append(norm_hist)
-                    else:
-                        state_features.append(0.5)
-                except BaseException:
-                    state_features.append(0.5)  # Neutral MACD
-            else:
-                # Dados insuficientes para indicadores
-                state_features.extend([0.5, 0.5])  # Neutral RSI and MACD
+        # 4. Technical indicators (valores incrementais já mantidos pelo IndicatorSet)
+        values = self.indicators.values()
+        if values["rsi"] is not None:
+            state_features.append(values["rsi"] / 100.0)
+        else:
+            state_features.append(0.5)  # Neutral RSI
+
+        if values["macd_hist"] is not None and len(self.indicators.closes) > 0:
+            # Normalize histogram
+            recent_mean = float(np.mean(list(self.indicators.closes)[-30:]))
+            norm_hist = np.clip(
+                (values["macd_hist"] / (recent_mean * 0.01)) / 2.0 + 0.5, 0, 1
+            ) if recent_mean > 0 else 0.5
+            state_features.append(norm_hist)
         else:
-            # Add placeholders if TA-Lib not available
-            state_features.extend([0.5, 0.5])  # Neutral RSI and MACD
+            state_features.append(0.5)  # Neutral MACD
 
         # 5. Market activity features
         # Recent trades count/volume
@@ -2765,7 +2927,7 @@ class GridLogic:
             order_id = self._place_order(side, formatted_price_str, formatted_qty_str)
             
             if order_id:
-                self.active_grid_orders[price] = order_id
+                self._track_grid_order(price, order_id)
                 log.info(f"[{self.symbol}] Ordem recriada com sucesso: {side} @ {formatted_price_str}")
                 return order_id
             else:
@@ -3003,7 +3165,7 @@ class GridLogic:
                             'recovered': True
                         }
                         self.grid_levels.append(level)
-                        self.active_grid_orders[order['price']] = order['orderId']
+                        self.active_grid_orders.set(order['price'], order['orderId'], order.get('clientOrderId'))
                         self.open_orders[order['orderId']] = order
                     
                     log.info(f"[{self.symbol}] ✅ Grid recuperado com sucesso! {len(self.grid_levels)} níveis ativos")
@@ -3064,7 +3226,7 @@ class GridLogic:
                                 'recovered': True
                             }
                             self.grid_levels.append(level)
-                            self.active_grid_orders[order['price']] = order['orderId']
+                            self.active_grid_orders.set(order['price'], order['orderId'], order.get('clientOrderId'))
                             self.open_orders[order['orderId']] = order
                         
                         log.info(f"[{self.symbol}] ⚠️ Recuperação parcial do grid (alguns espaçamentos inconsistentes)")
@@ -3094,7 +3256,7 @@ class GridLogic:
                             'recovered': True
                         }
                         self.grid_levels.append(level)
-                        self.active_grid_orders[order['price']] = order['orderId']
+                        self.active_grid_orders.set(order['price'], order['orderId'], order.get('clientOrderId'))
                         self.open_orders[order['orderId']] = order
                     
                     log.info(f"[{self.symbol}] ✅ Grid recuperado com ordens insuficientes para calcular espaçamento")
@@ -3220,7 +3382,7 @@ class GridLogic:
             # Reconstruir estruturas de dados
             recovered_levels = []
             self.open_orders = {}  # Limpar antes de reconstruir
-            self.active_grid_orders = {}  # Limpar antes de reconstruir
+            self.active_grid_orders.clear()  # Limpar antes de reconstruir
             
             for order in active_orders:
                 # Adicionar às ordens abertas com formato adequado para cada tipo de mercado
@@ -3240,7 +3402,7 @@ class GridLogic:
                 
                 # Adicionar aos níveis ativos do grid
                 # Chave é o preço formatado como string para evitar problemas com Decimal
-                self.active_grid_orders[float(order['price'])] = order['orderId']
+                self.active_grid_orders.set(float(order['price']), order['orderId'], order.get('clientOrderId'))
                 
                 # Criar nível do grid
                 # Determinar tipo baseado no lado da ordem
@@ -3360,18 +3522,12 @@ class GridLogic:
         try:
             log.warning(f"[{self.symbol}] Cancelando {len(orders)} ordens órfãs...")
             
-            for order in orders:
-                try:
-                    if self.market_type == "spot":
-                        self.api_client.cancel_spot_order(symbol=self.symbol, orderId=order['orderId'])
-                    else:  # futures
-                        self.api_client.cancel_order(symbol=self.symbol, orderId=order['orderId'])
-                    
-                    log.info(f"[{self.symbol}] Ordem órfã {order['orderId']} cancelada")
-                    time.sleep(0.1)  # Pequena pausa entre cancelamentos
-                    
-                except Exception as e:
-                    log.warning(f"[{self.symbol}] Erro ao cancelar ordem órfã {order['orderId']}: {e}")
+            order_ids = [order['orderId'] for order in orders]
+            for order_id, success in zip(order_ids, self._cancel_orders_batch(order_ids)):
+                if success:
+                    log.info(f"[{self.symbol}] Ordem órfã {order_id} cancelada")
+                else:
+                    log.warning(f"[{self.symbol}] Erro ao cancelar ordem órfã {order_id}")
             
         except Exception as e:
             log.error(f"[{self.symbol}] Erro durante limpeza de ordens órfãs: {e}")
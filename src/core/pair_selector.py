@@ -1,17 +1,37 @@
 # Pair Selector Module for Grid Trading Bot
 
+import os
+import threading
 import time
 import asyncio
+import concurrent.futures
 from decimal import Decimal
 from typing import List, Dict, Optional
 
 import numpy as np  # Import numpy for TA-Lib
 import pandas as pd
 
-from utils.api_client import APIClient
+from utils.api_client import API_KEY, API_SECRET, TESTNET_API_KEY, TESTNET_API_SECRET, APIClient
+from utils.async_client import AsyncAPIClient
 from utils.logger import setup_logger
+from utils.rate_limiter import get_global_rate_limiter
+from utils.streaming_indicators import get_indicator_engine
+from utils.kline_store import get_kline_store
+from utils.rotation_monitor import RotationMonitor
+from utils.universe_metrics import MetricsTable, compute_universe_metrics
 log = setup_logger("pair_selector")
 
+# Intervalo dos klines do scan do universo (e do cache de warm start)
+UNIVERSE_INTERVAL = "3m"
+
+# Pares USDT populares avaliados como substitutos na rotação
+ROTATION_CANDIDATES = [
+    "BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "XRPUSDT", "SOLUSDT",
+    "DOGEUSDT", "AVAXUSDT", "DOTUSDT", "MATICUSDT", "LTCUSDT", "UNIUSDT",
+    "LINKUSDT", "XLMUSDT", "VETUSDT", "TRXUSDT", "EOSUSDT", "ETCUSDT",
+    "FILUSDT", "AAVEUSDT", "MKRUSDT", "COMPUSDT", "YFIUSDT", "SUSHIUSDT"
+]
+
 # Attempt to import TA-Lib
 try:
     import talib
@@ -42,6 +62,7 @@ class PairSelector:
         self, config: dict, api_client: APIClient, get_sentiment_score_func=None
     ):
         self.config = config
+        self._init_started = time.time()
         self.api_client = api_client
         # Function to get the latest sentiment score
         self.get_sentiment_score_func = get_sentiment_score_func
@@ -90,10 +111,22 @@ class PairSelector:
         # --- State --- #
         self.selected_pairs = []
         self.last_update_time = 0
+        self.last_scan_stats = {}  # Duração por etapa do último scan do universo
+        self.last_metrics_table: Optional[MetricsTable] = None  # Última tabela de métricas do universo
+        # Métricas de rotação mantidas por streaming (!ticker@arr); REST só no cold start
+        self.rotation_monitor_config = self.selector_config.get("rotation_monitor", {})
+        self.rotation_monitor = RotationMonitor(config)
+        self.startup_stats = {}  # Warm start: cache restaurado e tempo até o primeiro ranking
+        self._warm_ranking_pending = False  # Tabela do cache ainda não usada para ranquear
+        self._rescan_thread: Optional[threading.Thread] = None  # Scan completo após o ranking do cache
         # Use absolute path to avoid working directory confusion
-        import os
         root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))  # Go up to project root
         self.cache_file = os.path.join(root_dir, "data", "pair_selection_cache.json")
+        universe_cache_config = self.selector_config.get("universe_cache", {})
+        self.universe_cache_enabled = universe_cache_config.get("enabled", True)
+        self.universe_cache_max_age = universe_cache_config.get("max_age_hours", 6) * 3600
+        self.universe_cache_file = os.path.join(root_dir, "data", "universe_cache.npz")
+        self._load_universe_cache()
         self._load_cache()
 
         log.info(
@@ -112,7 +145,6 @@ class PairSelector:
         """Load cached pair selection if available."""
         try:
             import json
-            import os
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'r') as f:
                     cache_data = json.load(f)
@@ -137,7 +169,6 @@ class PairSelector:
         """Save current pair selection to cache."""
         try:
             import json
-            import os
             
             os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
             
@@ -153,11 +184,112 @@ class PairSelector:
         except Exception as e:
             log.warning(f"Could not save cache: {e}")
 
+    def _load_universe_cache(self):
+        """Warm start: restaura janelas de klines e a tabela de métricas do último scan.
+
+        A primeira seleção ranqueia direto a tabela restaurada; com o KlineStore preenchido,
+        o scan que a atualiza busca só os candles que faltam.
+        """
+        started = time.time()
+        self.startup_stats["warm_start"] = False
+        self._warm_ranking_pending = False
+        if not self.universe_cache_enabled or not os.path.exists(self.universe_cache_file):
+            return
+        try:
+            with np.load(self.universe_cache_file, allow_pickle=False) as data:
+                cache_age = time.time() - float(data["saved_at"])
+                if cache_age > self.universe_cache_max_age:
+                    log.info(f"Universe cache is {cache_age / 3600:.1f}h old - cold start")
+                    return
+                restored = get_kline_store().import_arrays(
+                    str(data["interval"]), data["kline_symbols"], data["kline_offsets"], data["klines"]
+                )
+                if "metric_symbols" in data.files:
+                    self.last_metrics_table = MetricsTable.from_arrays(data)
+        except Exception as e:
+            log.warning(f"Could not load universe cache: {e}")
+            return
+
+        self._warm_ranking_pending = self.last_metrics_table is not None
+        self.startup_stats.update({
+            "warm_start": restored > 0,
+            "cache_age_s": round(cache_age, 1),
+            "series_restored": restored,
+            "cache_load_s": round(time.time() - started, 3),
+        })
+        log.info(
+            f"♻️ Universe cache loaded: {restored} kline windows, "
+            f"{len(self.last_metrics_table) if self.last_metrics_table is not None else 0} metric rows "
+            f"(age {cache_age / 60:.0f}min) in {self.startup_stats['cache_load_s']:.2f}s"
+        )
+
+    def _save_universe_cache(self, kline_data: Dict, metrics: MetricsTable):
+        """Persiste klines fechados e métricas do universo em .npz (escrita atômica)."""
+        try:
+            arrays = get_kline_store().export_arrays(UNIVERSE_INTERVAL, kline_data.keys())
+            os.makedirs(os.path.dirname(self.universe_cache_file), exist_ok=True)
+            tmp_file = self.universe_cache_file + ".tmp"
+            with open(tmp_file, "wb") as f:
+                np.savez(
+                    f,
+                    saved_at=np.float64(time.time()),
+                    interval=np.array(UNIVERSE_INTERVAL),
+                    kline_symbols=arrays["symbols"],
+                    kline_offsets=arrays["offsets"],
+                    klines=arrays["klines"],
+                    **metrics.to_arrays(),
+                )
+            os.replace(tmp_file, self.universe_cache_file)
+            log.debug(f"Saved universe cache: {len(arrays['symbols'])} kline windows, {len(metrics)} metric rows")
+        except Exception as e:
+            log.warning(f"Could not save universe cache: {e}")
+
+    def _warm_start_ranking(self) -> Optional[List[str]]:
+        """Ranking da tabela de métricas do cache, só na primeira seleção após o start."""
+        if not self._warm_ranking_pending or self.last_metrics_table is None:
+            return None
+        self._warm_ranking_pending = False
+        ranked_symbols = self._filter_and_rank_pairs(self.last_metrics_table)
+        self._record_first_ranking()
+        return ranked_symbols
+
+    def _start_background_rescan(self):
+        """Atualiza a seleção feita a partir do cache com um scan completo, sem bloquear o start."""
+        self._rescan_thread = threading.Thread(
+            target=self.get_selected_pairs, kwargs={"force_update": True},
+            name="PairSelectorRescan", daemon=True,
+        )
+        self._rescan_thread.start()
+
+    def _full_market_analysis(self) -> Optional[List[str]]:
+        """Scan completo do universo (tickers + klines), ranking e persistência do cache."""
+        tickers, kline_data = self._fetch_market_data()
+        if not (tickers and kline_data):
+            return None
+        metrics = self._calculate_metrics(tickers, kline_data)
+        ranked_symbols = self._filter_and_rank_pairs(metrics)
+        self._record_first_ranking()
+        # Só o rescan periódico persiste o universo (resumos/API não escrevem em disco)
+        if self.universe_cache_enabled:
+            self._save_universe_cache(kline_data, metrics)
+        return ranked_symbols
+
+    def _record_first_ranking(self):
+        if "first_ranking_s" in self.startup_stats:
+            return
+        self.startup_stats["first_ranking_s"] = round(time.time() - self._init_started, 3)
+        log.info(
+            f"⏱️ Startup: first pair ranking {self.startup_stats['first_ranking_s']:.2f}s after init "
+            f"({'warm' if self.startup_stats.get('warm_start') else 'cold'} start)"
+        )
+
     def _fetch_market_data(self):
         # ... (no changes) ...
         log.info("Fetching market data for pair selection...")
         try:
+            scan_started = time.time()
             tickers = self.api_client.get_futures_ticker()
+            tickers_elapsed = time.time() - scan_started
             if not tickers:
                 log.error("Failed to fetch tickers for pair selection.")
                 return None, None
@@ -179,174 +311,114 @@ class PairSelector:
             kline_limit = market_analysis_config['kline_limit']
             min_required_klines = market_analysis_config['min_required_klines']
 
+            kline_store = get_kline_store()
+            fetched_series = None
+            if market_analysis_config.get("concurrent_scan", True):
+                try:
+                    fetched_series = self._scan_universe_klines(symbols_to_fetch_klines, UNIVERSE_INTERVAL, kline_limit)
+                    self.last_scan_stats["tickers_s"] = round(tickers_elapsed, 3)
+                except Exception as e:
+                    log.warning(f"Concurrent kline scan failed ({e}) - falling back to sequential fetch")
             for symbol in symbols_to_fetch_klines:
-                klines = self.api_client.get_futures_klines(
-                    symbol=symbol, interval="3m", limit=kline_limit
-                )
-                if klines and len(klines) >= min_required_klines:
-                    df = pd.DataFrame(
-                        klines,
-                        columns=[
-                            "Open time",
-                            "Open",
-                            "High",
-                            "Low",
-                            "Close",
-                            "Volume",
-                            "Close time",
-                            "Quote asset volume",
-                            "Number of trades",
-                            "Taker buy base asset volume",
-                            "Taker buy quote asset volume",
-                            "Ignore",
-                        ],
+                if fetched_series is not None:
+                    series = fetched_series.get(symbol)
+                else:
+                    # KlineStore: após o primeiro ciclo só os candles novos são buscados e convertidos
+                    series = kline_store.fetch(
+                        self.api_client, symbol, UNIVERSE_INTERVAL, limit=kline_limit, market_type="futures"
                     )
-                    for col in ["Open", "High", "Low", "Close", "Volume"]:
-                        df[col] = pd.to_numeric(df[col])
-                    kline_data[symbol] = df
+                    time.sleep(0.1)
+                if series is not None and len(series) >= min_required_klines:
+                    kline_data[symbol] = series
                 else:
                     log.warning(
-                        f"Could not fetch sufficient kline data ({len(klines) if klines else 0}/{min_required_klines}) for {symbol}. Excluding from this cycle."
+                        f"Could not fetch sufficient kline data ({len(series) if series else 0}/{min_required_klines}) for {symbol}. Excluding from this cycle."
                     )
                     if symbol in relevant_tickers:
                         del relevant_tickers[symbol]
-                time.sleep(0.1)
 
-            log.info(f"Fetched kline data for {len(kline_data)} pairs.")
+            log.info(f"Fetched kline data for {len(kline_data)} pairs in {time.time() - scan_started:.2f}s.")
             return relevant_tickers, kline_data
 
         except Exception as e:
             log.error(f"Error fetching market data: {e}", exc_info=True)
             return None, None
 
-    def _calculate_metrics(self, tickers, kline_data):
-        # ... (no changes) ...
-        metrics = {}
-        for symbol, df in kline_data.items():
-            if symbol not in tickers:
-                continue
+    def _scan_universe_klines(self, symbols: List[str], interval: str, kline_limit: int) -> Dict:
+        """Busca klines do universo inteiro em paralelo (asyncio) e incorpora no KlineStore.
 
-            ticker_info = tickers[symbol]
-            try:
-                volume_24h = Decimal(ticker_info.get("quoteVolume", "0"))
-                high_prices = df["High"].values
-                low_prices = df["Low"].values
-                close_prices = df["Close"].values
-                open_prices = df["Open"].values
+        Cada símbolo pede só os candles que faltam; as respostas viram arrays NumPy
+        direto no cliente async e o orçamento de weight é o do rate limiter compartilhado.
+        Preenche self.last_scan_stats com a duração de cada etapa.
+        """
+        kline_store = get_kline_store()
+        started = time.time()
+        plan = {symbol: kline_store.plan(symbol, interval, kline_limit) for symbol in symbols}
+        planned = time.time()
 
-                atr = Decimal("0")
-                atr_percentage = Decimal("0")
-                adx = Decimal("100")
-                last_pattern = "N/A"
+        arrays = self._run_async(self._fetch_klines_concurrently(plan, interval, kline_limit))
+        fetched = time.time()
 
-                if talib_available:
-                    try:
-                        # Use configurable timeperiod from config
-                        ta_timeperiod = market_analysis_config['ta_timeperiod']
-                        atr_series = talib.ATR(
-                            high_prices, low_prices, close_prices, timeperiod=ta_timeperiod
-                        )
-                        adx_series = talib.ADX(
-                            high_prices, low_prices, close_prices, timeperiod=ta_timeperiod
-                        )
-                        latest_atr = (
-                            atr_series[~np.isnan(atr_series)][-1]
-                            if not np.all(np.isnan(atr_series))
-                            else 0
-                        )
-                        latest_adx = (
-                            adx_series[~np.isnan(adx_series)][-1]
-                            if not np.all(np.isnan(adx_series))
-                            else 100
-                        )
-                        atr = Decimal(str(latest_atr))
-                        adx = Decimal(str(latest_adx))
-                        last_close_price = Decimal(str(close_prices[-1]))
-                        if last_close_price > 0:
-                            atr_percentage = atr / last_close_price
+        series_by_symbol = {}
+        for symbol, needed in plan.items():
+            series_by_symbol[symbol] = kline_store.ingest(
+                symbol, interval, arrays.get(f"{symbol}_{interval}"), kline_limit, needed
+            )
+        merged = time.time()
 
-                        if self.use_candlestick_filter:
-                            detected_pattern_name = "None"
-                            for pattern_func_name in self.avoid_patterns:
-                                if hasattr(talib, pattern_func_name):
-                                    pattern_func = getattr(talib, pattern_func_name)
-                                    try:
-                                        result = pattern_func(
-                                            open_prices,
-                                            high_prices,
-                                            low_prices,
-                                            close_prices,
-                                        )
-                                        if result[-1] != 0:
-                                            detected_pattern_name = pattern_func_name
-                                            log.debug(
-                                                f"Detected pattern {pattern_func_name} for {symbol} on last candle."
-                                            )
-                                            break
-                                    except Exception as e_pattern:
-                                        log.warning(
-                                            f"Error calculating pattern {pattern_func_name} for {symbol}: {e_pattern}"
-                                        )
-                                else:
-                                    # Corrected string literal
-                                    log.warning(
-                                        f"Candlestick pattern function '{pattern_func_name}' not found in TA-Lib."
-                                    )
-                            last_pattern = detected_pattern_name
-                    except Exception as e_talib:
-                        log.error(
-                            f"TA-Lib calculation error for {symbol}: {e_talib}. ADX/ATR might be inaccurate.",
-                            exc_info=True,
-                        )
-                elif pandas_ta_available:
-                    try:
-                        df.ta.atr(length=14, append=True)
-                        df.ta.adx(length=14, append=True)
-                        latest_atr = df["ATRr_14"].iloc[-1]
-                        latest_adx = df["ADX_14"].iloc[-1]
-                        atr = (
-                            Decimal(str(latest_atr))
-                            if pd.notna(latest_atr)
-                            else Decimal("0")
-                        )
-                        adx = (
-                            Decimal(str(latest_adx))
-                            if pd.notna(latest_adx)
-                            else Decimal("100")
-                        )
-                        last_close_price = Decimal(
-                            str(df["Close"].iloc[-1])
-                        )  # Corrected df['Close']
-                        if last_close_price > 0:
-                            atr_percentage = atr / last_close_price
-                        log.debug(
-                            f"Calculated ATR/ADX for {symbol} using pandas_ta (fallback)."
-                        )
-                    except Exception as e_pta:
-                        log.error(
-                            f"pandas_ta calculation error for {symbol}: {e_pta}. ADX/ATR might be inaccurate.",
-                            exc_info=True,
-                        )
-                else:
-                    log.error(
-                        f"Neither TA-Lib nor pandas_ta available for {symbol}. Cannot calculate ATR/ADX."
-                    )
+        self.last_scan_stats = {
+            "symbols": len(symbols),
+            "responses": len(arrays),
+            "klines_requested": int(sum(plan.values())),
+            "plan_s": round(planned - started, 3),
+            "fetch_s": round(fetched - planned, 3),
+            "merge_s": round(merged - fetched, 3),
+            "total_s": round(merged - started, 3),
+        }
+        log.info(
+            f"⏱️ Universe scan: {len(arrays)}/{len(symbols)} symbols, {self.last_scan_stats['klines_requested']} klines "
+            f"| plan {self.last_scan_stats['plan_s']:.2f}s, fetch {self.last_scan_stats['fetch_s']:.2f}s, "
+            f"merge {self.last_scan_stats['merge_s']:.2f}s, total {self.last_scan_stats['total_s']:.2f}s"
+        )
+        return series_by_symbol
 
-                spread_percentage = Decimal("0")  # Placeholder
+    async def _fetch_klines_concurrently(self, plan: Dict[str, int], interval: str, kline_limit: int) -> Dict:
+        # Garante o orçamento de weight compartilhado (cria o limiter do processo se ainda não existe)
+        get_global_rate_limiter(self.config)
+        testnet = getattr(self.api_client, "use_testnet", False)
+        api_key, api_secret = (TESTNET_API_KEY, TESTNET_API_SECRET) if testnet else (API_KEY, API_SECRET)
+        concurrency = self.config.get("market_analysis", {}).get("scan_concurrency", 20)
+        async with AsyncAPIClient(api_key or "", api_secret or "", testnet=testnet) as client:
+            return await client.batch_fetch_klines(
+                [(symbol, interval) for symbol in plan], limit=kline_limit, market_type="futures",
+                as_array=True, max_concurrency=concurrency, limits=plan,
+            )
 
-                metrics[symbol] = {
-                    "volume": volume_24h,
-                    "atr_perc": atr_percentage,
-                    "spread_perc": spread_percentage,
-                    "adx": adx,
-                    "last_pattern": last_pattern,
-                    "last_price": Decimal(ticker_info.get("lastPrice", "0")),
-                }
-                log.debug(
-                    f"{symbol}: Vol={volume_24h:.0f}, ATR%={atr_percentage*100:.2f}, ADX={adx:.2f}, Pattern={last_pattern}"
-                )
-            except Exception as e:
-                log.error(f"Error calculating metrics for {symbol}: {e}", exc_info=True)
+    @staticmethod
+    def _run_async(coro):
+        """Executa a corrotina mesmo se chamado de dentro de um event loop (usa uma thread auxiliar)."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coro).result()
+
+    def _calculate_metrics(self, tickers, kline_data) -> MetricsTable:
+        """Métricas do universo inteiro numa passada vetorizada (tabela colunar, uma linha por símbolo)."""
+        started = time.time()
+        market_analysis_config = self.config.get("market_analysis", {})
+        metrics = compute_universe_metrics(
+            kline_data,
+            tickers,
+            period=market_analysis_config.get("ta_timeperiod", 14),
+            limit=market_analysis_config.get("kline_limit", 100),
+            patterns=self.avoid_patterns if self.use_candlestick_filter else (),
+        )
+        if not self.use_candlestick_filter:
+            metrics.columns["last_pattern"][:] = "N/A"
+        self.last_metrics_table = metrics
+        log.debug(f"Computed metrics for {len(metrics)} pairs in {(time.time() - started) * 1000:.1f}ms")
         return metrics
 
     def _get_symbol_metrics(self, symbol: str) -> Optional[Dict]:
@@ -367,47 +439,25 @@ class PairSelector:
             market_analysis_config = self.config['market_analysis']
             kline_limit = market_analysis_config['kline_limit']
             
-            if self.market_type == "futures":
-                klines = self.api_client.get_futures_klines(symbol, "5m", kline_limit)
-            else:
-                klines = self.api_client.get_spot_klines(symbol, "5m", kline_limit)
-            
-            if not klines or len(klines) < 20:
+            interval = self.rotation_monitor.interval
+            series = get_kline_store().fetch(
+                self.api_client, symbol, interval, limit=kline_limit, market_type=self.market_type
+            )
+            if series is None or len(series) < 20:
                 return None
-                
-            # Convert to DataFrame for analysis
-            import pandas as pd
-            df = pd.DataFrame(klines, columns=[
-                "timestamp", "Open", "High", "Low", "Close", "Volume",
-                "close_time", "quote_asset_volume", "number_of_trades",
-                "taker_buy_base_asset_volume", "taker_buy_quote_asset_volume", "ignore"
-            ])
-            
-            # Convert to numeric
-            for col in ["Open", "High", "Low", "Close", "Volume"]:
-                df[col] = pd.to_numeric(df[col])
+            # A partir daqui o símbolo é mantido pelo stream de tickers
+            self.rotation_monitor.seed_from_series(symbol, series, ticker_info)
             
             # Calculate ATR
             volume_24h = float(ticker_info.get("quoteVolume", "0"))
             atr_perc = 0.0
             
-            if talib_available and len(df) >= 14:
-                try:
-                    ta_timeperiod = market_analysis_config['ta_timeperiod']
-                    atr_series = talib.ATR(
-                        df["High"].values, 
-                        df["Low"].values, 
-                        df["Close"].values, 
-                        timeperiod=ta_timeperiod
-                    )
-                    
-                    if len(atr_series) > 0 and not pd.isna(atr_series[-1]):
-                        current_price = float(ticker_info.get("lastPrice", "0"))
-                        if current_price > 0:
-                            atr_perc = float(atr_series[-1]) / current_price
-                            
-                except Exception as e:
-                    log.debug(f"Erro no cálculo ATR para {symbol}: {e}")
+            ta_timeperiod = market_analysis_config.get('ta_timeperiod', 14)
+            indicator_set = get_indicator_engine().get(symbol, interval, self.market_type, atr_period=ta_timeperiod)
+            indicator_set.update_from_series(series)
+            current_price = float(ticker_info.get("lastPrice", "0"))
+            if indicator_set.atr.value is not None and current_price > 0:
+                atr_perc = indicator_set.atr.value / current_price
             
             return {
                 "atr_perc": atr_perc,
@@ -420,9 +470,8 @@ class PairSelector:
             log.debug(f"Erro ao obter métricas para {symbol}: {e}")
             return None
 
-    def _filter_and_rank_pairs(self, metrics):
+    def _filter_and_rank_pairs(self, metrics: MetricsTable):
         """Filters pairs based on criteria (including sentiment) and ranks them."""
-        filtered_pairs = []
         current_sentiment_score = None
 
         # Get sentiment score once if filtering is enabled
@@ -442,73 +491,44 @@ class PairSelector:
                     False  # Disable for this run if error
                 )
 
-        for symbol, m in metrics.items():
-            # Apply standard filters
-            if m["volume"] < self.min_volume_usd_24h:
-                log.debug(
-                    f"Excluding {symbol}: Low volume ({m['volume']:.0f} < {self.min_volume_usd_24h})"
-                )
-                continue
-            if m["atr_perc"] < self.min_atr_perc_24h:
-                log.debug(
-                    f"Excluding {symbol}: Low volatility ATR ({m['atr_perc']*100:.2f}% < {self.min_atr_perc_24h*100}%)"
-                )
-                continue
-            if m["adx"] > self.max_adx:
-                log.debug(
-                    f"Excluding {symbol}: Too trendy ADX ({m['adx']:.2f} > {self.max_adx})"
-                )
-                continue
-            
-            # Apply price filter - NEW
-            if m["last_price"] > self.max_price_usdt:
-                log.debug(
-                    f"Excluding {symbol}: Price too high ({m['last_price']:.4f} > {self.max_price_usdt})"
-                )
-                continue
-
-            # Apply optional candlestick pattern filter
-            if (
-                self.use_candlestick_filter
-                and m["last_pattern"] != "N/A"
-                and m["last_pattern"] != "None"
-            ):
-                if m["last_pattern"] in self.avoid_patterns:
-                    log.info(
-                        f"Excluding {symbol}: Found undesirable pattern ({m['last_pattern']}) on last candle."
-                    )
-                    continue
+        # Filtros padrão como máscaras sobre a tabela colunar
+        volume, atr_perc, adx = metrics["volume"], metrics["atr_perc"], metrics["adx"]
+        filters = [
+            ("Low volume", volume < float(self.min_volume_usd_24h)),
+            ("Low volatility ATR", atr_perc < float(self.min_atr_perc_24h)),
+            ("Too trendy ADX", adx > float(self.max_adx)),
+            ("Price too high", metrics["last_price"] > float(self.max_price_usdt)),  # NOVO: filtro de preço
+        ]
+        if self.use_candlestick_filter:
+            patterns = metrics["last_pattern"]
+            filters.append(("Undesirable pattern", np.isin(patterns, self.avoid_patterns)))
 
-            # --- Apply Sentiment Filter (NEW) --- #
-            if self.sentiment_filtering_enabled and current_sentiment_score is not None:
-                if current_sentiment_score <= self.min_sentiment_for_new_pair:
-                    log.info(
-                        f"Excluding {symbol}: Sentiment score ({current_sentiment_score:.4f}) is below threshold ({self.min_sentiment_for_new_pair})."
-                    )
-                    continue  # Skip this pair due to low sentiment
-            # ------------------------------------ #
+        keep = np.ones(len(metrics), dtype=bool)
+        for reason, excluded in filters:
+            excluded &= keep
+            if excluded.any():
+                log.debug(f"Excluding {int(excluded.sum())} pairs: {reason} ({', '.join(metrics.symbols[excluded][:10])})")
+            keep &= ~excluded
 
-            # If all filters pass, add to list
-            filtered_pairs.append(
-                {
-                    "symbol": symbol,
-                    "volume": m["volume"],
-                    "atr_perc": m["atr_perc"],
-                    "adx": m["adx"],
-                    "last_pattern": m["last_pattern"],
-                }
-            )
+        # --- Apply Sentiment Filter (NEW) --- #
+        if self.sentiment_filtering_enabled and current_sentiment_score is not None:
+            if current_sentiment_score <= self.min_sentiment_for_new_pair:
+                log.info(
+                    f"Excluding all new pairs: Sentiment score ({current_sentiment_score:.4f}) is below threshold ({self.min_sentiment_for_new_pair})."
+                )
+                keep[:] = False
+        # ------------------------------------ #
 
+        filtered = metrics.filter(keep)
         log.info(
-            f"Found {len(filtered_pairs)} pairs after filtering (including sentiment if enabled)."
+            f"Found {len(filtered)} pairs after filtering (including sentiment if enabled)."
         )
 
         # Rank pairs: prioritize higher ATR (more grid opportunities), then
         # lower ADX (better for grid)
         # Sort descending by ATR, then ascending by ADX
-        filtered_pairs.sort(key=lambda p: (-p["atr_perc"], p["adx"]))
-
-        ranked_symbols = [p["symbol"] for p in filtered_pairs]
+        order = np.lexsort((filtered["adx"], -filtered["atr_perc"]))
+        ranked_symbols = filtered.symbols[order].tolist()
         log.info(f"Ranked pairs: {ranked_symbols[:self.max_pairs]}")
 
         return ranked_symbols
@@ -520,11 +540,17 @@ class PairSelector:
             self.update_interval_hours * 3600
         )
 
+        rescan = self._rescan_thread
+        if rescan is not None and rescan.is_alive() and rescan is not threading.current_thread():
+            # Scan de atualização do warm start em andamento: mantém o ranking do cache até ele terminar
+            return self.selected_pairs
+
         if force_update or needs_update:
             log.info(
                 f"Updating pair selection (Force update: {force_update}, Time elapsed: {(current_time - self.last_update_time)/3600:.2f}h)"
             )
             
+            rescan_after = False
             # NOVO: Verificar pares com posições abertas primeiro
             existing_position_pairs = self._get_pairs_with_open_positions()
             log.info(f"Found {len(existing_position_pairs)} pairs with open positions: {existing_position_pairs}")
@@ -551,15 +577,20 @@ class PairSelector:
                     selected_pairs = preferred[:self.max_pairs]
             else:
                 # Caso contrário, fazer análise completa
-                log.info("No sufficient preferred symbols, performing full market analysis...")
-                tickers, kline_data = self._fetch_market_data()
-                if tickers and kline_data:
-                    metrics = self._calculate_metrics(tickers, kline_data)
-                    ranked_symbols = self._filter_and_rank_pairs(metrics)
-                    selected_pairs = ranked_symbols[:self.max_pairs]
+                warm_ranking = self._warm_start_ranking()
+                if warm_ranking is not None:
+                    # Warm start: ranking imediato da tabela do cache; o scan completo roda em segundo plano
+                    log.info("Ranking pairs from the cached universe metrics, full rescan in background...")
+                    selected_pairs = warm_ranking[:self.max_pairs]
+                    rescan_after = True
                 else:
-                    log.error("Failed to update pair selection due to data fetching errors.")
-                    selected_pairs = self.selected_pairs  # Keep existing
+                    log.info("No sufficient preferred symbols, performing full market analysis...")
+                    ranked_symbols = self._full_market_analysis()
+                    if ranked_symbols is not None:
+                        selected_pairs = ranked_symbols[:self.max_pairs]
+                    else:
+                        log.error("Failed to update pair selection due to data fetching errors.")
+                        selected_pairs = self.selected_pairs  # Keep existing
             
             # NOVO: Combinar pares selecionados com pares que têm posições abertas
             final_pairs = list(existing_position_pairs)  # Sempre incluir pares com posições
@@ -583,6 +614,8 @@ class PairSelector:
             self.last_update_time = current_time
             self._save_cache()
             log.info(f"Pair selection completed. Selected pairs: {self.selected_pairs}")
+            if rescan_after:
+                self._start_background_rescan()
 
         return self.selected_pairs
     
@@ -835,27 +868,19 @@ class PairSelector:
                 return self._get_fallback_market_summary()
             
             # Calcular estatísticas agregadas
-            volumes = [float(m["volume"]) for m in metrics.values()]
-            atr_percentages = [float(m["atr_perc"]) * 100 for m in metrics.values()]
-            adx_values = [float(m["adx"]) for m in metrics.values()]
-            prices = [float(m["last_price"]) for m in metrics.values()]
+            volumes = metrics["volume"].tolist()
+            atr_percentages = (metrics["atr_perc"] * 100).tolist()
+            adx_values = metrics["adx"].tolist()
+            prices = metrics["last_price"].tolist()
             
             # Identificar pares de alto volume (top 10%)
             volume_threshold = sorted(volumes, reverse=True)[int(len(volumes) * 0.1)]
-            high_volume_pairs = [
-                symbol for symbol, m in metrics.items() 
-                if float(m["volume"]) >= volume_threshold
-            ][:10]  # Top 10 para evitar lista muito longa
+            high_volume_pairs = metrics.symbols[metrics["volume"] >= volume_threshold][:10].tolist()  # Top 10 para evitar lista muito longa
             
             # Determinar tendência predominante do mercado
-            bullish_count = 0
-            bearish_count = 0
-            for symbol, m in metrics.items():
-                if float(m["atr_perc"]) > 0.03:  # Alta volatilidade
-                    if float(m["adx"]) < 25:  # Baixo ADX = bom para grid
-                        bullish_count += 1
-                    else:
-                        bearish_count += 1
+            high_volatility = metrics["atr_perc"] > 0.03  # Alta volatilidade
+            bullish_count = int((high_volatility & (metrics["adx"] < 25)).sum())  # Baixo ADX = bom para grid
+            bearish_count = int((high_volatility & (metrics["adx"] >= 25)).sum())
             
             if bullish_count > bearish_count * 1.2:
                 market_trend = "bullish"
@@ -934,7 +959,15 @@ class PairSelector:
             problematic_pairs = {}
             replacement_suggestions = {}
             
+            # Cadência configurável: fora dela não há avaliação (nem rotação)
+            if not self.rotation_monitor.evaluation_due():
+                return {"problematic_pairs": {}, "replacement_suggestions": {}, "total_problematic": 0, "skipped": True}
+            
             log.info("🔍 Monitorando qualidade de ATR e atividade dos pares ativos...")
+            evaluation_started = time.time()
+            self._refresh_rotation_tickers(
+                list(active_pairs) + list(self.rotation_monitor_config.get("candidate_symbols", ROTATION_CANDIDATES))
+            )
             
             # Timeout de inatividade: 1 hora (3600 segundos)
             inactivity_timeout = 3600
@@ -978,8 +1011,10 @@ class PairSelector:
                         }
                         continue  # Pular análise de métricas se já é problemático por atividade
                     
-                    # Obter métricas atuais do par
-                    metrics = self._get_symbol_metrics(symbol)
+                    # Obter métricas atuais do par (tabela em memória; REST só no cold start)
+                    metrics = self.rotation_monitor.metrics(symbol)
+                    if metrics is None and self.rotation_monitor.should_seed(symbol):
+                        metrics = self._get_symbol_metrics(symbol)
                     
                     if not metrics:
                         continue
@@ -1037,6 +1072,7 @@ class PairSelector:
                         
                         log.info(f"💡 Sugestão: Substituir {problematic_symbol} por {best_alternative['symbol']} (ATR: {best_alternative['atr_percentage']:.2f}%) - {reason}")
             
+            log.info(f"⏱️ Avaliação de rotação em {(time.time() - evaluation_started) * 1000:.1f}ms")
             return {
                 "problematic_pairs": problematic_pairs,
                 "replacement_suggestions": replacement_suggestions,
@@ -1052,55 +1088,51 @@ class PairSelector:
     def _get_high_atr_alternatives(self, exclude_symbols: List[str] = None, min_atr_perc: float = 1.5) -> List[Dict]:
         """
         Busca pares alternativos com ATR alto para substituição.
+        Consulta a tabela do RotationMonitor em memória (sem REST em regime).
         """
         try:
             exclude_symbols = exclude_symbols or []
-            alternatives = []
             
-            # Lista de pares USDT populares para verificar
-            candidate_symbols = [
-                "BTCUSDT", "ETHUSDT", "BNBUSDT", "ADAUSDT", "XRPUSDT", "SOLUSDT",
-                "DOGEUSDT", "AVAXUSDT", "DOTUSDT", "MATICUSDT", "LTCUSDT", "UNIUSDT",
-                "LINKUSDT", "XLMUSDT", "VETUSDT", "TRXUSDT", "EOSUSDT", "ETCUSDT",
-                "FILUSDT", "AAVEUSDT", "MKRUSDT", "COMPUSDT", "YFIUSDT", "SUSHIUSDT"
-            ]
+            candidate_symbols = self.rotation_monitor_config.get("candidate_symbols", ROTATION_CANDIDATES)
             
+            # Cold start: candidatos ainda fora da tabela são semeados uma vez via REST
             for symbol in candidate_symbols:
-                if symbol in exclude_symbols:
+                if symbol in exclude_symbols or not self.rotation_monitor.should_seed(symbol):
                     continue
-                    
                 try:
-                    metrics = self._get_symbol_metrics(symbol)
-                    if not metrics:
-                        continue
-                        
-                    atr_perc = float(metrics.get("atr_perc", 0)) * 100
-                    volume_24h = metrics.get("volume_24h", 0)
-                    
-                    # Critérios para bom substituto
-                    if (atr_perc >= min_atr_perc and 
-                        volume_24h >= 5000000 and 
-                        atr_perc <= 15.0):  # Não muito volátil também
-                        
-                        alternatives.append({
-                            "symbol": symbol,
-                            "atr_percentage": atr_perc,
-                            "volume_24h": volume_24h,
-                            "quality_score": atr_perc * (volume_24h / 1000000)  # Score combinado
-                        })
-                
+                    self._get_symbol_metrics(symbol)
                 except Exception as e:
                     log.debug(f"Erro ao analisar candidato {symbol}: {e}")
             
-            # Ordenar por quality_score decrescente
-            alternatives.sort(key=lambda x: x["quality_score"], reverse=True)
-            
-            return alternatives[:10]  # Retornar top 10
+            # Critérios para bom substituto: ATR entre min_atr_perc e 15% (não muito volátil), volume >= 5M;
+            # ordenado por quality_score (ATR% x volume em milhões), top 10
+            return self.rotation_monitor.alternatives(
+                exclude_symbols=exclude_symbols,
+                min_atr_perc=min_atr_perc,
+                min_volume=5_000_000,
+                max_atr_perc=15.0,
+                limit=10,
+                candidates=candidate_symbols,
+            )
             
         except Exception as e:
             log.error(f"Erro ao buscar alternativas de alta ATR: {e}")
             return []
     
+    def _refresh_rotation_tickers(self, symbols: List[str] = ()):
+        """Uma única chamada bulk atualiza a tabela de rotação quando o stream !ticker@arr está
+        parado ou quando algum dos `symbols` ficou sem ticker recente."""
+        if self.market_type != "futures":
+            return
+        stale = self.rotation_monitor.stale_symbols(symbols)
+        if self.rotation_monitor.stream_is_fresh() and not stale:
+            return
+        if stale:
+            log.debug(f"Rotação: {len(stale)} símbolo(s) sem ticker recente, atualizando via REST")
+        tickers = self.api_client.get_futures_ticker()
+        if tickers:
+            self.rotation_monitor.on_ticker_batch(tickers)
+    
     def _get_fallback_market_summary(self) -> dict:
         """Resumo de fallback quando não consegue obter dados reais."""
         return {
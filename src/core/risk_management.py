@@ -11,6 +11,8 @@ from binance.enums import SIDE_SELL, SIDE_BUY, FUTURE_ORDER_TYPE_STOP_MARKET
 
 from utils.api_client import APIClient
 from utils.logger import setup_logger
+from utils.streaming_indicators import get_indicator_engine
+from utils.kline_store import get_kline_store
 from utils.trailing_stop import TrailingStopManager, TrailingStopConfig, PositionSide
 from utils.conditional_orders import ConditionalOrderManager, ConditionalOrderConfig, OrderType, ConditionType
 log = setup_logger("risk_management")
@@ -147,7 +149,7 @@ class RiskManager:
         self.trailing_stop_config = self._create_trailing_stop_config()
         
         # --- Conditional Orders Manager --- #
-        self.conditional_order_manager = ConditionalOrderManager(api_client, alerter)
+        self.conditional_order_manager = ConditionalOrderManager(api_client, alerter, market_type=self.market_type)
         self.conditional_orders_enabled = self.risk_config.get("conditional_orders", {}).get("enabled", True)
         
         # Iniciar monitoramento de ordens condicionais
@@ -310,43 +312,17 @@ class RiskManager:
             return None
         try:
             limit = periods_needed + 5  # Adiciona buffer
-            # Busca klines baseado no tipo de mercado
-            if self.market_type == "spot":
-                klines = self.api_client.get_spot_klines(
-                    symbol=self.symbol, interval=getattr(self, 'kline_interval', '3m'), limit=limit
-                )
-            else:  # futures
-                klines = self.api_client.get_futures_klines(
-                    symbol=self.symbol, interval=getattr(self, 'kline_interval', '3m'), limit=limit
-                )
-            if not klines or len(klines) < periods_needed:
+            # KlineStore do processo (já alimentado pelo GridLogic) - só busca o que falta
+            series = get_kline_store().fetch(
+                self.api_client, self.symbol, getattr(self, 'kline_interval', '3m'), limit, self.market_type
+            )
+            if series is None or len(series) < periods_needed:
                 log.warning(
-                    f"[{self.symbol}] Insufficient kline data ({len(klines) if klines else 0}/{periods_needed}) for TA-Lib risk calculation."
+                    f"[{self.symbol}] Insufficient kline data ({len(series) if series else 0}/{periods_needed}) for TA-Lib risk calculation."
                 )
                 return None
 
-            df = pd.DataFrame(
-                klines,
-                columns=[
-                    "Open time",
-                    "Open",
-                    "High",
-                    "Low",
-                    "Close",
-                    "Volume",
-                    "Close time",
-                    "Quote asset volume",
-                    "Number of trades",
-                    "Taker buy base asset volume",
-                    "Taker buy quote asset volume",
-                    "Ignore",
-                ],
-            )
-            df["Open"] = pd.to_numeric(df["Open"])
-            df["High"] = pd.to_numeric(df["High"])
-            df["Low"] = pd.to_numeric(df["Low"])
-            df["Close"] = pd.to_numeric(df["Close"])
-            return df
+            return series.view(limit)  # Registro colunar sem cópia
         except Exception as e:
             log.error(
                 f"[{self.symbol}] Error fetching data for risk calculation: {e}",
@@ -354,23 +330,17 @@ class RiskManager:
             )
             return None
 
-    def _calculate_atr(self, df: pd.DataFrame) -> Decimal | None:
-        # ... (no changes) ...
-        if df is None or not talib_available:
+    def _calculate_atr(self, klines: np.ndarray) -> Decimal | None:
+        """ATR incremental (Wilder, equivalente ao talib.ATR) compartilhado com o GridLogic."""
+        if klines is None:
             return None
         try:
-            high_prices = df["High"].values
-            low_prices = df["Low"].values
-            close_prices = df["Close"].values
-
-            atr_series = talib.ATR(
-                high_prices, low_prices, close_prices, timeperiod=self.atr_sl_period
-            )
-            latest_atr = (
-                atr_series[~np.isnan(atr_series)][-1]
-                if not np.all(np.isnan(atr_series))
-                else None
-            )
+            interval = getattr(self, 'kline_interval', '3m')
+            # Mesmo período do GridLogic -> reutiliza o IndicatorSet já aquecido por ele
+            params = {} if self.atr_sl_period == 14 else {"atr_period": self.atr_sl_period}
+            indicator_set = get_indicator_engine().get(self.symbol, interval, self.market_type, **params)
+            indicator_set.update_from_klines(klines)
+            latest_atr = indicator_set.atr.value
 
             if latest_atr is not None:
                 self.last_atr_value = Decimal(str(latest_atr))
@@ -386,17 +356,17 @@ class RiskManager:
             return None
 
     def _check_reversal_patterns(
-        self, df: pd.DataFrame, position_is_long: bool
+        self, klines: np.ndarray, position_is_long: bool
     ) -> str | None:
         # ... (no changes) ...
-        if df is None or not talib_available or not self.check_reversal_patterns_sl:
+        if klines is None or not talib_available or not self.check_reversal_patterns_sl:
             return None
 
         try:
-            open_prices = df["Open"].values
-            high_prices = df["High"].values
-            low_prices = df["Low"].values
-            close_prices = df["Close"].values
+            open_prices = klines["open"]
+            high_prices = klines["high"]
+            low_prices = klines["low"]
+            close_prices = klines["close"]
 
             patterns_to_check = (
                 self.reversal_patterns_long
@@ -456,7 +426,7 @@ class RiskManager:
             return
 
         # Fetch data if using TA-Lib features
-        df = None
+        klines = None
         periods_needed = 0
         if self.use_atr_stop_loss:
             periods_needed = max(periods_needed, self.atr_sl_period)
@@ -464,20 +434,20 @@ class RiskManager:
             periods_needed = max(periods_needed, 2)
 
         if periods_needed > 0 and talib_available:
-            df = self._fetch_recent_data_for_risk(periods_needed)
+            klines = self._fetch_recent_data_for_risk(periods_needed)
 
         # Calculate ATR if needed
         current_atr = None
-        if self.use_atr_stop_loss and df is not None:
-            current_atr = self._calculate_atr(df)
+        if self.use_atr_stop_loss and klines is not None:
+            current_atr = self._calculate_atr(klines)
         if current_atr is None:
             current_atr = self.last_atr_value
 
         # Check for reversal patterns if enabled
         reversal_pattern_detected = None
-        if self.check_reversal_patterns_sl and df is not None:
+        if self.check_reversal_patterns_sl and klines is not None:
             reversal_pattern_detected = self._check_reversal_patterns(
-                df, position_qty > 0
+                klines, position_qty > 0
             )
 
         # Calculate Stop Loss Price
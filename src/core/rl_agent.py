@@ -9,6 +9,7 @@ import yaml
 from gymnasium import spaces
 
 from rl.agent import RLTradingAgent
+from rl.replay_buffer import ReplayBuffer
 from rl.environment import TradingEnvironment
 from utils.logger import setup_logger
 log = setup_logger("rl_agent")
@@ -493,11 +494,16 @@ class RLAgent:
         
         # Set model paths
         self.model_path = os.path.join(symbol_dir, "model")
+        self.replay_path = os.path.join(symbol_dir, "replay")
         
         self.agent = None
         self.env = None
         self.state_size = self.rl_config.get("state_size", 30)
         self.action_size = self.rl_config.get("action_size", 3)
+        self.target_update_steps = self.rl_config.get("target_update_steps", 0)
+        self.memory_size = self.rl_config.get("experience_replay_buffer_size", 2000)
+        self.prioritized_replay = self.rl_config.get("prioritized_replay", False)
+        self.replay_memmap = self.rl_config.get("replay_memmap", False)
         self.total_timesteps_trained = 0
         
         log.info(f"[{self.symbol}] RLAgent initialized with state_size={self.state_size}, action_size={self.action_size}")
@@ -518,10 +524,15 @@ class RLAgent:
             # Create or load agent
             if training or not os.path.exists(f"{self.model_path}.h5"):
                 log.info(f"[{self.symbol}] Creating new RLTrading agent")
-                self.agent = RLTradingAgent(self.state_size, self.action_size)
+                self.agent = self._create_agent(training)
+                if training and ReplayBuffer.exists(self.replay_path):
+                    # Treino retoma a memória salva (memmap reaberto em r+, sem truncar)
+                    self.agent.load_memory(self.replay_path, mmap=self.replay_memmap)
+                    log.info(f"[{self.symbol}] Resumed replay memory: {len(self.agent.memory)} transitions")
             else:
+                # Inferência não usa a memória de replay: só os pesos
                 log.info(f"[{self.symbol}] Loading existing model from {self.model_path}.h5")
-                self.agent = RLTradingAgent(self.state_size, self.action_size)
+                self.agent = self._create_agent(training)
                 self.agent.load_model(f"{self.model_path}.h5")
 
             return True
@@ -529,6 +540,18 @@ class RLAgent:
             log.error(f"[{self.symbol}] Error setting up agent: {e}", exc_info=True)
             return False
 
+    def _create_agent(self, training):
+        # Buffer em memmap grava direto em replay_path; w+ só quando não há memória salva
+        # (a existente é reaberta por load_memory)
+        memory_dir = None
+        if self.replay_memmap and training and not ReplayBuffer.exists(self.replay_path):
+            memory_dir = self.replay_path
+        return RLTradingAgent(self.state_size, self.action_size,
+                              target_update_steps=self.target_update_steps,
+                              memory_size=self.memory_size,
+                              prioritized_replay=self.prioritized_replay,
+                              memory_dir=memory_dir)
+
     def predict_action(self, state, sentiment_score=None):
         """Predict action based on current state and optional sentiment score."""
         if not self.agent:
@@ -617,7 +640,8 @@ class RLAgent:
         if self.agent:
             try:
                 self.agent.save_model(f"{self.model_path}.h5")
-                log.info(f"[{self.symbol}] Model saved to {self.model_path}.h5")
+                self.agent.save_memory(self.replay_path)
+                log.info(f"[{self.symbol}] Model saved to {self.model_path}.h5 (replay memory: {len(self.agent.memory)} transitions)")
                 return True
             except Exception as e:
                 log.error(f"[{self.symbol}] Error saving model: {e}", exc_info=True)
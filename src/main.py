@@ -5,6 +5,8 @@ from utils.api_client import APIClient
 from utils.alerter import Alerter
 from utils.request_cache import cached_endpoint, request_cache
 from utils.market_data_manager import get_market_data_manager, initialize_market_data_manager
+from utils.kline_store import get_kline_store
+from utils.stress_test import account_equity, aligned_close_returns, exposures_from_account, get_stress_tester
 
 # Import model_api (may require RL dependencies)
 try:
@@ -42,6 +44,7 @@ from core.risk_management import RiskManager
 from core.grid_logic import GridLogic
 from flask_cors import CORS
 from flask import Flask, jsonify, request, send_from_directory
+import numpy as np
 import yaml
 import threading
 import os
@@ -723,46 +726,37 @@ def get_klines(symbol):
     
     try:
         # Determinar cliente baseado no tipo de mercado
-        if market_type == "spot":
-            client = binance_spot_client
-            klines = client.get_spot_klines(symbol=symbol, interval=interval, limit=limit)
-        else:  # futures
-            client = binance_futures_client
-            klines = client.get_futures_klines(symbol=symbol, interval=interval, limit=limit)
+        client = binance_spot_client if market_type == "spot" else binance_futures_client
+        # KlineStore: requisições repetidas só buscam os candles novos
+        series = get_kline_store().fetch(client, symbol, interval, limit, market_type)
 
-        logger.info(f"Klines recebidos para {symbol}: {klines[:3]}")  # Loga os 3 primeiros para debug
-
-        if not klines:
+        if series is None:
             return jsonify({"error": "Nenhum dado de klines encontrado"}), 404
 
-        # Formatar dados para o frontend
-        formatted_klines = []
-        all_doji = True
-        for kline in klines:
-            try:
-                o = float(kline[1])
-                h = float(kline[2])
-                l = float(kline[3])
-                c = float(kline[4])
-                v = float(kline[5])
-                if not (o == h == l == c):
-                    all_doji = False
-                formatted_klines.append({
-                    "timestamp": int(kline[0]),
-                    "open": o,
-                    "high": h,
-                    "low": l,
-                    "close": c,
-                    "volume": v,
-                    "close_time": int(kline[6]),
-                    "quote_volume": float(kline[7]),
-                    "trades": int(kline[8])
-                })
-            except Exception as e:
-                logger.error(f"Erro ao formatar kline: {kline} - {e}")
+        # Formatar dados para o frontend direto das colunas float64
+        klines = series.view(limit)
+        all_doji = bool(np.all(
+            (klines["open"] == klines["high"]) & (klines["high"] == klines["low"]) & (klines["low"] == klines["close"])
+        ))
         if all_doji:
-            logger.error(f"Todos os candles vieram como doji (OHLC iguais) para {symbol}. Dados brutos: {klines[:3]}")
-            return jsonify({"error": "Todos os candles vieram como doji (OHLC iguais ou zerados). Verifique o símbolo, limite ou se a Binance está retornando dados válidos.", "raw_klines": klines[:3]}), 500
+            raw_klines = series.to_list(3)
+            logger.error(f"Todos os candles vieram como doji (OHLC iguais) para {symbol}. Dados brutos: {raw_klines}")
+            return jsonify({"error": "Todos os candles vieram como doji (OHLC iguais ou zerados). Verifique o símbolo, limite ou se a Binance está retornando dados válidos.", "raw_klines": raw_klines}), 500
+
+        formatted_klines = [
+            {
+                "timestamp": int(row[0]),
+                "open": row[1],
+                "high": row[2],
+                "low": row[3],
+                "close": row[4],
+                "volume": row[5],
+                "close_time": int(row[6]),
+                "quote_volume": row[7],
+                "trades": int(row[8]),
+            }
+            for row in klines.tolist()
+        ]
         return jsonify({
             "symbol": symbol,
             "interval": interval,
@@ -1022,34 +1016,24 @@ def get_indicators_list():
 @app.route("/api/indicators/<symbol>", methods=["GET"])
 def get_indicators_for_symbol(symbol):
     """Retorna dados reais de indicadores técnicos para o símbolo usando TA-Lib e dados da Binance."""
-    import numpy as np
     try:
         # --- Parâmetros ---
         indicator_type = request.args.get("type", "RSI").upper()
         period = int(request.args.get("period", 14))
         interval = request.args.get("interval", "3m")
         limit = int(request.args.get("limit", 500))
-        # --- Cache simples em memória ---
-        if not hasattr(get_indicators_for_symbol, "_klines_cache"):
-            get_indicators_for_symbol._klines_cache = {}
-        klines_cache = get_indicators_for_symbol._klines_cache
-        cache_key = f"{symbol}_{interval}_{limit}"
-        now = time.time()
-        # 5 minutos de cache
-        if cache_key in klines_cache and now - klines_cache[cache_key][1] < 300:
-            klines = klines_cache[cache_key][0]
-        else:
-            if not binance_spot_client:
-                return jsonify({"error": "Binance client não inicializado"}), 500
-            klines = binance_spot_client.get_spot_klines(symbol, interval, limit=limit)
-            if not klines or len(klines) < period:
-                return jsonify({"error": "Dados insuficientes para cálculo do indicador"}), 400
-            klines_cache[cache_key] = (klines, now)
-        closes = np.array([float(k[4]) for k in klines])
-        highs = np.array([float(k[2]) for k in klines])
-        lows = np.array([float(k[3]) for k in klines])
-        volumes = np.array([float(k[5]) for k in klines])
-        timestamps = [int(k[0]) for k in klines]
+        if not binance_spot_client:
+            return jsonify({"error": "Binance client não inicializado"}), 500
+        # KlineStore substitui o cache de 5 minutos: dados atuais buscando só os candles novos
+        series = get_kline_store().fetch(binance_spot_client, symbol, interval, limit, "spot")
+        if series is None or len(series) < period:
+            return jsonify({"error": "Dados insuficientes para cálculo do indicador"}), 400
+        klines = series.view(limit)
+        closes = klines["close"]
+        highs = klines["high"]
+        lows = klines["low"]
+        volumes = klines["volume"]
+        timestamps = klines["open_time"].astype(np.int64).tolist()
         import talib
         # --- Cálculo do indicador ---
         if indicator_type == "SMA":
@@ -1302,6 +1286,67 @@ def get_balance_summary():
         return jsonify({"error": str(e)}), 500
 
 
+def _parse_shocks(raw):
+    """Choques como dict {"BTCUSDT": -0.10} (POST) ou "BTCUSDT:-0.10,ETHUSDT:-0.05" (GET)."""
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return {symbol.upper(): float(move) for symbol, move in raw.items()}
+    shocks = {}
+    for item in str(raw).split(","):
+        symbol, move = item.split(":")
+        shocks[symbol.strip().upper()] = float(move)
+    return shocks
+
+
+@app.route("/api/risk/stress_test", methods=["GET", "POST"])
+def run_stress_test():
+    """Stress test Monte Carlo das posições e ordens abertas de Futures (choques opcionais)."""
+    try:
+        if not initialize_components():
+            return jsonify({"error": "Falha ao inicializar cliente de trading"}), 500
+        
+        params = {**request.args.to_dict(), **(request.get_json(silent=True) or {})}
+        stress_config = config.get("risk_agent", {}).get("stress_test", {})
+        try:
+            shocks = _parse_shocks(params.get("shocks"))
+            paths = min(int(params.get("paths", stress_config.get("paths", 10000))), 100000)
+            horizon_steps = min(int(params.get("horizon_steps", stress_config.get("horizon_steps", 10))), 1440)
+            seed = int(params["seed"]) if "seed" in params else None
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Parâmetros inválidos: {e}"}), 400
+        if paths <= 0 or horizon_steps <= 0:
+            return jsonify({"error": "paths e horizon_steps devem ser maiores que zero"}), 400
+        interval = params.get("interval", stress_config.get("kline_interval", "1m"))
+        
+        tester = get_stress_tester(config)
+        default_leverage = config.get("grid", {}).get("futures", {}).get("leverage", 10)
+        exposures = exposures_from_account(
+            binance_futures_client.get_futures_positions() or [],
+            binance_futures_client.get_open_futures_orders() or [],
+            default_leverage,
+            include=shocks,
+        )
+        equity = account_equity(binance_futures_client.get_futures_account_balance())
+        
+        # Covariância por candle: cada passo do horizonte equivale a um candle do intervalo
+        closes = {}
+        for exposure in exposures:
+            series = get_kline_store().fetch(binance_futures_client, exposure.symbol, interval, 100, "futures")
+            closes[exposure.symbol] = series.closes() if series is not None else None
+        history_symbols, returns = aligned_close_returns(closes)
+        symbols = [exposure.symbol for exposure in exposures]
+        covariance = tester.covariance_for(symbols, history_symbols, returns)
+        
+        report = tester.run(exposures, covariance, equity, shocks, paths, horizon_steps, seed)
+        report["interval"] = interval
+        return jsonify(report)
+    
+    except Exception as e:
+        logger.error(f"Erro no stress test: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
 # --- Endpoints de Controle de Modo --- #
 
 @app.route("/api/operation_mode", methods=["GET"])
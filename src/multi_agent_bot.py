@@ -54,6 +54,10 @@ except ImportError as e:
     RLAgent = None
     log.warning(f"RL Agent not available: {e}")
 from utils.simple_websocket import SimpleBinanceWebSocket, get_global_websocket
+from utils.user_data_stream import UserDataStream
+from utils.market_data_hub import SharedMarketDataBuffer, SharedMarketDataReader, run_market_data_hub
+from utils.rate_limiter import SharedRateLimiter, set_global_rate_limiter
+from utils.async_trading_runtime import AsyncRuntimePool, AsyncSymbolHandle, AsyncTradingRuntime
 # Conditional import of model_api (may contain RL dependencies)
 try:
     from routes import model_api
@@ -140,12 +144,36 @@ class MultiAgentTradingBot:
         
         # Core components
         self.operation_mode = self.config["operation_mode"].lower()
+        # Rate limiter de request weight compartilhado por todos os processos (shared memory)
+        rate_limit_config = self.config.get("api_client", {}).get("rate_limiting", {})
+        self.rate_limiter = None
+        if rate_limit_config.get("enabled", True):
+            self.rate_limiter = SharedRateLimiter(self.config, name=rate_limit_config.get("shm_name"))
+            set_global_rate_limiter(self.rate_limiter)
+        
         self.api_client = APIClient(self.config, operation_mode=self.operation_mode)
         self.alerter = Alerter(self.api_client)
         
         # Real-time WebSocket client for low-latency data
         testnet = self.operation_mode == "shadow"
-        self.ws_client = SimpleBinanceWebSocket(testnet=testnet)
+        self.ws_client = SimpleBinanceWebSocket(testnet=testnet, config=self.config)
+        
+        # Streams de futuros do TP/SL global (preço por tick + ACCOUNT_UPDATE), criados no start()
+        self.tpsl_price_stream = None
+        self.tpsl_account_stream = None
+        # Stream !ticker@arr de futuros da rotação de pares, criado no start()
+        self.rotation_stream = None
+        
+        # Market data hub: um único processo de ingestão publicando em shared memory
+        hub_config = self.config.get("market_data_hub", {})
+        self.market_data_buffer = None
+        self.market_data_hub_process = None
+        if hub_config.get("enabled", False):
+            self.market_data_buffer = SharedMarketDataBuffer(
+                name=hub_config.get("shm_name"),
+                max_symbols=hub_config.get("max_symbols", 64),
+                kline_window=hub_config.get("kline_window", 200),
+            )
         
         # Initialize intelligent cache
         self.cache = get_global_cache()
@@ -165,6 +193,8 @@ class MultiAgentTradingBot:
         
         # Trading components
         self.capital_manager = CapitalManager(self.api_client, self.config)
+        # Alocações da carteira calculadas no processo principal e repassadas a cada worker
+        self.pair_allocations = {}
         self.pair_selector = None
         self.trading_workers = {}
         self.rl_agents = {}
@@ -180,6 +210,9 @@ class MultiAgentTradingBot:
         # Process management
         self.worker_processes = {}
         self.worker_stop_events = {}  # Individual stop events per worker
+        # "process": um processo por par; "async": pares como tasks asyncio em runtimes loop-per-core
+        self.execution_mode = multi_agent_config.get("execution_mode", "process").lower()
+        self.async_runtime_pool = None
         self.stop_event = multiprocessing.Event()  # Global stop event for system shutdown
         self.global_trade_counter = multiprocessing.Value("i", 0)
         
@@ -353,6 +386,8 @@ class MultiAgentTradingBot:
             if global_tpsl:
                 start_global_tpsl()
                 log.info("🎯 Global TP/SL Manager iniciado para todos os pares")
+                if self.config["aggressive_tp_sl"].get("stream_triggers", True):
+                    self._start_tpsl_streams(global_tpsl)
             else:
                 log.error("❌ Falha ao inicializar Global TP/SL Manager")
             
@@ -360,6 +395,23 @@ class MultiAgentTradingBot:
             log.info("Starting real-time WebSocket connection...")
             self.ws_client.start()
             
+            # Tickers de todo o mercado de FUTUROS alimentam a tabela de rotação (zero REST em regime).
+            # O ws_client é spot: a rotação usa uma conexão fstream própria, como o TP/SL global.
+            rotation_config = self.config["pair_selection"].get("rotation_monitor", {})
+            if self.pair_selector is not None and rotation_config.get("use_market_stream", True):
+                self._start_rotation_stream(rotation_config)
+            
+            # Start market data hub process (shared by all trading workers)
+            if self.market_data_buffer is not None:
+                self.market_data_hub_process = multiprocessing.Process(
+                    target=run_market_data_hub,
+                    args=(self.market_data_buffer, self.config, self.operation_mode, self.stop_event),
+                    daemon=True,
+                    name="MarketDataHub"
+                )
+                self.market_data_hub_process.start()
+                log.info(f"🛰️ Market data hub started (PID: {self.market_data_hub_process.pid})")
+            
             # Start coordinator (this starts data and sentiment agents)
             self.coordinator.start_coordination()
             
@@ -621,6 +673,8 @@ class MultiAgentTradingBot:
             
             # Start workers for new pairs (que não foram da substituição)
             pairs_to_start = target_pairs - current_pairs
+            if pairs_to_start:
+                self._refresh_pair_allocations(selected_pairs)
             for pair in pairs_to_start:
                 log.info(f"🚀 Iniciando trading para novo par: {pair}")
                 self._start_trading_worker(pair)
@@ -629,10 +683,9 @@ class MultiAgentTradingBot:
             for pair in selected_pairs:
                 self.risk_agent.add_symbol_monitoring(pair)
             
-            # Subscribe to real-time data for active pairs
-            for pair in selected_pairs:
-                log.info(f"Subscribing to real-time data for {pair}")
-                self.ws_client.subscribe_ticker(pair)
+            # Sync real-time subscriptions on the live connection (SUBSCRIBE/UNSUBSCRIBE, sem reconectar)
+            log.info(f"Syncing real-time data subscriptions for {len(selected_pairs)} pairs")
+            self.ws_client.set_ticker_subscriptions(selected_pairs)
             
             # Remove pairs from risk monitoring
             for pair in pairs_to_stop:
@@ -644,6 +697,19 @@ class MultiAgentTradingBot:
             log.error(f"Error updating trading pairs: {e}", exc_info=True)
             self.alerter.send_critical_alert(f"Error updating trading pairs: {e}")
     
+    def _refresh_pair_allocations(self, symbols: List[str]) -> None:
+        """Aloca o capital da rodada entre todos os pares selecionados (motor de alocação configurado).
+
+        Os workers recebem a própria fatia; sozinhos eles só veriam um símbolo e cairiam na
+        divisão igual.
+        """
+        try:
+            allocations = self.capital_manager.calculate_optimal_allocations(list(symbols))
+            self.pair_allocations = {allocation.symbol: allocation for allocation in allocations}
+        except Exception as e:
+            log.warning(f"Could not compute portfolio allocations, workers will allocate individually: {e}")
+            self.pair_allocations = {}
+    
     def _cancel_orders_for_symbol(self, symbol: str) -> None:
         """Cancel all orders for a specific symbol directly via API (independent of worker state)."""
         log.info(f"[{symbol}] Cancelling all orders directly via API...")
@@ -699,15 +765,25 @@ class MultiAgentTradingBot:
                 log.warning(f"Max concurrent pairs ({max_concurrent}) reached. Cannot start worker for {symbol}")
                 return
             
+            if self.execution_mode == "async":
+                if self.async_runtime_pool is None:
+                    runtime_config = self.config.get("multi_agent_system", {}).get("async_runtime", {})
+                    self.async_runtime_pool = AsyncRuntimePool(
+                        self._spawn_async_runtime, runtime_config.get("processes", 1)
+                    )
+                handle = self.async_runtime_pool.start_symbol(symbol, self.pair_allocations.get(symbol))
+                self.worker_processes[symbol] = handle
+                self.worker_stop_events[symbol] = handle
+                log.info(f"Trading task for {symbol} scheduled on async runtime (PID: {handle.pid})")
+                return
+            
             # Create individual stop event for this worker
             worker_stop_event = multiprocessing.Event()
             self.worker_stop_events[symbol] = worker_stop_event
             
-            # Prepare shared resources for worker
-            shared_resources = {
-                "ai_agent": self.ai_agent if self.ai_agent is not None else None,
-                "smart_decision_engine": self.smart_decision_engine
-            }
+            # Prepare shared resources for worker (inclui a fatia de capital do par)
+            shared_resources = self._worker_shared_resources()
+            shared_resources["capital_allocation"] = self.pair_allocations.get(symbol)
             
             # Create worker process with both individual and global stop events
             process = multiprocessing.Process(
@@ -725,6 +801,54 @@ class MultiAgentTradingBot:
         except Exception as e:
             log.error(f"Error starting trading worker for {symbol}: {e}")
     
+    def _worker_shared_resources(self) -> dict:
+        """Recursos do processo principal repassados a workers/runtimes."""
+        return {
+            "ai_agent": self.ai_agent if self.ai_agent is not None else None,
+            "smart_decision_engine": self.smart_decision_engine,
+            "market_data_buffer": self.market_data_buffer,
+            "rate_limiter": self.rate_limiter,
+            "account_snapshot": self._shared_account_snapshot()
+        }
+    
+    def _shared_account_snapshot(self):
+        """Snapshot da conta da rodada atual, semeado nos workers para evitar REST duplicado."""
+        try:
+            return self.capital_manager.get_account_snapshot()
+        except Exception as e:
+            log.warning(f"Could not build account snapshot for workers: {e}")
+            return None
+    
+    def _spawn_async_runtime(self, index: int, command_queue, status_queue) -> multiprocessing.Process:
+        """Inicia um processo de runtime asyncio (usado pelo AsyncRuntimePool)."""
+        process = multiprocessing.Process(
+            target=self._async_runtime_main,
+            args=(index, self.config, command_queue, status_queue, self.stop_event,
+                  self.global_trade_counter, self._worker_shared_resources()),
+            daemon=True,
+            name=f"AsyncTradingRuntime-{index}"
+        )
+        process.start()
+        return process
+    
+    def _async_runtime_main(self, index: int, config: dict, command_queue, status_queue,
+                            global_stop_event: multiprocessing.Event,
+                            global_trade_counter: multiprocessing.Value,
+                            shared_resources: dict = None) -> None:
+        """Main function for an async trading runtime process (many symbols, one event loop)."""
+        setup_logger(f"async_runtime_{index}")
+        try:
+            AsyncTradingRuntime(self, index, config, command_queue, status_queue,
+                                global_stop_event, global_trade_counter, shared_resources).run()
+        except Exception as e:
+            log.error(f"Critical error in async runtime #{index}: {e}", exc_info=True)
+        finally:
+            try:
+                from utils.pair_logger import cleanup_process_loggers
+                cleanup_process_loggers()
+            except Exception as cleanup_error:
+                log.warning(f"Error cleaning up loggers in async runtime #{index}: {cleanup_error}")
+    
     def _stop_trading_worker(self, symbol: str) -> None:
         """Stop a trading worker process with proper cleanup."""
         log.info(f"🛑 Stopping trading worker for {symbol}")
@@ -749,7 +873,10 @@ class MultiAgentTradingBot:
                     worker_shutdown_timeout = multi_agent_config['worker_shutdown_timeout_seconds']
                     process.join(timeout=worker_shutdown_timeout)
                     
-                    if process.is_alive():
+                    if process.is_alive() and isinstance(process, AsyncSymbolHandle):
+                        # Task em runtime compartilhado: não há processo próprio para sinalizar
+                        log.warning(f"[{symbol}] Trading task still shutting down on async runtime")
+                    elif process.is_alive():
                         log.warning(f"[{symbol}] Worker did not terminate gracefully. Sending SIGTERM.")
                         try:
                             os.kill(process.pid, signal.SIGTERM)
@@ -765,6 +892,8 @@ class MultiAgentTradingBot:
                             log.error(f"[{symbol}] Error killing process: {kill_error}")
                 
                 # STEP 3: Cleanup resources
+                if self.market_data_buffer is not None:
+                    self.market_data_buffer.unregister_symbol(symbol)
                 del self.worker_processes[symbol]
                 if symbol in self.worker_stop_events:
                     del self.worker_stop_events[symbol]
@@ -796,350 +925,46 @@ class MultiAgentTradingBot:
         """Main function for trading worker process."""
         # Setup logging for worker
         worker_logger = setup_logger(f"{symbol}_worker")
+        ctx = None
+        loop = None
         
         try:
             log.info(f"[{symbol}] Trading worker started (PID: {os.getpid()})")
             
             # Initialize components for this worker
             operation_mode = config["operation_mode"].lower()
+            # Mesmo orçamento de request weight do processo principal e dos outros workers
+            if (shared_resources or {}).get("rate_limiter") is not None:
+                set_global_rate_limiter(shared_resources["rate_limiter"])
             api_client = APIClient(config, operation_mode=operation_mode)
             alerter = Alerter(api_client)
             
             # Initialize capital manager and validate symbol before grid initialization
             capital_manager = CapitalManager(api_client, config)
+            capital_manager.snapshot_service.seed((shared_resources or {}).get("account_snapshot"))
             
-            # Check if we have sufficient capital for this symbol, but allow recovery of existing positions
-            min_capital = capital_manager.min_capital_per_pair_usd
-            has_existing_position = False
-            
-            # Quick check for existing positions/orders before capital validation
-            try:
-                # Check for existing grid state file
-                state_file = f"data/grid_states/{symbol}_state.json"
-                if os.path.exists(state_file):
-                    has_existing_position = True
-                    log.info(f"[{symbol}] Found existing grid state - allowing recovery despite low capital")
-                
-                # Also check for existing positions in the exchange
-                if not has_existing_position:
-                    positions = api_client.get_futures_positions()
-                    if positions:
-                        for pos in positions:
-                            if pos.get('symbol') == symbol and float(pos.get('positionAmt', 0)) != 0:
-                                has_existing_position = True
-                                log.info(f"[{symbol}] Found existing position in exchange - allowing recovery")
-                                break
-            except Exception as e:
-                log.warning(f"[{symbol}] Error checking for existing positions: {e}")
-            
-            # Only enforce capital requirements for new positions
-            if not has_existing_position and not capital_manager.can_trade_symbol(symbol, min_capital):
-                log.error(f"[{symbol}] Insufficient capital to trade. Minimum required: ${min_capital:.2f}")
-                capital_manager.log_capital_status()
-                return
-            elif has_existing_position:
-                log.info(f"[{symbol}] Existing position detected - proceeding with recovery mode")
-            
-            # Get capital allocation for this symbol
-            allocation = capital_manager.get_allocation_for_symbol(symbol)
-            if not allocation:
-                if has_existing_position:
-                    # For existing positions, create minimal allocation for recovery
-                    class SimpleAllocation:
-                        def __init__(self, symbol, allocated_amount, grid_levels, spacing_percentage, max_position_size, market_type, leverage=10):
-                            self.symbol = symbol
-                            self.allocated_amount = allocated_amount
-                            self.grid_levels = grid_levels
-                            self.spacing_percentage = spacing_percentage
-                            self.max_position_size = max_position_size
-                            self.market_type = market_type
-                            self.leverage = leverage
-                    
-                    allocation = SimpleAllocation(
-                        symbol=symbol,
-                        allocated_amount=1.0,  # Minimal amount for recovery
-                        grid_levels=5,
-                        spacing_percentage=0.005,
-                        max_position_size=0.5,
-                        market_type="futures",
-                        leverage=10
-                    )
-                    log.info(f"[{symbol}] Created minimal allocation for position recovery")
-                else:
-                    # Calculate allocation for single symbol
-                    allocations = capital_manager.calculate_optimal_allocations([symbol])
-                    if not allocations:
-                        log.error(f"[{symbol}] No capital can be allocated for trading")
-                        return
-                    allocation = allocations[0]
-            
-            log.info(f"[{symbol}] Capital allocated: ${allocation.allocated_amount:.2f} ({allocation.market_type}, {allocation.grid_levels} levels)")
-            
-            # Initialize grid logic with capital-adapted configuration
-            # Update config with capital-specific parameters
-            adapted_config = config.copy()
-            adapted_config['initial_levels'] = allocation.grid_levels
-            adapted_config['initial_spacing_perc'] = str(allocation.spacing_percentage)
-            adapted_config['max_position_size_usd'] = allocation.max_position_size
-            
-            # Validate symbol exists in target market before proceeding
-            if not capital_manager.is_symbol_valid(symbol, allocation.market_type):
-                log.error(f"[{symbol}] Symbol not valid for {allocation.market_type} market. Skipping.")
-                return
-            
-            # Initialize WebSocket client for worker process
-            testnet = operation_mode == "shadow"
-            worker_ws_client = SimpleBinanceWebSocket(testnet=testnet, config=config)
-            worker_ws_client.start()
-            worker_ws_client.subscribe_ticker(symbol)
-            log.info(f"[{symbol}] Started and subscribed to real-time WebSocket data")
-            
-            try:
-                grid_logic = GridLogic(symbol, adapted_config, api_client, 
-                                     operation_mode=operation_mode, 
-                                     market_type=allocation.market_type,
-                                     ws_client=worker_ws_client)
-            except ValueError as e:
-                log.error(f"[{symbol}] Failed to initialize GridLogic: {e}")
-                log.info(f"[{symbol}] Skipping this symbol and shutting down worker")
+            ctx = self._setup_symbol_trader(symbol, config, api_client, capital_manager, alerter, shared_resources)
+            if ctx is None:
                 return
             
-            # Initialize RL agent (if enabled and available)
-            rl_agent = None
-            rl_enabled = config["rl_agent"]["enabled"]
-            if rl_enabled and RL_AVAILABLE and RLAgent is not None:
-                try:
-                    rl_agent = RLAgent(config, symbol)
-                    if not rl_agent.setup_agent(training=False):
-                        log.warning(f"[{symbol}] Failed to setup RL agent, continuing without RL")
-                        rl_agent = None
-                except Exception as e:
-                    log.warning(f"[{symbol}] RL agent initialization failed: {e}, continuing without RL")
-                    rl_agent = None
-            else:
-                if not RL_AVAILABLE:
-                    log.info(f"[{symbol}] RL agent not available (missing dependencies)")
-                elif not rl_enabled:
-                    log.info(f"[{symbol}] RL agent disabled in configuration")
-                else:
-                    log.info(f"[{symbol}] RL agent module not found")
-            
             # Trading loop - AI-driven cycle (wait for previous analysis to complete)
             min_cycle_interval = config["trading"]["cycle_interval_seconds"]  # Minimum wait time
-            local_trade_count = 0
-            
-            # Initialize pair logger
-            pair_logger = get_pair_logger(symbol)
-            pair_logger.log_info(f"Iniciando sistema de trading AI-driven para {symbol}")
-            
-            cycle_count = 0
-            last_heartbeat = time.time()
+            # Um único event loop por worker para as decisões async da IA
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
             
             while not individual_stop_event.is_set() and not global_stop_event.is_set():
                 cycle_start = time.time()
-                cycle_count += 1
-                
-                # Heartbeat a cada 50 ciclos (≈5 minutos se ciclo = 6s)
-                if cycle_count % 50 == 0:
-                    current_time = time.time()
-                    elapsed_minutes = (current_time - last_heartbeat) / 60
-                    ai_queue_status = AIProcessingQueue().get_status()
-                    log.info(f"[{symbol}] ❤️ Heartbeat: Cycle #{cycle_count}, {elapsed_minutes:.1f}min since last heartbeat, "
-                            f"AI Queue: {ai_queue_status['count']}/{ai_queue_status['max_concurrent']} processing {ai_queue_status['processing_pairs']}")
-                    last_heartbeat = current_time
+                self._log_worker_heartbeat(ctx)
                 
                 try:
-                    # Get smart trading decision (AI + Dynamic Sizing)
-                    rl_action = None
-                    ai_decision = None
-                    
-                    # Get current market data
-                    ticker = grid_logic._get_ticker()
-                    current_price = grid_logic._get_current_price_from_ticker(ticker) if ticker else 0
-                    market_data = {
-                        "current_price": float(current_price),
-                        "volume_24h": getattr(grid_logic, 'volume_24h', 0),
-                        "price_change_24h": getattr(grid_logic, 'price_change_24h', 0),
-                        "rsi": getattr(grid_logic, 'current_rsi', 50),
-                        "atr_percentage": getattr(grid_logic, 'current_atr_percentage', 1.0),
-                        "adx": getattr(grid_logic, 'current_adx', 25)
-                    }
-                    
-                    # Get position info
-                    try:
-                        position = api_client.get_futures_position(symbol)
-                        position_size = float(position.get('positionAmt', 0)) if position else 0
-                        entry_price = float(position.get('entryPrice', 0)) if position else 0
-                        unrealized_pnl = float(position.get('unrealizedPnl', 0)) if position else 0
-                        position_side = "LONG" if position_size > 0 else "SHORT" if position_size < 0 else "NONE"
-                        
-                        # NOVO: Verificar se posição deve ser fechada por perda excessiva
-                        if position_size != 0 and entry_price > 0:
-                            loss_percentage = abs(unrealized_pnl / (abs(position_size) * entry_price))
-                            risk_config = config.get('risk_management', {})
-                            auto_close_loss_percentage = risk_config['auto_close_loss_percentage']
-                            if loss_percentage > auto_close_loss_percentage:
-                                log.warning(f"[{symbol}] Excessive loss detected: {loss_percentage*100:.2f}% (${unrealized_pnl:.2f})")
-                                try:
-                                    # Fechar posição por ordem de mercado
-                                    close_side = "SELL" if position_size > 0 else "BUY"
-                                    close_result = api_client.place_futures_order(
-                                        symbol=symbol,
-                                        side=close_side,
-                                        order_type="MARKET",
-                                        quantity=str(abs(position_size)),
-                                        reduceOnly="true"
-                                    )
-                                    if close_result:
-                                        log.info(f"[{symbol}] ✅ Closed losing position: ${unrealized_pnl:.2f}")
-                                        pair_logger.log_error(f"🛑 Posição fechada por perda excessiva: {loss_percentage*100:.2f}%")
-                                except Exception as e:
-                                    log.error(f"[{symbol}] Failed to close losing position: {e}")
-                        
-                    except:
-                        position_size = 0
-                        entry_price = 0
-                        unrealized_pnl = 0
-                        position_side = "NONE"
-                    
-                    # Get grid info
-                    active_orders = len(getattr(grid_logic, 'active_orders', []))
-                    filled_orders = getattr(grid_logic, 'total_trades', 0)
-                    grid_profit = float(getattr(grid_logic, 'total_realized_pnl', 0))
-                    
-                    # Update metrics no pair logger
-                    pair_logger.update_metrics(
-                        current_price=float(current_price),
-                        entry_price=entry_price,
-                        tp_price=0,  # Será atualizado se houver TP/SL
-                        sl_price=0,
-                        unrealized_pnl=unrealized_pnl,
-                        realized_pnl=grid_profit,
-                        position_size=position_size,
-                        leverage=allocation.leverage if allocation else 10,
-                        rsi=market_data["rsi"],
-                        atr=market_data["atr_percentage"] * current_price / 100,
-                        adx=market_data["adx"],
-                        volume_24h=market_data["volume_24h"],
-                        price_change_24h=market_data["price_change_24h"],
-                        grid_levels=grid_logic.num_levels,
-                        active_orders=active_orders,
-                        filled_orders=filled_orders,
-                        grid_profit=grid_profit,
-                        position_side=position_side,
-                        market_type=allocation.market_type if allocation else "FUTURES"
+                    cycle = self._prepare_trading_cycle(ctx)
+                    rl_action, ai_decision = loop.run_until_complete(
+                        self._decide_trading_action(ctx, cycle, shared_resources)
                     )
-                    
-                    current_grid_params = {
-                        "num_levels": grid_logic.num_levels,
-                        "spacing_perc": float(grid_logic.current_spacing_percentage),
-                        "recent_pnl": float(grid_logic.total_realized_pnl)
-                    }
-                    
-                    # Get available balance
-                    balances = capital_manager.get_available_balances()
-                    available_balance = balances["futures_usdt"] + balances["spot_usdt"]
-                    
-                    # Try Smart Decision Engine first (AI + Dynamic Sizer) - Global Queue approach
-                    if shared_resources and shared_resources.get("smart_decision_engine"):
-                        # Get global AI processing queue
-                        ai_queue = AIProcessingQueue()
-                        
-                        # Check if this pair can process AI analysis
-                        if ai_queue.start_processing(symbol):
-                            try:
-                                # Get async smart decision
-                                loop = asyncio.new_event_loop()
-                                asyncio.set_event_loop(loop)
-                                ai_decision = loop.run_until_complete(
-                                    shared_resources["smart_decision_engine"].get_smart_trading_action(
-                                        symbol, market_data, current_grid_params, available_balance
-                                    )
-                                )
-                                loop.close()
-                                
-                                if ai_decision and ai_decision.get("action") is not None:
-                                    rl_action = ai_decision["action"]
-                                    log.info(f"[{symbol}] AI Decision: action={rl_action}, confidence={ai_decision.get('confidence', 0):.2f}, "
-                                            f"reasoning={ai_decision.get('reasoning', 'N/A')}")
-                                
-                            except Exception as e:
-                                log.error(f"[{symbol}] Error getting AI decision: {e}")
-                                rl_action = None
-                            finally:
-                                # Always release the AI processing slot
-                                ai_queue.finish_processing(symbol)
-                        else:
-                            # AI queue is full, skip AI analysis this cycle
-                            queue_status = ai_queue.get_status()
-                            log.debug(f"[{symbol}] AI queue full ({queue_status['count']}/{queue_status['max_concurrent']}), "
-                                     f"processing: {queue_status['processing_pairs']}")
-                            rl_action = None
-                    
-                    # Fallback to traditional RL if AI decision failed and RL is available
-                    if rl_action is None and rl_agent is not None:
-                        market_state = grid_logic.get_market_state()
-                        if market_state is not None:
-                            try:
-                                # Get sentiment if available
-                                sentiment_config = config.get("sentiment_analysis", {})
-                                if sentiment_config["rl_feature"]["enabled"]:
-                                    sentiment_score = 0.0
-                                    rl_action = rl_agent.predict_action(market_state, sentiment_score=sentiment_score)
-                                else:
-                                    rl_action = rl_agent.predict_action(market_state)
-                                
-                                log.debug(f"[{symbol}] Fallback RL action: {rl_action}")
-                            
-                            except Exception as e:
-                                log.error(f"[{symbol}] Error getting RL action: {e}")
-                                rl_action = 0  # Safe fallback
-                    
-                    # Execute trading logic with AI/RL decision
-                    previous_orders = len(getattr(grid_logic, 'active_orders', []))
-                    grid_logic.run_cycle(rl_action=rl_action, ai_decision=ai_decision)
-                    current_orders = len(getattr(grid_logic, 'active_orders', []))
-                    
-                    # Track activity to decide if we should log trading cycle
-                    has_activity = False
-                    
-                    # Check for new orders
-                    if current_orders > previous_orders:
-                        pair_logger.log_info(f"Novas ordens criadas: {current_orders - previous_orders}")
-                        has_activity = True
-                    
-                    # Update trade counter
-                    new_trade_count = grid_logic.total_trades
-                    if new_trade_count > local_trade_count:
-                        trades_made = new_trade_count - local_trade_count
-                        with global_trade_counter.get_lock():
-                            global_trade_counter.value += trades_made
-                        local_trade_count = new_trade_count
-                        
-                        # Log trade completion
-                        pair_logger.log_info(f"✅ {trades_made} trade(s) executado(s)! Total: {new_trade_count}")
-                        has_activity = True
-                    
-                    # Check for position changes
-                    try:
-                        new_position = api_client.get_futures_position(symbol)
-                        new_position_size = float(new_position.get('positionAmt', 0)) if new_position else 0
-                        new_unrealized_pnl = float(new_position.get('unrealizedPnl', 0)) if new_position else 0
-                        
-                        if abs(new_position_size - position_size) > 0.0001:  # Position changed
-                            new_side = "LONG" if new_position_size > 0 else "SHORT" if new_position_size < 0 else "NONE"
-                            new_entry = float(new_position.get('entryPrice', 0)) if new_position else 0
-                            pair_logger.log_position_update(new_side, new_entry, new_position_size, new_unrealized_pnl)
-                            has_activity = True
-                    except Exception as pos_error:
-                        pass  # Ignore position check errors
-                    
-                    # Only log full trading cycle when there's relevant activity
-                    if has_activity:
-                        pair_logger.log_trading_cycle(force_terminal=True)
-                
+                    self._finish_trading_cycle(ctx, cycle, rl_action, ai_decision, global_trade_counter)
                 except Exception as e:
-                    pair_logger.log_error(f"Erro no ciclo de trading: {e}")
+                    ctx["pair_logger"].log_error(f"Erro no ciclo de trading: {e}")
                     log.error(f"[{symbol}] Error in trading cycle: {e}", exc_info=True)
                     alerter.send_critical_alert(f"Error in {symbol} trading cycle: {e}")
                 
@@ -1161,16 +986,8 @@ class MultiAgentTradingBot:
         finally:
             log.info(f"[{symbol}] Trading worker shutting down - starting cleanup")
             try:
-                # Enhanced cleanup process
-                if "grid_logic" in locals():
-                    # Stop TP/SL manager first
-                    if hasattr(grid_logic, 'tpsl_manager'):
-                        log.info(f"[{symbol}] Stopping TP/SL manager...")
-                        grid_logic.tpsl_manager.stop_monitoring()
-                    
-                    # Cancel orders in all modes (production, shadow, etc.)
-                    log.info(f"[{symbol}] Cancelling all orders during worker cleanup...")
-                    grid_logic.cancel_all_orders()
+                if ctx is not None:
+                    self._cleanup_symbol_trader(ctx)
                 
                 # Clean up loggers to prevent memory leaks
                 try:
@@ -1180,18 +997,478 @@ class MultiAgentTradingBot:
                 except Exception as cleanup_error:
                     log.warning(f"[{symbol}] Error cleaning up loggers: {cleanup_error}")
                 
-                # Clean up WebSocket connections
-                if "worker_ws_client" in locals():
-                    try:
-                        worker_ws_client.unsubscribe_ticker(symbol)
-                        log.info(f"[{symbol}] Unsubscribed from WebSocket")
-                    except Exception as ws_error:
-                        log.warning(f"[{symbol}] Error unsubscribing from WebSocket: {ws_error}")
-                
                 log.info(f"[{symbol}] Worker cleanup completed")
                 
             except Exception as e:
                 log.error(f"[{symbol}] Error during cleanup: {e}")
+            if loop is not None:
+                loop.close()
+    
+    def _setup_symbol_trader(self, symbol: str, config: dict, api_client: APIClient,
+                             capital_manager: CapitalManager, alerter: Alerter,
+                             shared_resources: dict = None) -> Optional[dict]:
+        """Valida capital, aloca e cria GridLogic/RL de um símbolo. Retorna o contexto do trader (ou None).
+
+        Usado pelos dois modos de execução: processo por par e runtime asyncio.
+        """
+        operation_mode = config["operation_mode"].lower()
+        # Check if we have sufficient capital for this symbol, but allow recovery of existing positions
+        min_capital = capital_manager.min_capital_per_pair_usd
+        has_existing_position = False
+
+        # Quick check for existing positions/orders before capital validation
+        try:
+            # Check for existing grid state file
+            state_file = f"data/grid_states/{symbol}_state.json"
+            if os.path.exists(state_file):
+                has_existing_position = True
+                log.info(f"[{symbol}] Found existing grid state - allowing recovery despite low capital")
+
+            # Also check for existing positions in the exchange
+            if not has_existing_position:
+                positions = api_client.get_futures_positions()
+                if positions:
+                    for pos in positions:
+                        if pos.get('symbol') == symbol and float(pos.get('positionAmt', 0)) != 0:
+                            has_existing_position = True
+                            log.info(f"[{symbol}] Found existing position in exchange - allowing recovery")
+                            break
+        except Exception as e:
+            log.warning(f"[{symbol}] Error checking for existing positions: {e}")
+
+        # Only enforce capital requirements for new positions
+        if not has_existing_position and not capital_manager.can_trade_symbol(symbol, min_capital):
+            log.error(f"[{symbol}] Insufficient capital to trade. Minimum required: ${min_capital:.2f}")
+            capital_manager.log_capital_status()
+            return
+        elif has_existing_position:
+            log.info(f"[{symbol}] Existing position detected - proceeding with recovery mode")
+
+        # Get capital allocation for this symbol (fatia calculada pelo processo principal, se houver)
+        shared_allocation = (shared_resources or {}).get("capital_allocation")
+        if shared_allocation is not None and shared_allocation.symbol == symbol:
+            capital_manager.seed_allocations([shared_allocation])
+        allocation = capital_manager.get_allocation_for_symbol(symbol)
+        if not allocation:
+            if has_existing_position:
+                # For existing positions, create minimal allocation for recovery
+                class SimpleAllocation:
+                    def __init__(self, symbol, allocated_amount, grid_levels, spacing_percentage, max_position_size, market_type, leverage=10):
+                        self.symbol = symbol
+                        self.allocated_amount = allocated_amount
+                        self.grid_levels = grid_levels
+                        self.spacing_percentage = spacing_percentage
+                        self.max_position_size = max_position_size
+                        self.market_type = market_type
+                        self.leverage = leverage
+
+                allocation = SimpleAllocation(
+                    symbol=symbol,
+                    allocated_amount=1.0,  # Minimal amount for recovery
+                    grid_levels=5,
+                    spacing_percentage=0.005,
+                    max_position_size=0.5,
+                    market_type="futures",
+                    leverage=10
+                )
+                log.info(f"[{symbol}] Created minimal allocation for position recovery")
+            else:
+                # Calculate allocation for single symbol
+                allocations = capital_manager.calculate_optimal_allocations([symbol])
+                if not allocations:
+                    log.error(f"[{symbol}] No capital can be allocated for trading")
+                    return
+                allocation = allocations[0]
+
+        log.info(f"[{symbol}] Capital allocated: ${allocation.allocated_amount:.2f} ({allocation.market_type}, {allocation.grid_levels} levels)")
+
+        # Initialize grid logic with capital-adapted configuration
+        # Update config with capital-specific parameters
+        adapted_config = config.copy()
+        adapted_config['initial_levels'] = allocation.grid_levels
+        adapted_config['initial_spacing_perc'] = str(allocation.spacing_percentage)
+        adapted_config['max_position_size_usd'] = allocation.max_position_size
+
+        # Validate symbol exists in target market before proceeding
+        if not capital_manager.is_symbol_valid(symbol, allocation.market_type):
+            log.error(f"[{symbol}] Symbol not valid for {allocation.market_type} market. Skipping.")
+            return
+
+        # Market data: ler do hub (shared memory) ou abrir WebSocket próprio.
+        # No runtime async, market_streams traz o WebSocket combinado e os user data streams
+        # (um por mercado) do runtime: cada símbolo só se registra neles.
+        testnet = operation_mode == "shadow"
+        market_streams = (shared_resources or {}).get("market_streams")
+        market_data_reader = None
+        market_data_buffer = (shared_resources or {}).get("market_data_buffer")
+        if market_data_buffer is not None and market_data_buffer.register_symbol(symbol, allocation.market_type) is not None:
+            market_data_reader = SharedMarketDataReader(market_data_buffer, config)
+            worker_ws_client = None
+            log.info(f"[{symbol}] Using shared market data hub ({market_data_buffer.name})")
+        elif market_streams is not None:
+            if market_streams.get("ws_client") is None:
+                market_streams["ws_client"] = SimpleBinanceWebSocket(testnet=testnet, config=config)
+                market_streams["ws_client"].start()
+            worker_ws_client = market_streams["ws_client"]
+            worker_ws_client.subscribe_ticker(symbol)
+            log.info(f"[{symbol}] Subscribed to the runtime's combined WebSocket stream")
+        else:
+            # Initialize WebSocket client for worker process
+            worker_ws_client = SimpleBinanceWebSocket(testnet=testnet, config=config)
+            worker_ws_client.start()
+            worker_ws_client.subscribe_ticker(symbol)
+            log.info(f"[{symbol}] Started and subscribed to real-time WebSocket data")
+
+        # Initialize user data stream (fills em tempo real via listenKey)
+        worker_user_stream = None
+        if config.get("user_data_stream", {}).get("enabled", True):
+            user_streams = market_streams.setdefault("user_streams", {}) if market_streams is not None else None
+            if user_streams is not None and allocation.market_type in user_streams:
+                # GridLogic registra o símbolo e recebe seus eventos pela fila própria
+                worker_user_stream = user_streams[allocation.market_type]
+                log.info(f"[{symbol}] Using the runtime's {allocation.market_type} user data stream")
+            else:
+                worker_user_stream = UserDataStream(api_client, config, 
+                                                    market_type=allocation.market_type, 
+                                                    testnet=testnet)
+                if worker_user_stream.start():
+                    if user_streams is not None:
+                        user_streams[allocation.market_type] = worker_user_stream
+                    log.info(f"[{symbol}] User data stream started - REST polling only for reconciliation")
+                else:
+                    log.warning(f"[{symbol}] User data stream unavailable - falling back to REST polling")
+                    worker_user_stream = None
+
+        try:
+            grid_logic = GridLogic(symbol, adapted_config, api_client, 
+                                 operation_mode=operation_mode, 
+                                 market_type=allocation.market_type,
+                                 ws_client=worker_ws_client,
+                                 user_stream=worker_user_stream,
+                                 market_data=market_data_reader)
+        except ValueError as e:
+            log.error(f"[{symbol}] Failed to initialize GridLogic: {e}")
+            log.info(f"[{symbol}] Skipping this symbol and shutting down worker")
+            self._cleanup_symbol_trader({
+                "symbol": symbol, "worker_ws_client": worker_ws_client, "worker_user_stream": worker_user_stream,
+                "shared_streams": market_streams is not None,
+            })
+            return None
+
+        # Initialize RL agent (if enabled and available)
+        rl_agent = None
+        rl_enabled = config["rl_agent"]["enabled"]
+        if rl_enabled and RL_AVAILABLE and RLAgent is not None:
+            try:
+                rl_agent = RLAgent(config, symbol)
+                if not rl_agent.setup_agent(training=False):
+                    log.warning(f"[{symbol}] Failed to setup RL agent, continuing without RL")
+                    rl_agent = None
+            except Exception as e:
+                log.warning(f"[{symbol}] RL agent initialization failed: {e}, continuing without RL")
+                rl_agent = None
+        else:
+            if not RL_AVAILABLE:
+                log.info(f"[{symbol}] RL agent not available (missing dependencies)")
+            elif not rl_enabled:
+                log.info(f"[{symbol}] RL agent disabled in configuration")
+            else:
+                log.info(f"[{symbol}] RL agent module not found")
+        
+        # Initialize pair logger
+        pair_logger = get_pair_logger(symbol)
+        pair_logger.log_info(f"Iniciando sistema de trading AI-driven para {symbol}")
+        
+        return {
+            "symbol": symbol,
+            "config": config,
+            "api_client": api_client,
+            "capital_manager": capital_manager,
+            "alerter": alerter,
+            "allocation": allocation,
+            "grid_logic": grid_logic,
+            "rl_agent": rl_agent,
+            "pair_logger": pair_logger,
+            "worker_ws_client": worker_ws_client,
+            "worker_user_stream": worker_user_stream,
+            "shared_streams": market_streams is not None,
+            "local_trade_count": 0,
+            "cycle_count": 0,
+            "last_heartbeat": time.time(),
+        }
+    
+    def _log_worker_heartbeat(self, ctx: dict) -> None:
+        """Heartbeat a cada 50 ciclos (≈5 minutos se ciclo = 6s)."""
+        ctx["cycle_count"] += 1
+        if ctx["cycle_count"] % 50 == 0:
+            current_time = time.time()
+            elapsed_minutes = (current_time - ctx["last_heartbeat"]) / 60
+            ai_queue_status = AIProcessingQueue().get_status()
+            log.info(f"[{ctx['symbol']}] ❤️ Heartbeat: Cycle #{ctx['cycle_count']}, {elapsed_minutes:.1f}min since last heartbeat, "
+                    f"AI Queue: {ai_queue_status['count']}/{ai_queue_status['max_concurrent']} processing {ai_queue_status['processing_pairs']}")
+            ctx["last_heartbeat"] = current_time
+    
+    def _prepare_trading_cycle(self, ctx: dict) -> dict:
+        """Parte síncrona do início do ciclo: preço, posição, métricas e parâmetros do grid."""
+        symbol = ctx["symbol"]
+        config = ctx["config"]
+        grid_logic = ctx["grid_logic"]
+        pair_logger = ctx["pair_logger"]
+        api_client = ctx["api_client"]
+        capital_manager = ctx["capital_manager"]
+        allocation = ctx["allocation"]
+        
+        # Get smart trading decision (AI + Dynamic Sizing)
+
+        # Get current market data
+        ticker = grid_logic._get_ticker()
+        current_price = grid_logic._get_current_price_from_ticker(ticker) if ticker else 0
+        market_data = {
+            "current_price": float(current_price),
+            "volume_24h": getattr(grid_logic, 'volume_24h', 0),
+            "price_change_24h": getattr(grid_logic, 'price_change_24h', 0),
+            "rsi": getattr(grid_logic, 'current_rsi', 50),
+            "atr_percentage": getattr(grid_logic, 'current_atr_percentage', 1.0),
+            "adx": getattr(grid_logic, 'current_adx', 25)
+        }
+
+        # Get position info
+        try:
+            position = api_client.get_futures_position(symbol)
+            position_size = float(position.get('positionAmt', 0)) if position else 0
+            entry_price = float(position.get('entryPrice', 0)) if position else 0
+            unrealized_pnl = float(position.get('unrealizedPnl', 0)) if position else 0
+            position_side = "LONG" if position_size > 0 else "SHORT" if position_size < 0 else "NONE"
+
+            # NOVO: Verificar se posição deve ser fechada por perda excessiva
+            if position_size != 0 and entry_price > 0:
+                loss_percentage = abs(unrealized_pnl / (abs(position_size) * entry_price))
+                risk_config = config.get('risk_management', {})
+                auto_close_loss_percentage = risk_config['auto_close_loss_percentage']
+                if loss_percentage > auto_close_loss_percentage:
+                    log.warning(f"[{symbol}] Excessive loss detected: {loss_percentage*100:.2f}% (${unrealized_pnl:.2f})")
+                    try:
+                        # Fechar posição por ordem de mercado
+                        close_side = "SELL" if position_size > 0 else "BUY"
+                        close_result = api_client.place_futures_order(
+                            symbol=symbol,
+                            side=close_side,
+                            order_type="MARKET",
+                            quantity=str(abs(position_size)),
+                            reduceOnly="true"
+                        )
+                        if close_result:
+                            log.info(f"[{symbol}] ✅ Closed losing position: ${unrealized_pnl:.2f}")
+                            pair_logger.log_error(f"🛑 Posição fechada por perda excessiva: {loss_percentage*100:.2f}%")
+                    except Exception as e:
+                        log.error(f"[{symbol}] Failed to close losing position: {e}")
+
+        except:
+            position_size = 0
+            entry_price = 0
+            unrealized_pnl = 0
+            position_side = "NONE"
+
+        # Get grid info
+        active_orders = len(getattr(grid_logic, 'active_orders', []))
+        filled_orders = getattr(grid_logic, 'total_trades', 0)
+        grid_profit = float(getattr(grid_logic, 'total_realized_pnl', 0))
+
+        # Update metrics no pair logger
+        pair_logger.update_metrics(
+            current_price=float(current_price),
+            entry_price=entry_price,
+            tp_price=0,  # Será atualizado se houver TP/SL
+            sl_price=0,
+            unrealized_pnl=unrealized_pnl,
+            realized_pnl=grid_profit,
+            position_size=position_size,
+            leverage=allocation.leverage if allocation else 10,
+            rsi=market_data["rsi"],
+            atr=market_data["atr_percentage"] * current_price / 100,
+            adx=market_data["adx"],
+            volume_24h=market_data["volume_24h"],
+            price_change_24h=market_data["price_change_24h"],
+            grid_levels=grid_logic.num_levels,
+            active_orders=active_orders,
+            filled_orders=filled_orders,
+            grid_profit=grid_profit,
+            position_side=position_side,
+            market_type=allocation.market_type if allocation else "FUTURES"
+        )
+
+        current_grid_params = {
+            "num_levels": grid_logic.num_levels,
+            "spacing_perc": float(grid_logic.current_spacing_percentage),
+            "recent_pnl": float(grid_logic.total_realized_pnl)
+        }
+
+        # Get available balance
+        balances = capital_manager.get_available_balances()
+        available_balance = balances["futures_usdt"] + balances["spot_usdt"]
+
+        
+        return {
+            "market_data": market_data,
+            "current_grid_params": current_grid_params,
+            "available_balance": available_balance,
+            "position_size": position_size,
+        }
+    
+    async def _decide_trading_action(self, ctx: dict, cycle: dict, shared_resources: dict = None) -> tuple:
+        """Decisão do ciclo (Smart Decision Engine com fallback para RL). Retorna (rl_action, ai_decision)."""
+        symbol = ctx["symbol"]
+        config = ctx["config"]
+        grid_logic = ctx["grid_logic"]
+        rl_agent = ctx["rl_agent"]
+        market_data = cycle["market_data"]
+        current_grid_params = cycle["current_grid_params"]
+        available_balance = cycle["available_balance"]
+        loop = asyncio.get_running_loop()
+        rl_action = None
+        ai_decision = None
+        
+        # Try Smart Decision Engine first (AI + Dynamic Sizer) - Global Queue approach
+        if shared_resources and shared_resources.get("smart_decision_engine"):
+            # Get global AI processing queue
+            ai_queue = AIProcessingQueue()
+
+            # Check if this pair can process AI analysis
+            if ai_queue.start_processing(symbol):
+                try:
+                    # Get async smart decision (no event loop do worker/runtime)
+                    ai_decision = await shared_resources["smart_decision_engine"].get_smart_trading_action(
+                        symbol, market_data, current_grid_params, available_balance
+                    )
+
+                    if ai_decision and ai_decision.get("action") is not None:
+                        rl_action = ai_decision["action"]
+                        log.info(f"[{symbol}] AI Decision: action={rl_action}, confidence={ai_decision.get('confidence', 0):.2f}, "
+                                f"reasoning={ai_decision.get('reasoning', 'N/A')}")
+
+                except Exception as e:
+                    log.error(f"[{symbol}] Error getting AI decision: {e}")
+                    rl_action = None
+                finally:
+                    # Always release the AI processing slot
+                    ai_queue.finish_processing(symbol)
+            else:
+                # AI queue is full, skip AI analysis this cycle
+                queue_status = ai_queue.get_status()
+                log.debug(f"[{symbol}] AI queue full ({queue_status['count']}/{queue_status['max_concurrent']}), "
+                         f"processing: {queue_status['processing_pairs']}")
+                rl_action = None
+        
+        # Fallback to traditional RL if AI decision failed and RL is available
+        if rl_action is None and rl_agent is not None:
+            market_state = await loop.run_in_executor(None, grid_logic.get_market_state)
+            if market_state is not None:
+                try:
+                    # Get sentiment if available
+                    sentiment_config = config.get("sentiment_analysis", {})
+                    if sentiment_config["rl_feature"]["enabled"]:
+                        sentiment_score = 0.0
+                        rl_action = await loop.run_in_executor(
+                            None, lambda: rl_agent.predict_action(market_state, sentiment_score=sentiment_score)
+                        )
+                    else:
+                        rl_action = await loop.run_in_executor(None, rl_agent.predict_action, market_state)
+
+                    log.debug(f"[{symbol}] Fallback RL action: {rl_action}")
+
+                except Exception as e:
+                    log.error(f"[{symbol}] Error getting RL action: {e}")
+                    rl_action = 0  # Safe fallback
+        
+        return rl_action, ai_decision
+    
+    def _finish_trading_cycle(self, ctx: dict, cycle: dict, rl_action, ai_decision,
+                              global_trade_counter: multiprocessing.Value) -> None:
+        """Executa o ciclo do grid com a decisão e registra trades/posição."""
+        symbol = ctx["symbol"]
+        grid_logic = ctx["grid_logic"]
+        pair_logger = ctx["pair_logger"]
+        api_client = ctx["api_client"]
+        position_size = cycle["position_size"]
+        
+        # Execute trading logic with AI/RL decision
+        previous_orders = len(getattr(grid_logic, 'active_orders', []))
+        grid_logic.run_cycle(rl_action=rl_action, ai_decision=ai_decision)
+        current_orders = len(getattr(grid_logic, 'active_orders', []))
+
+        # Track activity to decide if we should log trading cycle
+        has_activity = False
+
+        # Check for new orders
+        if current_orders > previous_orders:
+            pair_logger.log_info(f"Novas ordens criadas: {current_orders - previous_orders}")
+            has_activity = True
+
+        # Update trade counter
+        new_trade_count = grid_logic.total_trades
+        if new_trade_count > ctx["local_trade_count"]:
+            trades_made = new_trade_count - ctx["local_trade_count"]
+            with global_trade_counter.get_lock():
+                global_trade_counter.value += trades_made
+            ctx["local_trade_count"] = new_trade_count
+
+            # Log trade completion
+            pair_logger.log_info(f"✅ {trades_made} trade(s) executado(s)! Total: {new_trade_count}")
+            has_activity = True
+
+        # Check for position changes
+        try:
+            new_position = api_client.get_futures_position(symbol)
+            new_position_size = float(new_position.get('positionAmt', 0)) if new_position else 0
+            new_unrealized_pnl = float(new_position.get('unrealizedPnl', 0)) if new_position else 0
+
+            if abs(new_position_size - position_size) > 0.0001:  # Position changed
+                new_side = "LONG" if new_position_size > 0 else "SHORT" if new_position_size < 0 else "NONE"
+                new_entry = float(new_position.get('entryPrice', 0)) if new_position else 0
+                pair_logger.log_position_update(new_side, new_entry, new_position_size, new_unrealized_pnl)
+                has_activity = True
+        except Exception as pos_error:
+            pass  # Ignore position check errors
+
+        # Only log full trading cycle when there's relevant activity
+        if has_activity:
+            pair_logger.log_trading_cycle(force_terminal=True)
+    
+    def _cleanup_symbol_trader(self, ctx: dict) -> None:
+        """Para TP/SL, cancela ordens e fecha os streams de um símbolo."""
+        symbol = ctx["symbol"]
+        grid_logic = ctx.get("grid_logic")
+        if grid_logic is not None:
+            # Stop TP/SL manager first
+            if hasattr(grid_logic, 'tpsl_manager'):
+                log.info(f"[{symbol}] Stopping TP/SL manager...")
+                grid_logic.tpsl_manager.stop_monitoring()
+            
+            # Cancel orders in all modes (production, shadow, etc.)
+            log.info(f"[{symbol}] Cancelling all orders during worker cleanup...")
+            grid_logic.cancel_all_orders()
+        
+        # Clean up WebSocket connections
+        worker_ws_client = ctx.get("worker_ws_client")
+        if worker_ws_client:
+            try:
+                worker_ws_client.unsubscribe_ticker(symbol)
+                log.info(f"[{symbol}] Unsubscribed from WebSocket")
+            except Exception as ws_error:
+                log.warning(f"[{symbol}] Error unsubscribing from WebSocket: {ws_error}")
+        
+        worker_user_stream = ctx.get("worker_user_stream")
+        if worker_user_stream and ctx.get("shared_streams"):
+            # Stream do runtime async: segue atendendo os outros símbolos, encerrado pelo runtime
+            worker_user_stream.unregister_symbol(symbol)
+            log.info(f"[{symbol}] Unregistered from user data stream")
+        elif worker_user_stream:
+            try:
+                # listenKey é compartilhado entre workers da mesma conta - não invalidar
+                worker_user_stream.stop(close_listen_key=False)
+                log.info(f"[{symbol}] Stopped user data stream")
+            except Exception as uds_error:
+                log.warning(f"[{symbol}] Error stopping user data stream: {uds_error}")
     
     def _monitor_workers(self) -> None:
         """Monitor worker processes and restart if needed."""
@@ -1269,6 +1546,50 @@ class MultiAgentTradingBot:
         except Exception as e:
             log.error(f"Error checking system health: {e}")
     
+    def _create_futures_stream(self, section_config: dict) -> SimpleBinanceWebSocket:
+        """SimpleBinanceWebSocket no endpoint combinado de futuros (fstream).
+
+        A URL pode ser sobrescrita na seção do consumidor (price_stream_url / price_stream_testnet_url).
+        """
+        testnet = self.operation_mode == "shadow"
+        url_key = "testnet" if testnet else "production"
+        stream_url = section_config.get(
+            "price_stream_testnet_url" if testnet else "price_stream_url",
+            "wss://stream.binancefuture.com/stream" if testnet else "wss://fstream.binance.com/stream",
+        )
+        ws_config = dict(self.config.get("websocket_config", {}))
+        ws_config[f"{url_key}_url"] = stream_url.rsplit("/stream", 1)[0] + "/ws/"
+        ws_config[f"{url_key}_stream_url"] = stream_url
+        return SimpleBinanceWebSocket(testnet=testnet, config={**self.config, "websocket_config": ws_config})
+    
+    def _start_rotation_stream(self, rotation_config: dict) -> None:
+        """Assina !ticker@arr de futuros para o RotationMonitor (sem misturar preços/volumes spot)."""
+        try:
+            self.rotation_stream = self._create_futures_stream(rotation_config)
+            self.rotation_stream.start()
+            self.rotation_stream.subscribe_stream("!ticker@arr", self.pair_selector.rotation_monitor.on_ticker_batch)
+        except Exception as e:
+            log.error(f"Erro ao iniciar stream de tickers da rotação (fallback REST bulk): {e}")
+    
+    def _start_tpsl_streams(self, global_tpsl) -> None:
+        """Liga o TP/SL global aos streams de futuros: gatilhos por tick e posições por ACCOUNT_UPDATE."""
+        tpsl_config = self.config["aggressive_tp_sl"]
+        testnet = self.operation_mode == "shadow"
+        
+        try:
+            self.tpsl_price_stream = self._create_futures_stream(tpsl_config)
+            self.tpsl_price_stream.start()
+            
+            account_stream = UserDataStream(self.api_client, self.config, market_type="futures", testnet=testnet)
+            if account_stream.start():
+                self.tpsl_account_stream = account_stream
+            else:
+                log.warning("TP/SL: user data stream indisponível - status de posições via REST")
+            
+            global_tpsl.attach_streams(self.tpsl_price_stream, self.tpsl_account_stream)
+        except Exception as e:
+            log.error(f"Erro ao iniciar streams do TP/SL global: {e}")
+    
     def _signal_handler(self, signum, frame):
         """Handle shutdown signals."""
         # Prevent multiple signal handling
@@ -1345,6 +1666,33 @@ class MultiAgentTradingBot:
                         process.join(timeout=2)
                     except Exception as e:
                         log.error(f"Error force killing worker: {e}")
+            if self.async_runtime_pool is not None:
+                self.async_runtime_pool.shutdown(timeout=worker_stop_timeout * 2)
+                log.info("Async trading runtimes stopped")
+            
+            # Streams do TP/SL global (listenKey de futuros é por conta: não invalidar)
+            if self.tpsl_account_stream is not None:
+                self.tpsl_account_stream.stop(close_listen_key=False)
+            if self.tpsl_price_stream is not None:
+                self.tpsl_price_stream.stop()
+            if self.rotation_stream is not None:
+                self.rotation_stream.stop()
+            
+            # Stop market data hub and release shared memory
+            if self.market_data_hub_process is not None:
+                try:
+                    self.market_data_hub_process.join(timeout=5)
+                    if self.market_data_hub_process.is_alive():
+                        self.market_data_hub_process.kill()
+                    log.info("Market data hub stopped")
+                except Exception as e:
+                    log.error(f"Error stopping market data hub: {e}")
+            if self.market_data_buffer is not None:
+                self.market_data_buffer.close()
+            if self.rate_limiter is not None:
+                log.info(f"Rate limiter stats: {self.rate_limiter.get_statistics()}")
+                set_global_rate_limiter(None)
+                self.rate_limiter.close()
             
             # Cleanup AI agent asyncio components first
             if self.ai_agent is not None:
@@ -1,12 +1,13 @@
 import os
 import random
-from collections import deque
 
 import numpy as np
 from tensorflow.keras.layers import LSTM, Dense, Dropout
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.optimizers import Adam
 
+from .replay_buffer import ReplayBuffer
+
 
 class RLTradingAgent:
     """
@@ -14,7 +15,9 @@ class RLTradingAgent:
     Agora suporta decisão entre Spot e Futuros.
     """
 
-    def __init__(self, state_size, action_size, model_path=None, market_types=["futures", "spot"]):
+    def __init__(self, state_size, action_size, model_path=None, market_types=["futures", "spot"],
+                 target_update_steps=0, memory_size=2000, prioritized_replay=False, memory_dir=None,
+                 learning_rate=0.001, grid_actions=10):
         self.state_size = state_size  # Tamanho do estado (features do mercado)
         self.action_size = action_size  # Tamanho total do espaço de ações
         self.market_types = market_types  # Tipos de mercado disponíveis
@@ -23,15 +26,16 @@ class RLTradingAgent:
         # Primeiro: escolha do mercado (0=futures, 1=spot)
         # Segundo: ação do grid (0-9 como definido anteriormente)
         self.market_choice_actions = len(market_types)  # 2 opções: futures ou spot
-        self.grid_actions = 10  # Ações de grid (0-9)
+        self.grid_actions = grid_actions  # Ações de grid (0-9; 3 = manter/comprar/vender do TradingEnvironment)
         
-        # Memória de replay para experiências passadas
-        self.memory = deque(maxlen=2000)
+        # Memória de replay para experiências passadas (arrays NumPy; memmap se memory_dir)
+        self.memory = ReplayBuffer(memory_size, state_size, prioritized=prioritized_replay,
+                                   memmap_dir=memory_dir)
         self.gamma = 0.95  # Fator de desconto para recompensas futuras
         self.epsilon = 1.0  # Taxa de exploração inicial
         self.epsilon_min = 0.01  # Taxa mínima de exploração
         self.epsilon_decay = 0.995  # Taxa de decaimento da exploração
-        self.learning_rate = 0.001  # Taxa de aprendizado
+        self.learning_rate = learning_rate  # Taxa de aprendizado
         
         # Histórico de desempenho por mercado
         self.market_performance = {
@@ -48,6 +52,14 @@ class RLTradingAgent:
                 self.epsilon_min
             )  # Reduzir exploração se já temos um modelo treinado
 
+        # Rede alvo opcional (Q(s',a') estável): sincronizada a cada N passos de replay (0 = desativada)
+        self.target_update_steps = int(target_update_steps or 0)
+        self.target_model = None
+        if self.target_update_steps > 0:
+            self.target_model = self._build_model()
+            self._sync_target()
+        self.train_steps = 0
+
     def _build_model(self):
         """
         Constrói a arquitetura da rede neural para o agente DQN.
@@ -75,7 +87,16 @@ class RLTradingAgent:
         """
         Armazena experiência na memória para treinamento posterior.
         """
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.append(state, self._encode_action(action), reward, next_state, done)
+
+    def _encode_action(self, action):
+        """
+        Ação como índices de saída (cabeça de mercado, cabeça de grid); ações inteiras
+        (formato antigo) usam grid = -1 e indexam a saída diretamente.
+        """
+        if isinstance(action, dict):
+            return (action["market_action"], self.market_choice_actions + action["grid_action"])
+        return (action, -1)
 
     def act(self, state, training=True, current_market_type="futures"):
         """
@@ -88,6 +109,7 @@ class RLTradingAgent:
             # Exploração: escolher ação aleatória
             market_action = random.randrange(self.market_choice_actions)
             grid_action = random.randrange(self.grid_actions)
+            market_q_values = None
         else:
             # Aproveitamento: prever Q-values e escolher as melhores ações
             state = np.reshape(state, [1, self.state_size, 1])
@@ -104,7 +126,9 @@ class RLTradingAgent:
         chosen_market = self.market_types[market_action]
         
         # Adicionar lógica de persistência: evitar trocar de mercado muito frequentemente
-        if hasattr(self, 'last_market_choice') and self.last_market_choice != chosen_market:
+        # (só ao aproveitar: a exploração mantém a escolha aleatória)
+        if (market_q_values is not None and hasattr(self, 'last_market_choice')
+                and self.last_market_choice != chosen_market):
             # Verificar se realmente vale a pena trocar de mercado
             market_switch_threshold = 0.1  # Diferença mínima nos Q-values para trocar
             current_market_idx = self.market_types.index(current_market_type)
@@ -154,57 +178,95 @@ class RLTradingAgent:
     def replay(self, batch_size):
         """
         Treina o modelo usando experiências aleatórias da memória.
-        Implementa o algoritmo de Q-learning com rede neural.
-        Agora considera ações separadas para mercado e grid.
+        Implementa o algoritmo de Q-learning com rede neural, vetorizado no minibatch:
+        um forward em next_states (rede alvo, se houver), um em states e um único
+        train_on_batch. Ações no formato dict atualizam as duas cabeças (mercado e grid).
         """
         if len(self.memory) < batch_size:
             return
 
-        # Amostra aleatória de experiências da memória
-        minibatch = random.sample(self.memory, batch_size)
+        # Amostra de experiências da memória (uniforme ou priorizada pelo erro TD)
+        batch = self.memory.sample(batch_size)
+        states = batch["states"].reshape(batch_size, self.state_size, 1)
+        next_states = batch["next_states"].reshape(batch_size, self.state_size, 1)
 
-        for state, action, reward, next_state, done in minibatch:
-            state = np.reshape(state, [1, self.state_size, 1])
-            next_state = np.reshape(next_state, [1, self.state_size, 1])
-
-            # Cálculo do Q-value alvo
-            target = reward
-            if not done:
-                # Q(s',a') para o próximo estado
-                target = reward + self.gamma * np.amax(
-                    self.model.predict(next_state, verbose=0)[0]
-                )
-
-            # Q(s,a) atual
-            target_f = self.model.predict(state, verbose=0)
-            
-            # Se action é um dicionário (novo formato), usar combined_action
-            if isinstance(action, dict):
-                action_idx = action["combined_action"]
-            else:
-                action_idx = action
-            
-            # Atualiza o Q-value para a ação tomada
-            target_f[0][action_idx] = target
+        # Q(s',a') para todos os próximos estados e Q(s,a) atual, em uma passada cada
+        next_model = self.target_model if self.target_model is not None else self.model
+        next_q = next_model.predict(next_states, batch_size=batch_size, verbose=0)
+        target_f = self.model.predict(states, batch_size=batch_size, verbose=0)
+
+        target_f, td_errors = self._q_targets(target_f, next_q, batch["actions"], batch["rewards"], batch["dones"])
 
-            # Treina o modelo para aproximar o Q-value alvo
-            self.model.fit(state, target_f, epochs=1, verbose=0)
+        # Treina o modelo para aproximar os Q-values alvo
+        if self.memory.prioritized:
+            self.model.train_on_batch(states, target_f, sample_weight=batch["weights"])
+            self.memory.update_priorities(batch["indices"], td_errors)
+        else:
+            self.model.train_on_batch(states, target_f)
+
+        self.train_steps += 1
+        if self.target_model is not None and self.train_steps % self.target_update_steps == 0:
+            self._sync_target()
 
         # Decai a taxa de exploração
         if self.epsilon > self.epsilon_min:
             self.epsilon *= self.epsilon_decay
 
+    def _q_targets(self, q_values, next_q, actions, rewards, dones):
+        """
+        Q-values alvo do minibatch: r + gamma * max Q(s',.) (só r em estados terminais),
+        com o máximo tomado na cabeça da ação (mercado ou grid) ou em toda a saída.
+        Retorna também o erro TD de cada amostra (maior entre as cabeças atualizadas).
+        """
+        targets = np.array(q_values, copy=True)
+        rows = np.arange(len(actions))
+        m = self.market_choice_actions
+        not_done = self.gamma * ~dones
+
+        factored = actions[:, 1] >= 0
+        market_max = next_q[:, :m].max(axis=1)
+        grid_max = next_q[:, m:].max(axis=1)
+        full_max = next_q.max(axis=1)
+
+        first_max = np.where(factored, market_max, full_max)
+        targets[rows, actions[:, 0]] = rewards + not_done * first_max
+        td_errors = np.abs(targets[rows, actions[:, 0]] - q_values[rows, actions[:, 0]])
+        if factored.any():
+            f = rows[factored]
+            targets[f, actions[f, 1]] = rewards[f] + not_done[f] * grid_max[f]
+            td_errors[f] = np.maximum(td_errors[f], np.abs(targets[f, actions[f, 1]] - q_values[f, actions[f, 1]]))
+        return targets, td_errors
+
+    def _sync_target(self):
+        if self.target_model is not None:
+            self.target_model.set_weights(self.model.get_weights())
+
     def save_model(self, path):
         """
         Salva os pesos do modelo em um arquivo.
         """
         self.model.save_weights(path)
 
+    def save_memory(self, directory):
+        """
+        Salva a memória de replay (e epsilon/passos de treino) para retomar o treinamento.
+        """
+        self.memory.save(directory, extra={"epsilon": self.epsilon, "train_steps": self.train_steps})
+
+    def load_memory(self, directory, mmap=False):
+        """
+        Restaura a memória de replay salva por save_memory().
+        """
+        self.memory = ReplayBuffer.load(directory, mmap=mmap)
+        self.epsilon = self.memory.extra.get("epsilon", self.epsilon)
+        self.train_steps = self.memory.extra.get("train_steps", self.train_steps)
+
     def load_model(self, path):
         """
         Carrega os pesos do modelo de um arquivo.
         """
         self.model.load_weights(path)
+        self._sync_target()
         self.epsilon = (
             self.epsilon_min
         )  # Reduz exploração após carregar modelo treinado
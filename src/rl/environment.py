@@ -4,6 +4,7 @@ import pandas as pd
 from gymnasium import spaces
 
 from utils.logger import setup_logger
+from .features import add_indicators, has_indicators, position_features, window_features
 log = setup_logger("rl_environment")
 
 
@@ -87,35 +88,36 @@ class TradingEnvironment(gym.Env):
         self.total_commission_paid = 0
         self.transaction_history = []
 
+        # Features de janela pré-calculadas (uma linha por passo) e fechamentos em array
+        self.window_features = None
+        self.closes = None
+        self.mean_close = 1
+        if self.data is not None:
+            if has_indicators(self.data):
+                self._precompute_features()
+            else:
+                self._calculate_indicators()
+
         log.info(
             f"TradingEnvironment initialized. Observation space size: {self.observation_space_size}, Include Sentiment: {self.include_sentiment}"
         )
 
     def _calculate_indicators(self):
-        # ... (cálculo de indicadores permanece o mesmo) ...
-        df = self.data.copy()
-        df["sma_7"] = df["close"].rolling(window=7).mean()
-        df["sma_25"] = df["close"].rolling(window=25).mean()
-        df["sma_99"] = df["close"].rolling(window=99).mean()
-        delta = df["close"].diff()
-        gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-        loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-        rs = gain / loss
-        df["rsi"] = 100 - (100 / (1 + rs))
-        ema_12 = df["close"].ewm(span=12, adjust=False).mean()
-        ema_26 = df["close"].ewm(span=26, adjust=False).mean()
-        df["macd"] = ema_12 - ema_26
-        df["macd_signal"] = df["macd"].ewm(span=9, adjust=False).mean()
-        df["macd_hist"] = df["macd"] - df["macd_signal"]
-        df["bb_middle"] = df["close"].rolling(window=20).mean()
-        df["bb_std"] = df["close"].rolling(window=20).std()
-        df["bb_upper"] = df["bb_middle"] + 2 * df["bb_std"]
-        df["bb_lower"] = df["bb_middle"] - 2 * df["bb_std"]
-        df["volume_norm"] = df["volume"] / df["volume"].rolling(window=20).mean()
-        df["volatility"] = df["close"].pct_change().rolling(window=20).std()
-        df.fillna(method="bfill", inplace=True)
-        df.fillna(0, inplace=True)  # Fill remaining NaNs with 0
-        self.data = df
+        self.data = add_indicators(self.data)
+        self._precompute_features()
+
+    def _precompute_features(self):
+        """
+        Monta o tensor (passos x features) float32 das janelas normalizadas: o estado do
+        passo t é a linha t - features_window mais as features de posição.
+        """
+        self.window_features = window_features(self.data, self.features_window)
+        self.closes = self.data["close"].to_numpy(dtype=float)
+        mean_close = self.data["close"].mean()
+        self.mean_close = mean_close if mean_close != 0 else 1
+
+    def _price_at(self, step):
+        return self.closes[step] if step < len(self.closes) else 0
 
     def _get_state(self, current_sentiment_score: float = 0.0):
         """
@@ -134,94 +136,30 @@ class TradingEnvironment(gym.Env):
             )
             return np.zeros(self.observation_space.shape, dtype=np.float32)
 
-        frame = self.data.iloc[
-            self.current_step - self.features_window : self.current_step
-        ]
-        if frame.empty or len(frame) < self.features_window:
+        row = self.current_step - self.features_window
+        if row >= len(self.window_features):
             log.warning(
-                f"Insufficient data frame length ({len(frame)}) at step {self.current_step}. Returning zero state."
+                f"Insufficient data frame length at step {self.current_step}. Returning zero state."
             )
             return np.zeros(self.observation_space.shape, dtype=np.float32)
 
-        features = []
-
-        # Preços normalizados
-        close_prices = frame["close"].values
-        # Avoid division by zero if the first price is 0
-        first_price = close_prices[0] if close_prices[0] != 0 else 1
-        normalized_prices = close_prices / first_price - 1
-        features.extend(normalized_prices)
-
-        # Indicadores técnicos normalizados
-        for indicator in ["rsi", "macd", "macd_hist", "volatility"]:
-            values = frame[indicator].values
-            if len(values) > 0 and not np.isnan(values).all():
-                min_val, max_val = np.nanmin(values), np.nanmax(values)
-                if max_val > min_val:
-                    normalized = (values - min_val) / (
-                        max_val - min_val
-                    ) * 2 - 1  # Normalize to [-1, 1]
-                else:
-                    normalized = np.zeros_like(values)
-                features.extend(normalized)
-            else:
-                # Append zeros if indicator calculation failed or all NaNs
-                features.extend(np.zeros(self.features_window))
-
-        # Informações de posição atual
-        current_price = (
-            self.data.iloc[self.current_step]["close"]
-            if self.current_step < len(self.data)
-            else 0
+        # Janela pré-calculada (preços e indicadores normalizados) + posição atual normalizada
+        position = position_features(
+            self.shares_held, self.balance, self._price_at(self.current_step),
+            self.initial_balance, self.mean_close,
         )
-        position_value = self.shares_held * current_price
-        # portfolio_value = self.balance + position_value # Unused variable
-
-        # Normalizar informações de posição (aproximado)
-        features.append(
-            np.clip(
-                self.shares_held
-                / (
-                    self.initial_balance
-                    / (
-                        self.data["close"].mean()
-                        if self.data["close"].mean() != 0
-                        else 1
-                    )
-                ),
-                -1,
-                1,
-            )
-        )  # Clip share count relative to potential max shares
-        # Normalize balance to [-1, 1]
-        features.append(np.clip((self.balance / self.initial_balance) * 2 - 1, -1, 1))
-        # Normalize position value to [-1, 1]
-        features.append(np.clip((position_value / self.initial_balance) * 2 - 1, -1, 1))
-
+        extra = []
         # --- Adicionar Score de Sentimento (se habilitado) --- #
         if self.include_sentiment:
-            features.append(np.clip(current_sentiment_score, -1.0, 1.0))
+            extra.append(np.clip(current_sentiment_score, -1.0, 1.0))
         # --- One-hot do tipo de mercado --- #
-        market_one_hot = [
-            1.0 if self.current_market == m else 0.0 for m in self.market_types
-        ]
-        features.extend(market_one_hot)
-
-        # Garantir que o tamanho do estado corresponde ao espaço de observação
-        final_state = np.array(features, dtype=np.float32)
-        if len(final_state) != self.observation_space_size:
-            log.error(
-                f"State size mismatch! Expected {self.observation_space_size}, got {len(final_state)}. Padding/truncating."
-            )
-            # Pad or truncate (simple approach, might need refinement)
-            if len(final_state) > self.observation_space_size:
-                final_state = final_state[: self.observation_space_size]
-            else:
-                padding = np.zeros(
-                    self.observation_space_size - len(final_state), dtype=np.float32
-                )
-                final_state = np.concatenate((final_state, padding))
+        extra.extend(1.0 if self.current_market == m else 0.0 for m in self.market_types)
 
+        final_state = np.concatenate((
+            self.window_features[row],
+            position.astype(np.float32),
+            np.asarray(extra, dtype=np.float32),
+        ))
         return final_state
 
     def reset(self, seed=None, options=None):
@@ -272,11 +210,7 @@ class TradingEnvironment(gym.Env):
         market_idx = action // 3
         action_type = action % 3  # 0: manter, 1: comprar, 2: vender
         self.current_market = self.market_types[market_idx]
-        current_price = (
-            self.data.iloc[self.current_step]["close"]
-            if self.current_step < len(self.data)
-            else 0
-        )
+        current_price = self._price_at(self.current_step)
 
         # Executar ação
         if action_type == 1:  # Comprar
@@ -360,7 +294,7 @@ class TradingEnvironment(gym.Env):
         if self.current_step >= len(self.data) - 1:
             terminated = True
             # Calcular valor final do portfólio para recompensa final
-            final_price = self.data.iloc[-1]["close"]
+            final_price = self.closes[-1]
             portfolio_value = self.balance + (self.shares_held * final_price)
             return_pct = (portfolio_value / self.initial_balance) - 1
             reward += (
@@ -379,11 +313,7 @@ class TradingEnvironment(gym.Env):
 
     def _get_info(self):
         """Retorna informações adicionais sobre o estado atual."""
-        current_price = (
-            self.data.iloc[self.current_step]["close"]
-            if self.current_step < len(self.data)
-            else 0
-        )
+        current_price = self._price_at(self.current_step)
         portfolio_value = self.balance + (self.shares_held * current_price)
         return {
             "step": self.current_step,
@@ -0,0 +1,94 @@
+"""
+Features do estado dos ambientes de RL, calculadas uma vez por dataset.
+
+O estado do TradingEnvironment num passo t usa a janela dos `features_window` candles
+anteriores (linhas t-W .. t-1): preços relativos ao primeiro fechamento da janela e os
+indicadores normalizados para [-1, 1] pelo mínimo/máximo da própria janela. Como isso
+só depende dos dados, window_features() monta todas as janelas de uma vez com
+sliding_window_view, e o estado de um passo vira uma linha do tensor mais as poucas
+features de posição.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Indicadores normalizados por janela no estado (nesta ordem, depois dos preços)
+STATE_INDICATORS = ("rsi", "macd", "macd_hist", "volatility")
+NUM_POSITION_FEATURES = 3  # shares_held, balance, position_value
+
+
+def add_indicators(data: pd.DataFrame) -> pd.DataFrame:
+    """Indicadores usados pelo ambiente a partir de OHLCV (NaNs do warm-up preenchidos)."""
+    df = data.copy()
+    df["sma_7"] = df["close"].rolling(window=7).mean()
+    df["sma_25"] = df["close"].rolling(window=25).mean()
+    df["sma_99"] = df["close"].rolling(window=99).mean()
+    delta = df["close"].diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
+    rs = gain / loss
+    df["rsi"] = 100 - (100 / (1 + rs))
+    ema_12 = df["close"].ewm(span=12, adjust=False).mean()
+    ema_26 = df["close"].ewm(span=26, adjust=False).mean()
+    df["macd"] = ema_12 - ema_26
+    df["macd_signal"] = df["macd"].ewm(span=9, adjust=False).mean()
+    df["macd_hist"] = df["macd"] - df["macd_signal"]
+    df["bb_middle"] = df["close"].rolling(window=20).mean()
+    df["bb_std"] = df["close"].rolling(window=20).std()
+    df["bb_upper"] = df["bb_middle"] + 2 * df["bb_std"]
+    df["bb_lower"] = df["bb_middle"] - 2 * df["bb_std"]
+    df["volume_norm"] = df["volume"] / df["volume"].rolling(window=20).mean()
+    df["volatility"] = df["close"].pct_change().rolling(window=20).std()
+    df = df.bfill()
+    df = df.fillna(0)  # Fill remaining NaNs with 0
+    return df
+
+
+def has_indicators(data: pd.DataFrame) -> bool:
+    return all(column in data.columns for column in STATE_INDICATORS)
+
+
+def _normalized_windows(values: np.ndarray, window: int) -> np.ndarray:
+    """Cada janela levada a [-1, 1] pelo seu mínimo/máximo (zeros se constante ou toda NaN)."""
+    windows = sliding_window_view(values, window)
+    out = np.zeros(windows.shape)
+    valid = ~np.isnan(windows).all(axis=1)
+    if valid.any():
+        lows = np.nanmin(windows[valid], axis=1, keepdims=True)
+        highs = np.nanmax(windows[valid], axis=1, keepdims=True)
+        varying = (highs > lows)[:, 0]
+        rows = np.flatnonzero(valid)[varying]
+        out[rows] = (windows[rows] - lows[varying]) / (highs[varying] - lows[varying]) * 2 - 1
+    return out
+
+
+def window_features(data: pd.DataFrame, window: int) -> np.ndarray:
+    """Tensor (len(data) - window + 1, 5 * window) float32: linha t - window = features do passo t.
+
+    Mesmas operações (em float64) do cálculo por passo, convertidas para float32 no fim.
+    """
+    closes = data["close"].to_numpy(dtype=float)
+    if len(closes) < window:
+        return np.zeros((0, (1 + len(STATE_INDICATORS)) * window), dtype=np.float32)
+    price_windows = sliding_window_view(closes, window)
+    first = price_windows[:, :1]
+    first = np.where(first != 0, first, 1)
+    blocks = [price_windows / first - 1]
+    for indicator in STATE_INDICATORS:
+        blocks.append(_normalized_windows(data[indicator].to_numpy(dtype=float), window))
+    return np.concatenate(blocks, axis=1).astype(np.float32)
+
+
+def position_features(shares_held, balance, current_price, initial_balance: float,
+                      mean_close) -> np.ndarray:
+    """Features de posição normalizadas (escalares ou arrays por ambiente) -> (..., 3)."""
+    shares_held = np.asarray(shares_held, dtype=float)
+    balance = np.asarray(balance, dtype=float)
+    position_value = shares_held * np.asarray(current_price, dtype=float)
+    mean_close = np.where(np.asarray(mean_close) != 0, mean_close, 1)
+    return np.stack([
+        np.clip(shares_held / (initial_balance / mean_close), -1, 1),
+        np.clip((balance / initial_balance) * 2 - 1, -1, 1),
+        np.clip((position_value / initial_balance) * 2 - 1, -1, 1),
+    ], axis=-1)
@@ -0,0 +1,134 @@
+"""
+Datasets gravados para o treinamento offline do agente de RL.
+
+Carrega candles OHLCV (coluna `timestamp` + open/high/low/close/volume, em ordem de tempo)
+de três fontes, sem interferir no bot em execução:
+
+- banco SQLite de mercado (tabela `klines` do MarketDataManager ou `kline_data` do
+  LocalDataStorage), aberto somente leitura;
+- estados gravados pelo ShadowDataStorage (market_states.jsonl), cujos preços são
+  agregados em candles do intervalo pedido;
+- arquivos CSV exportados.
+
+split_by_time() separa treino e validação pelo tempo: a validação é sempre o trecho
+mais recente, para medir o agente em dados posteriores aos de treino.
+"""
+
+import os
+import sqlite3
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+KLINE_TABLES = ("klines", "kline_data")  # MarketDataManager, LocalDataStorage
+
+_PANDAS_UNITS = {"m": "min", "h": "h", "d": "D", "w": "W"}
+
+
+def interval_to_freq(interval: str) -> str:
+    """Intervalo de kline da Binance ("1m", "4h", "1d") -> frequência do pandas."""
+    return f"{interval[:-1]}{_PANDAS_UNITS[interval[-1]]}"
+
+
+def _connect_readonly(db_path: str) -> sqlite3.Connection:
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Banco de mercado não encontrado: {db_path}")
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+
+
+def _kline_table(conn: sqlite3.Connection) -> str:
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    for table in KLINE_TABLES:
+        if table in tables:
+            return table
+    raise ValueError(f"Nenhuma tabela de klines ({', '.join(KLINE_TABLES)}) no banco")
+
+
+def list_sqlite_symbols(db_path: str, interval: str = "1m") -> List[str]:
+    """Símbolos com klines gravados no intervalo."""
+    with _connect_readonly(db_path) as conn:
+        table = _kline_table(conn)
+        rows = conn.execute(f"SELECT DISTINCT symbol FROM {table} WHERE interval = ? ORDER BY symbol", (interval,))
+        return [row[0] for row in rows]
+
+
+def load_sqlite_klines(db_path: str, symbol: str, interval: str = "1m",
+                       last_days: Optional[int] = None) -> pd.DataFrame:
+    """Klines de um símbolo do banco SQLite de mercado (somente leitura)."""
+    with _connect_readonly(db_path) as conn:
+        table = _kline_table(conn)
+        query = (
+            f"SELECT open_time, open_price AS open, high_price AS high, low_price AS low, "
+            f"close_price AS close, volume FROM {table} WHERE symbol = ? AND interval = ?"
+        )
+        params = [symbol, interval]
+        if last_days:
+            cutoff = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=last_days)
+            query += " AND open_time >= ?"
+            params.append(int(cutoff.timestamp() * 1000))
+        df = pd.read_sql_query(query + " ORDER BY open_time", conn, params=params)
+
+    df = df.drop_duplicates("open_time", keep="last")
+    df.insert(0, "timestamp", pd.to_datetime(df.pop("open_time"), unit="ms"))
+    return df.reset_index(drop=True)
+
+
+def list_shadow_symbols(data_dir: str = "data") -> List[str]:
+    from utils.data_storage import ShadowDataStorage
+
+    states = ShadowDataStorage(data_dir).load_market_states_df()
+    return sorted(states["symbol"].unique()) if not states.empty else []
+
+
+def load_shadow_klines(data_dir: str, symbol: str, interval: str = "1m",
+                       last_days: Optional[int] = None) -> pd.DataFrame:
+    """Candles a partir dos preços dos estados gravados em shadow mode (volume 0)."""
+    from utils.data_storage import ShadowDataStorage
+
+    states = ShadowDataStorage(data_dir).load_market_states_df(symbol, last_days=last_days)
+    if states.empty:
+        return pd.DataFrame(columns=["timestamp"] + OHLCV_COLUMNS)
+    prices = states.set_index("timestamp")["current_price"].astype(float)
+    df = prices.resample(interval_to_freq(interval)).ohlc().dropna()
+    df["volume"] = 0.0
+    return df.rename_axis("timestamp").reset_index()
+
+
+def load_csv_klines(path: str, last_days: Optional[int] = None) -> pd.DataFrame:
+    """CSV com OHLCV e `timestamp` (data) ou `open_time` (ms); sem nenhum dos dois, usa a ordem das linhas."""
+    df = pd.read_csv(path)
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+    elif "open_time" in df.columns:
+        df.insert(0, "timestamp", pd.to_datetime(df.pop("open_time"), unit="ms"))
+    missing = [column for column in OHLCV_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: colunas ausentes {missing}")
+    if "timestamp" in df.columns:
+        df = df.sort_values("timestamp")
+        if last_days:
+            df = df[df["timestamp"] >= df["timestamp"].iloc[-1] - pd.Timedelta(days=last_days)]
+    return df.reset_index(drop=True)
+
+
+def split_by_time(data: pd.DataFrame, validation_fraction: float = 0.2,
+                  split_time=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Separa (treino, validação) sem embaralhar: validação = candles a partir de `split_time`
+    ou a fração final `validation_fraction` da série.
+    """
+    if split_time is not None and "timestamp" in data.columns:
+        split = int((data["timestamp"] < pd.Timestamp(split_time)).sum())
+    else:
+        split = int(round(len(data) * (1 - validation_fraction)))
+    return data.iloc[:split].reset_index(drop=True), data.iloc[split:].reset_index(drop=True)
+
+
+def describe_range(data: pd.DataFrame) -> dict:
+    """Período e número de candles de um split (para o manifesto do treinamento)."""
+    info = {"rows": len(data)}
+    if "timestamp" in data.columns and len(data):
+        info["start"] = str(data["timestamp"].iloc[0])
+        info["end"] = str(data["timestamp"].iloc[-1])
+    return info
@@ -0,0 +1,201 @@
+"""
+Replay Buffer - memória de experiências do agente DQN em arrays NumPy pré-alocados.
+
+Estados, ações, recompensas, próximos estados e flags de término ficam em arrays
+contíguos (float32) usados como ring buffer: inserir não aloca e amostrar é indexação
+por array, sem copiar tuplas Python. Opcionalmente:
+
+- amostragem priorizada (PER) por uma sum-tree em array, com pesos de importance
+  sampling e prioridades atualizadas pelo erro TD do replay;
+- arrays em memmap num diretório, para buffers de milhões de transições;
+- save()/load() do conteúdo e das prioridades para retomar o treinamento.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+_ARRAYS = ("states", "actions", "rewards", "next_states", "dones")
+_META_FILE = "replay_meta.json"
+
+
+class SumTree:
+    """Árvore de somas em array (folhas = prioridades) com busca vetorizada por prefixo."""
+
+    def __init__(self, capacity: int):
+        self.leaves = 1 << max(0, int(capacity - 1).bit_length())
+        self.tree = np.zeros(2 * self.leaves)
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def priorities(self, indices: np.ndarray) -> np.ndarray:
+        return self.tree[self.leaves + np.asarray(indices)]
+
+    def update(self, indices: np.ndarray, priorities: np.ndarray):
+        """Atualiza as folhas e recalcula só os ancestrais tocados, nível a nível."""
+        nodes = self.leaves + np.asarray(indices, dtype=np.int64)
+        self.tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """Índices das folhas cujo intervalo de soma acumulada contém cada valor."""
+        values = np.array(values, dtype=float)
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self.leaves:
+            left = 2 * nodes
+            go_right = values >= self.tree[left]
+            values -= self.tree[left] * go_right
+            nodes = left + go_right
+        return nodes - self.leaves
+
+
+class ReplayBuffer:
+    """Ring buffer de transições em arrays NumPy com amostragem uniforme ou priorizada."""
+
+    def __init__(self, capacity: int, state_size: int, prioritized: bool = False,
+                 alpha: float = 0.6, beta: float = 0.4, beta_increment: float = 0.001,
+                 epsilon: float = 1e-6, memmap_dir: Optional[str] = None, seed: Optional[int] = None):
+        self.capacity = int(capacity)
+        self.state_size = int(state_size)
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.epsilon = epsilon
+        self.memmap_dir = memmap_dir
+        self.rng = np.random.default_rng(seed)
+        self.position = 0
+        self.size = 0
+        self.max_priority = 1.0
+        self.tree = SumTree(self.capacity) if prioritized else None
+        self.extra: dict = {}  # Estado do dono salvo junto (ex.: epsilon do agente)
+        self._allocate(mode="w+")
+
+    def _shapes(self) -> Dict[str, tuple]:
+        # actions: (índice na cabeça de mercado ou na saída inteira, índice na cabeça de grid ou -1)
+        return {
+            "states": ((self.capacity, self.state_size), np.float32),
+            "actions": ((self.capacity, 2), np.int64),
+            "rewards": ((self.capacity,), np.float32),
+            "next_states": ((self.capacity, self.state_size), np.float32),
+            "dones": ((self.capacity,), np.bool_),
+        }
+
+    def _allocate(self, mode: str):
+        for name, (shape, dtype) in self._shapes().items():
+            if self.memmap_dir:
+                os.makedirs(self.memmap_dir, exist_ok=True)
+                array = open_memmap(os.path.join(self.memmap_dir, f"{name}.npy"), mode=mode,
+                                    dtype=dtype, shape=shape if mode == "w+" else None)
+            else:
+                array = np.zeros(shape, dtype=dtype)
+            setattr(self, name, array)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, state, action, reward: float, next_state, done: bool):
+        """Grava a transição na próxima posição do anel (sobrescreve a mais antiga quando cheio)."""
+        i = self.position
+        self.states[i] = np.ravel(state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = np.ravel(next_state)
+        self.dones[i] = done
+        if self.tree is not None:
+            # Transição nova com a maior prioridade já vista: será amostrada ao menos uma vez
+            self.tree.update(np.array([i]), np.array([self.max_priority ** self.alpha]))
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size: int) -> Dict[str, np.ndarray]:
+        """Minibatch como arrays (cópias) + índices e pesos de importance sampling."""
+        if self.tree is not None:
+            # Amostragem estratificada: um valor por segmento da soma total
+            segment = self.tree.total / batch_size
+            values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+            indices = np.minimum(self.tree.find(values), self.size - 1)
+            probabilities = self.tree.priorities(indices) / self.tree.total
+            weights = (self.size * probabilities) ** -self.beta
+            weights = (weights / weights.max()).astype(np.float32)
+            self.beta = min(1.0, self.beta + self.beta_increment)
+        else:
+            indices = self.rng.integers(0, self.size, batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        batch = {name: getattr(self, name)[indices] for name in _ARRAYS}
+        batch["indices"] = indices
+        batch["weights"] = weights
+        return batch
+
+    def update_priorities(self, indices: np.ndarray, td_errors: np.ndarray):
+        """Prioridade = (|erro TD| + epsilon) ^ alpha para as transições amostradas."""
+        if self.tree is None:
+            return
+        raw = np.abs(np.asarray(td_errors, dtype=float)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(raw.max()))
+        self.tree.update(indices, raw ** self.alpha)
+
+    # --- Persistência --- #
+
+    def _meta(self, extra: Optional[dict]) -> dict:
+        return {
+            "capacity": self.capacity, "state_size": self.state_size, "prioritized": self.prioritized,
+            "alpha": self.alpha, "beta": self.beta, "beta_increment": self.beta_increment,
+            "epsilon": self.epsilon, "position": self.position, "size": self.size,
+            "max_priority": self.max_priority, "extra": extra or {},
+        }
+
+    def save(self, directory: str, extra: Optional[dict] = None):
+        """Grava arrays (.npy), prioridades e ponteiros; buffers em memmap no próprio diretório só fazem flush."""
+        os.makedirs(directory, exist_ok=True)
+        in_place = self.memmap_dir and os.path.abspath(self.memmap_dir) == os.path.abspath(directory)
+        for name in _ARRAYS:
+            array = getattr(self, name)
+            if in_place:
+                array.flush()
+            else:
+                np.save(os.path.join(directory, f"{name}.npy"), array)
+        if self.tree is not None:
+            np.save(os.path.join(directory, "priorities.npy"), self.tree.tree)
+        tmp_path = os.path.join(directory, _META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self._meta(extra), f)
+        os.replace(tmp_path, os.path.join(directory, _META_FILE))
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = False, seed: Optional[int] = None) -> "ReplayBuffer":
+        """Restaura um buffer salvo; com mmap=True os arrays continuam no disco (modo r+)."""
+        with open(os.path.join(directory, _META_FILE)) as f:
+            meta = json.load(f)
+        buffer = cls.__new__(cls)
+        buffer.capacity, buffer.state_size = meta["capacity"], meta["state_size"]
+        buffer.prioritized = meta["prioritized"]
+        for key in ("alpha", "beta", "beta_increment", "epsilon", "position", "size", "max_priority"):
+            setattr(buffer, key, meta[key])
+        buffer.extra = meta.get("extra", {})
+        buffer.rng = np.random.default_rng(seed)
+        buffer.memmap_dir = directory if mmap else None
+        if mmap:
+            buffer._allocate(mode="r+")
+        else:
+            for name in _ARRAYS:
+                setattr(buffer, name, np.load(os.path.join(directory, f"{name}.npy")))
+        buffer.tree = None
+        if buffer.prioritized:
+            buffer.tree = SumTree(buffer.capacity)
+            buffer.tree.tree = np.load(os.path.join(directory, "priorities.npy"))
+        return buffer
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, _META_FILE))
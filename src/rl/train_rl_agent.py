@@ -1,45 +1,391 @@
+"""
+Treinamento offline do RLTradingAgent a partir de dados gravados, fora do bot.
+
+Carrega os candles de cada símbolo (banco SQLite de mercado, estados do shadow mode ou
+CSV - ver rl.offline_data), calcula os indicadores na série inteira e separa treino e
+validação pelo tempo. Cada combinação símbolo x hiperparâmetros é um treino independente
+(TradingEnvironment + RLTradingAgent) executado em paralelo num ProcessPoolExecutor;
+o agente é avaliado de forma gulosa no trecho de validação.
+
+Os resultados vão para um diretório versionado, sem tocar nos modelos do bot:
+
+    <output_dir>/<AAAAMMDD_HHMMSS>/<símbolo>/<cfg_NNN>/model.weights.h5 + metrics.json
+    <output_dir>/<AAAAMMDD_HHMMSS>/manifest.json   (dados, grade, métricas, melhor por símbolo)
+    <output_dir>/LATEST                            (última versão concluída)
+
+Exemplo (retreino noturno em todos os núcleos):
+
+    python src/rl/train_rl_agent.py --source sqlite --db data/market_data.db \\
+        --symbols BTCUSDT ETHUSDT --days 30 --grid gamma=0.9,0.95 learning_rate=0.001,0.0005
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+if __package__ in (None, ""):
+    # Execução direta (python src/rl/train_rl_agent.py): pacotes importados a partir de src/
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import numpy as np
 import pandas as pd
+import tensorflow as tf
+import yaml
 
 from rl.agent import RLTradingAgent
 from rl.environment import TradingEnvironment
+from rl.features import add_indicators
+from rl.offline_data import (describe_range, list_shadow_symbols, list_sqlite_symbols,
+                             load_csv_klines, load_shadow_klines, load_sqlite_klines,
+                             split_by_time)
+from utils.logger import setup_logger
+
+log = setup_logger("rl_training")
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", "config.yaml")
+
+# Hiperparâmetros de cada treino (sobrescritos pela config rl_agent e pela grade --grid)
+DEFAULT_PARAMS = {
+    "gamma": 0.95,
+    "learning_rate": 0.001,
+    "epsilon_decay": 0.995,
+    "batch_size": 32,
+    "replay_every": 1,  # Passos do ambiente entre replays
+    "memory_size": 2000,
+    "prioritized_replay": False,
+    "target_update_steps": 0,
+    "features_window": 30,
+}
+
+# Chaves da seção rl_agent da config usadas como base dos hiperparâmetros
+_CONFIG_PARAMS = {
+    "batch_size": "batch_size",
+    "experience_replay_buffer_size": "memory_size",
+    "prioritized_replay": "prioritized_replay",
+    "target_update_steps": "target_update_steps",
+    "features_window": "features_window",
+}
+
+
+def base_params(rl_config: dict) -> dict:
+    params = dict(DEFAULT_PARAMS)
+    for key, param in _CONFIG_PARAMS.items():
+        if key in rl_config:
+            params[param] = rl_config[key]
+    return params
 
-# Exemplo de uso: treinamento RL
 
+def parse_grid(items: Optional[List[str]]) -> Dict[str, list]:
+    """["gamma=0.9,0.95", "prioritized_replay=false,true"] -> {"gamma": [0.9, 0.95], ...}."""
+    grid = {}
+    for item in items or []:
+        key, sep, values = item.partition("=")
+        if not sep or key not in DEFAULT_PARAMS:
+            raise ValueError(f"Parâmetro de grade inválido: {item!r} (chaves: {', '.join(DEFAULT_PARAMS)})")
+        grid[key] = [yaml.safe_load(value) for value in values.split(",")]
+    return grid
 
-def train_rl_agent(data_path, episodes=10, model_save_path=None):
-    df = pd.read_csv(data_path)
-    env = TradingEnvironment(df)
-    state_size = len(env._get_state())
-    action_size = 3  # manter, comprar, vender
-    agent = RLTradingAgent(state_size, action_size, model_path=model_save_path)
 
-    for ep in range(episodes):
-        state = env.reset()
-        state = np.reshape(state, (state_size, 1))
-        total_reward = 0
+def expand_grid(base: dict, grid: Dict[str, list]) -> List[dict]:
+    """Produto cartesiano da grade sobre os parâmetros base (uma configuração se a grade for vazia)."""
+    keys = list(grid)
+    return [{**base, **dict(zip(keys, values))} for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def _env_action(decision: dict) -> int:
+    """Decisão do agente (mercado, ação manter/comprar/vender) -> ação discreta do TradingEnvironment."""
+    return int(decision["market_action"]) * 3 + int(decision["grid_action"])
+
+
+def _seed_everything(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+
+def _make_env(data: pd.DataFrame, params: dict, task: dict) -> TradingEnvironment:
+    return TradingEnvironment(data, initial_balance=task["initial_balance"], commission=task["commission"],
+                              features_window=params["features_window"])
+
+
+def evaluate(agent: RLTradingAgent, env: TradingEnvironment) -> dict:
+    """Episódio guloso (sem exploração) sobre todo o ambiente; métricas de portfólio."""
+    state, info = env.reset()
+    values = [info["portfolio_value"]]
+    total_reward = 0.0
+    done = False
+    while not done:
+        decision = agent.act(state, training=False, current_market_type=env.current_market)
+        state, reward, terminated, truncated, info = env.step(_env_action(decision))
+        done = terminated or truncated
+        total_reward += reward
+        values.append(info["portfolio_value"])
+
+    values = np.asarray(values, dtype=float)
+    drawdown = 1 - values / np.maximum.accumulate(values)
+    first_price = env.closes[env.features_window]
+    return {
+        "total_reward": float(total_reward),
+        "final_portfolio_value": float(values[-1]),
+        "return_pct": float((values[-1] / env.initial_balance - 1) * 100),
+        "buy_and_hold_return_pct": float((env.closes[-1] / first_price - 1) * 100) if first_price else 0.0,
+        "max_drawdown_pct": float(drawdown.max() * 100),
+        "trades": len(env.transaction_history),
+        "steps": len(values) - 1,
+    }
+
+
+def run_trial(task: dict) -> dict:
+    """
+    Um treino completo (executado num processo do pool): episódios sobre o treino,
+    avaliação na validação, modelo e metrics.json gravados em task["run_dir"].
+    """
+    started = time.time()
+    params = task["params"]
+    _seed_everything(task["seed"])
+
+    env = _make_env(task["train"], params, task)
+    agent = RLTradingAgent(env.observation_space_size, env.action_space.n, market_types=list(env.market_types),
+                           target_update_steps=params["target_update_steps"], memory_size=params["memory_size"],
+                           prioritized_replay=params["prioritized_replay"],
+                           learning_rate=params["learning_rate"], grid_actions=3)
+    agent.gamma = params["gamma"]
+    agent.epsilon_decay = params["epsilon_decay"]
+    agent.memory.rng = np.random.default_rng(task["seed"])
+
+    episode_rewards = []
+    for episode in range(task["episodes"]):
+        state, info = env.reset()
+        total_reward = 0.0
+        steps = 0
         done = False
         while not done:
-            action = agent.act(state)
-            next_state, reward, done, info = env.step(action)
-            next_state = np.reshape(next_state, (state_size, 1))
-            agent.remember(state, action, reward, next_state, done)
+            decision = agent.act(state, training=True, current_market_type=env.current_market)
+            next_state, reward, terminated, truncated, info = env.step(_env_action(decision))
+            done = terminated or truncated
+            agent.remember(state, decision, reward, next_state, done)
             state = next_state
             total_reward += reward
-            if done:
-                print(
-                    f"Episódio {ep+1}/{episodes} - Recompensa total: {total_reward:.2f}"
-                )
-                break
-            agent.replay(batch_size=32)
-        if model_save_path:
-            agent.model.save_weights(model_save_path)
+            steps += 1
+            if steps % params["replay_every"] == 0:
+                agent.replay(params["batch_size"])
+        episode_rewards.append(float(total_reward))
+        log.info(f"[{task['symbol']}/{task['run_id']}] Episode {episode + 1}/{task['episodes']}, "
+                 f"Reward: {total_reward:.2f}, Portfolio: {info['portfolio_value']:.2f}")
+
+    os.makedirs(task["run_dir"], exist_ok=True)
+    model_path = os.path.join(task["run_dir"], "model.weights.h5")
+    agent.save_model(model_path)
+
+    metrics = {
+        "symbol": task["symbol"],
+        "run_id": task["run_id"],
+        "status": "completed",
+        "params": params,
+        "seed": task["seed"],
+        "model_path": model_path,
+        "train": {
+            "episode_rewards": episode_rewards,
+            "train_steps": agent.train_steps,
+            "final_epsilon": float(agent.epsilon),
+            **evaluate(agent, _make_env(task["train"], params, task)),
+        },
+        "validation": evaluate(agent, _make_env(task["validation"], params, task)),
+        "duration_seconds": round(time.time() - started, 2),
+    }
+    _write_json(os.path.join(task["run_dir"], "metrics.json"), metrics)
+    return metrics
+
+
+def _write_json(path: str, data: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+
+def _version_dir(output_dir: str) -> str:
+    version = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path, suffix = os.path.join(output_dir, version), 1
+    while os.path.exists(path):
+        path, suffix = os.path.join(output_dir, f"{version}_{suffix}"), suffix + 1
+    return path
+
+
+def run_sweep(datasets: Dict[str, pd.DataFrame], configs: List[dict], output_dir: str, episodes: int = 10,
+              workers: Optional[int] = None, validation_fraction: float = 0.2, split_time=None,
+              initial_balance: float = 10000.0, commission: float = 0.001, seed: int = 42,
+              source: Optional[dict] = None) -> dict:
+    """
+    Treina todas as combinações símbolo x configuração em paralelo e grava o manifesto da versão.
+
+    Args:
+        datasets: OHLCV por símbolo, em ordem de tempo (ver rl.offline_data)
+        configs: Hiperparâmetros de cada treino (expand_grid)
+        workers: Processos do pool (padrão: todos os núcleos; 1 = no próprio processo)
+
+    Returns:
+        Manifesto (também gravado em <versão>/manifest.json)
+    """
+    version_dir = _version_dir(output_dir)
+    os.makedirs(version_dir)
+    manifest = {
+        "version": os.path.basename(version_dir),
+        "created_at": datetime.now().isoformat(),
+        "source": source or {},
+        "episodes": episodes,
+        "validation_fraction": validation_fraction,
+        "split_time": str(split_time) if split_time is not None else None,
+        "configs": configs,
+        "symbols": {},
+        "runs": [],
+        "skipped": [],
+        "best": {},
+    }
+
+    tasks = []
+    for symbol, data in datasets.items():
+        # Indicadores na série inteira: a validação começa com o histórico do treino (sem warm-up)
+        train, validation = split_by_time(add_indicators(data), validation_fraction, split_time)
+        manifest["symbols"][symbol] = {"train": describe_range(train), "validation": describe_range(validation)}
+        for index, params in enumerate(configs):
+            run_id = f"cfg_{index:03d}"
+            minimum = params["features_window"] + 2
+            if len(train) < minimum or len(validation) < minimum:
+                manifest["skipped"].append({"symbol": symbol, "run_id": run_id,
+                                            "reason": f"menos de {minimum} candles no treino ou na validação"})
+                continue
+            tasks.append({
+                "symbol": symbol, "run_id": run_id, "params": params, "train": train, "validation": validation,
+                "episodes": episodes, "seed": seed + index, "initial_balance": initial_balance,
+                "commission": commission, "run_dir": os.path.join(version_dir, symbol, run_id),
+            })
+
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    log.info(f"🧠 Offline training {manifest['version']}: {len(tasks)} runs "
+             f"({len(datasets)} symbols x {len(configs)} configs) on {workers} workers")
+
+    def _failed(task, error):
+        log.error(f"❌ [{task['symbol']}/{task['run_id']}] Training failed: {error}")
+        return {"symbol": task["symbol"], "run_id": task["run_id"], "status": "failed",
+                "params": task["params"], "error": str(error)}
+
+    if workers <= 1:
+        for task in tasks:
+            try:
+                manifest["runs"].append(run_trial(task))
+            except Exception as e:
+                manifest["runs"].append(_failed(task, e))
+    else:
+        # spawn: cada processo inicializa seu próprio TensorFlow (fork após importar TF não é seguro)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(run_trial, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    manifest["runs"].append(future.result())
+                except Exception as e:
+                    manifest["runs"].append(_failed(task, e))
+
+    manifest["runs"].sort(key=lambda run: (run["symbol"], run["run_id"]))
+    for run in manifest["runs"]:
+        if run["status"] != "completed":
+            continue
+        best = manifest["best"].get(run["symbol"])
+        if best is None or run["validation"]["return_pct"] > best["validation_return_pct"]:
+            manifest["best"][run["symbol"]] = {
+                "run_id": run["run_id"], "model_path": run["model_path"],
+                "validation_return_pct": run["validation"]["return_pct"],
+            }
+
+    _write_json(os.path.join(version_dir, "manifest.json"), manifest)
+    with open(os.path.join(output_dir, "LATEST.tmp"), "w") as f:
+        f.write(manifest["version"] + "\n")
+    os.replace(os.path.join(output_dir, "LATEST.tmp"), os.path.join(output_dir, "LATEST"))
+
+    for symbol, best in manifest["best"].items():
+        log.info(f"🏆 [{symbol}] Best config {best['run_id']}: validation return {best['validation_return_pct']:.2f}%")
+    log.info(f"✅ Offline training saved to {version_dir}")
+    return manifest
+
+
+def load_datasets(args) -> Dict[str, pd.DataFrame]:
+    """OHLCV por símbolo da fonte escolhida na linha de comando."""
+    if args.source == "csv":
+        datasets = {}
+        for path in args.csv or []:
+            symbol = os.path.splitext(os.path.basename(path))[0].upper()
+            if not args.symbols or symbol in args.symbols:
+                datasets[symbol] = load_csv_klines(path, last_days=args.days)
+        return datasets
+
+    if args.source == "sqlite":
+        symbols = args.symbols or list_sqlite_symbols(args.db, args.interval)
+        return {symbol: load_sqlite_klines(args.db, symbol, args.interval, last_days=args.days)
+                for symbol in symbols}
+
+    symbols = args.symbols or list_shadow_symbols(args.shadow_dir)
+    return {symbol: load_shadow_klines(args.shadow_dir, symbol, args.interval, last_days=args.days)
+            for symbol in symbols}
+
+
+def build_parser(defaults: dict) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Treinamento offline do agente de RL com varredura de hiperparâmetros")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="config.yaml (seção rl_agent)")
+    parser.add_argument("--source", choices=("sqlite", "shadow", "csv"), default="sqlite")
+    parser.add_argument("--db", default="data/market_data.db", help="Banco SQLite de mercado")
+    parser.add_argument("--shadow-dir", default="data", help="Diretório do ShadowDataStorage")
+    parser.add_argument("--csv", nargs="+", help="Arquivos CSV (símbolo = nome do arquivo)")
+    parser.add_argument("--symbols", nargs="+", help="Símbolos (padrão: todos os da fonte)")
+    parser.add_argument("--interval", default=defaults.get("interval", "1m"))
+    parser.add_argument("--days", type=int, help="Usa só os últimos N dias")
+    parser.add_argument("--validation-fraction", type=float, default=defaults.get("validation_fraction", 0.2))
+    parser.add_argument("--split-time", help="Início da validação (data ISO); substitui --validation-fraction")
+    parser.add_argument("--episodes", type=int, default=defaults.get("episodes", 10))
+    parser.add_argument("--grid", nargs="+", metavar="PARAM=V1,V2", help="Grade de hiperparâmetros")
+    parser.add_argument("--workers", type=int, help="Processos paralelos (padrão: núcleos da máquina)")
+    parser.add_argument("--output-dir", default=defaults.get("output_dir", "models/offline"))
+    parser.add_argument("--initial-balance", type=float, default=10000.0)
+    parser.add_argument("--commission", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser
+
+
+def _load_config(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    except Exception as e:
+        log.warning(f"Could not load config {path}: {e}, using defaults")
+        return {}
+
+
+def main(argv=None) -> dict:
+    # --config primeiro: a seção offline_training define os padrões dos demais argumentos
+    pre_parser = argparse.ArgumentParser(add_help=False)
+    pre_parser.add_argument("--config", default=DEFAULT_CONFIG_PATH)
+    rl_config = _load_config(pre_parser.parse_known_args(argv)[0].config).get("rl_agent", {})
+    args = build_parser(rl_config.get("offline_training", {})).parse_args(argv)
+
+    datasets = {symbol: data for symbol, data in load_datasets(args).items() if not data.empty}
+    if not datasets:
+        raise SystemExit(f"Nenhum dado encontrado na fonte '{args.source}'")
+    configs = expand_grid(base_params(rl_config), parse_grid(args.grid))
+    source = {"type": args.source, "interval": args.interval, "days": args.days,
+              "path": {"sqlite": args.db, "shadow": args.shadow_dir, "csv": args.csv}[args.source]}
+    return run_sweep(datasets, configs, args.output_dir, episodes=args.episodes, workers=args.workers,
+                     validation_fraction=args.validation_fraction, split_time=args.split_time,
+                     initial_balance=args.initial_balance, commission=args.commission, seed=args.seed,
+                     source=source)
 
 
 if __name__ == "__main__":
-    # Exemplo de chamada
-    train_rl_agent(
-        "/caminho/para/dados.csv",
-        episodes=20,
-        model_save_path="/caminho/para/modelo_rl.h5",
-    )
+    main()
@@ -0,0 +1,243 @@
+"""
+VectorTradingEnv - K episódios do TradingEnvironment em lockstep, com estado em arrays NumPy.
+
+Cada sub-ambiente roda sobre um dataset (símbolos diferentes) a partir de um deslocamento
+inicial; as features de janela de todos os datasets são calculadas uma vez
+(features.window_features) e concatenadas, de modo que um passo de todos os ambientes é
+indexação + aritmética vetorizada, sem pandas no laço. As regras de compra/venda,
+recompensas e o estado são os mesmos do TradingEnvironment.
+
+Implementa a interface gymnasium.vector.VectorEnv com autoreset "next-step": o passo
+seguinte ao fim de um episódio reinicia o sub-ambiente (ação ignorada, recompensa 0).
+"""
+
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+from gymnasium import spaces
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from .features import (NUM_POSITION_FEATURES, STATE_INDICATORS, add_indicators, has_indicators,
+                       position_features, window_features)
+
+_INFO_KEYS = ("step", "portfolio_value", "balance", "shares_held", "cost_basis",
+              "total_commission_paid", "current_price")
+
+
+class VectorTradingEnv(VectorEnv):
+    """TradingEnvironment vetorizado: `num_envs` episódios independentes por chamada de step()."""
+
+    metadata = {"render_modes": [], "autoreset_mode": AutoresetMode.NEXT_STEP}
+
+    def __init__(
+        self,
+        datasets: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+        num_envs: Optional[int] = None,
+        initial_balance: float = 10000.0,
+        commission: float = 0.001,
+        features_window: int = 30,
+        include_sentiment: bool = False,
+        market_types=("spot", "futures"),
+        random_start: bool = False,
+        max_episode_steps: Optional[int] = None,
+    ):
+        """
+        Args:
+            datasets: DataFrame(s) OHLCV (indicadores calculados se ausentes); o ambiente i usa o dataset i % len(datasets)
+            num_envs: Número de sub-ambientes (padrão: um por dataset)
+            random_start: Se True, cada episódio começa num deslocamento aleatório do dataset
+            max_episode_steps: Trunca episódios após N passos (None = até o fim dos dados)
+        """
+        datasets = [datasets] if isinstance(datasets, pd.DataFrame) else list(datasets)
+        self.num_envs = int(num_envs or len(datasets))
+        self.initial_balance = initial_balance
+        self.commission = commission
+        self.features_window = features_window
+        self.include_sentiment = include_sentiment
+        self.market_types = tuple(market_types)
+        self.random_start = random_start
+        self.max_episode_steps = max_episode_steps
+
+        # Features de todos os datasets num só tensor; bases por dataset para indexar
+        features, closes, feature_base, close_base, lengths, mean_closes = [], [], [], [], [], []
+        rows = 0
+        for data in datasets:
+            if not has_indicators(data):
+                data = add_indicators(data)
+            if len(data) < features_window + 2:
+                raise ValueError(f"Dataset com {len(data)} candles: mínimo features_window + 2 = {features_window + 2}")
+            feature_base.append(rows)
+            close_base.append(sum(lengths))
+            window = window_features(data, features_window)
+            features.append(window)
+            rows += len(window)
+            closes.append(data["close"].to_numpy(dtype=float))
+            lengths.append(len(data))
+            mean_closes.append(data["close"].mean())
+        self.features = np.concatenate(features)
+        self.closes = np.concatenate(closes)
+
+        dataset = np.arange(self.num_envs) % len(datasets)
+        self.dataset_index = dataset
+        self.feature_base = np.asarray(feature_base, dtype=np.int64)[dataset]
+        self.close_base = np.asarray(close_base, dtype=np.int64)[dataset]
+        self.lengths = np.asarray(lengths, dtype=np.int64)[dataset]
+        self.mean_closes = np.asarray(mean_closes, dtype=float)[dataset]
+        self.mean_closes[self.mean_closes == 0] = 1
+
+        num_window_features = (1 + len(STATE_INDICATORS)) * features_window
+        self.observation_space_size = (
+            num_window_features + NUM_POSITION_FEATURES + int(include_sentiment) + len(self.market_types)
+        )
+        self.single_observation_space = spaces.Box(
+            low=-np.inf, high=np.inf, shape=(self.observation_space_size,), dtype=np.float32
+        )
+        self.single_action_space = spaces.Discrete(len(self.market_types) * 3)
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+
+        # Estado por sub-ambiente
+        n = self.num_envs
+        self.current_step = np.zeros(n, dtype=np.int64)
+        self.episode_steps = np.zeros(n, dtype=np.int64)
+        self.balance = np.zeros(n)
+        self.shares_held = np.zeros(n)
+        self.cost_basis = np.zeros(n)
+        self.total_shares_bought = np.zeros(n)
+        self.total_shares_sold = np.zeros(n)
+        self.total_commission_paid = np.zeros(n)
+        # Mercado inicial "spot" (mantido entre episódios, como no TradingEnvironment)
+        initial_market = self.market_types.index("spot") if "spot" in self.market_types else -1
+        self.current_market = np.full(n, initial_market, dtype=np.int64)
+        self.sentiment_scores = np.zeros(n)  # Score de sentimento atual por ambiente (include_sentiment)
+        self._needs_reset = np.zeros(n, dtype=bool)
+
+    # --- Interface VectorEnv --- #
+
+    def reset(self, *, seed: Optional[int] = None, options: Optional[dict] = None):
+        super().reset(seed=seed)
+        mask = (options or {}).get("reset_mask")
+        mask = np.ones(self.num_envs, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        self._reset_envs(mask)
+        return self._observations(), self._infos()
+
+    def step(self, actions):
+        actions = np.asarray(actions, dtype=np.int64)
+        resetting = self._needs_reset
+        active = ~resetting
+        reward = np.zeros(self.num_envs)
+
+        market_idx, action_type = np.divmod(actions, 3)
+        self.current_market[active] = market_idx[active]
+        price = self._prices()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Comprar 25% do saldo
+            buy = active & (action_type == 1)
+            max_shares = self.balance / (price * (1 + self.commission))
+            shares_to_buy = np.where(buy, np.floor(max_shares * 0.25), 0.0)
+            buying = buy & (shares_to_buy > 0)
+            cost = shares_to_buy * price
+            commission_cost = cost * self.commission
+            total_cost = cost + commission_cost
+            bought = buying & (self.balance >= total_cost)
+            new_total = self.shares_held + shares_to_buy
+            self.balance = np.where(bought, self.balance - total_cost, self.balance)
+            self.cost_basis = np.where(
+                bought, ((self.cost_basis * self.shares_held) + (price * shares_to_buy)) / new_total, self.cost_basis
+            )
+            self.shares_held = np.where(bought, new_total, self.shares_held)
+            self.total_shares_bought += np.where(bought, shares_to_buy, 0.0)
+            self.total_commission_paid += np.where(bought, commission_cost, 0.0)
+            reward[bought] = -0.01  # Pequena penalidade por transação
+            reward[buying & ~bought] = -0.1  # Saldo insuficiente
+            reward[buy & ~buying] = -0.05  # Tentou comprar 0 ações
+
+            # Vender 25% da posição
+            sell = active & (action_type == 2)
+            holding = sell & (self.shares_held > 0)
+            shares_to_sell = np.where(holding, np.floor(self.shares_held * 0.25), 0.0)
+            sold = holding & (shares_to_sell > 0)
+            sale_value = shares_to_sell * price
+            commission_cost = sale_value * self.commission
+            self.balance = np.where(sold, self.balance + (sale_value - commission_cost), self.balance)
+            self.shares_held = np.where(sold, self.shares_held - shares_to_sell, self.shares_held)
+            self.total_shares_sold += np.where(sold, shares_to_sell, 0.0)
+            self.total_commission_paid += np.where(sold, commission_cost, 0.0)
+            profit_pct = np.where(self.cost_basis > 0, (price - self.cost_basis) / self.cost_basis, 0.0)
+            reward[sold] = profit_pct[sold]  # Proporcional ao lucro/prejuízo percentual
+            self.cost_basis[sold & (self.shares_held == 0)] = 0
+            reward[holding & ~sold] = -0.05  # Tentou vender 0 ações
+            reward[sell & ~holding] = -0.1  # Vender sem ter ações
+
+        self.current_step[active] += 1
+        self.episode_steps[active] += 1
+
+        # Fim dos dados: recompensa final pelo retorno total do portfólio
+        terminated = active & (self.current_step >= self.lengths - 1)
+        if terminated.any():
+            final_price = self.closes[self.close_base + self.lengths - 1]
+            return_pct = (self.balance + self.shares_held * final_price) / self.initial_balance - 1
+            reward[terminated] += return_pct[terminated] * 10
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        if self.max_episode_steps:
+            truncated = active & ~terminated & (self.episode_steps >= self.max_episode_steps)
+
+        # Autoreset next-step: quem terminou no passo anterior recomeça agora
+        if resetting.any():
+            self._reset_envs(resetting)
+        self._needs_reset = terminated | truncated
+        return self._observations(), reward, terminated, truncated, self._infos()
+
+    # --- Estado --- #
+
+    def _reset_envs(self, mask: np.ndarray):
+        offsets = np.zeros(self.num_envs, dtype=np.int64)
+        if self.random_start:
+            # Último início possível ainda deixa um passo antes do fim dos dados
+            max_offset = self.lengths - 2 - self.features_window
+            offsets = self.np_random.integers(0, max_offset + 1)
+        self.current_step[mask] = self.features_window + offsets[mask]
+        self.episode_steps[mask] = 0
+        self.balance[mask] = self.initial_balance
+        for array in (self.shares_held, self.cost_basis, self.total_shares_bought,
+                      self.total_shares_sold, self.total_commission_paid):
+            array[mask] = 0
+        self._needs_reset[mask] = False
+
+    def _prices(self) -> np.ndarray:
+        in_range = self.current_step < self.lengths
+        index = self.close_base + np.minimum(self.current_step, self.lengths - 1)
+        return np.where(in_range, self.closes[index], 0.0)
+
+    def _observations(self) -> np.ndarray:
+        window = self.features.shape[1]
+        obs = np.empty((self.num_envs, self.observation_space_size), dtype=np.float32)
+        obs[:, :window] = self.features[self.feature_base + self.current_step - self.features_window]
+        end = window + NUM_POSITION_FEATURES
+        obs[:, window:end] = position_features(self.shares_held, self.balance, self._prices(),
+                                               self.initial_balance, self.mean_closes)
+        if self.include_sentiment:
+            obs[:, end] = np.clip(self.sentiment_scores, -1.0, 1.0)
+            end += 1
+        obs[:, end:] = self.current_market[:, None] == np.arange(len(self.market_types))
+        return obs
+
+    def _infos(self) -> dict:
+        price = self._prices()
+        values = {
+            "step": self.current_step.copy(),
+            "portfolio_value": self.balance + self.shares_held * price,
+            "balance": self.balance.copy(),
+            "shares_held": self.shares_held.copy(),
+            "cost_basis": self.cost_basis.copy(),
+            "total_commission_paid": self.total_commission_paid.copy(),
+            "current_price": price,
+        }
+        infos = {}
+        for key in _INFO_KEYS:
+            infos[key] = values[key]
+            infos[f"_{key}"] = np.ones(self.num_envs, dtype=bool)
+        return infos
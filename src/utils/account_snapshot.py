@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Account Snapshot - saldos, posições e tickers 24h da conta obtidos uma vez por rodada.
+
+O CapitalManager fazia, a cada rodada de alocação, duas chamadas de saldo, mais duas
+para o valor das posições e dois tickers por símbolo (mais saldos de novo no fallback
+da decisão de mercado), e cada worker repetia tudo com o seu próprio CapitalManager.
+O AccountSnapshotService busca o estado da conta em um número fixo de chamadas REST
+(conta spot, saldo futures, tickers 24h bulk de futures e spot) e o reutiliza enquanto
+estiver dentro do TTL. O AccountSnapshot é um objeto simples e picklable: o processo
+principal o repassa aos workers (shared_resources["account_snapshot"]), que semeiam o
+serviço local e calculam suas alocações sem nenhuma chamada adicional.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from utils.logger import setup_logger
+
+log = setup_logger("account_snapshot")
+
+
+@dataclass
+class AccountSnapshot:
+    """Estado da conta em um instante: saldos USDT, posições e volumes 24h por símbolo."""
+    spot_usdt: float = 0.0
+    futures_usdt: float = 0.0
+    futures_wallet_usdt: float = 0.0
+    spot_assets: Dict[str, float] = field(default_factory=dict)  # asset -> free + locked
+    spot_free: Dict[str, float] = field(default_factory=dict)    # asset -> free
+    futures_volume: Dict[str, float] = field(default_factory=dict)
+    spot_volume: Dict[str, float] = field(default_factory=dict)
+    fetched_at: float = 0.0
+    rest_calls: int = 0
+
+    @property
+    def total_usdt(self) -> float:
+        return self.spot_usdt + self.futures_usdt
+
+    @property
+    def positions_value(self) -> float:
+        """Capital já comprometido (mesma estimativa do antigo _get_existing_positions_value)."""
+        value = max(0.0, self.futures_wallet_usdt - self.futures_usdt)
+        # Saldos spot não-USDT relevantes contam como placeholder de 1 USDT cada
+        value += sum(1.0 for asset, amount in self.spot_assets.items() if asset != "USDT" and amount > 1)
+        return value
+
+    def balances(self) -> Dict[str, float]:
+        """Saldos no formato de CapitalManager.get_available_balances (cópia mutável)."""
+        return {
+            "spot_usdt": self.spot_usdt,
+            "futures_usdt": self.futures_usdt,
+            "total_usdt": self.total_usdt,
+        }
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.fetched_at
+
+
+def parse_spot_account(response) -> Dict[str, Dict[str, float]]:
+    """Resposta de GET /api/v3/account (ou dict asset -> saldo) em {asset: {free, locked}}."""
+    assets = {}
+    if response and isinstance(response, dict) and "balances" in response:
+        entries = response["balances"]
+    elif isinstance(response, list):
+        entries = response
+    elif isinstance(response, dict):
+        entries = [{"asset": asset, **(data if isinstance(data, dict) else {})} for asset, data in response.items()]
+    else:
+        entries = []
+    for entry in entries:
+        asset = entry.get("asset")
+        if asset:
+            assets[asset] = {
+                "free": float(entry.get("free", "0") or 0),
+                "locked": float(entry.get("locked", "0") or 0),
+            }
+    return assets
+
+
+def parse_futures_balance(response) -> Dict[str, float]:
+    """Resposta de GET /fapi/v2/balance em {available, wallet} do USDT."""
+    if isinstance(response, list):
+        for asset in response:
+            if asset.get("asset") == "USDT":
+                return {
+                    "available": float(asset.get("availableBalance", "0") or 0),
+                    "wallet": float(asset.get("balance", "0") or 0),
+                }
+    elif isinstance(response, dict):
+        return {
+            "available": float(response.get("availableBalance", "0") or 0),
+            "wallet": float(response.get("totalWalletBalance", "0") or 0),
+        }
+    return {"available": 0.0, "wallet": 0.0}
+
+
+def parse_ticker_volumes(response) -> Dict[str, float]:
+    """Tickers 24h bulk em {symbol: volume}."""
+    if isinstance(response, dict):
+        response = [response]
+    volumes = {}
+    for ticker in response or []:
+        symbol = ticker.get("symbol")
+        if symbol:
+            volumes[symbol] = float(ticker.get("volume", "0") or 0)
+    return volumes
+
+
+class AccountSnapshotService:
+    """Busca o AccountSnapshot em O(1) chamadas REST e o compartilha enquanto estiver fresco."""
+
+    def __init__(self, api_client=None, config: dict = None):
+        self.api_client = api_client
+        advanced = (config or {}).get("capital_management_advanced", {})
+        self.ttl_seconds = float(advanced.get("account_snapshot_ttl_seconds", 30))
+        self._lock = threading.Lock()
+        self._snapshot: Optional[AccountSnapshot] = None
+        self.stats = {"refreshes": 0, "rest_calls": 0, "hits": 0, "seeded": 0}
+
+    def get(self, force_refresh: bool = False) -> AccountSnapshot:
+        """Snapshot atual; refaz as chamadas REST apenas se expirado ou forçado."""
+        with self._lock:
+            snapshot = self._snapshot
+            if not force_refresh and snapshot is not None and snapshot.age() <= self.ttl_seconds:
+                self.stats["hits"] += 1
+                return snapshot
+            snapshot = self._fetch()
+            self._snapshot = snapshot
+            return snapshot
+
+    def seed(self, snapshot: Optional[AccountSnapshot]):
+        """Instala um snapshot recebido de outro processo (mantém o mais recente)."""
+        if snapshot is None:
+            return
+        with self._lock:
+            if self._snapshot is None or snapshot.fetched_at > self._snapshot.fetched_at:
+                self._snapshot = snapshot
+                self.stats["seeded"] += 1
+
+    def invalidate(self):
+        """Força nova leitura na próxima consulta (após transferências/conversões)."""
+        with self._lock:
+            self._snapshot = None
+
+    def _call(self, name: str):
+        """Executa um endpoint do APIClient, contando a chamada; falhas viram None."""
+        self.stats["rest_calls"] += 1
+        try:
+            return getattr(self.api_client, name)()
+        except Exception as e:
+            log.warning(f"Account snapshot: {name} failed: {e}")
+            return None
+
+    def _fetch(self) -> AccountSnapshot:
+        started = self.stats["rest_calls"]
+        spot_assets = parse_spot_account(self._call("get_spot_account_balance"))
+        futures = parse_futures_balance(self._call("get_futures_account_balance"))
+        futures_volume = parse_ticker_volumes(self._call("get_futures_ticker"))
+        spot_volume = parse_ticker_volumes(self._call("get_spot_24hr_ticker"))
+
+        snapshot = AccountSnapshot(
+            spot_usdt=spot_assets.get("USDT", {}).get("free", 0.0),
+            futures_usdt=futures["available"],
+            futures_wallet_usdt=futures["wallet"],
+            spot_assets={asset: data["free"] + data["locked"] for asset, data in spot_assets.items()},
+            spot_free={asset: data["free"] for asset, data in spot_assets.items()},
+            futures_volume=futures_volume,
+            spot_volume=spot_volume,
+            fetched_at=time.time(),
+            rest_calls=self.stats["rest_calls"] - started,
+        )
+        self.stats["refreshes"] += 1
+        log.debug(
+            f"🔄 Account snapshot: Spot ${snapshot.spot_usdt:.2f}, Futures ${snapshot.futures_usdt:.2f}, "
+            f"{len(futures_volume)} futures / {len(spot_volume)} spot tickers ({snapshot.rest_calls} REST calls)"
+        )
+        return snapshot
+
+
+# Global instance for easy access
+_global_account_snapshot_service = None
+
+def get_account_snapshot_service(api_client=None, config: dict = None) -> AccountSnapshotService:
+    """Serviço de snapshot do processo, compartilhado por todos os CapitalManagers."""
+    global _global_account_snapshot_service
+    if _global_account_snapshot_service is None:
+        _global_account_snapshot_service = AccountSnapshotService(api_client, config)
+    elif _global_account_snapshot_service.api_client is None and api_client is not None:
+        _global_account_snapshot_service.api_client = api_client
+    return _global_account_snapshot_service
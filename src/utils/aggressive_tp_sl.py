@@ -2,9 +2,17 @@
 """
 Aggressive Take Profit and Stop Loss Manager
 Implements tight TP/SL for small profits (0.01-0.05 USDT) with trailing stops
+
+Os gatilhos são avaliados por tick: cada posição fica armada num TriggerIndex (níveis
+ordenados por símbolo) e só as posições cujos níveis o preço cruzou são reavaliadas;
+o status das posições vem do ACCOUNT_UPDATE do user data stream. A varredura periódica
+permanece para timeouts, reconciliação e como fallback REST sem streams.
 """
 
+import math
+import queue
 import time
+from bisect import bisect_left, bisect_right
 from decimal import Decimal, ROUND_DOWN, ROUND_UP
 from typing import Dict, Optional, List, Tuple
 from dataclasses import dataclass
@@ -16,6 +24,8 @@ from .logger import setup_logger
 
 log = setup_logger("aggressive_tp_sl")
 
+TP_PROXIMITY_THRESHOLD = 0.002  # 0.2% de proximidade para TP imediato
+
 @dataclass
 class TPSLOrder:
     """Take Profit / Stop Loss order data."""
@@ -34,6 +44,81 @@ class TPSLOrder:
     failed_attempts: int = 0  # Track failed order attempts to prevent infinite loops
     max_failed_attempts: int = 3  # Maximum failed attempts before removing position
 
+
+class TriggerIndex:
+    """
+    Índice de gatilhos de preço por símbolo.
+
+    Cada posição é armada com uma faixa (low, high): o próximo nível abaixo do preço
+    (SL, trailing, perda máxima) e o próximo acima (TP, ativação do trailing). Os níveis
+    ficam em listas ordenadas por lado e um tick devolve só as posições cujos níveis
+    foram cruzados (bisect, O(log n + k)), desarmando-as até a próxima avaliação.
+    """
+
+    def __init__(self):
+        self._lows: Dict[str, Tuple[List[float], List[str]]] = {}   # dispara com preço <= nível
+        self._highs: Dict[str, Tuple[List[float], List[str]]] = {}  # dispara com preço >= nível
+        self._armed: Dict[str, Tuple[str, float, float]] = {}       # key -> (symbol, low, high)
+
+    def __len__(self) -> int:
+        return len(self._armed)
+
+    def band(self, key: str) -> Optional[Tuple[float, float]]:
+        entry = self._armed.get(key)
+        return (entry[1], entry[2]) if entry else None
+
+    def arm(self, symbol: str, key: str, low: float, high: float):
+        """(Re)arma a posição com os níveis informados (-inf/inf = sem gatilho naquele lado)."""
+        self.disarm(key)
+        if low > -math.inf:
+            self._insert(self._lows.setdefault(symbol, ([], [])), low, key)
+        if high < math.inf:
+            self._insert(self._highs.setdefault(symbol, ([], [])), high, key)
+        self._armed[key] = (symbol, low, high)
+
+    def disarm(self, key: str) -> bool:
+        entry = self._armed.pop(key, None)
+        if entry is None:
+            return False
+        symbol, low, high = entry
+        if low > -math.inf:
+            self._remove(self._lows[symbol], low, key)
+        if high < math.inf:
+            self._remove(self._highs[symbol], high, key)
+        return True
+
+    def crossed(self, symbol: str, price: float) -> List[str]:
+        """Posições cujo nível inferior (>= preço) ou superior (<= preço) foi cruzado."""
+        fired = []
+        lows = self._lows.get(symbol)
+        if lows and lows[0] and lows[0][-1] >= price:
+            fired.extend(lows[1][bisect_left(lows[0], price):])
+        highs = self._highs.get(symbol)
+        if highs and highs[0] and highs[0][0] <= price:
+            fired.extend(highs[1][:bisect_right(highs[0], price)])
+        for key in fired:
+            self.disarm(key)
+        return fired
+
+    @staticmethod
+    def _insert(book: Tuple[List[float], List[str]], level: float, key: str):
+        levels, keys = book
+        i = bisect_right(levels, level)
+        levels.insert(i, level)
+        keys.insert(i, key)
+
+    @staticmethod
+    def _remove(book: Tuple[List[float], List[str]], level: float, key: str):
+        levels, keys = book
+        i = bisect_left(levels, level)
+        while i < len(levels) and levels[i] == level:
+            if keys[i] == key:
+                del levels[i]
+                del keys[i]
+                return
+            i += 1
+
+
 class AggressiveTPSLManager:
     """
     Manages aggressive Take Profit and Stop Loss orders for small profits.
@@ -71,6 +156,23 @@ class AggressiveTPSLManager:
         self.running = False
         self.monitor_thread: Optional[Thread] = None
         
+        # Gatilhos por tick: níveis de TP/SL/trailing indexados por símbolo e avaliados a cada
+        # preço do stream; status das posições vem do ACCOUNT_UPDATE (user data stream)
+        self.price_stream_name = tp_sl_config.get('price_stream', 'aggTrade')
+        self.price_stale_seconds = tp_sl_config.get('price_stale_seconds', 5)
+        self.stream_sweep_interval = tp_sl_config.get('stream_sweep_interval_seconds', 30)
+        self.trailing_step_percentage = Decimal(str(tp_sl_config.get('trailing_step_percentage', 0.0005)))
+        self.trigger_index = TriggerIndex()
+        self.trigger_lock = Lock()  # separado de self.lock: o tick nunca espera chamadas REST
+        self.trigger_events: "queue.Queue[Tuple[Optional[str], Optional[float]]]" = queue.Queue()
+        self.last_prices: Dict[str, Tuple[float, float]] = {}            # symbol -> (preço, timestamp)
+        self.position_amounts: Dict[str, Tuple[Decimal, int]] = {}       # symbol -> (positionAmt, updateTime)
+        self._positions_synced = False
+        self.price_stream = None
+        self.account_stream = None
+        self._stream_symbols = set()
+        self.trigger_stats = {"ticks": 0, "triggered": 0, "account_updates": 0, "sweeps": 0}
+        
         log.info(
             f"AggressiveTPSLManager initialized - SL AGRESSIVO DE {self.default_sl_percentage*100:.1f}% ATIVADO - "
             f"Target profits: ${self.min_profit_usdt}-${self.max_profit_usdt} USDT, "
@@ -95,12 +197,94 @@ class AggressiveTPSLManager:
     def stop_monitoring(self):
         """Stop the TP/SL monitoring thread."""
         self.running = False
+        self.trigger_events.put((None, None))  # acorda o loop bloqueado na fila
         if self.monitor_thread:
             tp_sl_config = self.config['aggressive_tp_sl']
             shutdown_timeout = tp_sl_config['shutdown_timeout_seconds']
             self.monitor_thread.join(timeout=shutdown_timeout)
         log.info("🛑 Aggressive TP/SL monitoring stopped")
     
+    def attach_streams(self, price_stream=None, account_stream=None):
+        """
+        Conecta as fontes de eventos que substituem o polling.
+        
+        Args:
+            price_stream: SimpleBinanceWebSocket de futuros (um stream de preço por símbolo monitorado)
+            account_stream: UserDataStream de futuros (ACCOUNT_UPDATE -> status das posições)
+        """
+        if account_stream is not None:
+            self.account_stream = account_stream
+            account_stream.add_account_callback(self.on_account_update)
+            try:
+                positions = self.api_client.get_futures_positions()
+                if positions:
+                    self._sync_positions(positions)
+            except Exception as e:
+                log.error(f"Error seeding position cache: {e}")
+        if price_stream is not None:
+            self.price_stream = price_stream
+            with self.lock:
+                symbols = {order.symbol for order in self.active_orders.values()}
+            for symbol in symbols:
+                self._watch_symbol(symbol)
+        log.info(
+            f"⚡ TP/SL event-driven: price stream {'ON' if self.price_stream else 'OFF'} "
+            f"({self.price_stream_name}), account updates {'ON' if self.account_stream else 'OFF'}"
+        )
+    
+    def on_stream_message(self, data):
+        """Handler do stream de preço: aggTrade/markPrice ('p'), ticker ('c') ou bookTicker (mid)."""
+        for event in data if isinstance(data, list) else (data,):
+            symbol = event.get("s")
+            price = event.get("p") or event.get("c")
+            if price is None and "b" in event and "a" in event:
+                price = (float(event["b"]) + float(event["a"])) / 2
+            if symbol and price:
+                self.on_price(symbol, float(price))
+    
+    def on_price(self, symbol: str, price: float):
+        """Tick de preço: enfileira apenas as posições cujos níveis foram cruzados."""
+        self.last_prices[symbol] = (price, time.time())
+        self.trigger_stats["ticks"] += 1
+        with self.trigger_lock:
+            fired = self.trigger_index.crossed(symbol, price)
+        for position_id in fired:
+            self.trigger_events.put((position_id, price))
+        self.trigger_stats["triggered"] += len(fired)
+    
+    def on_account_update(self, update: Dict):
+        """ACCOUNT_UPDATE: atualiza o cache de posições, reavalia as alteradas e monitora as novas."""
+        self.trigger_stats["account_updates"] += 1
+        changed = {}
+        for position in update.get("positions", []):
+            if position.get("positionSide", "BOTH") != "BOTH":
+                continue  # cache assume modo one-way (sinal de positionAmt = lado)
+            symbol = position["symbol"]
+            amount = Decimal(str(position.get("positionAmt", "0")))
+            cached = self.position_amounts.get(symbol)
+            if cached is None or cached[0] != amount:
+                changed[symbol] = (amount, Decimal(str(position.get("entryPrice", "0"))))
+            self.position_amounts[symbol] = (amount, int(position.get("updateTime") or 0))
+        
+        if not changed:
+            return
+        with self.lock:
+            affected = [pid for pid, order in self.active_orders.items() if order.symbol in changed]
+            monitored = {order.symbol for order in self.active_orders.values()}
+        for position_id in affected:
+            with self.trigger_lock:
+                self.trigger_index.disarm(position_id)
+            self.trigger_events.put((position_id, None))
+        
+        # Posições abertas por outros processos (workers) chegam só pelo stream: monitorar pelo ep
+        for symbol, (amount, entry_price) in changed.items():
+            if amount == 0 or entry_price <= 0 or symbol in monitored:
+                continue
+            position_side = "LONG" if amount > 0 else "SHORT"
+            position_id = self.add_position(symbol, position_side, entry_price, abs(amount))
+            if position_id:
+                log.info(f"📡 ACCOUNT_UPDATE: nova posição {symbol} {position_side} {abs(amount)} @ {entry_price}")
+    
     def add_position(self, symbol: str, position_side: str, entry_price: Decimal, 
                     quantity: Decimal, custom_tp_percentage: Optional[Decimal] = None,
                     custom_sl_percentage: Optional[Decimal] = None) -> str:
@@ -177,6 +361,8 @@ class AggressiveTPSLManager:
         
         # Place initial TP and SL orders
         self._place_tp_sl_orders(position_id, tpsl_order)
+        self._watch_symbol(symbol)
+        self._rearm(position_id)
         
         # Update pair logger with TP/SL prices
         try:
@@ -212,32 +398,121 @@ class AggressiveTPSLManager:
                     self._cancel_order(tpsl_order.symbol, tpsl_order.sl_order_id)
                 
                 del self.active_orders[position_id]
+                still_watched = any(o.symbol == tpsl_order.symbol for o in self.active_orders.values())
                 log.info(f"🗑️ Removed position from TP/SL monitoring: {position_id}")
+            else:
+                return
+        
+        with self.trigger_lock:
+            self.trigger_index.disarm(position_id)
+        if not still_watched:
+            self._unwatch_symbol(tpsl_order.symbol)
+    
+    def _watch_symbol(self, symbol: str):
+        """Inscreve o stream de preço do símbolo (uma vez por símbolo monitorado)."""
+        if self.price_stream is None or symbol in self._stream_symbols:
+            return
+        self._stream_symbols.add(symbol)
+        self.price_stream.subscribe_stream(f"{symbol.lower()}@{self.price_stream_name}", self.on_stream_message)
+    
+    def _unwatch_symbol(self, symbol: str):
+        if self.price_stream is None or symbol not in self._stream_symbols:
+            return
+        self._stream_symbols.discard(symbol)
+        self.price_stream.unsubscribe_stream(f"{symbol.lower()}@{self.price_stream_name}")
+        self.last_prices.pop(symbol, None)
+    
+    def _trigger_band(self, tpsl_order: TPSLOrder, price: float) -> Tuple[float, float]:
+        """Faixa (low, high) em torno do preço: próximos níveis que exigem reavaliar a posição."""
+        entry = float(tpsl_order.entry_price)
+        tp = float(tpsl_order.tp_price)
+        stop = float(tpsl_order.trailing_stop_price or tpsl_order.sl_price)
+        # Trailing: ativar/reposicionar só quando o stop puder avançar pelo menos trailing_step
+        step = float(self.trailing_step_percentage) * entry
+        trailing_move = float(tpsl_order.trailing_distance) + step
+        # Perda de max_loss_percentage do capital investido (ver _should_close_losing_position)
+        leverage = float(self.config.get('grid', {}).get('futures', {}).get('leverage', 3))
+        loss_move = entry / leverage * float(self.max_loss_percentage)
+        
+        if tpsl_order.position_side == "LONG":
+            trailing = entry + step if tpsl_order.trailing_stop_price is None else stop + trailing_move
+            upper = (trailing, tp / (1 + TP_PROXIMITY_THRESHOLD), tp)
+            lower = (stop, entry - loss_move)
+        else:  # SHORT
+            trailing = entry - step if tpsl_order.trailing_stop_price is None else stop - trailing_move
+            upper = (stop, entry + loss_move)
+            lower = (trailing, tp / (1 - TP_PROXIMITY_THRESHOLD), tp)
+        
+        high = min((level for level in upper if level > price), default=math.inf)
+        low = max((level for level in lower if level < price), default=-math.inf)
+        return low, high
+    
+    def _rearm(self, position_id: str, price: Optional[float] = None):
+        """Arma a posição no índice em torno do último preço conhecido."""
+        with self.lock:
+            tpsl_order = self.active_orders.get(position_id)
+        if tpsl_order is None:
+            return
+        if price is None:
+            tick = self.last_prices.get(tpsl_order.symbol)
+            price = tick[0] if tick else float(tpsl_order.entry_price)
+        low, high = self._trigger_band(tpsl_order, price)
+        with self.trigger_lock:
+            if position_id in self.active_orders:
+                self.trigger_index.arm(tpsl_order.symbol, position_id, low, high)
     
     def _monitor_loop(self):
-        """Main monitoring loop for TP/SL orders."""
+        """Main monitoring loop: gatilhos cruzados pelo stream + varredura periódica."""
         log.info("🔄 TP/SL monitoring loop started")
+        next_sweep = 0.0
         
         while self.running:
             try:
-                current_time = time.time()
-                
-                with self.lock:
-                    positions_to_update = list(self.active_orders.items())
+                now = time.time()
+                if now >= next_sweep:
+                    # Varredura: timeouts, reconciliação e fallback REST quando não há stream de preço
+                    with self.lock:
+                        positions_to_update = list(self.active_orders.items())
+                    
+                    for position_id, tpsl_order in positions_to_update:
+                        self._evaluate_position(position_id, tpsl_order, now)
+                    
+                    self.trigger_stats["sweeps"] += 1
+                    next_sweep = time.time() + self._sweep_interval()
+                    continue
                 
-                for position_id, tpsl_order in positions_to_update:
-                    try:
-                        self._update_position(position_id, tpsl_order, current_time)
-                    except Exception as e:
-                        log.error(f"Error updating position {position_id}: {e}")
+                try:
+                    position_id, price = self.trigger_events.get(timeout=next_sweep - now)
+                except queue.Empty:
+                    continue
                 
-                time.sleep(self.update_interval)
+                with self.lock:
+                    tpsl_order = self.active_orders.get(position_id)
+                if tpsl_order is not None:
+                    self._evaluate_position(position_id, tpsl_order, time.time(), price)
                 
             except Exception as e:
                 log.error(f"Error in TP/SL monitor loop: {e}")
                 time.sleep(self.update_interval)
     
-    def _update_position(self, position_id: str, tpsl_order: TPSLOrder, current_time: float):
+    def _sweep_interval(self) -> float:
+        """Com stream de preço ativo a varredura é só reconciliação (timeouts, eventos perdidos)."""
+        if self.price_stream is not None and self.price_stream.is_running:
+            return self.stream_sweep_interval
+        return self.update_interval
+    
+    def _evaluate_position(self, position_id: str, tpsl_order: TPSLOrder, current_time: float,
+                           price: Optional[float] = None):
+        """Avalia a posição (com o preço do tick, se houver) e rearma seus gatilhos."""
+        try:
+            current_price = Decimal(str(price)) if price is not None else None
+            self._update_position(position_id, tpsl_order, current_time, current_price)
+        except Exception as e:
+            log.error(f"Error updating position {position_id}: {e}")
+        self._rearm(position_id, price)
+    
+    def _update_position(self, position_id: str, tpsl_order: TPSLOrder, current_time: float,
+                         current_price: Optional[Decimal] = None):
         """Update a single position's TP/SL orders."""
         try:
             # Check if position has too many failed attempts
@@ -246,8 +521,9 @@ class AggressiveTPSLManager:
                 self.remove_position(position_id)
                 return
                 
-            # Get current price
-            current_price = self._get_current_price(tpsl_order.symbol)
+            # Preço do tick que cruzou o gatilho; na varredura, último do stream ou REST
+            if current_price is None:
+                current_price = self._latest_price(tpsl_order.symbol)
             if not current_price:
                 return
             
@@ -298,7 +574,7 @@ class AggressiveTPSLManager:
         """Update trailing stop price and order with enhanced position verification."""
         try:
             # CRITICAL: Re-verify position exists before any operations
-            current_position = self.api_client.get_futures_position(tpsl_order.symbol)
+            current_position = self._current_position(tpsl_order.symbol)
             if not current_position:
                 log.warning(f"📈 Position {position_id} not found during trailing stop update")
                 self.remove_position(position_id)
@@ -367,7 +643,7 @@ class AggressiveTPSLManager:
         """Check if TP or SL should be manually triggered with position verification."""
         try:
             # CRITICAL: Verify position still exists before triggering TP/SL
-            current_position = self.api_client.get_futures_position(tpsl_order.symbol)
+            current_position = self._current_position(tpsl_order.symbol)
             if isinstance(current_position, list):
                 current_position = current_position[0] if current_position else None
                 
@@ -376,7 +652,7 @@ class AggressiveTPSLManager:
                 self.remove_position(position_id)
                 return
                 
-            proximity_threshold = 0.002  # 0.2% de proximidade para TP imediato
+            proximity_threshold = TP_PROXIMITY_THRESHOLD
             
             if tpsl_order.position_side == "LONG":
                 # Check TP proximity for immediate execution
@@ -441,7 +717,7 @@ class AggressiveTPSLManager:
             log.info(f"🎯 Attempting to place TP/SL orders for {position_id}")
             
             # CRITICAL: Get current actual position size before placing orders
-            current_position = self.api_client.get_futures_position(tpsl_order.symbol)
+            current_position = self._current_position(tpsl_order.symbol)
             if not current_position:
                 log.warning(f"🎯 Position {position_id} not found, skipping TP/SL orders")
                 return
@@ -477,7 +753,7 @@ class AggressiveTPSLManager:
             if current_price:
                 # Calcular distância do TP em relação ao preço atual
                 tp_distance_percentage = abs(float(tpsl_order.tp_price) - float(current_price)) / float(current_price)
-                proximity_threshold = 0.002  # 0.2% de proximidade
+                proximity_threshold = TP_PROXIMITY_THRESHOLD
                 
                 if tp_distance_percentage <= proximity_threshold:
                     # TP PRÓXIMO: Usar ordem de MERCADO para garantir lucro imediato
@@ -647,7 +923,7 @@ class AggressiveTPSLManager:
             log.warning(f"🎯🚀 EXECUTANDO TP IMEDIATO para {position_id}")
             
             # CRITICAL: Get current actual position size
-            current_position = self.api_client.get_futures_position(tpsl_order.symbol)
+            current_position = self._current_position(tpsl_order.symbol)
             if not current_position:
                 log.warning(f"🎯🚫 Position {position_id} not found during immediate TP")
                 self.remove_position(position_id)
@@ -732,6 +1008,46 @@ class AggressiveTPSLManager:
         
         return None
     
+    def _latest_price(self, symbol: str) -> Optional[Decimal]:
+        """Último preço do stream se recente; caso contrário, REST."""
+        tick = self.last_prices.get(symbol)
+        if tick and time.time() - tick[1] <= self.price_stale_seconds:
+            return Decimal(str(tick[0]))
+        return self._get_current_price(symbol)
+    
+    def _account_stream_healthy(self) -> bool:
+        return self.account_stream is not None and self.account_stream.is_healthy()
+    
+    def _sync_positions(self, positions: List[Dict]):
+        """Atualiza o cache com o positionRisk (REST), sem sobrescrever eventos mais novos."""
+        for pos in positions:
+            symbol = pos.get("symbol")
+            if not symbol or pos.get("positionSide", "BOTH") != "BOTH":
+                continue
+            update_time = int(pos.get("updateTime") or 0)
+            cached = self.position_amounts.get(symbol)
+            if cached is None or update_time >= cached[1]:
+                self.position_amounts[symbol] = (Decimal(str(pos.get("positionAmt", 0))), update_time)
+        # Só confia no cache se nenhum evento foi perdido desde a foto REST
+        self._positions_synced = self._account_stream_healthy()
+    
+    def _cached_position_amount(self, symbol: str) -> Optional[Decimal]:
+        """positionAmt do cache do ACCOUNT_UPDATE, ou None se o stream não é confiável agora."""
+        if not self._account_stream_healthy():
+            self._positions_synced = False  # eventos podem ter sido perdidos: ressincronizar via REST
+            return None
+        if not self._positions_synced:
+            return None
+        cached = self.position_amounts.get(symbol)
+        return cached[0] if cached else None
+    
+    def _current_position(self, symbol: str) -> Optional[Dict]:
+        """Posição atual (cache do user data stream com fallback para get_futures_position)."""
+        amount = self._cached_position_amount(symbol)
+        if amount is not None:
+            return {"symbol": symbol, "positionAmt": str(amount)}
+        return self.api_client.get_futures_position(symbol)
+    
     def _detect_existing_positions(self):
         """Detect and add existing futures positions to TP/SL monitoring."""
         try:
@@ -739,6 +1055,7 @@ class AggressiveTPSLManager:
             if not positions:
                 log.info("No existing positions found to monitor")
                 return
+            self._sync_positions(positions)
                 
             existing_count = 0
             for pos in positions:
@@ -868,10 +1185,15 @@ class AggressiveTPSLManager:
                 return None
     
     def _is_position_open(self, symbol: str, position_side: str) -> bool:
-        """Check if position is still open."""
+        """Check if position is still open (cache do ACCOUNT_UPDATE, REST como fallback)."""
+        amount = self._cached_position_amount(symbol)
+        if amount is not None:
+            return amount != 0 and ("LONG" if amount > 0 else "SHORT") == position_side
+        
         try:
             positions = self.api_client.get_futures_positions()
             if positions:
+                self._sync_positions(positions)
                 for pos in positions:
                     position_amt = float(pos.get("positionAmt", 0))
                     if pos.get("symbol") == symbol and position_amt != 0:
@@ -935,7 +1257,7 @@ class AggressiveTPSLManager:
         """Força o fechamento de uma posição perdedora."""
         try:
             # CRITICAL: Get current actual position size before closing
-            current_position = self.api_client.get_futures_position(tpsl_order.symbol)
+            current_position = self._current_position(tpsl_order.symbol)
             if not current_position:
                 log.warning(f"🚫 Force close CANCELADO: Posição {tpsl_order.symbol} não encontrada")
                 self.remove_position(position_id)
@@ -3,10 +3,13 @@
 # Assuming logger is correctly set up in __init__.py or similar
 # from ..utils.logger import log
 # For now, use basic logging
+import json
 import logging
 import os
 import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 # from decimal import Decimal # Unused import
@@ -16,6 +19,8 @@ from binance.client import Client
 from binance.exceptions import BinanceAPIException, BinanceRequestException
 from dotenv import load_dotenv
 
+from utils.rate_limiter import get_global_rate_limiter, request_profile
+
 log = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
@@ -60,6 +65,10 @@ TESTNET_API_SECRET = os.getenv("BINANCE_TESTNET_API_SECRET", API_SECRET)
 MAX_RETRIES = 5
 RETRY_DELAY_SECONDS = [1, 2, 4, 8, 16]  # Exponential backoff
 
+# Limites dos endpoints batchOrders da Binance Futures
+MAX_BATCH_ORDERS = 5
+MAX_BATCH_CANCEL = 10
+
 
 class APIClient:
     """Lida com comunicação com as APIs da Binance (Spot e Futuros).
@@ -88,6 +97,12 @@ class APIClient:
         self.max_retries = api_config['max_retries']
         self.retry_delays = api_config['retry_delays']
         self.timeout_seconds = api_config['timeout_seconds']
+
+        # Ordens em lote (futures batchOrders): lotes enviados em paralelo
+        batch_config = api_config.get('batch_orders', {})
+        self.batch_pipeline_workers = max(1, int(batch_config.get('pipeline_workers', 4)))
+        # Última resposta HTTP por thread: headers de weight sem corrida entre lotes paralelos
+        self._thread_state = threading.local()
         
         # Time synchronization
         self._server_time_offset = 0
@@ -122,6 +137,7 @@ class APIClient:
                 )
                 # Conecta baseado no modo
                 self.client = Client(key, secret, testnet=self.use_testnet)
+                self._install_response_hook()
                 
                 # Testa conexão com Futures
                 self.client.futures_ping()
@@ -149,6 +165,30 @@ class APIClient:
                 self.client = None
                 break
 
+    def _install_response_hook(self):
+        """Guarda cada resposta HTTP na thread que fez a requisição.
+
+        `client.response` é compartilhado pelo cliente inteiro; com lotes em paralelo ele pode
+        conter a resposta de outra thread quando os headers de weight são lidos.
+        """
+        session = getattr(self.client, "session", None)
+        if session is None or not hasattr(session, "hooks"):
+            return
+
+        def _capture(response, *args, **kwargs):
+            self._thread_state.response = response
+            return response
+
+        session.hooks.setdefault("response", []).append(_capture)
+
+    def _last_response(self):
+        """Resposta HTTP da última requisição desta thread (fallback: client.response)."""
+        thread_state = getattr(self, "_thread_state", None)
+        response = getattr(thread_state, "response", None) if thread_state is not None else None
+        if response is None:
+            response = getattr(self.client, "response", None)
+        return response
+
     def _get_cache_key(self, method, *args, **kwargs):
         """Generate a cache key for the API request."""
         method_name = getattr(method, '__name__', str(method))
@@ -373,8 +413,13 @@ class APIClient:
             log.error(f"Error validating/normalizing parameters: {e}")
             return None
 
-    def _make_request(self, method, *args, **kwargs):
-        """Faz uma requisição à API com tratamento de erros, tentativas e simulação no modo Shadow."""
+    def _make_request(self, method, *args, idempotent=True, **kwargs):
+        """Faz uma requisição à API com tratamento de erros, tentativas e simulação no modo Shadow.
+
+        Com idempotent=False (ex.: POST batchOrders) só há nova tentativa quando a Binance
+        recusou a requisição (assinatura, rate limit); erros de envio incerto não são repetidos
+        para não duplicar ordens já aceitas.
+        """
         if not self.client:
             log.error("Cliente da API não está conectado. Tentando reconectar...")
             self._connect()
@@ -414,7 +459,18 @@ class APIClient:
                     if hasattr(self, '_server_time_offset'):
                         log.debug(f"  Server time offset: {self._server_time_offset}ms")
                 
+                # Orçamento de request weight compartilhado entre processos (ordens têm prioridade)
+                rate_limiter = get_global_rate_limiter(self.config)
+                market, weight, priority, order_count = request_profile(method_name, kwargs)
+                if rate_limiter is not None:
+                    rate_limiter.acquire(weight, priority, market, order_count)
+
+                thread_state = getattr(self, "_thread_state", None)
+                if thread_state is not None:
+                    thread_state.response = None
                 response = method(*args, **kwargs)
+                if rate_limiter is not None:
+                    rate_limiter.update_from_headers(getattr(self._last_response(), "headers", None), market)
                 method_name = getattr(method, '__name__', str(method))
                 log.debug(
                     f"API call successful: {method_name} args={args} kwargs={kwargs}"
@@ -508,17 +564,23 @@ class APIClient:
                         f"Order value too small. Increase quantity or check minimum notional requirements."
                     )
                     return None  # Don't retry min notional errors
-                elif error_code == -1003:
+                elif error_code == -1003 or getattr(e, 'status_code', None) in (418, 429):
                     # Rate limiting error - wait longer and use cached data if available
                     log.warning(
                         f"RATE LIMIT ERROR (Code -1003): {e.message} - "
                         f"Too many requests. Using cached data if available."
                     )
+                    # Pausar TODOS os processos pelo Retry-After informado pela Binance
+                    rate_limiter = get_global_rate_limiter(self.config)
+                    if rate_limiter is not None:
+                        error_response = getattr(e, 'response', None)
+                        retry_after = getattr(error_response, 'headers', {}).get('Retry-After') if error_response is not None else None
+                        rate_limiter.penalize(request_profile(method_name, kwargs)[0], retry_after)
                     # For rate limits, try to return cached data even if slightly stale
+                    api_config = self.config['api_client']
                     if cache_key in self._cache:
                         cached_time, cached_response = self._cache[cache_key]
                         # Accept cache up to configured time old for rate limited requests
-                        api_config = self.config['api_client']
                         cache_tolerance_minutes = api_config['rate_limit_cache_tolerance_minutes']
                         if datetime.now() - cached_time < timedelta(minutes=cache_tolerance_minutes):
                             log.info("Returning stale cached data due to rate limiting")
@@ -539,6 +601,9 @@ class APIClient:
                 log.warning(
                     f"API Error on attempt {retries + 1}: {e} (Code: {error_code}, Message: {e.message})"
                 )
+                if not idempotent:
+                    log.error(f"Not retrying non-idempotent call {method_name} (outcome unknown): {e}")
+                    return None
                 retries += 1
                 if retries < MAX_RETRIES:
                     delay = RETRY_DELAY_SECONDS[retries - 1]
@@ -554,6 +619,10 @@ class APIClient:
                 log.warning(
                     f"Connection Error on attempt {retries + 1}: {e}. Attempting reconnect..."
                 )
+                if not idempotent:
+                    log.error(f"Not retrying non-idempotent call {method_name} after ConnectionError")
+                    self._connect()
+                    return None
                 self._connect()
                 if not self.client:
                     log.error(
@@ -686,6 +755,79 @@ class APIClient:
         """Alias for cancel_futures_order for compatibility."""
         return self.cancel_futures_order(symbol=symbol, orderId=orderId)
 
+    def _run_batches(self, method, batches, idempotent=True):
+        """Envia os lotes em paralelo (pipeline) e retorna as respostas na ordem dos lotes."""
+        def send(batch):
+            return self._make_request(method, idempotent=idempotent, **batch)
+
+        if len(batches) == 1 or self.batch_pipeline_workers == 1:
+            return [send(batch) for batch in batches]
+        workers = min(self.batch_pipeline_workers, len(batches))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(send, batches))
+
+    def place_futures_batch_orders(self, orders):
+        """Coloca várias ordens via POST /fapi/v1/batchOrders (até 5 por requisição).
+
+        `orders` é uma lista de dicts no formato da API (symbol, side, type, quantity, price,
+        timeInForce...). Retorna uma lista alinhada com `orders`: a resposta da ordem ou um
+        dict {"code", "msg"} quando aquela ordem específica foi rejeitada. Lotes com resultado
+        incerto (timeout, erro de servidor) não são reenviados: viram None para cada ordem.
+        """
+        if not orders:
+            return []
+        normalized = []
+        for order in orders:
+            params = self._validate_and_normalize_params(dict(order))
+            if params is None:
+                log.error(f"Parameter validation failed for batch order: {order}")
+                return [None] * len(orders)
+            normalized.append(params)
+
+        batches = [
+            {"batchOrders": normalized[i:i + MAX_BATCH_ORDERS]}
+            for i in range(0, len(normalized), MAX_BATCH_ORDERS)
+        ]
+        log.info(
+            f"Placing {len(orders)} orders in {len(batches)} batch request(s) ({self.operation_mode.upper()})"
+        )
+        results = []
+        for batch, response in zip(batches, self._run_batches(
+            self.client.futures_place_batch_order, batches, idempotent=False
+        )):
+            size = len(batch["batchOrders"])
+            if isinstance(response, list) and len(response) == size:
+                results.extend(response)
+            else:
+                log.error(f"Batch order request failed: {response}")
+                results.extend([None] * size)
+        return results
+
+    def cancel_futures_batch_orders(self, symbol, order_ids):
+        """Cancela ordens via DELETE /fapi/v1/batchOrders (até 10 por requisição).
+
+        Retorna uma lista alinhada com `order_ids` (resposta da ordem ou dict {"code", "msg"}).
+        """
+        if not order_ids:
+            return []
+        order_ids = list(order_ids)
+        batches = [
+            {"symbol": symbol, "orderIdList": json.dumps([int(oid) for oid in order_ids[i:i + MAX_BATCH_CANCEL]])}
+            for i in range(0, len(order_ids), MAX_BATCH_CANCEL)
+        ]
+        log.info(
+            f"Cancelling {len(order_ids)} orders for {symbol} in {len(batches)} batch request(s) ({self.operation_mode.upper()})"
+        )
+        results = []
+        for batch, response in zip(batches, self._run_batches(self.client.futures_cancel_orders, batches)):
+            size = len(json.loads(batch["orderIdList"]))
+            if isinstance(response, list) and len(response) == size:
+                results.extend(response)
+            else:
+                log.error(f"Batch cancel request failed for {symbol}: {response}")
+                results.extend([None] * size)
+        return results
+
     def get_futures_order_status(self, symbol, orderId):
         # In Shadow mode, this won"t work for simulated orders unless we cache them.
         # GridLogic will need to manage simulated order state.
@@ -732,6 +874,29 @@ class APIClient:
         params = {"symbol": symbol} if symbol else {}
         return self._make_request(self.client.get_open_orders, **params)
 
+    # --- User Data Stream (listenKey) --- #
+
+    def start_user_data_stream(self, market_type="futures"):
+        """Cria um listenKey para o user data stream (eventos de ordens em tempo real)."""
+        log.info(f"Creating user data stream listenKey ({market_type.upper()})")
+        if market_type == "futures":
+            return self._make_request(self.client.futures_stream_get_listen_key)
+        return self._make_request(self.client.stream_get_listen_key)
+
+    def keepalive_user_data_stream(self, listen_key, market_type="futures"):
+        """Renova o listenKey (expira após 60 minutos sem keepalive)."""
+        log.debug(f"Keepalive user data stream ({market_type.upper()})")
+        if market_type == "futures":
+            return self._make_request(self.client.futures_stream_keepalive, listenKey=listen_key)
+        return self._make_request(self.client.stream_keepalive, listenKey=listen_key)
+
+    def close_user_data_stream(self, listen_key, market_type="futures"):
+        """Invalida o listenKey."""
+        log.info(f"Closing user data stream listenKey ({market_type.upper()})")
+        if market_type == "futures":
+            return self._make_request(self.client.futures_stream_close, listenKey=listen_key)
+        return self._make_request(self.client.stream_close, listenKey=listen_key)
+
     def get_futures_klines(
         self, symbol, interval, startTime=None, endTime=None, limit=500
     ):
@@ -850,6 +1015,12 @@ class APIClient:
             # Use futures_ticker when no symbol is specified (get all tickers)
             return self._make_request(self.client.futures_ticker)
 
+    def get_futures_mark_price(self, symbol=None):
+        """Mark price / funding (premiumIndex). Sem símbolo retorna todos em uma única chamada."""
+        log.debug(f"Getting mark price ({self.operation_mode.upper()}): symbol={symbol}")
+        params = {"symbol": symbol} if symbol else {}
+        return self._make_request(self.client.futures_mark_price, **params)
+
     def get_exchange_info(self):
         log.debug(f"Getting exchange info ({self.operation_mode.upper()})")
         return self._make_request(self.client.futures_exchange_info)
@@ -943,6 +1114,12 @@ class APIClient:
         else:
             return self._make_request(self.client.get_all_tickers)
 
+    def get_spot_24hr_ticker(self, symbol=None):
+        """Estatísticas 24h do mercado Spot (com volume). Sem símbolo retorna todos em uma chamada."""
+        log.debug(f"Obtendo ticker 24h Spot ({self.operation_mode.upper()}): symbol={symbol}")
+        params = {"symbol": symbol} if symbol else {}
+        return self._make_request(self.client.get_ticker, **params)
+
     def get_account_balance(self):
         """Obtém saldo da conta Spot."""
         log.debug(f"Obtendo saldo da conta Spot ({self.operation_mode.upper()})")
@@ -1,13 +1,17 @@
 # Async API Client - High-performance asynchronous API operations
 import asyncio
+import contextlib
 import time
 from typing import Dict, List, Optional, Tuple, Union
 
 import aiohttp
+import numpy as np
 import pandas as pd
 from decimal import Decimal
 
+from utils.kline_store import parse_klines_array
 from utils.logger import setup_logger
+from utils.rate_limiter import get_global_rate_limiter, rest_path_profile
 
 log = setup_logger("async_client")
 
@@ -119,17 +123,30 @@ class AsyncAPIClient:
         self,
         symbol_intervals: List[Tuple[str, str]],
         limit: int = 100,
-        market_type: str = "futures"
-    ) -> Dict[str, pd.DataFrame]:
-        """Batch fetch kline data for multiple symbol-interval pairs."""
-        tasks = []
-        
-        for symbol, interval in symbol_intervals:
-            task = self._fetch_single_klines(symbol, interval, limit, market_type)
-            tasks.append(task)
+        market_type: str = "futures",
+        as_array: bool = False,
+        max_concurrency: Optional[int] = None,
+        limits: Optional[Dict[str, int]] = None
+    ) -> Dict[str, Union[pd.DataFrame, np.ndarray]]:
+        """Batch fetch kline data for multiple symbol-interval pairs.
+        
+        as_array: retorna registros NumPy (KLINE_DTYPE) em vez de DataFrames.
+        max_concurrency: requisições simultâneas em voo (o orçamento de weight fica com o rate limiter).
+        limits: limite por símbolo (ex.: só os candles que faltam no KlineStore).
+        """
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        
+        async def fetch(symbol, interval):
+            symbol_limit = (limits or {}).get(symbol, limit)
+            if semaphore is None:
+                return await self._fetch_single_klines(symbol, interval, symbol_limit, market_type, as_array)
+            async with semaphore:
+                return await self._fetch_single_klines(symbol, interval, symbol_limit, market_type, as_array)
         
         # Execute all requests concurrently
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        results = await asyncio.gather(
+            *(fetch(symbol, interval) for symbol, interval in symbol_intervals), return_exceptions=True
+        )
         
         # Process results
         kline_data = {}
@@ -141,7 +158,7 @@ class AsyncAPIClient:
                 log.error(f"Error fetching klines for {symbol} {interval}: {result}")
                 continue
             
-            if result:
+            if result is not None and len(result):
                 kline_data[key] = result
         
         return kline_data
@@ -151,8 +168,9 @@ class AsyncAPIClient:
         symbol: str,
         interval: str,
         limit: int,
-        market_type: str
-    ) -> Optional[pd.DataFrame]:
+        market_type: str,
+        as_array: bool = False
+    ) -> Optional[Union[pd.DataFrame, np.ndarray]]:
         """Fetch klines for a single symbol."""
         try:
             if market_type == "futures":
@@ -166,9 +184,11 @@ class AsyncAPIClient:
                 "limit": limit
             }
             
-            async with self.rate_limiter:
+            async with self._request_slot():
                 klines = await self._make_request("GET", url, params=params)
             
+            if klines and as_array:
+                return parse_klines_array(klines)
             if klines:
                 df = pd.DataFrame(
                     klines,
@@ -268,6 +288,13 @@ class AsyncAPIClient:
             log.error(f"Error placing single order: {e}")
             return None
     
+    def _request_slot(self):
+        """Limite local por contagem de requisições - dispensado quando o orçamento
+        de weight compartilhado (SharedRateLimiter) está instalado."""
+        if get_global_rate_limiter() is not None:
+            return contextlib.nullcontext()
+        return self.rate_limiter
+    
     async def _make_request(
         self,
         method: str,
@@ -282,6 +309,12 @@ class AsyncAPIClient:
         start_time = time.time()
         
         try:
+            # Orçamento de request weight compartilhado com o APIClient (se instalado)
+            rate_limiter = get_global_rate_limiter()
+            market, weight, priority, order_count = rest_path_profile(method, url, params, signed)
+            if rate_limiter is not None:
+                await rate_limiter.acquire_async(weight, priority, market, order_count)
+            
             # Prepare request
             if signed:
                 params = self._sign_request(params or {})
@@ -289,10 +322,10 @@ class AsyncAPIClient:
             # Make request
             if method == "GET":
                 async with self.session.get(url, params=params) as response:
-                    data = await self._handle_response(response)
+                    data = await self._handle_response(response, market)
             elif method == "POST":
                 async with self.session.post(url, data=params) as response:
-                    data = await self._handle_response(response)
+                    data = await self._handle_response(response, market)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
             
@@ -311,14 +344,19 @@ class AsyncAPIClient:
             log.error(f"Request failed for {method} {url}: {e}")
             return None
     
-    async def _handle_response(self, response: aiohttp.ClientResponse) -> Optional[Union[Dict, List]]:
+    async def _handle_response(self, response: aiohttp.ClientResponse, market: str = "futures") -> Optional[Union[Dict, List]]:
         """Handle API response."""
+        rate_limiter = get_global_rate_limiter()
+        if rate_limiter is not None:
+            rate_limiter.update_from_headers(response.headers, market)
         if response.status == 200:
             return await response.json()
-        elif response.status == 429:
+        elif response.status in (418, 429):
             # Rate limit hit
             self.stats["rate_limit_hits"] += 1
             log.warning("Rate limit hit, backing off...")
+            if rate_limiter is not None:
+                rate_limiter.penalize(market, response.headers.get("Retry-After"))
             await asyncio.sleep(1)
             return None
         else:
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Async Trading Runtime - todos os pares como tasks asyncio em poucos processos (loop-per-core).
+
+Alternativa ao modo "um processo por par" (multi_agent_system.execution_mode: "async").
+Cada processo de runtime importa TensorFlow/TA-Lib/pandas uma única vez e compartilha
+APIClient, CapitalManager e Alerter entre todos os símbolos que hospeda, além de um
+único WebSocket combinado de market data e um user data stream por mercado. Cada símbolo é
+uma task no mesmo event loop: as decisões da IA são aguardadas no próprio loop e as
+chamadas síncronas do GridLogic (python-binance) rodam num pool de threads limitado,
+de modo que esperas de I/O de um par não bloqueiam os demais.
+
+O processo principal conversa com os runtimes por filas (start/stop/shutdown) e enxerga
+cada símbolo por um AsyncSymbolHandle, que imita a interface de multiprocessing.Process
+usada pelo gerenciamento de workers.
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from utils.logger import setup_logger
+
+log = setup_logger("async_trading_runtime")
+
+COMMAND_POLL_SECONDS = 0.2
+
+
+class AsyncSymbolHandle:
+    """Símbolo hospedado em um runtime asyncio.
+
+    Expõe is_alive/join/kill/pid como um Process e set() como um stop event, para
+    ocupar worker_processes e worker_stop_events no MultiAgentTradingBot.
+    """
+
+    def __init__(self, pool: "AsyncRuntimePool", symbol: str):
+        self.pool = pool
+        self.symbol = symbol
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.pool.runtime_pid(self.symbol)
+
+    def is_alive(self) -> bool:
+        return self.pool.is_symbol_running(self.symbol)
+
+    def join(self, timeout: Optional[float] = None):
+        self.pool.wait_symbol(self.symbol, timeout)
+
+    def kill(self):
+        # Nunca mata o processo compartilhado - apenas pede a parada do símbolo
+        self.pool.stop_symbol(self.symbol)
+
+    def set(self):
+        self.pool.stop_symbol(self.symbol)
+
+
+class AsyncRuntimePool:
+    """Lado do processo principal: distribui símbolos entre os processos de runtime."""
+
+    def __init__(self, spawn_runtime: Callable, num_processes: int = 1):
+        # spawn_runtime(index, command_queue, status_queue) -> multiprocessing.Process já iniciado
+        self.spawn_runtime = spawn_runtime
+        self.num_processes = max(1, int(num_processes))
+        self.status_queue = multiprocessing.Queue()
+        self.runtimes: List[Optional[dict]] = [None] * self.num_processes
+        self.running: Dict[str, int] = {}  # símbolo -> índice do runtime
+
+    def _ensure_runtime(self, index: int) -> dict:
+        runtime = self.runtimes[index]
+        if runtime is None or not runtime["process"].is_alive():
+            if runtime is not None:
+                log.warning(f"Async runtime #{index} died - restarting")
+                for symbol in [s for s, i in self.running.items() if i == index]:
+                    del self.running[symbol]
+            command_queue = multiprocessing.Queue()
+            process = self.spawn_runtime(index, command_queue, self.status_queue)
+            runtime = {"process": process, "command_queue": command_queue}
+            self.runtimes[index] = runtime
+            log.info(f"⚡ Async runtime #{index} started (PID: {process.pid})")
+        return runtime
+
+    def _drain_status(self, timeout: Optional[float] = None):
+        """Processa avisos de símbolos encerrados pelos runtimes."""
+        while True:
+            try:
+                message = self.status_queue.get(timeout=timeout) if timeout else self.status_queue.get_nowait()
+            except queue.Empty:
+                return
+            timeout = None
+            if message[0] == "stopped":
+                self.running.pop(message[1], None)
+
+    def start_symbol(self, symbol: str, allocation=None) -> AsyncSymbolHandle:
+        """Agenda o par num runtime; `allocation` é a CapitalAllocation calculada pelo processo principal."""
+        self._drain_status()
+        if symbol not in self.running:
+            loads = [sum(1 for i in self.running.values() if i == index) for index in range(self.num_processes)]
+            index = loads.index(min(loads))
+            runtime = self._ensure_runtime(index)
+            runtime["command_queue"].put(("start", symbol, allocation))
+            self.running[symbol] = index
+        return AsyncSymbolHandle(self, symbol)
+
+    def stop_symbol(self, symbol: str):
+        index = self.running.get(symbol)
+        runtime = self.runtimes[index] if index is not None else None
+        if runtime is not None and runtime["process"].is_alive():
+            runtime["command_queue"].put(("stop", symbol))
+
+    def runtime_pid(self, symbol: str) -> Optional[int]:
+        index = self.running.get(symbol)
+        runtime = self.runtimes[index] if index is not None else None
+        return runtime["process"].pid if runtime is not None else None
+
+    def is_symbol_running(self, symbol: str) -> bool:
+        self._drain_status()
+        index = self.running.get(symbol)
+        if index is None:
+            return False
+        runtime = self.runtimes[index]
+        return runtime is not None and runtime["process"].is_alive()
+
+    def wait_symbol(self, symbol: str, timeout: Optional[float] = None):
+        deadline = None if timeout is None else time.time() + timeout
+        while self.is_symbol_running(symbol):
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return
+            self._drain_status(timeout=min(remaining or 1.0, 1.0))
+
+    def shutdown(self, timeout: float = 30):
+        """Para todos os runtimes (cada um encerra e limpa seus símbolos)."""
+        for runtime in self.runtimes:
+            if runtime is not None and runtime["process"].is_alive():
+                runtime["command_queue"].put(("shutdown", None))
+        for index, runtime in enumerate(self.runtimes):
+            if runtime is None:
+                continue
+            runtime["process"].join(timeout=timeout)
+            if runtime["process"].is_alive():
+                log.warning(f"Async runtime #{index} did not stop in {timeout}s - killing")
+                runtime["process"].kill()
+                runtime["process"].join(timeout=2)
+        self.running.clear()
+
+
+class AsyncTradingRuntime:
+    """Lado do processo de runtime: um event loop com uma task por símbolo.
+
+    `trader` fornece as etapas do ciclo compartilhadas com o modo processo
+    (_setup_symbol_trader, _prepare_trading_cycle, _decide_trading_action,
+    _finish_trading_cycle, _cleanup_symbol_trader, _log_worker_heartbeat).
+    """
+
+    def __init__(self, trader, index: int, config: dict, command_queue, status_queue,
+                 global_stop_event, global_trade_counter, shared_resources: dict = None):
+        self.trader = trader
+        self.index = index
+        self.config = config
+        self.command_queue = command_queue
+        self.status_queue = status_queue
+        self.global_stop_event = global_stop_event
+        self.global_trade_counter = global_trade_counter
+        self.shared_resources = shared_resources or {}
+        runtime_config = config.get("multi_agent_system", {}).get("async_runtime", {})
+        self.io_threads = int(runtime_config.get("io_threads", 8))
+        self.min_cycle_interval = config["trading"]["cycle_interval_seconds"]
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.stop_flags: Dict[str, asyncio.Event] = {}
+        self.api_client = None
+        self.capital_manager = None
+        self.alerter = None
+        # Streams do runtime, criados sob demanda pelo setup do primeiro símbolo de cada mercado
+        self.market_streams = {"ws_client": None, "user_streams": {}}
+
+    def run(self):
+        asyncio.run(self._main())
+
+    def _create_shared_clients(self):
+        # Imports aqui: o módulo é carregado no processo principal antes do fork
+        from core.capital_management import CapitalManager
+        from utils.alerter import Alerter
+        from utils.api_client import APIClient
+        from utils.rate_limiter import set_global_rate_limiter
+
+        if self.shared_resources.get("rate_limiter") is not None:
+            set_global_rate_limiter(self.shared_resources["rate_limiter"])
+        operation_mode = self.config["operation_mode"].lower()
+        self.api_client = APIClient(self.config, operation_mode=operation_mode)
+        self.alerter = Alerter(self.api_client)
+        self.capital_manager = CapitalManager(self.api_client, self.config)
+        self.capital_manager.snapshot_service.seed(self.shared_resources.get("account_snapshot"))
+
+    def _stop_market_streams(self):
+        """Encerra os streams compartilhados depois que todos os símbolos fizeram cleanup."""
+        for market_type, user_stream in list(self.market_streams["user_streams"].items()):
+            try:
+                # listenKey é compartilhado com outros processos da mesma conta - não invalidar
+                user_stream.stop(close_listen_key=False)
+            except Exception as e:
+                log.warning(f"Async runtime #{self.index}: error stopping {market_type} user data stream: {e}")
+        self.market_streams["user_streams"].clear()
+        ws_client = self.market_streams["ws_client"]
+        if ws_client is not None:
+            try:
+                ws_client.stop()
+            except Exception as e:
+                log.warning(f"Async runtime #{self.index}: error stopping WebSocket: {e}")
+            self.market_streams["ws_client"] = None
+
+    async def _main(self):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.io_threads, thread_name_prefix=f"AsyncRuntime{self.index}")
+        loop.set_default_executor(executor)
+        self._setup_lock = asyncio.Lock()
+        log.info(f"⚡ Async runtime #{self.index} running ({self.io_threads} I/O threads)")
+        try:
+            await loop.run_in_executor(None, self._create_shared_clients)
+            while not self.global_stop_event.is_set():
+                try:
+                    command, symbol, *payload = self.command_queue.get_nowait()
+                except queue.Empty:
+                    await asyncio.sleep(COMMAND_POLL_SECONDS)
+                    continue
+                if command == "start" and symbol not in self.tasks:
+                    self.stop_flags[symbol] = asyncio.Event()
+                    allocation = payload[0] if payload else None
+                    self.tasks[symbol] = asyncio.create_task(
+                        self._run_symbol(symbol, allocation), name=f"Trader-{symbol}"
+                    )
+                elif command == "stop" and symbol in self.stop_flags:
+                    self.stop_flags[symbol].set()
+                elif command == "shutdown":
+                    break
+        finally:
+            for flag in self.stop_flags.values():
+                flag.set()
+            if self.tasks:
+                await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            await loop.run_in_executor(None, self._stop_market_streams)
+            executor.shutdown(wait=False)
+            log.info(f"Async runtime #{self.index} stopped")
+
+    async def _run_symbol(self, symbol: str, allocation=None):
+        loop = asyncio.get_running_loop()
+        trader = self.trader
+        stop_flag = self.stop_flags[symbol]
+        ctx = None
+        try:
+            # Setup serializado: CapitalManager compartilhado e carga de modelos RL
+            async with self._setup_lock:
+                ctx = await loop.run_in_executor(
+                    None, trader._setup_symbol_trader, symbol, self.config, self.api_client,
+                    self.capital_manager, self.alerter,
+                    {**self.shared_resources, "capital_allocation": allocation, "market_streams": self.market_streams},
+                )
+            if ctx is None:
+                return
+            log.info(f"[{symbol}] Trading task started on async runtime #{self.index}")
+
+            while not stop_flag.is_set() and not self.global_stop_event.is_set():
+                cycle_start = time.time()
+                trader._log_worker_heartbeat(ctx)
+                try:
+                    cycle = await loop.run_in_executor(None, trader._prepare_trading_cycle, ctx)
+                    rl_action, ai_decision = await trader._decide_trading_action(ctx, cycle, self.shared_resources)
+                    await loop.run_in_executor(
+                        None, trader._finish_trading_cycle, ctx, cycle, rl_action, ai_decision,
+                        self.global_trade_counter,
+                    )
+                except Exception as e:
+                    ctx["pair_logger"].log_error(f"Erro no ciclo de trading: {e}")
+                    log.error(f"[{symbol}] Error in trading cycle: {e}", exc_info=True)
+                    self.alerter.send_critical_alert(f"Error in {symbol} trading cycle: {e}")
+
+                wait_time = max(0, self.min_cycle_interval - (time.time() - cycle_start))
+                if wait_time > 0:
+                    try:
+                        await asyncio.wait_for(stop_flag.wait(), timeout=wait_time)
+                    except asyncio.TimeoutError:
+                        pass
+
+        except Exception as e:
+            log.error(f"[{symbol}] Critical error in trading task: {e}", exc_info=True)
+        finally:
+            log.info(f"[{symbol}] Trading task shutting down - starting cleanup")
+            if ctx is not None:
+                try:
+                    await loop.run_in_executor(None, trader._cleanup_symbol_trader, ctx)
+                except Exception as e:
+                    log.error(f"[{symbol}] Error during cleanup: {e}")
+            self.tasks.pop(symbol, None)
+            self.stop_flags.pop(symbol, None)
+            self.status_queue.put(("stopped", symbol))
@@ -2,16 +2,24 @@
 """
 Sistema de Ordens Condicionais para Multi-Agent Trading Bot
 Implementa ordens baseadas em condições técnicas e de mercado
+
+As ordens são agrupadas por (símbolo, indicador, intervalo) e avaliadas sobre o
+IndicatorFeed compartilhado: cada grupo busca os klines uma vez, o indicador é calculado
+uma vez por versão dos dados (100 ordens de RSI no mesmo símbolo = 1 cálculo) e as
+ordens só são reavaliadas quando suas entradas mudam - candle novo/alterado para
+indicadores, tick de preço assinado no feed para condições de preço.
 """
 
 import time
 import threading
 from decimal import Decimal
-from typing import Dict, List, Optional, Callable, Any
+from typing import Dict, List, Optional, Callable, Any, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import logging
 
+from utils.indicator_feed import get_indicator_feed, series_version
+
 log = logging.getLogger(__name__)
 
 class OrderType(Enum):
@@ -33,6 +41,21 @@ class ConditionType(Enum):
     BOLLINGER_BREAK = "bollinger_break"
     CUSTOM = "custom"
 
+# Entrada compartilhada de cada tipo de condição (chave do grupo junto com símbolo e intervalo)
+CONDITION_INDICATORS = {
+    ConditionType.PRICE_ABOVE: "price",
+    ConditionType.PRICE_BELOW: "price",
+    ConditionType.RSI_OVERSOLD: "rsi",
+    ConditionType.RSI_OVERBOUGHT: "rsi",
+    ConditionType.VOLUME_SPIKE: "volume",
+    ConditionType.MA_CROSS_ABOVE: "ma",
+    ConditionType.MA_CROSS_BELOW: "ma",
+    ConditionType.ATR_BREAKOUT: "atr",
+    ConditionType.MACD_SIGNAL: "macd",
+    ConditionType.BOLLINGER_BREAK: "bollinger",
+    ConditionType.CUSTOM: "custom",
+}
+
 @dataclass
 class ConditionalOrderConfig:
     """Configuração para ordem condicional"""
@@ -50,6 +73,7 @@ class ConditionalOrderConfig:
     expiry_time: Optional[float] = None
     max_checks: int = 1000
     check_interval: int = 5  # segundos
+    interval: str = "1h"  # intervalo dos klines para condições de indicador
 
 @dataclass
 class ConditionalOrderState:
@@ -67,9 +91,11 @@ class ConditionalOrderState:
 class ConditionalOrderManager:
     """Gerenciador de ordens condicionais"""
     
-    def __init__(self, api_client, alerter=None):
+    def __init__(self, api_client, alerter=None, feed=None, market_type: str = "futures"):
         self.api_client = api_client
         self.alerter = alerter
+        self.feed = feed or get_indicator_feed()
+        self.market_type = market_type
         self.orders: Dict[str, ConditionalOrderState] = {}
         self.stop_event = threading.Event()
         self.monitor_thread = None
@@ -78,9 +104,19 @@ class ConditionalOrderManager:
             "triggered_orders": 0,
             "executed_orders": 0,
             "expired_orders": 0,
-            "failed_orders": 0
+            "failed_orders": 0,
+            "group_evaluations": 0,
+            "skipped_unchanged": 0
         }
         
+        # Grupos (símbolo, indicador, intervalo) -> ordens; versão dos dados já avaliada
+        self.groups: Dict[Tuple[str, str, Optional[str]], Dict[str, ConditionalOrderState]] = {}
+        self.group_versions: Dict[tuple, Any] = {}
+        self.group_next_check: Dict[tuple, float] = {}
+        self._dirty_symbols: Set[str] = set()
+        self._wake = threading.Event()
+        self._lock = threading.RLock()
+        
         # Registrar condições padrão
         self.condition_handlers = {
             ConditionType.PRICE_ABOVE: self._check_price_above,
@@ -115,6 +151,7 @@ class ConditionalOrderManager:
     def stop_monitoring(self):
         """Para thread de monitoramento"""
         self.stop_event.set()
+        self._wake.set()
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=10)
         log.info("Monitoramento de ordens condicionais parado")
@@ -136,8 +173,17 @@ class ConditionalOrderManager:
                 created_at=time.time()
             )
             
-            self.orders[config.order_id] = state
+            key = self._group_key(config)
+            with self._lock:
+                self.orders[config.order_id] = state
+                self.groups.setdefault(key, {})[config.order_id] = state
+                # Ordem nova precisa de uma avaliação mesmo sem mudança nos dados
+                self.group_versions.pop(key, None)
+                self.group_next_check[key] = 0.0
+            if key[1] == "price":
+                self.feed.subscribe(config.symbol, self._on_price_tick, self.market_type)
             self.stats["total_orders"] += 1
+            self._wake.set()
             
             log.info(f"Ordem condicional adicionada: {config.order_id} - "
                     f"{config.symbol} {config.side} {config.condition_type.value}")
@@ -159,61 +205,195 @@ class ConditionalOrderManager:
     
     def remove_conditional_order(self, order_id: str) -> bool:
         """Remove ordem condicional"""
-        if order_id in self.orders:
-            self.orders[order_id].is_active = False
-            del self.orders[order_id]
-            log.info(f"Ordem condicional removida: {order_id}")
-            return True
-        return False
+        with self._lock:
+            state = self.orders.pop(order_id, None)
+            if state is None:
+                return False
+            state.is_active = False
+            self._detach(order_id, state)
+        log.info(f"Ordem condicional removida: {order_id}")
+        return True
+    
+    def _detach(self, order_id: str, state: ConditionalOrderState):
+        """Tira a ordem do seu grupo; grupo vazio deixa de ser avaliado (e de assinar ticks)."""
+        with self._lock:
+            key = self._group_key(state.config)
+            group = self.groups.get(key, {})
+            group.pop(order_id, None)
+            if not group:
+                self.groups.pop(key, None)
+                self.group_versions.pop(key, None)
+                self.group_next_check.pop(key, None)
+                if key[1] == "price":
+                    self.feed.unsubscribe(key[0], self._on_price_tick, self.market_type)
+    
+    @staticmethod
+    def _group_key(config: ConditionalOrderConfig) -> Tuple[str, str, Optional[str]]:
+        indicator = CONDITION_INDICATORS.get(config.condition_type, "custom")
+        interval = None if indicator in ("price", "custom") else config.interval
+        return (config.symbol.upper(), indicator, interval)
+    
+    def _on_price_tick(self, symbol: str, price: float):
+        """Tick do feed: marca os grupos de preço do símbolo para avaliação imediata."""
+        with self._lock:
+            self._dirty_symbols.add(symbol)
+        self._wake.set()
     
     def _monitoring_loop(self):
-        """Loop principal de monitoramento"""
+        """Loop principal: avalia os grupos com dados novos (tick ou intervalo de verificação)"""
         while not self.stop_event.is_set():
             try:
                 current_time = time.time()
-                orders_to_remove = []
+                orders_to_remove = self._expire_orders(current_time)
                 
-                for order_id, state in self.orders.items():
-                    if not state.is_active:
-                        continue
-                    
-                    # Verificar expiração
-                    if (state.config.expiry_time and 
-                        current_time > state.config.expiry_time):
-                        log.info(f"Ordem condicional expirada: {order_id}")
-                        state.is_active = False
-                        orders_to_remove.append(order_id)
-                        self.stats["expired_orders"] += 1
-                        continue
-                    
-                    # Verificar limite de checks
-                    if state.checks_performed >= state.config.max_checks:
-                        log.info(f"Limite de verificações atingido: {order_id}")
-                        state.is_active = False
-                        orders_to_remove.append(order_id)
-                        continue
-                    
-                    # Verificar intervalo
-                    if (current_time - state.last_check < 
-                        state.config.check_interval):
-                        continue
-                    
-                    # Executar verificação da condição
-                    self._check_order_condition(state)
+                with self._lock:
+                    dirty = self._dirty_symbols
+                    self._dirty_symbols = set()
+                    due = [
+                        key for key in self.groups
+                        if self.group_next_check.get(key, 0.0) <= current_time
+                        or (key[1] == "price" and key[0] in dirty)
+                    ]
+                
+                for key in due:
+                    self._process_group(key, current_time)
                 
-                # Remover ordens inativas
+                # Remover ordens expiradas; executadas/desativadas só saem dos grupos
                 for order_id in orders_to_remove:
-                    if order_id in self.orders:
-                        del self.orders[order_id]
+                    self.remove_conditional_order(order_id)
+                for key in due:
+                    for order_id, state in list(self.groups.get(key, {}).items()):
+                        if not state.is_active:
+                            self._detach(order_id, state)
                 
-                # Aguardar próxima iteração
-                self.stop_event.wait(1)
+                # Aguardar próximo grupo devido ou um tick de preço
+                with self._lock:
+                    next_check = min(self.group_next_check.values(), default=current_time + 1)
+                self._wake.wait(min(max(next_check - time.time(), 0.0), 1.0))
+                self._wake.clear()
                 
             except Exception as e:
                 log.error(f"Erro no loop de monitoramento: {e}")
                 self.stop_event.wait(5)
     
-    def _check_order_condition(self, state: ConditionalOrderState):
+    def _expire_orders(self, current_time: float) -> List[str]:
+        """Expiração e limite de verificações (sem acessar a API)"""
+        orders_to_remove = []
+        for order_id, state in list(self.orders.items()):
+            if not state.is_active:
+                continue
+            
+            # Verificar expiração
+            if (state.config.expiry_time and 
+                current_time > state.config.expiry_time):
+                log.info(f"Ordem condicional expirada: {order_id}")
+                state.is_active = False
+                orders_to_remove.append(order_id)
+                self.stats["expired_orders"] += 1
+                continue
+            
+            # Verificar limite de checks
+            if state.checks_performed >= state.config.max_checks:
+                log.info(f"Limite de verificações atingido: {order_id}")
+                state.is_active = False
+                orders_to_remove.append(order_id)
+        return orders_to_remove
+    
+    def _process_group(self, key: Tuple[str, str, Optional[str]], current_time: float):
+        """Busca a entrada do grupo uma vez e avalia suas ordens se ela mudou"""
+        with self._lock:
+            states = [st for st in self.groups.get(key, {}).values() if st.is_active]
+            if not states:
+                return
+            self.group_next_check[key] = current_time + min(st.config.check_interval for st in states)
+        
+        try:
+            version, data = self._group_input(key, states)
+        except Exception as e:
+            log.error(f"Erro ao obter dados do grupo {key}: {e}")
+            return
+        if version is None:
+            return
+        if key[1] != "custom" and self.group_versions.get(key) == version:
+            self.stats["skipped_unchanged"] += 1
+            return
+        self.group_versions[key] = version
+        self.stats["group_evaluations"] += 1
+        
+        for state in states:
+            if state.is_active:
+                self._check_order_condition(state, self._order_input(state.config, key[1], data))
+    
+    def _group_input(self, key: Tuple[str, str, Optional[str]], states: List[ConditionalOrderState]):
+        """(versão, dados) compartilhados pelo grupo: preço ou série de klines"""
+        symbol, indicator, interval = key
+        if indicator == "custom":
+            return time.time(), None
+        if indicator == "price":
+            max_age = min(st.config.check_interval for st in states)
+            price = self.feed.get_price(symbol, max_age=max_age, market_type=self.market_type)
+            if price is None:
+                if self.market_type == "spot":
+                    ticker = self.api_client.get_spot_ticker(symbol)
+                else:
+                    ticker = self.api_client.get_futures_ticker(symbol)
+                if not ticker or not ticker.get("price"):
+                    return None, None
+                price = float(ticker["price"])
+                self.feed.on_price(symbol, price, self.market_type)
+            return price, price
+        
+        limit = max(self._lookback(indicator, self._indicator_params(st.config)) for st in states)
+        max_age = min(st.config.check_interval for st in states)
+        series = self.feed.refresh(self.api_client, symbol, interval, limit,
+                                   max_age=max_age, market_type=self.market_type)
+        return series_version(series), series
+    
+    def _order_input(self, config: ConditionalOrderConfig, indicator: str, data):
+        """Entrada de uma ordem: o indicador vem do cache do feed (1 cálculo por parâmetros)"""
+        if indicator in ("price", "custom"):
+            return data
+        return self.feed.indicator(data, indicator, self._indicator_params(config))
+    
+    @staticmethod
+    def _indicator_params(config: ConditionalOrderConfig) -> Dict[str, Any]:
+        params = config.condition_params or {}
+        indicator = CONDITION_INDICATORS.get(config.condition_type)
+        if indicator == "rsi":
+            return {"period": params.get("rsi_period", 14)}
+        if indicator == "volume":
+            return {"lookback": params.get("lookback", 10)}
+        if indicator == "ma":
+            return {"fast_period": params.get("fast_period", 9),
+                    "slow_period": params.get("slow_period", 21),
+                    "ma_type": params.get("ma_type", "ema")}
+        if indicator == "atr":
+            return {"period": params.get("atr_period", 14)}
+        if indicator == "macd":
+            return {"fast_period": params.get("fast_period", 12),
+                    "slow_period": params.get("slow_period", 26),
+                    "signal_period": params.get("signal_period", 9)}
+        if indicator == "bollinger":
+            return {"period": params.get("bb_period", 20), "std_dev": params.get("bb_std_dev", 2.0)}
+        return {}
+    
+    @staticmethod
+    def _lookback(indicator: str, params: Dict[str, Any]) -> int:
+        """Klines necessários para o indicador convergir (suavizações de Wilder/EMA)"""
+        if indicator in ("rsi", "atr"):
+            return max(100, 6 * params["period"])
+        if indicator == "volume":
+            return params["lookback"]
+        if indicator == "ma":
+            slow = params["slow_period"]
+            return slow + 1 if params["ma_type"] == "sma" else max(100, 4 * slow)
+        if indicator == "macd":
+            return max(100, 3 * (params["slow_period"] + params["signal_period"]))
+        if indicator == "bollinger":
+            return params["period"] + 1
+        return 100
+    
+    def _check_order_condition(self, state: ConditionalOrderState, data=None):
         """Verifica condição de uma ordem"""
         try:
             state.last_check = time.time()
@@ -225,7 +405,7 @@ class ConditionalOrderManager:
             # Verificar condição usando handler apropriado
             if config.condition_type in self.condition_handlers:
                 handler = self.condition_handlers[config.condition_type]
-                condition_met = handler(config)
+                condition_met = handler(config, data)
             else:
                 log.warning(f"Tipo de condição não suportado: {config.condition_type}")
                 return
@@ -349,127 +529,82 @@ class ConditionalOrderManager:
             log.error(f"Erro na validação: {e}")
             return False
     
-    # Handlers de condições específicas
-    def _check_price_above(self, config: ConditionalOrderConfig) -> bool:
+    # Handlers de condições específicas: recebem a entrada já calculada do grupo
+    @staticmethod
+    def _param(config: ConditionalOrderConfig, name: str, default):
+        return (config.condition_params or {}).get(name, default)
+    
+    def _check_price_above(self, config: ConditionalOrderConfig, price: Optional[float]) -> bool:
         """Verifica se preço está acima do valor"""
-        try:
-            ticker = self.api_client.get_futures_ticker(config.symbol)
-            if ticker:
-                current_price = float(ticker.get("price", 0))
-                return current_price > config.condition_value
-        except Exception as e:
-            log.error(f"Erro ao verificar price_above: {e}")
-        return False
+        return price is not None and price > config.condition_value
     
-    def _check_price_below(self, config: ConditionalOrderConfig) -> bool:
+    def _check_price_below(self, config: ConditionalOrderConfig, price: Optional[float]) -> bool:
         """Verifica se preço está abaixo do valor"""
-        try:
-            ticker = self.api_client.get_futures_ticker(config.symbol)
-            if ticker:
-                current_price = float(ticker.get("price", 0))
-                return current_price < config.condition_value
-        except Exception as e:
-            log.error(f"Erro ao verificar price_below: {e}")
-        return False
+        return price is not None and price < config.condition_value
     
-    def _check_rsi_oversold(self, config: ConditionalOrderConfig) -> bool:
-        """Verifica RSI oversold"""
-        try:
-            # Buscar dados históricos e calcular RSI
-            klines = self.api_client.get_futures_klines(config.symbol, "1h", 20)
-            if not klines or len(klines) < 14:
-                return False
-            
-            closes = [float(k[4]) for k in klines]
-            
-            # Calcular RSI simples
-            gains = []
-            losses = []
-            for i in range(1, len(closes)):
-                change = closes[i] - closes[i-1]
-                if change > 0:
-                    gains.append(change)
-                    losses.append(0)
-                else:
-                    gains.append(0)
-                    losses.append(abs(change))
-            
-            if len(gains) < 14:
-                return False
-            
-            avg_gain = sum(gains[-14:]) / 14
-            avg_loss = sum(losses[-14:]) / 14
-            
-            if avg_loss == 0:
-                return False
-            
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-            
-            threshold = config.condition_params.get("rsi_threshold", 30) if config.condition_params else 30
-            return rsi < threshold
-            
-        except Exception as e:
-            log.error(f"Erro ao calcular RSI: {e}")
-        return False
+    def _check_rsi_oversold(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
+        """Verifica RSI oversold (RSI de Wilder)"""
+        if not values or values["value"] is None:
+            return False
+        return values["value"] < self._param(config, "rsi_threshold", 30)
     
-    def _check_rsi_overbought(self, config: ConditionalOrderConfig) -> bool:
-        """Verifica RSI overbought"""
-        # Similar ao oversold, mas threshold > 70
-        try:
-            # Implementação similar ao _check_rsi_oversold
-            # mas verificando se RSI > threshold (default 70)
-            threshold = config.condition_params.get("rsi_threshold", 70) if config.condition_params else 70
-            # ... (código similar ao oversold)
-            return False  # Placeholder
-        except Exception as e:
-            log.error(f"Erro ao verificar RSI overbought: {e}")
-        return False
+    def _check_rsi_overbought(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
+        """Verifica RSI overbought (RSI de Wilder)"""
+        if not values or values["value"] is None:
+            return False
+        return values["value"] > self._param(config, "rsi_threshold", 70)
     
-    def _check_volume_spike(self, config: ConditionalOrderConfig) -> bool:
+    def _check_volume_spike(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
         """Verifica spike de volume"""
-        try:
-            klines = self.api_client.get_futures_klines(config.symbol, "1h", 10)
-            if not klines or len(klines) < 5:
-                return False
-            
-            volumes = [float(k[5]) for k in klines]
-            current_volume = volumes[-1]
-            avg_volume = sum(volumes[:-1]) / len(volumes[:-1])
-            
-            multiplier = config.condition_params.get("volume_multiplier", 2.0) if config.condition_params else 2.0
-            return current_volume > avg_volume * multiplier
-            
-        except Exception as e:
-            log.error(f"Erro ao verificar volume spike: {e}")
-        return False
+        if not values:
+            return False
+        return values["value"] > values["average"] * self._param(config, "volume_multiplier", 2.0)
     
-    def _check_ma_cross_above(self, config: ConditionalOrderConfig) -> bool:
-        """Verifica cruzamento de médias móveis para cima"""
-        # Implementação placeholder
-        return False
+    @staticmethod
+    def _crossed(values: Optional[Dict], upward: bool) -> bool:
+        if not values or None in (values["fast"], values["slow"], values["previous_fast"], values["previous_slow"]):
+            return False
+        if upward:
+            return values["previous_fast"] <= values["previous_slow"] and values["fast"] > values["slow"]
+        return values["previous_fast"] >= values["previous_slow"] and values["fast"] < values["slow"]
+    
+    def _check_ma_cross_above(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
+        """Verifica cruzamento de médias móveis para cima (rápida cruza a lenta no último candle)"""
+        return self._crossed(values, upward=True)
     
-    def _check_ma_cross_below(self, config: ConditionalOrderConfig) -> bool:
+    def _check_ma_cross_below(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
         """Verifica cruzamento de médias móveis para baixo"""
-        # Implementação placeholder  
-        return False
+        return self._crossed(values, upward=False)
     
-    def _check_atr_breakout(self, config: ConditionalOrderConfig) -> bool:
-        """Verifica breakout baseado em ATR"""
-        # Implementação placeholder
-        return False
+    def _check_atr_breakout(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
+        """Verifica breakout baseado em ATR: fechamento além de referência ± multiplicador * ATR"""
+        if not values or None in (values["value"], values["reference_close"], values["close"]):
+            return False
+        multiplier = self._param(config, "atr_multiplier", config.condition_value or 1.5)
+        direction = self._param(config, "direction", "up" if config.side == "BUY" else "down")
+        if direction == "up":
+            return values["close"] > values["reference_close"] + multiplier * values["value"]
+        return values["close"] < values["reference_close"] - multiplier * values["value"]
     
-    def _check_macd_signal(self, config: ConditionalOrderConfig) -> bool:
-        """Verifica sinal MACD"""
-        # Implementação placeholder
-        return False
+    def _check_macd_signal(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
+        """Verifica sinal MACD (histograma troca de sinal no último candle)"""
+        if not values or values["hist"] is None or values["previous_hist"] is None:
+            return False
+        signal = self._param(config, "signal", "bullish" if config.side == "BUY" else "bearish")
+        if signal == "bullish":
+            return values["previous_hist"] <= 0 < values["hist"]
+        return values["previous_hist"] >= 0 > values["hist"]
     
-    def _check_bollinger_break(self, config: ConditionalOrderConfig) -> bool:
+    def _check_bollinger_break(self, config: ConditionalOrderConfig, values: Optional[Dict]) -> bool:
         """Verifica quebra das bandas de Bollinger"""
-        # Implementação placeholder
-        return False
+        if not values or None in (values["upper"], values["lower"], values["close"]):
+            return False
+        band = self._param(config, "band", "lower" if config.side == "BUY" else "upper")
+        if band == "lower":
+            return values["close"] < values["lower"]
+        return values["close"] > values["upper"]
     
-    def _check_custom_condition(self, config: ConditionalOrderConfig) -> bool:
+    def _check_custom_condition(self, config: ConditionalOrderConfig, data=None) -> bool:
         """Verifica condição customizada"""
         try:
             if config.custom_condition:
@@ -504,7 +639,11 @@ class ConditionalOrderManager:
             "executed_orders": self.stats["executed_orders"],
             "expired_orders": self.stats["expired_orders"],
             "failed_orders": self.stats["failed_orders"],
-            "success_rate": (self.stats["executed_orders"] / max(1, self.stats["triggered_orders"])) * 100
+            "success_rate": (self.stats["executed_orders"] / max(1, self.stats["triggered_orders"])) * 100,
+            "groups": len(self.groups),
+            "group_evaluations": self.stats["group_evaluations"],
+            "skipped_unchanged": self.stats["skipped_unchanged"],
+            "indicator_feed": dict(self.feed.stats)
         }
 
 # Exemplo de uso
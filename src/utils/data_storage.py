@@ -114,7 +114,38 @@ class ShadowDataStorage:
         except Exception as e:
             log.error(f"Erro ao carregar trades: {e}")
             return pd.DataFrame()
-    
+
+    def load_market_states_df(self, symbol: str = None, last_days: int = None) -> pd.DataFrame:
+        """Carrega estados de mercado capturados (timestamp, symbol, current_price, state_vector)."""
+        try:
+            if not os.path.exists(self.states_file):
+                return pd.DataFrame()
+
+            states = []
+            with open(self.states_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    state = json.loads(line)
+                    if symbol is None or state.get('symbol') == symbol:
+                        states.append(state)
+
+            df = pd.DataFrame(states)
+            if df.empty:
+                return df
+
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+
+            if last_days:
+                cutoff = datetime.now() - pd.Timedelta(days=last_days)
+                df = df[df['timestamp'] >= cutoff]
+
+            return df.sort_values('timestamp')
+
+        except Exception as e:
+            log.error(f"Erro ao carregar estados de mercado: {e}")
+            return pd.DataFrame()
+
     def load_training_data(self, symbol: str = None, limit: int = 10000) -> Dict[str, List]:
         """Carrega dados para treinamento RL (estados, ações, rewards)."""
         try:
@@ -114,7 +114,8 @@ class GlobalTPSLManager:
                     "initialized": cls._initialized,
                     "running": cls._instance.running,
                     "active_positions": len(cls._instance.active_orders),
-                    "positions": list(cls._instance.active_orders.keys())
+                    "positions": list(cls._instance.active_orders.keys()),
+                    "trigger_stats": dict(cls._instance.trigger_stats)
                 }
             else:
                 return {
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Indicator Feed - preços e indicadores técnicos compartilhados no processo.
+
+Os indicadores são calculados sobre as views do KlineStore com NumPy (série inteira de
+uma vez, sem laço Python por candle) e ficam em cache por versão dos dados: enquanto
+nenhum candle novo chega e o candle em formação não muda, o mesmo resultado é reutilizado
+por todos os consumidores. Preços de tick chegam por on_price() e são repassados apenas
+aos assinantes do símbolo. Preços, assinantes e cache são separados por mercado (spot/futures).
+
+Os kernels da série inteira (EMA, RSI/ATR de Wilder, MACD, Bollinger) vêm de
+utils.streaming_indicators, a mesma implementação usada no ranking do universo.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.kline_store import KlineSeries, get_kline_store
+from utils.logger import setup_logger
+from utils.streaming_indicators import atr, bollinger, macd, moving_average, rsi
+
+log = setup_logger("indicator_feed")
+
+
+def _last(values: np.ndarray, offset: int = 1) -> Optional[float]:
+    if len(values) < offset:
+        return None
+    value = values[-offset]
+    return None if np.isnan(value) else float(value)
+
+
+def _compute(series: KlineSeries, indicator: str, params: Dict) -> Optional[Dict[str, Optional[float]]]:
+    """Valores atuais (último candle) e anteriores (penúltimo) do indicador."""
+    closes = series.closes()
+    if indicator == "rsi":
+        values = rsi(closes, params.get("period", 14))
+        return {"value": _last(values), "previous": _last(values, 2), "close": _last(closes)}
+    if indicator == "volume":
+        volumes = series.volumes(params.get("lookback", 10))
+        if len(volumes) < 2:
+            return None
+        return {"value": float(volumes[-1]), "average": float(volumes[:-1].mean())}
+    if indicator == "ma":
+        kind = params.get("ma_type", "ema")
+        fast = moving_average(closes, params.get("fast_period", 9), kind)
+        slow = moving_average(closes, params.get("slow_period", 21), kind)
+        return {"fast": _last(fast), "slow": _last(slow),
+                "previous_fast": _last(fast, 2), "previous_slow": _last(slow, 2)}
+    if indicator == "atr":
+        values = atr(series.highs(), series.lows(), closes, params.get("period", 14))
+        # ATR e fechamento de referência do candle anterior: o candle do breakout não infla o próprio limite
+        return {"value": _last(values, 2), "reference_close": _last(closes, 2), "close": _last(closes)}
+    if indicator == "macd":
+        line, signal_line, hist = macd(closes, params.get("fast_period", 12),
+                                       params.get("slow_period", 26), params.get("signal_period", 9))
+        return {"macd": _last(line), "signal": _last(signal_line),
+                "hist": _last(hist), "previous_hist": _last(hist, 2)}
+    if indicator == "bollinger":
+        upper, middle, lower = bollinger(closes, params.get("period", 20), params.get("std_dev", 2.0))
+        return {"upper": _last(upper), "middle": _last(middle), "lower": _last(lower), "close": _last(closes)}
+    raise ValueError(f"Indicador desconhecido: {indicator}")
+
+
+def series_version(series: Optional[KlineSeries]) -> Optional[tuple]:
+    """Identifica o estado da série: muda com candle novo ou candle em formação alterado."""
+    if series is None or len(series) == 0:
+        return None
+    last = series.view(1)[0]
+    return (len(series), float(last["open_time"]), float(last["high"]), float(last["low"]),
+            float(last["close"]), float(last["volume"]))
+
+
+class IndicatorFeed:
+    """Preços de tick + indicadores em cache por versão, compartilhados no processo."""
+
+    def __init__(self, kline_store=None):
+        self.kline_store = kline_store or get_kline_store()
+        self.prices: Dict[Tuple[str, str], Tuple[float, float]] = {}  # (market_type, symbol) -> (preço, timestamp)
+        self._subscribers: Dict[Tuple[str, str], List[Callable[[str, float], None]]] = {}
+        self._cache: Dict[tuple, Tuple[tuple, Optional[Dict]]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"computations": 0, "cache_hits": 0, "kline_requests": 0, "ticks": 0}
+
+    # --- Preços --- #
+
+    def subscribe(self, symbol: str, callback: Callable[[str, float], None], market_type: str = "futures"):
+        with self._lock:
+            callbacks = self._subscribers.setdefault((market_type, symbol.upper()), [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+
+    def unsubscribe(self, symbol: str, callback: Callable[[str, float], None], market_type: str = "futures"):
+        with self._lock:
+            callbacks = self._subscribers.get((market_type, symbol.upper()), [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def on_price(self, symbol: str, price: float, market_type: str = "futures"):
+        """Novo preço do símbolo (WebSocket, market data hub ou ticker REST)."""
+        symbol = symbol.upper()
+        key = (market_type, symbol)
+        previous = self.prices.get(key)
+        self.prices[key] = (float(price), time.time())
+        self.stats["ticks"] += 1
+        if previous is not None and previous[0] == float(price):
+            return  # entrada inalterada: nada a reavaliar
+        for callback in list(self._subscribers.get(key, ())):
+            try:
+                callback(symbol, float(price))
+            except Exception as e:
+                log.error(f"Error in price subscriber for {symbol}: {e}")
+
+    def get_price(self, symbol: str, max_age: Optional[float] = None,
+                  market_type: str = "futures") -> Optional[float]:
+        tick = self.prices.get((market_type, symbol.upper()))
+        if tick is None or (max_age is not None and time.time() - tick[1] > max_age):
+            return None
+        return tick[0]
+
+    # --- Klines e indicadores --- #
+
+    def refresh(self, api_client, symbol: str, interval: str, limit: int, max_age: float = 0.0,
+                market_type: str = "futures") -> Optional[KlineSeries]:
+        """Série atualizada: reaproveita a do KlineStore se atualizada há menos de `max_age` s."""
+        series = self.kline_store.get_series(symbol, interval, capacity=limit, market_type=market_type)
+        if len(series) >= min(limit, series.capacity) - 1 and time.time() - series.updated_at <= max_age:
+            return series
+        self.stats["kline_requests"] += 1
+        return self.kline_store.fetch(api_client, symbol, interval, limit, market_type)
+
+    def indicator(self, series: Optional[KlineSeries], indicator: str,
+                  params: Optional[Dict] = None) -> Optional[Dict[str, Optional[float]]]:
+        """Indicador do último candle; recalculado só quando a versão da série muda."""
+        version = series_version(series)
+        if version is None:
+            return None
+        params = params or {}
+        key = (series.market_type, series.symbol, series.interval, indicator, tuple(sorted(params.items())))
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            self.stats["cache_hits"] += 1
+            return cached[1]
+        result = _compute(series, indicator, params)
+        self._cache[key] = (version, result)
+        self.stats["computations"] += 1
+        return result
+
+
+# Global instance for easy access
+_global_indicator_feed = None
+
+def get_indicator_feed() -> IndicatorFeed:
+    """Get global indicator feed instance."""
+    global _global_indicator_feed
+    if _global_indicator_feed is None:
+        _global_indicator_feed = IndicatorFeed()
+    return _global_indicator_feed
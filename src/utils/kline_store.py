@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Kline Store - armazenamento colunar de klines em ring buffers NumPy por (mercado, símbolo, intervalo).
+
+Os klines da API chegam como listas de strings; aqui cada candle é convertido UMA vez para
+um registro float64 e guardado num buffer pré-alocado. Candles fechados são anexados
+(append-on-close); o candle em formação é sobrescrito no lugar. Os consumidores recebem
+views sem cópia das colunas OHLCV em ordem cronológica, e as buscas subsequentes pedem à
+API apenas os candles que faltam. Spot e futuros têm séries separadas (preços e volumes
+diferem entre os mercados).
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.logger import setup_logger
+from utils.streaming_indicators import INTERVAL_MS
+
+log = setup_logger("kline_store")
+
+# Mesma ordem de colunas da API Binance (sem o campo "ignore")
+KLINE_DTYPE = np.dtype([
+    ("open_time", np.float64),
+    ("open", np.float64),
+    ("high", np.float64),
+    ("low", np.float64),
+    ("close", np.float64),
+    ("volume", np.float64),
+    ("close_time", np.float64),
+    ("quote_volume", np.float64),
+    ("trades", np.float64),
+    ("taker_buy_base", np.float64),
+    ("taker_buy_quote", np.float64),
+])
+KLINE_FIELDS = len(KLINE_DTYPE.names)
+
+
+def _parse_row(kline) -> tuple:
+    """Converte um kline (lista da API, array numérico ou registro) em tupla float."""
+    values = [float(kline[i]) for i in range(min(len(kline), KLINE_FIELDS))]
+    values.extend([0.0] * (KLINE_FIELDS - len(values)))
+    return tuple(values)
+
+
+def parse_klines_array(klines) -> np.ndarray:
+    """Resposta da API (lista de listas de strings) -> registros KLINE_DTYPE numa única conversão NumPy."""
+    if not klines:
+        return np.zeros(0, dtype=KLINE_DTYPE)
+    rows = np.asarray([kline[:KLINE_FIELDS] for kline in klines], dtype=np.float64)
+    return np.ascontiguousarray(rows).view(KLINE_DTYPE).reshape(-1)
+
+
+class KlineSeries:
+    """Ring buffer de klines de um (mercado, símbolo, intervalo).
+
+    Cada linha é escrita duas vezes (posições i e i+R) para que qualquer janela
+    cronológica seja um slice contíguo - ou seja, views sem cópia. O slot `head`
+    nunca guarda candle fechado e é usado para o candle em formação.
+    """
+
+    def __init__(self, symbol: str, interval: str, capacity: int = 200, market_type: str = "futures"):
+        self.symbol = symbol
+        self.interval = interval
+        self.market_type = market_type
+        self.interval_ms = INTERVAL_MS.get(interval)
+        self._lock = threading.Lock()
+        self.updated_at = 0.0  # Último merge (REST, hub ou stream)
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int, keep: Optional[np.ndarray] = None):
+        self.capacity = int(capacity)
+        self._ring = self.capacity + 1
+        self._buf = np.zeros(2 * self._ring, dtype=KLINE_DTYPE)
+        self.head = 0
+        self.count = 0
+        self.has_forming = False
+        self.last_closed_open_time: Optional[int] = None
+        if keep is not None:
+            for row in keep:
+                self._append_closed(row)
+
+    def _write(self, idx: int, row):
+        self._buf[idx] = row
+        self._buf[idx + self._ring] = row
+
+    def _append_closed(self, row):
+        self._write(self.head, row)
+        self.head = (self.head + 1) % self._ring
+        self.count = min(self.count + 1, self.capacity)
+        self.last_closed_open_time = int(row[0])
+
+    def ensure_capacity(self, capacity: int):
+        """Aumenta o buffer preservando os candles fechados."""
+        with self._lock:
+            if capacity > self.capacity:
+                self._allocate(capacity, keep=self._view(None, False).copy())
+
+    def merge(self, klines: Iterable, now_ms: Optional[int] = None) -> int:
+        """Incorpora klines (ordem cronológica). Retorna o número de candles fechados novos."""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        appended = 0
+        if isinstance(klines, np.ndarray) and klines.dtype == KLINE_DTYPE:
+            rows = klines.tolist()  # Já convertidos (parse_klines_array)
+        else:
+            rows = map(_parse_row, klines)
+        with self._lock:
+            for row in rows:
+                open_time = int(row[0])
+                last = self.last_closed_open_time
+                if last is not None and open_time <= last:
+                    continue  # Já armazenado
+                if last is not None and self.interval_ms and open_time > last + self.interval_ms:
+                    # Lacuna na série (ex.: worker parado) - recomeça para não misturar janelas
+                    log.debug(f"[{self.symbol}] Lacuna em klines {self.interval}, reiniciando série")
+                    self.head = self.count = 0
+                    self.last_closed_open_time = None
+                if row[6] >= now_ms:
+                    self._write(self.head, row)  # Candle em formação, sobrescrito no lugar
+                    self.has_forming = True
+                else:
+                    self._append_closed(row)
+                    self.has_forming = False
+                    appended += 1
+            self.updated_at = time.time()
+        return appended
+
+    def klines_needed(self, limit: int, now_ms: Optional[int] = None) -> int:
+        """Quantos klines pedir à API para ter `limit` candles atualizados (incluindo o em formação)."""
+        if self.interval_ms is None or self.last_closed_open_time is None or self.count < min(limit - 1, self.capacity):
+            return limit
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        # Fechados desde o último armazenado + o candle em formação
+        missing = (now_ms - self.last_closed_open_time) // self.interval_ms
+        return int(min(max(missing, 1), limit))
+
+    def _view(self, limit: Optional[int], include_forming: bool) -> np.ndarray:
+        forming = 1 if include_forming and self.has_forming else 0
+        n = self.count if limit is None else max(min(limit - forming, self.count), 0)
+        end = self.head + self._ring
+        return self._buf[end - n:end + forming]
+
+    def view(self, limit: Optional[int] = None, include_forming: bool = True) -> np.ndarray:
+        """Últimos `limit` candles (registro estruturado) sem cópia, do mais antigo ao mais recente.
+
+        A view reflete escritas futuras no buffer; copie se precisar de um snapshot estável.
+        """
+        with self._lock:
+            return self._view(limit, include_forming)
+
+    def column(self, name: str, limit: Optional[int] = None, include_forming: bool = True) -> np.ndarray:
+        return self.view(limit, include_forming)[name]
+
+    def opens(self, limit=None, include_forming=True) -> np.ndarray:
+        return self.column("open", limit, include_forming)
+
+    def highs(self, limit=None, include_forming=True) -> np.ndarray:
+        return self.column("high", limit, include_forming)
+
+    def lows(self, limit=None, include_forming=True) -> np.ndarray:
+        return self.column("low", limit, include_forming)
+
+    def closes(self, limit=None, include_forming=True) -> np.ndarray:
+        return self.column("close", limit, include_forming)
+
+    def volumes(self, limit=None, include_forming=True) -> np.ndarray:
+        return self.column("volume", limit, include_forming)
+
+    def __len__(self) -> int:
+        return self.count + (1 if self.has_forming else 0)
+
+    def to_list(self, limit: Optional[int] = None, include_forming: bool = True) -> List[list]:
+        """Klines no formato de lista da API Binance (para código legado)."""
+        rows = self.view(limit, include_forming).tolist()
+        result = []
+        for row in rows:
+            row = list(row)
+            row[0], row[6], row[8] = int(row[0]), int(row[6]), int(row[8])
+            row.append("0")
+            result.append(row)
+        return result
+
+
+class KlineStore:
+    """Registro central de KlineSeries - fonte única de klines no processo."""
+
+    def __init__(self, default_capacity: int = 200):
+        self.default_capacity = default_capacity
+        self._series: Dict[tuple, KlineSeries] = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "klines_fetched": 0, "klines_saved": 0}
+
+    def get_series(self, symbol: str, interval: str, capacity: Optional[int] = None,
+                   market_type: str = "futures") -> KlineSeries:
+        key = (market_type, symbol.upper(), interval)
+        capacity = max(capacity or 0, self.default_capacity)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = KlineSeries(key[1], interval, capacity, market_type)
+                self._series[key] = series
+        if capacity > series.capacity:
+            series.ensure_capacity(capacity)
+        return series
+
+    def update(self, symbol: str, interval: str, klines: Iterable, now_ms: Optional[int] = None,
+               market_type: str = "futures") -> KlineSeries:
+        series = self.get_series(symbol, interval, market_type=market_type)
+        series.merge(klines, now_ms)
+        return series
+
+    def plan(self, symbol: str, interval: str, limit: int = 100, market_type: str = "futures") -> int:
+        """Quantos klines pedir à API para atualizar a série até `limit` candles."""
+        return self.get_series(symbol, interval, capacity=limit, market_type=market_type).klines_needed(limit)
+
+    def ingest(self, symbol: str, interval: str, klines, limit: int, needed: int,
+               market_type: str = "futures") -> Optional[KlineSeries]:
+        """Incorpora uma resposta pedida via plan() e retorna a série (None se vazia)."""
+        series = self.get_series(symbol, interval, capacity=limit, market_type=market_type)
+        self.stats["requests"] += 1
+        if klines is not None and len(klines):
+            self.stats["klines_fetched"] += len(klines)
+            self.stats["klines_saved"] += limit - needed
+            series.merge(klines)
+        return series if len(series) > 0 else None
+
+    def fetch(self, api_client, symbol: str, interval: str, limit: int = 100,
+              market_type: str = "futures") -> Optional[KlineSeries]:
+        """Atualiza a série buscando só os klines que faltam e a retorna (None se vazia)."""
+        needed = self.plan(symbol, interval, limit, market_type)
+        if market_type == "spot":
+            klines = api_client.get_spot_klines(symbol=symbol, interval=interval, limit=needed)
+        else:
+            klines = api_client.get_futures_klines(symbol=symbol, interval=interval, limit=needed)
+        return self.ingest(symbol, interval, klines, limit, needed, market_type)
+
+    def export_arrays(self, interval: str, symbols: Optional[Iterable[str]] = None,
+                      market_type: str = "futures") -> Dict[str, np.ndarray]:
+        """Candles fechados das séries (`market_type`, `interval`) em arrays planos (para np.savez).
+
+        Retorna symbols, offsets (n+1) e klines (registros KLINE_DTYPE concatenados).
+        """
+        with self._lock:
+            if symbols is None:
+                keys = [key for key in self._series if key[0] == market_type and key[2] == interval]
+            else:
+                keys = [(market_type, symbol.upper(), interval) for symbol in symbols
+                        if (market_type, symbol.upper(), interval) in self._series]
+            views = [self._series[key].view(include_forming=False) for key in keys]
+        offsets = np.zeros(len(views) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(view) for view in views])
+        klines = np.concatenate(views) if views else np.zeros(0, dtype=KLINE_DTYPE)
+        return {
+            "symbols": np.array([key[1] for key in keys], dtype=str),
+            "offsets": offsets,
+            "klines": klines,
+        }
+
+    def import_arrays(self, interval: str, symbols: np.ndarray, offsets: np.ndarray, klines: np.ndarray,
+                      now_ms: Optional[int] = None, market_type: str = "futures") -> int:
+        """Restaura séries exportadas por export_arrays (candles já presentes são ignorados)."""
+        restored = 0
+        for i, symbol in enumerate(symbols.tolist()):
+            rows = klines[offsets[i]:offsets[i + 1]]
+            if len(rows) == 0:
+                continue
+            series = self.get_series(symbol, interval, capacity=len(rows), market_type=market_type)
+            series.merge(rows, now_ms)
+            restored += 1
+        return restored
+
+    def remove(self, symbol: str, market_type: Optional[str] = None):
+        """Remove as séries do símbolo (de um mercado ou de ambos)."""
+        symbol = symbol.upper()
+        with self._lock:
+            for key in [k for k in self._series if k[1] == symbol and market_type in (None, k[0])]:
+                del self._series[key]
+
+
+# Global instance for easy access
+_global_kline_store = None
+
+def get_kline_store() -> KlineStore:
+    """Get global kline store instance."""
+    global _global_kline_store
+    if _global_kline_store is None:
+        _global_kline_store = KlineStore()
+    return _global_kline_store
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Market Data Hub - ingestão centralizada de dados de mercado em um único processo.
+
+Um único processo (hub) é dono do WebSocket e do polling REST (tickers 24h e mark price
+em chamadas bulk, klines por símbolo) e publica os últimos valores em um segmento
+multiprocessing.shared_memory com layout numérico fixo. Os workers de trading apenas
+leem desse segmento, eliminando N conexões WebSocket e N fetches REST duplicados.
+
+Layout (S = max_symbols, W = kline_window):
+    meta    int64   [S, 5]      active, market, seq, kline_head, kline_count
+    names   uint8   [S, 16]     símbolo ASCII
+    ticker  float64 [S, 9]      price, mark_price, change_pct, volume, quote_volume,
+                                high, low, ticker_update_time, kline_update_time
+    klines  float64 [S, W, 11]  ring buffer de klines no formato Binance (sem "Ignore")
+
+Consistência: cada slot usa um seqlock (seq ímpar = escrita em andamento); leitores
+repetem a cópia se o seq mudou durante a leitura.
+"""
+
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.logger import setup_logger
+
+log = setup_logger("market_data_hub")
+
+# Colunas de meta
+META_ACTIVE, META_MARKET, META_SEQ, META_HEAD, META_COUNT = range(5)
+META_FIELDS = 5
+
+# Colunas de ticker
+(TICKER_PRICE, TICKER_MARK_PRICE, TICKER_CHANGE_PCT, TICKER_VOLUME, TICKER_QUOTE_VOLUME,
+ TICKER_HIGH, TICKER_LOW, TICKER_UPDATE_TIME, KLINE_UPDATE_TIME) = range(9)
+TICKER_FIELDS = 9
+
+KLINE_FIELDS = 11  # open_time, open, high, low, close, volume, close_time, quote_volume,
+                   # trades, taker_buy_base, taker_buy_quote
+NAME_BYTES = 16
+
+MARKET_CODES = {"futures": 0, "spot": 1}
+MARKET_NAMES = {v: k for k, v in MARKET_CODES.items()}
+
+
+class SharedMarketDataBuffer:
+    """Segmento de memória compartilhada com tickers e janelas de klines por símbolo.
+
+    O processo principal cria o segmento (owner=True); hub e workers recebem a instância
+    via argumentos do multiprocessing e se reconectam ao mesmo segmento ao deserializar.
+    """
+
+    def __init__(self, name: str = None, max_symbols: int = 64, kline_window: int = 200,
+                 create: bool = True, lock=None):
+        self.max_symbols = int(max_symbols)
+        self.kline_window = int(kline_window)
+        self.owner = create
+        self.lock = lock if lock is not None else multiprocessing.Lock()
+
+        size = self._layout_size(self.max_symbols, self.kline_window)
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Segmento órfão de uma execução anterior - recriar
+                stale = shared_memory.SharedMemory(name=name, create=False)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name, create=False)
+        self.name = self.shm.name
+
+        self._map_arrays()
+        if create:
+            self.meta.fill(0)
+            self.names.fill(0)
+            self.ticker.fill(0.0)
+            self.klines.fill(0.0)
+            log.info(
+                f"📦 Shared market data buffer criado: {self.name} "
+                f"({size / 1024:.0f} KB, {self.max_symbols} símbolos x {self.kline_window} klines)"
+            )
+
+        self._slot_cache: Dict[str, int] = {}
+
+    @staticmethod
+    def _layout_size(max_symbols: int, kline_window: int) -> int:
+        return (
+            max_symbols * META_FIELDS * 8
+            + max_symbols * NAME_BYTES
+            + max_symbols * TICKER_FIELDS * 8
+            + max_symbols * kline_window * KLINE_FIELDS * 8
+        )
+
+    def _map_arrays(self):
+        buf = self.shm.buf
+        offset = 0
+        s, w = self.max_symbols, self.kline_window
+        self.meta = np.ndarray((s, META_FIELDS), dtype=np.int64, buffer=buf, offset=offset)
+        offset += self.meta.nbytes
+        self.names = np.ndarray((s, NAME_BYTES), dtype=np.uint8, buffer=buf, offset=offset)
+        offset += self.names.nbytes
+        self.ticker = np.ndarray((s, TICKER_FIELDS), dtype=np.float64, buffer=buf, offset=offset)
+        offset += self.ticker.nbytes
+        self.klines = np.ndarray((s, w, KLINE_FIELDS), dtype=np.float64, buffer=buf, offset=offset)
+
+    # --- Pickling: reanexa ao segmento existente no processo filho --- #
+
+    def __getstate__(self):
+        return {
+            "name": self.name,
+            "max_symbols": self.max_symbols,
+            "kline_window": self.kline_window,
+            "lock": self.lock,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(
+            name=state["name"],
+            max_symbols=state["max_symbols"],
+            kline_window=state["kline_window"],
+            create=False,
+            lock=state["lock"],
+        )
+
+    def close(self):
+        """Desanexa do segmento (e remove, se for o dono)."""
+        # Liberar views antes de fechar o mmap
+        self.meta = self.names = self.ticker = self.klines = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+                log.info(f"Shared market data buffer removido: {self.name}")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning(f"Erro ao fechar shared memory {self.name}: {e}")
+
+    # --- Registro de símbolos --- #
+
+    def register_symbol(self, symbol: str, market_type: str = "futures") -> Optional[int]:
+        """Registra (ou atualiza o mercado de) um símbolo e retorna o slot."""
+        symbol = symbol.upper()
+        market_code = MARKET_CODES.get(market_type.lower(), 0)
+        with self.lock:
+            slot = self._find_slot(symbol)
+            if slot is None:
+                free = np.flatnonzero(self.meta[:, META_ACTIVE] == 0)
+                if len(free) == 0:
+                    log.error(f"[{symbol}] Shared market data buffer cheio ({self.max_symbols} símbolos)")
+                    return None
+                slot = int(free[0])
+                encoded = symbol.encode("ascii")[:NAME_BYTES]
+                self.names[slot].fill(0)
+                self.names[slot, :len(encoded)] = np.frombuffer(encoded, dtype=np.uint8)
+                self.ticker[slot].fill(0.0)
+                self.meta[slot, META_HEAD] = 0
+                self.meta[slot, META_COUNT] = 0
+                self.meta[slot, META_ACTIVE] = 1
+                log.info(f"[{symbol}] Registrado no market data hub (slot {slot})")
+            self.meta[slot, META_MARKET] = market_code
+            self._slot_cache[symbol] = slot
+            return slot
+
+    def unregister_symbol(self, symbol: str):
+        symbol = symbol.upper()
+        with self.lock:
+            slot = self._find_slot(symbol)
+            if slot is not None:
+                self.meta[slot, META_ACTIVE] = 0
+                self.names[slot].fill(0)
+            self._slot_cache.pop(symbol, None)
+
+    def _find_slot(self, symbol: str) -> Optional[int]:
+        cached = self._slot_cache.get(symbol)
+        if cached is not None and self._slot_name(cached) == symbol and self.meta[cached, META_ACTIVE]:
+            return cached
+        for slot in np.flatnonzero(self.meta[:, META_ACTIVE] == 1):
+            if self._slot_name(int(slot)) == symbol:
+                self._slot_cache[symbol] = int(slot)
+                return int(slot)
+        return None
+
+    def _slot_name(self, slot: int) -> str:
+        return self.names[slot].tobytes().rstrip(b"\x00").decode("ascii", errors="ignore")
+
+    def active_symbols(self) -> Dict[str, str]:
+        """Retorna {símbolo: market_type} dos slots ativos."""
+        result = {}
+        for slot in np.flatnonzero(self.meta[:, META_ACTIVE] == 1):
+            slot = int(slot)
+            result[self._slot_name(slot)] = MARKET_NAMES.get(int(self.meta[slot, META_MARKET]), "futures")
+        return result
+
+    def slot_of(self, symbol: str) -> Optional[int]:
+        return self._find_slot(symbol.upper())
+
+    # --- Escrita (apenas no processo hub) --- #
+
+    def _begin_write(self, slot: int):
+        self.meta[slot, META_SEQ] += 1
+
+    def _end_write(self, slot: int):
+        self.meta[slot, META_SEQ] += 1
+
+    def write_ticker(self, slot: int, price: float = None, mark_price: float = None,
+                     change_pct: float = None, volume: float = None, quote_volume: float = None,
+                     high: float = None, low: float = None):
+        self._begin_write(slot)
+        try:
+            row = self.ticker[slot]
+            for col, value in (
+                (TICKER_PRICE, price), (TICKER_MARK_PRICE, mark_price),
+                (TICKER_CHANGE_PCT, change_pct), (TICKER_VOLUME, volume),
+                (TICKER_QUOTE_VOLUME, quote_volume), (TICKER_HIGH, high), (TICKER_LOW, low),
+            ):
+                if value is not None:
+                    row[col] = value
+            row[TICKER_UPDATE_TIME] = time.time()
+        finally:
+            self._end_write(slot)
+
+    def write_klines(self, slot: int, klines: List[list]):
+        """Faz merge de klines (formato Binance, ordem cronológica) no ring buffer do slot."""
+        if not klines:
+            return
+        rows = np.asarray([[float(v) for v in k[:KLINE_FIELDS]] for k in klines], dtype=np.float64)
+        w = self.kline_window
+
+        self._begin_write(slot)
+        try:
+            head = int(self.meta[slot, META_HEAD])   # próxima posição de escrita
+            count = int(self.meta[slot, META_COUNT])
+            ring = self.klines[slot]
+            last_open = ring[(head - 1) % w, 0] if count else -1.0
+
+            for row in rows:
+                if count and row[0] == last_open:
+                    ring[(head - 1) % w] = row  # Atualiza o candle corrente
+                elif row[0] > last_open:
+                    ring[head] = row
+                    head = (head + 1) % w
+                    count = min(count + 1, w)
+                    last_open = row[0]
+
+            self.meta[slot, META_HEAD] = head
+            self.meta[slot, META_COUNT] = count
+            self.ticker[slot, KLINE_UPDATE_TIME] = time.time()
+        finally:
+            self._end_write(slot)
+
+    # --- Leitura (workers) --- #
+
+    def _consistent_copy(self, slot: int, reader, retries: int = 50):
+        for _ in range(retries):
+            seq_before = int(self.meta[slot, META_SEQ])
+            if seq_before & 1:
+                time.sleep(0)
+                continue
+            data = reader()
+            if int(self.meta[slot, META_SEQ]) == seq_before:
+                return data
+        return None
+
+    def read_ticker(self, symbol: str) -> Optional[np.ndarray]:
+        slot = self._find_slot(symbol.upper())
+        if slot is None:
+            return None
+        return self._consistent_copy(slot, lambda: self.ticker[slot].copy())
+
+    def read_klines(self, symbol: str, limit: int = None) -> Optional[np.ndarray]:
+        """Retorna array [n, 11] em ordem cronológica (mais antigo primeiro)."""
+        slot = self._find_slot(symbol.upper())
+        if slot is None:
+            return None
+
+        def _copy():
+            head = int(self.meta[slot, META_HEAD])
+            count = int(self.meta[slot, META_COUNT])
+            n = count if limit is None else min(limit, count)
+            if n == 0:
+                return np.empty((0, KLINE_FIELDS), dtype=np.float64)
+            idx = (np.arange(head - n, head)) % self.kline_window
+            return self.klines[slot, idx]  # fancy indexing já copia
+
+        return self._consistent_copy(slot, _copy)
+
+
+class SharedMarketDataReader:
+    """Visão de leitura do buffer para um worker (interface compatível com ws_client.get_price)."""
+
+    def __init__(self, buffer: SharedMarketDataBuffer, config: dict = None):
+        self.buffer = buffer
+        hub_config = (config or {}).get("market_data_hub", {})
+        self.max_ticker_age = hub_config.get("max_ticker_age_seconds", 10)
+        self.max_kline_age = hub_config.get("max_kline_age_seconds", 90)
+        self.kline_interval = (config or {}).get("http_api", {}).get("default_kline_interval", "3m")
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        row = self.buffer.read_ticker(symbol)
+        if row is None or row[TICKER_PRICE] <= 0:
+            return None
+        if time.time() - row[TICKER_UPDATE_TIME] > self.max_ticker_age:
+            return None
+        return float(row[TICKER_PRICE])
+
+    def get_ticker(self, symbol: str) -> Optional[dict]:
+        """Ticker no formato dos endpoints REST (ou None se ausente/desatualizado)."""
+        row = self.buffer.read_ticker(symbol)
+        if row is None or row[TICKER_PRICE] <= 0:
+            return None
+        if time.time() - row[TICKER_UPDATE_TIME] > self.max_ticker_age:
+            return None
+        ticker = {
+            "symbol": symbol.upper(),
+            "price": str(row[TICKER_PRICE]),
+            "lastPrice": str(row[TICKER_PRICE]),
+            "time": int(row[TICKER_UPDATE_TIME] * 1000),
+        }
+        if row[TICKER_MARK_PRICE] > 0:
+            ticker["markPrice"] = str(row[TICKER_MARK_PRICE])
+        if row[TICKER_VOLUME] > 0:
+            ticker["priceChangePercent"] = str(row[TICKER_CHANGE_PCT])
+            ticker["volume"] = str(row[TICKER_VOLUME])
+            ticker["quoteVolume"] = str(row[TICKER_QUOTE_VOLUME])
+            ticker["highPrice"] = str(row[TICKER_HIGH])
+            ticker["lowPrice"] = str(row[TICKER_LOW])
+        return ticker
+
+    def get_klines_array(self, symbol: str, interval: str, limit: int) -> Optional[np.ndarray]:
+        """Array [limit, 11] se o hub tiver a janela completa e atualizada, senão None."""
+        if interval != self.kline_interval:
+            return None
+        row = self.buffer.read_ticker(symbol)
+        if row is None or time.time() - row[KLINE_UPDATE_TIME] > self.max_kline_age:
+            return None
+        klines = self.buffer.read_klines(symbol, limit)
+        if klines is None or len(klines) < limit:
+            return None
+        return klines
+
+    def get_klines(self, symbol: str, interval: str, limit: int) -> Optional[list]:
+        """Klines no formato de lista da API Binance (compatível com _get_klines)."""
+        klines = self.get_klines_array(symbol, interval, limit)
+        if klines is None:
+            return None
+        rows = klines.tolist()
+        for row in rows:
+            row[0] = int(row[0])
+            row[6] = int(row[6])
+            row[8] = int(row[8])
+            row.append("0")
+        return rows
+
+
+class MarketDataHub:
+    """Processo único de ingestão: WebSocket para último preço + REST bulk/klines."""
+
+    def __init__(self, buffer: SharedMarketDataBuffer, config: dict, operation_mode: str = "production"):
+        self.buffer = buffer
+        self.config = config
+        self.operation_mode = operation_mode
+        hub_config = config.get("market_data_hub", {})
+        self.loop_interval = hub_config.get("loop_interval_seconds", 1)
+        self.ticker_refresh = hub_config.get("ticker_refresh_seconds", 5)
+        self.kline_refresh = hub_config.get("kline_refresh_seconds", 30)
+        self.kline_interval = config.get("http_api", {}).get("default_kline_interval", "3m")
+
+        self.api_client = None
+        self.ws_client = None
+        self._last_ticker_refresh = 0.0
+        self._last_kline_refresh: Dict[str, float] = {}
+        self._ws_symbols = set()
+        self._ws_published: Dict[str, float] = {}
+
+        self.stats = {"ticker_refreshes": 0, "kline_fetches": 0, "errors": 0}
+
+    def run(self, stop_event):
+        """Loop principal do hub (roda no processo dedicado)."""
+        from utils.api_client import APIClient
+        from utils.simple_websocket import SimpleBinanceWebSocket
+
+        self.api_client = APIClient(self.config, operation_mode=self.operation_mode)
+        self.ws_client = SimpleBinanceWebSocket(testnet=self.operation_mode == "shadow", config=self.config)
+        self.ws_client.start()
+        log.info(f"🛰️ Market data hub iniciado (shm={self.buffer.name})")
+
+        try:
+            while not stop_event.is_set():
+                cycle_start = time.time()
+                try:
+                    symbols = self.buffer.active_symbols()
+                    self._sync_ws_subscriptions(symbols)
+                    self._publish_ws_prices(symbols)
+
+                    if cycle_start - self._last_ticker_refresh >= self.ticker_refresh:
+                        self._refresh_tickers(symbols)
+                        self._last_ticker_refresh = cycle_start
+
+                    self._refresh_klines(symbols)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    log.error(f"Erro no ciclo do market data hub: {e}")
+
+                elapsed = time.time() - cycle_start
+                stop_event.wait(max(0.0, self.loop_interval - elapsed))
+        finally:
+            self.ws_client.stop()
+            log.info("Market data hub encerrado")
+
+    def _sync_ws_subscriptions(self, symbols: Dict[str, str]):
+        current = set(symbols)
+        if current == self._ws_symbols:
+            return
+        self.ws_client.set_ticker_subscriptions(current)
+        for symbol in self._ws_symbols - current:
+            self._last_kline_refresh.pop(symbol, None)
+            self._ws_published.pop(symbol, None)
+        self._ws_symbols = current
+
+    def _publish_ws_prices(self, symbols: Dict[str, str]):
+        for symbol in symbols:
+            data = self.ws_client.ticker_data.get(symbol)
+            if not data or data["timestamp"] <= self._ws_published.get(symbol, 0.0):
+                continue
+            self._ws_published[symbol] = data["timestamp"]
+            slot = self.buffer.slot_of(symbol)
+            if slot is not None:
+                self.buffer.write_ticker(slot, price=data["price"])
+
+    def _refresh_tickers(self, symbols: Dict[str, str]):
+        """Uma chamada bulk por mercado em vez de uma por worker."""
+        if not symbols:
+            return
+        markets = set(symbols.values())
+
+        if "futures" in markets:
+            tickers = self.api_client.get_futures_ticker() or []
+            marks = self.api_client.get_futures_mark_price() or []
+            mark_by_symbol = {m["symbol"]: float(m["markPrice"]) for m in marks if "markPrice" in m}
+            for t in tickers:
+                symbol = t.get("symbol")
+                if symbols.get(symbol) != "futures":
+                    continue
+                slot = self.buffer.slot_of(symbol)
+                if slot is None:
+                    continue
+                self.buffer.write_ticker(
+                    slot,
+                    price=float(t["lastPrice"]),
+                    mark_price=mark_by_symbol.get(symbol),
+                    change_pct=float(t.get("priceChangePercent", 0)),
+                    volume=float(t.get("volume", 0)),
+                    quote_volume=float(t.get("quoteVolume", 0)),
+                    high=float(t.get("highPrice", 0)),
+                    low=float(t.get("lowPrice", 0)),
+                )
+
+        if "spot" in markets:
+            for t in self.api_client.get_spot_ticker() or []:
+                symbol = t.get("symbol")
+                if symbols.get(symbol) != "spot":
+                    continue
+                slot = self.buffer.slot_of(symbol)
+                if slot is not None:
+                    self.buffer.write_ticker(slot, price=float(t["price"]))
+
+        self.stats["ticker_refreshes"] += 1
+
+    def _refresh_klines(self, symbols: Dict[str, str]):
+        now = time.time()
+        for symbol, market_type in symbols.items():
+            last = self._last_kline_refresh.get(symbol)
+            if last is not None and now - last < self.kline_refresh:
+                continue
+            slot = self.buffer.slot_of(symbol)
+            if slot is None:
+                continue
+
+            # Primeira carga preenche a janela inteira; depois só os 2 últimos candles
+            limit = self.buffer.kline_window if last is None else 2
+            if market_type == "spot":
+                klines = self.api_client.get_spot_klines(symbol=symbol, interval=self.kline_interval, limit=limit)
+            else:
+                klines = self.api_client.get_futures_klines(symbol=symbol, interval=self.kline_interval, limit=limit)
+
+            if klines:
+                self.buffer.write_klines(slot, klines)
+                self._last_kline_refresh[symbol] = now
+                self.stats["kline_fetches"] += 1
+
+
+def run_market_data_hub(buffer: SharedMarketDataBuffer, config: dict, operation_mode: str, stop_event):
+    """Entry point do processo do hub."""
+    MarketDataHub(buffer, config, operation_mode).run(stop_event)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Order Index - índice bidirecional das ordens ativas do grid.
+
+Mapeia nível de preço -> orderId (interface de dict, compatível com o antigo
+active_grid_orders) e mantém os mapas reversos orderId -> nível e
+clientOrderId -> orderId, de modo que fills, cancelamentos e recuperação
+encontram o nível em O(1) em vez de varrer todas as ordens.
+"""
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Hashable, Iterator, Optional
+
+
+def _order_key(order_id) -> Hashable:
+    """Normaliza o orderId: a API devolve int, estados salvos em JSON podem trazer str."""
+    if isinstance(order_id, str) and order_id.isdigit():
+        return int(order_id)
+    return order_id
+
+
+class OrderIndex(MutableMapping):
+    """nível -> orderId com lookups reversos por orderId e clientOrderId.
+
+    Cada nível tem no máximo uma ordem e cada ordem pertence a no máximo um nível:
+    registrar uma ordem em um nível remove a ordem anterior daquele nível e o
+    registro anterior da mesma ordem em outro nível.
+    """
+
+    def __init__(self, initial: Optional[Dict[Any, Any]] = None):
+        self._by_level: Dict[Any, Any] = {}
+        self._by_order: Dict[Hashable, Any] = {}
+        self._by_client_id: Dict[str, Hashable] = {}
+        self._client_id_of: Dict[Hashable, str] = {}
+        if initial:
+            for level, order_id in initial.items():
+                self.set(level, order_id)
+
+    # --- Interface de dict (nível -> orderId) --- #
+
+    def __getitem__(self, level):
+        return self._by_level[level]
+
+    def __setitem__(self, level, order_id):
+        self.set(level, order_id)
+
+    def __delitem__(self, level):
+        order_id = self._by_level.pop(level)
+        self._forget_order(_order_key(order_id))
+
+    def __iter__(self) -> Iterator:
+        return iter(self._by_level)
+
+    def __len__(self) -> int:
+        return len(self._by_level)
+
+    def __contains__(self, level) -> bool:
+        return level in self._by_level
+
+    def __repr__(self) -> str:
+        return f"OrderIndex({self._by_level!r})"
+
+    def clear(self):
+        self._by_level.clear()
+        self._by_order.clear()
+        self._by_client_id.clear()
+        self._client_id_of.clear()
+
+    # --- Registro --- #
+
+    def set(self, level, order_id, client_order_id: Optional[str] = None):
+        """Associa a ordem ao nível, removendo associações antigas dos dois lados."""
+        key = _order_key(order_id)
+        previous_order = self._by_level.get(level)
+        if previous_order is not None and _order_key(previous_order) != key:
+            self._forget_order(_order_key(previous_order))
+        previous_level = self._by_order.get(key, level)
+        if previous_level != level:
+            self._by_level.pop(previous_level, None)
+
+        self._by_level[level] = order_id
+        self._by_order[key] = level
+        if client_order_id:
+            old_client_id = self._client_id_of.get(key)
+            if old_client_id and old_client_id != client_order_id:
+                self._by_client_id.pop(old_client_id, None)
+            self._by_client_id[client_order_id] = key
+            self._client_id_of[key] = client_order_id
+
+    def _forget_order(self, key):
+        self._by_order.pop(key, None)
+        client_id = self._client_id_of.pop(key, None)
+        if client_id is not None:
+            self._by_client_id.pop(client_id, None)
+
+    # --- Lookups reversos --- #
+
+    def level_of(self, order_id) -> Optional[Any]:
+        """Nível da ordem, ou None se ela não pertence ao grid."""
+        return self._by_order.get(_order_key(order_id))
+
+    def has_order(self, order_id) -> bool:
+        return _order_key(order_id) in self._by_order
+
+    def pop_order(self, order_id) -> Optional[Any]:
+        """Remove a ordem (fill/cancelamento) e retorna o nível que ela ocupava."""
+        key = _order_key(order_id)
+        level = self._by_order.get(key)
+        if level is None and key not in self._by_order:
+            return None
+        self._by_level.pop(level, None)
+        self._forget_order(key)
+        return level
+
+    def order_id_for_client(self, client_order_id: str) -> Optional[Any]:
+        """orderId associado a um clientOrderId (ex.: eventos que só trazem o id do cliente)."""
+        key = self._by_client_id.get(client_order_id)
+        return None if key is None else self._by_level.get(self._by_order.get(key))
+
+    def client_order_id(self, order_id) -> Optional[str]:
+        return self._client_id_of.get(_order_key(order_id))
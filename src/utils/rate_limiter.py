@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter - token bucket de request weight da Binance compartilhado entre processos.
+
+O estado dos buckets (um por mercado: futures e spot) vive em um segmento
+multiprocessing.shared_memory protegido por um multiprocessing.Lock, de modo que o
+processo principal, o market data hub e todos os workers consomem do mesmo orçamento
+por IP. O bucket é ressincronizado com os headers X-MBX-USED-WEIGHT-1M /
+X-MBX-ORDER-COUNT-10S das respostas e bloqueado por Retry-After em 429/418.
+
+Prioridades: ordens (place/cancel) consomem até o fim do bucket; consultas de conta
+precisam deixar uma reserva; dados de mercado/analytics deixam uma reserva maior e
+aguardam enquanto houver ordens esperando. Cada ordem em espera ocupa um slot
+(PID, pool, expiração) na shared memory; slots expirados ou de processos mortos (ex.:
+worker encerrado na rotação de pares) são ignorados e liberados.
+"""
+
+import asyncio
+import atexit
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.logger import setup_logger
+
+log = setup_logger("rate_limiter")
+
+PRIORITY_ORDER = 0
+PRIORITY_ACCOUNT = 1
+PRIORITY_MARKET_DATA = 2
+PRIORITY_NAMES = {PRIORITY_ORDER: "order", PRIORITY_ACCOUNT: "account", PRIORITY_MARKET_DATA: "market_data"}
+
+POOLS = {"futures": 0, "spot": 1}
+
+# Campos de estado por pool
+(F_TOKENS, F_LAST_REFILL, F_ORDER_TOKENS, F_ORDER_LAST_REFILL, F_BANNED_UNTIL,
+ F_USED_WEIGHT, F_REQUESTS, F_WAITED_SECONDS, F_THROTTLED, F_BANS) = range(10)
+STATE_FIELDS = 10
+
+# Slots de ordens em espera: (pid, pool, expira_em); pid 0 = livre
+W_PID, W_POOL, W_EXPIRES = range(3)
+WAITER_FIELDS = 3
+MAX_WAITERS = 64
+
+DEFAULT_LIMITS = {
+    "futures": {"weight_per_minute": 2400, "orders_per_10s": 300},
+    "spot": {"weight_per_minute": 6000, "orders_per_10s": 100},
+}
+DEFAULT_RESERVES = {"order": 0.0, "account": 0.10, "market_data": 0.25}
+
+
+class SharedRateLimiter:
+    """Token bucket por peso de requisição, compartilhado via shared memory.
+
+    Como o SharedMarketDataBuffer, a instância pode ser passada para processos filhos
+    e se reconecta ao mesmo segmento ao ser deserializada.
+    """
+
+    def __init__(self, config: dict = None, name: str = None, create: bool = True, lock=None):
+        rl_config = (config or {}).get("api_client", {}).get("rate_limiting", {})
+        self.config = config or {}
+        self.safety_margin = float(rl_config.get("safety_margin", 0.9))
+        self.max_wait_seconds = float(rl_config.get("max_wait_seconds", 30))
+        reserves = {**DEFAULT_RESERVES, **rl_config.get("priority_reserve", {})}
+        self.reserves = [reserves["order"], reserves["account"], reserves["market_data"]]
+
+        self.capacity = np.zeros(len(POOLS))
+        self.order_capacity = np.zeros(len(POOLS))
+        for market, pool in POOLS.items():
+            limits = DEFAULT_LIMITS[market]
+            weight = rl_config.get(f"{market}_weight_per_minute", limits["weight_per_minute"])
+            orders = rl_config.get(f"{market}_orders_per_10s", limits["orders_per_10s"])
+            self.capacity[pool] = weight * self.safety_margin
+            self.order_capacity[pool] = orders * self.safety_margin
+
+        self.owner = create
+        self.lock = lock if lock is not None else multiprocessing.Lock()
+        state_size = len(POOLS) * STATE_FIELDS * 8
+        size = state_size + MAX_WAITERS * WAITER_FIELDS * 8
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Segmento órfão de uma execução anterior - recriar
+                stale = shared_memory.SharedMemory(name=name, create=False)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name, create=False)
+        self.name = self.shm.name
+        self.state = np.ndarray((len(POOLS), STATE_FIELDS), dtype=np.float64, buffer=self.shm.buf)
+        self.waiters = np.ndarray(
+            (MAX_WAITERS, WAITER_FIELDS), dtype=np.float64, buffer=self.shm.buf, offset=state_size
+        )
+
+        if create:
+            now = time.time()
+            self.state.fill(0.0)
+            self.waiters.fill(0.0)
+            self.state[:, F_TOKENS] = self.capacity
+            self.state[:, F_ORDER_TOKENS] = self.order_capacity
+            self.state[:, F_LAST_REFILL] = now
+            self.state[:, F_ORDER_LAST_REFILL] = now
+            log.info(
+                f"🚦 Rate limiter compartilhado criado: {self.name} "
+                f"(futures {self.capacity[0]:.0f} weight/min, spot {self.capacity[1]:.0f} weight/min)"
+            )
+
+    # --- Pickling: reanexa ao segmento existente no processo filho --- #
+
+    def __getstate__(self):
+        return {"config": self.config, "name": self.name, "lock": self.lock}
+
+    def __setstate__(self, state):
+        self.__init__(config=state["config"], name=state["name"], create=False, lock=state["lock"])
+
+    def close(self):
+        """Desanexa do segmento (e remove, se for o dono)."""
+        self.state = None
+        self.waiters = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    # --- Bucket --- #
+
+    def _refill(self, pool: int, now: float):
+        row = self.state[pool]
+        elapsed = max(now - row[F_LAST_REFILL], 0.0)
+        row[F_TOKENS] = min(self.capacity[pool], row[F_TOKENS] + elapsed * self.capacity[pool] / 60.0)
+        row[F_LAST_REFILL] = now
+        elapsed = max(now - row[F_ORDER_LAST_REFILL], 0.0)
+        row[F_ORDER_TOKENS] = min(
+            self.order_capacity[pool], row[F_ORDER_TOKENS] + elapsed * self.order_capacity[pool] / 10.0
+        )
+        row[F_ORDER_LAST_REFILL] = now
+
+    def _orders_waiting(self, pool: int, now: float) -> bool:
+        """Há ordens vivas esperando no pool? Libera slots expirados ou de processos mortos (sob o lock)."""
+        waiters = self.waiters
+        for slot in np.flatnonzero((waiters[:, W_PID] > 0) & (waiters[:, W_POOL] == pool)):
+            if waiters[slot, W_EXPIRES] > now and _pid_alive(int(waiters[slot, W_PID])):
+                return True
+            waiters[slot] = 0.0
+        return False
+
+    def _try_acquire(self, pool: int, weight: float, priority: int, orders: int) -> float:
+        """Tenta consumir do bucket (sob o lock). Retorna 0 se conseguiu, senão o tempo de espera sugerido."""
+        now = time.time()
+        self._refill(pool, now)
+        row = self.state[pool]
+
+        banned = row[F_BANNED_UNTIL] - now
+        if banned > 0:
+            return banned
+
+        reserve = self.capacity[pool] * self.reserves[priority]
+        if priority == PRIORITY_MARKET_DATA and self._orders_waiting(pool, now):
+            return 0.05  # Ordens esperando têm preferência
+        weight_deficit = weight - (row[F_TOKENS] - reserve)
+        order_deficit = orders - row[F_ORDER_TOKENS] if orders else 0.0
+        if weight_deficit <= 0 and order_deficit <= 0:
+            row[F_TOKENS] -= weight
+            row[F_ORDER_TOKENS] -= orders
+            row[F_REQUESTS] += 1
+            return 0.0
+        return max(
+            weight_deficit / (self.capacity[pool] / 60.0) if weight_deficit > 0 else 0.0,
+            order_deficit / (self.order_capacity[pool] / 10.0) if order_deficit > 0 else 0.0,
+            0.01,
+        )
+
+    def _begin_wait(self, pool: int, priority: int, wait: float, timeout: float) -> Optional[tuple]:
+        """Registra a espera; ordens ocupam um slot até `timeout` (retorna (slot, expira_em) ou None)."""
+        ticket = None
+        with self.lock:
+            self.state[pool, F_THROTTLED] += 1
+            if priority == PRIORITY_ORDER:
+                now = time.time()
+                waiters = self.waiters
+                free = np.flatnonzero(waiters[:, W_PID] == 0)
+                if len(free) == 0:
+                    # Tabela cheia: recicla slots expirados/órfãos de todos os pools
+                    for pool_index in POOLS.values():
+                        self._orders_waiting(pool_index, now)
+                    free = np.flatnonzero(waiters[:, W_PID] == 0)
+                if len(free):
+                    slot = int(free[0])
+                    expires = now + timeout + 1.0
+                    waiters[slot] = (os.getpid(), pool, expires)
+                    ticket = (slot, expires)
+        log.debug(f"Rate limit: {PRIORITY_NAMES[priority]} aguardando {wait:.2f}s")
+        return ticket
+
+    def _finish_wait(self, pool: int, waited: float, ticket: Optional[tuple]):
+        with self.lock:
+            self.state[pool, F_WAITED_SECONDS] += waited
+            if ticket is not None:
+                slot, expires = ticket
+                # O slot pode ter sido reciclado após expirar; só libera se ainda for nosso
+                if self.waiters[slot, W_PID] == os.getpid() and self.waiters[slot, W_EXPIRES] == expires:
+                    self.waiters[slot] = 0.0
+
+    def acquire(self, weight: float = 1, priority: int = PRIORITY_MARKET_DATA, market: str = "futures",
+                orders: int = 0, timeout: Optional[float] = None) -> float:
+        """Bloqueia até haver orçamento. Retorna o tempo esperado (s).
+
+        Após `timeout` (padrão max_wait_seconds) a requisição é liberada mesmo assim,
+        para não travar o loop de trading; o 429 resultante é tratado pelo APIClient.
+        """
+        pool = POOLS.get(market, 0)
+        timeout = self.max_wait_seconds if timeout is None else timeout
+        started = time.time()
+        waiting = False
+        ticket = None
+        while True:
+            with self.lock:
+                wait = self._try_acquire(pool, weight, priority, orders)
+            if wait == 0.0:
+                if waiting:
+                    self._finish_wait(pool, time.time() - started, ticket)
+                return time.time() - started if waiting else 0.0
+            if not waiting:
+                waiting = True
+                ticket = self._begin_wait(pool, priority, wait, timeout)
+            if time.time() - started >= timeout:
+                log.warning(
+                    f"Rate limiter: {PRIORITY_NAMES[priority]} ({market}, weight {weight}) liberado após {timeout:.0f}s de espera"
+                )
+                self._finish_wait(pool, time.time() - started, ticket)
+                return time.time() - started
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, weight: float = 1, priority: int = PRIORITY_MARKET_DATA,
+                            market: str = "futures", orders: int = 0, timeout: Optional[float] = None) -> float:
+        """Versão asyncio de acquire (não bloqueia o event loop durante a espera)."""
+        pool = POOLS.get(market, 0)
+        timeout = self.max_wait_seconds if timeout is None else timeout
+        started = time.time()
+        waiting = False
+        ticket = None
+        while True:
+            with self.lock:
+                wait = self._try_acquire(pool, weight, priority, orders)
+            if wait == 0.0:
+                if waiting:
+                    self._finish_wait(pool, time.time() - started, ticket)
+                return time.time() - started if waiting else 0.0
+            if not waiting:
+                waiting = True
+                ticket = self._begin_wait(pool, priority, wait, timeout)
+            if time.time() - started >= timeout:
+                self._finish_wait(pool, time.time() - started, ticket)
+                return time.time() - started
+            await asyncio.sleep(min(wait, 1.0))
+
+    def update_from_headers(self, headers, market: str = "futures"):
+        """Sincroniza o bucket com o uso informado pela Binance (X-MBX-USED-WEIGHT-1M, X-MBX-ORDER-COUNT-10S)."""
+        if not headers:
+            return
+        pool = POOLS.get(market, 0)
+        used_weight = _header_value(headers, "X-MBX-USED-WEIGHT-1M")
+        order_count = _header_value(headers, "X-MBX-ORDER-COUNT-10S")
+        if used_weight is None and order_count is None:
+            return
+        with self.lock:
+            self._refill(pool, time.time())
+            row = self.state[pool]
+            if used_weight is not None:
+                row[F_USED_WEIGHT] = used_weight
+                # O servidor é a fonte da verdade: nunca ter mais tokens do que o restante real
+                row[F_TOKENS] = min(row[F_TOKENS], self.capacity[pool] - used_weight)
+            if order_count is not None:
+                row[F_ORDER_TOKENS] = min(row[F_ORDER_TOKENS], self.order_capacity[pool] - order_count)
+
+    def penalize(self, market: str = "futures", retry_after: Optional[float] = None):
+        """429/418: bloqueia o pool por Retry-After (ou 60s) e zera o bucket."""
+        pool = POOLS.get(market, 0)
+        retry_after = float(retry_after) if retry_after else 60.0
+        with self.lock:
+            row = self.state[pool]
+            row[F_BANNED_UNTIL] = max(row[F_BANNED_UNTIL], time.time() + retry_after)
+            row[F_TOKENS] = 0.0
+            row[F_BANS] += 1
+        log.warning(f"🚦 Rate limit da Binance ({market}): requisições pausadas por {retry_after:.0f}s")
+
+    def get_statistics(self) -> Dict:
+        stats = {}
+        with self.lock:
+            now = time.time()
+            for market, pool in POOLS.items():
+                self._refill(pool, now)
+                row = self.state[pool]
+                stats[market] = {
+                    "available_weight": float(row[F_TOKENS]),
+                    "capacity": float(self.capacity[pool]),
+                    "available_orders_10s": float(row[F_ORDER_TOKENS]),
+                    "server_used_weight_1m": float(row[F_USED_WEIGHT]),
+                    "requests": int(row[F_REQUESTS]),
+                    "throttled": int(row[F_THROTTLED]),
+                    "waited_seconds": float(row[F_WAITED_SECONDS]),
+                    "bans": int(row[F_BANS]),
+                    "banned_for_seconds": max(float(row[F_BANNED_UNTIL]) - now, 0.0),
+                    "orders_waiting": int(np.count_nonzero(
+                        (self.waiters[:, W_PID] > 0) & (self.waiters[:, W_POOL] == pool)
+                        & (self.waiters[:, W_EXPIRES] > now)
+                    )),
+                }
+        return stats
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Existe, mas pertence a outro usuário
+    return True
+
+
+def _header_value(headers, key: str) -> Optional[float]:
+    value = headers.get(key)
+    if value is None:
+        value = headers.get(key.lower())
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# --- Peso e prioridade por endpoint (python-binance) --- #
+
+_FUTURES_WEIGHTS = {
+    "futures_account_balance": 5, "futures_account": 5, "futures_position_information": 5,
+    "futures_get_order": 1, "futures_create_order": 1, "futures_cancel_order": 1,
+    "futures_place_batch_order": 5, "futures_cancel_orders": 1, "futures_cancel_all_open_orders": 1,
+    "futures_exchange_info": 1, "futures_account_trades": 5, "futures_income_history": 30,
+    "futures_get_all_orders": 5, "futures_change_leverage": 1, "futures_time": 1,
+}
+_SPOT_WEIGHTS = {
+    "get_account": 20, "get_asset_balance": 20, "get_order": 4, "create_order": 1, "cancel_order": 1,
+    "get_exchange_info": 20, "get_klines": 2, "get_server_time": 1,
+}
+
+
+def _klines_weight(limit) -> int:
+    limit = int(limit or 500)
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+def request_profile(method_name: str, params: dict) -> tuple:
+    """(market, weight, priority, orders) estimados para um método do python-binance."""
+    params = params or {}
+    market = "futures" if method_name.startswith("futures_") else "spot"
+    has_symbol = bool(params.get("symbol"))
+
+    if method_name == "futures_klines":
+        weight = _klines_weight(params.get("limit"))
+    elif method_name in ("futures_ticker", "futures_symbol_ticker"):
+        weight = 1 if has_symbol else 40
+    elif method_name == "futures_mark_price":
+        weight = 1 if has_symbol else 10
+    elif method_name == "futures_get_open_orders":
+        weight = 1 if has_symbol else 40
+    elif method_name == "futures_order_book":
+        weight = 2 if int(params.get("limit", 20)) <= 50 else 10
+    elif method_name == "get_ticker":
+        weight = 2 if has_symbol else 80
+    elif method_name == "get_open_orders":
+        weight = 6 if has_symbol else 80
+    else:
+        weight = _FUTURES_WEIGHTS.get(method_name) or _SPOT_WEIGHTS.get(method_name) or 1
+
+    orders = 0
+    if method_name in ("futures_create_order", "create_order", "order_market", "order_limit"):
+        orders = 1
+    elif method_name == "futures_place_batch_order":
+        orders = len(params.get("batchOrders", [])) or 1
+
+    name = method_name.lower()
+    if orders or "cancel" in name:
+        priority = PRIORITY_ORDER
+    elif any(key in name for key in ("account", "balance", "position", "get_order", "open_orders",
+                                     "listen_key", "stream", "leverage", "income", "trades")):
+        priority = PRIORITY_ACCOUNT
+    else:
+        priority = PRIORITY_MARKET_DATA
+    return market, weight, priority, orders
+
+
+def rest_path_profile(http_method: str, url: str, params: dict = None, signed: bool = False) -> tuple:
+    """(market, weight, priority, orders) para chamadas REST diretas (AsyncAPIClient)."""
+    params = params or {}
+    market = "futures" if "/fapi/" in url else "spot"
+    path = url.rsplit("/", 1)[-1]
+    if path == "klines":
+        weight = _klines_weight(params.get("limit")) * (1 if market == "futures" else 2)
+    elif path in ("24hr", "price") and not params.get("symbol"):
+        weight = 40 if market == "futures" else 80
+    elif path == "batchOrders":
+        weight = 5
+    else:
+        weight = 5 if signed else 1
+    if http_method in ("POST", "DELETE"):
+        priority = PRIORITY_ORDER
+        orders = 1 if path == "order" else 0
+    else:
+        priority = PRIORITY_ACCOUNT if signed else PRIORITY_MARKET_DATA
+        orders = 0
+    return market, weight, priority, orders
+
+
+# Global instance for easy access
+_global_rate_limiter = None
+
+def get_global_rate_limiter(config: dict = None) -> Optional[SharedRateLimiter]:
+    """Rate limiter do processo (compartilhado se instalado pelo processo principal).
+
+    Um processo filho sem limiter herdado cria um bucket privado, que NÃO conta o weight
+    dos outros processos - isso é registrado como aviso.
+    """
+    global _global_rate_limiter
+    if _global_rate_limiter is None and config is not None:
+        rl_config = config.get("api_client", {}).get("rate_limiting", {})
+        if rl_config.get("enabled", True):
+            _global_rate_limiter = SharedRateLimiter(config)
+            atexit.register(_global_rate_limiter.close)
+            if multiprocessing.parent_process() is not None:
+                log.warning(
+                    f"🚦 Processo {os.getpid()} sem rate limiter compartilhado: usando bucket privado "
+                    f"({_global_rate_limiter.name}); o weight dos demais processos não é contabilizado"
+                )
+    return _global_rate_limiter
+
+
+def set_global_rate_limiter(limiter: Optional[SharedRateLimiter]):
+    """Instala o limiter compartilhado recebido do processo principal."""
+    global _global_rate_limiter
+    _global_rate_limiter = limiter
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Risk Engine - métricas de risco de todos os símbolos em operações matriciais.
+
+Preços e PnL de cada símbolo ficam em ring buffers NumPy (símbolos x janela) com cabeça
+própria por linha, de modo que "as últimas N amostras de cada símbolo" é um único
+take_along_axis. A partir dessa matriz o motor calcula, em uma chamada:
+
+- covariância/correlação de todos os pares (um produto matricial);
+- VaR histórico e paramétrico (gaussiano) e CVaR por símbolo;
+- VaR/CVaR do portfólio para um vetor de pesos;
+- as métricas de PnL do RiskMetrics (VaR, Sharpe, drawdown máximo) para todas as linhas.
+
+Convenção de sinal igual ao RiskMetrics: VaR é o quantil do retorno (negativo = perda).
+"""
+
+import threading
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+_INITIAL_CAPACITY = 64
+
+
+class RiskEngine:
+    """Ring buffers alinhados de preço/PnL e métricas de risco vetorizadas."""
+
+    def __init__(self, window: int = 100, capacity: int = _INITIAL_CAPACITY):
+        self.window = int(window)
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.capacity = 0
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        def grow(old, shape, fill, dtype=np.float64):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        w = self.window
+        self.prices = grow(getattr(self, "prices", None), (capacity, w), np.nan)
+        self.pnl = grow(getattr(self, "pnl", None), (capacity, w), np.nan)
+        self.head = grow(getattr(self, "head", None), capacity, 0, np.int64)    # próxima escrita
+        self.count = grow(getattr(self, "count", None), capacity, 0, np.int64)  # amostras válidas
+        self.capacity = capacity
+
+    def _row_of(self, symbol: str) -> int:
+        row = self._rows.get(symbol)
+        if row is None:
+            row = len(self.symbols)
+            if row >= self.capacity:
+                self._allocate(self.capacity * 2)
+            self._rows[symbol] = row
+            self.symbols.append(symbol)
+        return row
+
+    # --- Ingestão --- #
+
+    def update(self, symbol: str, price: float, pnl: float = 0.0):
+        """Acrescenta uma amostra (preço, PnL) ao ring do símbolo."""
+        with self._lock:
+            row = self._row_of(symbol)
+            pos = self.head[row]
+            self.prices[row, pos] = price
+            self.pnl[row, pos] = pnl
+            self.head[row] = (pos + 1) % self.window
+            self.count[row] = min(self.count[row] + 1, self.window)
+
+    def update_many(self, symbols: List[str], prices, pnls=None):
+        """Uma amostra para cada símbolo (uma passada de monitoramento) em escrita vetorizada."""
+        with self._lock:
+            rows = np.fromiter((self._row_of(s) for s in symbols), dtype=np.int64, count=len(symbols))
+            pos = self.head[rows]
+            self.prices[rows, pos] = prices
+            self.pnl[rows, pos] = pnls if pnls is not None else 0.0
+            self.head[rows] = (pos + 1) % self.window
+            self.count[rows] = np.minimum(self.count[rows] + 1, self.window)
+
+    def length(self, symbol: str) -> int:
+        row = self._rows.get(symbol)
+        return int(self.count[row]) if row is not None else 0
+
+    # --- Janelas --- #
+
+    def _window(self, data: np.ndarray, rows: np.ndarray, length: int) -> np.ndarray:
+        """Últimas `length` amostras de cada linha, alinhadas à direita (NaN onde não há dado)."""
+        idx = (self.head[rows][:, None] - length + np.arange(length)) % self.window
+        values = np.take_along_axis(data[rows], idx, axis=1)
+        missing = np.arange(length)[None, :] < (length - self.count[rows])[:, None]
+        values[missing] = np.nan
+        return values
+
+    def _select(self, symbols: Optional[List[str]], min_length: int) -> Tuple[List[str], np.ndarray]:
+        symbols = self.symbols if symbols is None else symbols
+        chosen = [s for s in symbols if s in self._rows and self.count[self._rows[s]] > min_length]
+        return chosen, np.fromiter((self._rows[s] for s in chosen), dtype=np.int64, count=len(chosen))
+
+    def aligned_returns(self, symbols: List[str] = None, window: int = None,
+                        min_length: int = 30) -> Tuple[List[str], np.ndarray]:
+        """Retornos simples alinhados pelo fim (comprimento comum) dos símbolos com histórico."""
+        with self._lock:
+            chosen, rows = self._select(symbols, min_length)
+            if not chosen:
+                return [], np.empty((0, 0))
+            length = int(self.count[rows].min())
+            if window is not None:
+                length = min(length, window + 1)
+            prices = self._window(self.prices, rows, length)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(prices, axis=1) / prices[:, :-1]
+        return chosen, np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    def _own_returns(self, rows: np.ndarray) -> np.ndarray:
+        """Retornos de cada linha com o próprio histórico (NaN à esquerda nas linhas curtas)."""
+        prices = self._window(self.prices, rows, self.window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.diff(prices, axis=1) / prices[:, :-1]
+        returns[~np.isfinite(returns)] = np.nan
+        return returns
+
+    # --- Covariância / correlação --- #
+
+    @staticmethod
+    def covariance_matrix(returns: np.ndarray) -> np.ndarray:
+        centered = returns - returns.mean(axis=1, keepdims=True)
+        return centered @ centered.T / max(returns.shape[1] - 1, 1)
+
+    @staticmethod
+    def correlation_from_covariance(cov: np.ndarray) -> np.ndarray:
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(std, std)
+        corr = np.nan_to_num(corr, nan=0.0, posinf=0.0, neginf=0.0)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def correlation(self, symbols: List[str] = None, min_length: int = 30) -> Tuple[List[str], np.ndarray]:
+        """Matriz de correlação de todos os pares em um produto matricial."""
+        chosen, returns = self.aligned_returns(symbols, min_length=min_length)
+        if len(chosen) < 2:
+            return chosen, np.empty((0, 0))
+        return chosen, self.correlation_from_covariance(self.covariance_matrix(returns))
+
+    # --- VaR / CVaR --- #
+
+    @staticmethod
+    def _row_quantile(sorted_values: np.ndarray, valid: np.ndarray, q: float) -> np.ndarray:
+        """Quantil linear (np.percentile) por linha de uma matriz ordenada com NaN no fim."""
+        pos = (valid - 1).clip(min=0) * q
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, (valid - 1).clip(min=0))
+        lo_v = np.take_along_axis(sorted_values, lo[:, None], axis=1)[:, 0]
+        hi_v = np.take_along_axis(sorted_values, hi[:, None], axis=1)[:, 0]
+        return lo_v + (hi_v - lo_v) * (pos - lo)
+
+    @staticmethod
+    def _nan_moments(values: np.ndarray, valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Média e desvio padrão (ddof=0) por linha ignorando NaN."""
+        n = np.maximum(valid, 1)
+        mean = np.nansum(values, axis=1) / n
+        std = np.sqrt(np.nansum((values - mean[:, None]) ** 2, axis=1) / n)
+        return mean, std
+
+    @classmethod
+    def tail_risk(cls, returns: np.ndarray, confidence: float = 0.95, horizon: int = 1,
+                  min_samples: int = 10) -> Dict[str, np.ndarray]:
+        """VaR histórico, VaR paramétrico e CVaR por linha (NaN ignorado; NaN se poucas amostras)."""
+        valid = np.sum(~np.isnan(returns), axis=1)
+        ordered = np.sort(returns, axis=1)
+        historical = cls._row_quantile(ordered, valid, 1.0 - confidence)
+        with np.errstate(invalid="ignore"):
+            tail = returns <= historical[:, None]
+        cvar = np.where(tail, returns, 0.0).sum(axis=1) / np.maximum(tail.sum(axis=1), 1)
+        mean, std = cls._nan_moments(returns, valid)
+        z = NormalDist().inv_cdf(1.0 - confidence)
+        scale = np.sqrt(horizon)
+        enough = valid >= min_samples
+        return {
+            "historical_var": np.where(enough, historical * scale, np.nan),
+            "parametric_var": np.where(enough, (mean + z * std) * scale, np.nan),
+            "cvar": np.where(enough, cvar * scale, np.nan),
+            "volatility": np.where(enough, std, np.nan),
+            "samples": valid,
+        }
+
+    def risk_report(self, symbols: List[str] = None, confidence: float = 0.95, horizon: int = 1,
+                    weights: Dict[str, float] = None, min_length: int = 30) -> Dict:
+        """VaR/CVaR de todos os símbolos, correlação e VaR do portfólio em uma chamada."""
+        with self._lock:
+            chosen, rows = self._select(symbols, 1)
+            own = self._own_returns(rows) if len(rows) else np.empty((0, self.window - 1))
+        per_symbol = self.tail_risk(own, confidence, horizon)
+        report = {
+            "symbols": chosen,
+            **{key: {s: float(v) for s, v in zip(chosen, values) if not np.isnan(v)}
+               for key, values in per_symbol.items() if key != "samples"},
+        }
+
+        aligned, returns = self.aligned_returns(symbols, min_length=min_length)
+        if len(aligned) >= 2:
+            cov = self.covariance_matrix(returns)
+            report["correlation_symbols"] = aligned
+            report["correlation"] = self.correlation_from_covariance(cov)
+            if weights:
+                w = np.array([float(weights.get(s, 0.0)) for s in aligned])
+                portfolio = w @ returns
+                tail = self.tail_risk(portfolio[None, :], confidence, horizon)
+                z = NormalDist().inv_cdf(1.0 - confidence)
+                report["portfolio"] = {
+                    "historical_var": float(tail["historical_var"][0]),
+                    "cvar": float(tail["cvar"][0]),
+                    "parametric_var": float((w @ returns.mean(axis=1) + z * np.sqrt(max(w @ cov @ w, 0.0)))
+                                            * np.sqrt(horizon)),
+                }
+        return report
+
+    # --- Métricas de PnL (semântica do RiskMetrics) --- #
+
+    def pnl_metrics(self, symbols: List[str] = None, confidence: float = 0.95, horizon: int = 1,
+                    risk_free_rate: float = 0.02) -> Dict[str, Dict[str, Optional[float]]]:
+        """VaR, Sharpe e drawdown máximo sobre o histórico de PnL de cada símbolo, vetorizados."""
+        with self._lock:
+            chosen, rows = self._select(symbols, 0)
+            if not chosen:
+                return {}
+            pnl = self._window(self.pnl, rows, self.window)
+            count = self.count[rows].copy()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = np.diff(pnl, axis=1) / np.abs(pnl[:, :-1])
+        valid = np.sum(~np.isnan(ratios), axis=1)
+        ordered = np.sort(ratios, axis=1)
+        var = self._row_quantile(ordered, valid, 1.0 - confidence) * np.sqrt(horizon)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean, std = self._nan_moments(ratios, valid)
+            sharpe = (mean * 365 - risk_free_rate) / (std * np.sqrt(365))
+
+        # Drawdown do PnL acumulado, ignorando o preenchimento à esquerda
+        present = ~np.isnan(pnl)
+        cumulative = np.cumsum(np.where(present, pnl, 0.0), axis=1)
+        running_max = np.maximum.accumulate(np.where(present, cumulative, -np.inf), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            drawdown = (cumulative - running_max) / np.abs(running_max)
+        drawdown = np.where(running_max == 0, 0.0, drawdown)
+        max_drawdown = np.where(present, drawdown, np.inf).min(axis=1)
+
+        result = {}
+        for i, symbol in enumerate(chosen):
+            has_var = count[i] >= 30 and valid[i] >= 10
+            result[symbol] = {
+                "var": float(var[i]) if has_var else None,
+                "sharpe": float(sharpe[i]) if has_var and std[i] > 0 and np.isfinite(sharpe[i]) else None,
+                "max_drawdown": float(max_drawdown[i]) if count[i] >= 10 else None,
+            }
+        return result
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Rotation Monitor - tabela de métricas por símbolo mantida por streaming para a rotação de pares.
+
+Em vez de buscar ticker + klines via REST para cada par ativo e para cada candidato a
+cada avaliação, o monitor mantém colunas NumPy (preço, volume 24h, ATR de Wilder sobre
+barras do intervalo configurado) atualizadas pelo stream de tickers de todo o mercado
+(!ticker@arr) ou por uma única chamada REST bulk. As barras OHLC são montadas a partir
+dos próprios ticks, de modo que a decisão de rotação vira uma consulta em memória.
+
+Símbolos ainda sem histórico suficiente são semeados uma única vez a partir do
+KlineStore (seed_from_series); depois disso o custo em REST é zero.
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.logger import setup_logger
+from utils.streaming_indicators import INTERVAL_MS, WilderATR, bar_true_range, wilder_step
+
+log = setup_logger("rotation_monitor")
+
+_INITIAL_CAPACITY = 256
+
+
+class RotationMonitor:
+    """Métricas de rotação (ATR%, volume 24h, atualidade) de todo o universo em colunas."""
+
+    def __init__(self, config: dict = None):
+        monitor_config = (config or {}).get("pair_selection", {}).get("rotation_monitor", {})
+        self.interval = monitor_config.get("interval", "5m")
+        self.bar_ms = INTERVAL_MS.get(self.interval, 300_000)
+        self.atr_period = int(monitor_config.get("atr_period", 14))
+        self.max_ticker_age = monitor_config.get("max_ticker_age_seconds", 30)
+        self.evaluation_interval = monitor_config.get("evaluation_interval_seconds", 60)
+        self.seed_retry_seconds = monitor_config.get("seed_retry_seconds", 3600)
+
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self._allocate(_INITIAL_CAPACITY)
+        self.last_ticker_batch = 0.0
+        self._last_evaluation = 0.0
+        self._seed_attempts: Dict[str, float] = {}
+        self.stats = {"ticker_batches": 0, "bars_closed": 0, "seeded": 0}
+
+    def _allocate(self, capacity: int):
+        def grow(old, fill, dtype=np.float64):
+            new = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            return new
+
+        self.price = grow(getattr(self, "price", None), np.nan)
+        self.quote_volume = grow(getattr(self, "quote_volume", None), 0.0)
+        self.updated_at = grow(getattr(self, "updated_at", None), 0.0)
+        self.bar_id = grow(getattr(self, "bar_id", None), -1, np.int64)
+        self.bar_high = grow(getattr(self, "bar_high", None), np.nan)
+        self.bar_low = grow(getattr(self, "bar_low", None), np.nan)
+        self.bar_close = grow(getattr(self, "bar_close", None), np.nan)
+        self.prev_close = grow(getattr(self, "prev_close", None), np.nan)
+        self.atr = grow(getattr(self, "atr", None), np.nan)
+        self.tr_sum = grow(getattr(self, "tr_sum", None), 0.0)
+        self.tr_count = grow(getattr(self, "tr_count", None), 0, np.int64)
+        self.capacity = capacity
+
+    def _row_of(self, symbol: str) -> int:
+        """Índice da linha do símbolo, criando-a se necessário (chamado com _lock)."""
+        row = self._rows.get(symbol)
+        if row is None:
+            row = len(self.symbols)
+            if row >= self.capacity:
+                self._allocate(self.capacity * 2)
+            self._rows[symbol] = row
+            self.symbols.append(symbol)
+        return row
+
+    # --- Ingestão --- #
+
+    def on_ticker_batch(self, tickers: Iterable[dict], now: Optional[float] = None):
+        """Aplica um lote de tickers 24h: payload do stream !ticker@arr ou resposta REST bulk."""
+        now = now if now is not None else time.time()
+        symbols, prices, volumes, event_ms = [], [], [], []
+        for t in tickers:
+            symbol = t.get("s") or t.get("symbol")
+            price = t.get("c") or t.get("lastPrice")
+            if not symbol or price is None:
+                continue
+            symbols.append(symbol)
+            prices.append(float(price))
+            volumes.append(float(t.get("q") or t.get("quoteVolume") or 0))
+            event_ms.append(int(t.get("E") or t.get("closeTime") or now * 1000))
+        if not symbols:
+            return
+
+        with self._lock:
+            rows = np.fromiter((self._row_of(s) for s in symbols), dtype=np.int64, count=len(symbols))
+            prices = np.asarray(prices)
+            bars = np.asarray(event_ms, dtype=np.int64) // self.bar_ms
+
+            # Barras encerradas alimentam o ATR; as novas começam no preço atual
+            rolled = rows[(bars > self.bar_id[rows]) & (self.bar_id[rows] >= 0)]
+            if len(rolled):
+                self._close_bars(rolled)
+            new_bar = bars > self.bar_id[rows]
+            started = rows[new_bar]
+            self.bar_id[started] = bars[new_bar]
+            self.bar_high[started] = prices[new_bar]
+            self.bar_low[started] = prices[new_bar]
+
+            self.bar_high[rows] = np.fmax(self.bar_high[rows], prices)
+            self.bar_low[rows] = np.fmin(self.bar_low[rows], prices)
+            self.bar_close[rows] = prices
+            self.price[rows] = prices
+            self.quote_volume[rows] = volumes
+            self.updated_at[rows] = now
+            self.last_ticker_batch = now
+            self.stats["ticker_batches"] += 1
+
+    def _close_bars(self, rows: np.ndarray):
+        """Wilder ATR (talib.ATR) avançado uma barra para cada linha, vetorizado."""
+        p = self.atr_period
+        high, low, close = self.bar_high[rows], self.bar_low[rows], self.bar_close[rows]
+        prev = self.prev_close[rows]
+        has_prev = ~np.isnan(prev)
+        tr = bar_true_range(high, low, prev)
+
+        counted = rows[has_prev]
+        tr = tr[has_prev]
+        self.tr_count[counted] += 1
+        count = self.tr_count[counted]
+        seeding = count <= p
+        self.tr_sum[counted[seeding]] += tr[seeding]
+        seeded = count == p
+        self.atr[counted[seeded]] = self.tr_sum[counted[seeded]] / p
+        smoothing = count > p
+        smooth_rows = counted[smoothing]
+        self.atr[smooth_rows] = wilder_step(self.atr[smooth_rows], tr[smoothing], p)
+
+        self.prev_close[rows] = close
+        self.stats["bars_closed"] += len(rows)
+
+    def seed_from_series(self, symbol: str, series, ticker: dict = None, now: Optional[float] = None):
+        """Semeia o ATR de um símbolo a partir de uma KlineSeries do mesmo intervalo."""
+        closed = series.view(include_forming=False)
+        if len(closed) == 0:
+            return
+        atr = WilderATR(self.atr_period)
+        for row in closed.tolist():
+            atr.update(row[2], row[3], row[4])
+        full = series.view()
+        with self._lock:
+            row = self._row_of(symbol)
+            self.prev_close[row] = closed["close"][-1]
+            self.tr_count[row] = max(atr._count, 0)
+            self.tr_sum[row] = atr._tr_sum
+            self.atr[row] = atr.value if atr.value is not None else np.nan
+            if len(full) > len(closed):  # candle em formação vira a barra corrente
+                forming = full[-1]
+                self.bar_id[row] = int(forming["open_time"]) // self.bar_ms
+                self.bar_high[row] = forming["high"]
+                self.bar_low[row] = forming["low"]
+                self.bar_close[row] = forming["close"]
+            else:
+                self.bar_id[row] = -1
+            if ticker:
+                self.price[row] = float(ticker.get("lastPrice", ticker.get("c", "nan")))
+                self.quote_volume[row] = float(ticker.get("quoteVolume", ticker.get("q", 0)) or 0)
+                self.updated_at[row] = now if now is not None else time.time()
+            self.stats["seeded"] += 1
+
+    # --- Consultas --- #
+
+    def _fresh_mask(self, now: float) -> np.ndarray:
+        n = len(self.symbols)
+        return ((now - self.updated_at[:n]) <= self.max_ticker_age) & ~np.isnan(self.atr[:n])
+
+    def metrics(self, symbol: str, now: Optional[float] = None) -> Optional[Dict]:
+        """Métricas atuais do símbolo (mesmo formato de PairSelector._get_symbol_metrics) ou None."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self._rows.get(symbol)
+            if row is None or now - self.updated_at[row] > self.max_ticker_age or np.isnan(self.atr[row]):
+                return None
+            price = self.price[row]
+            return {
+                "atr_perc": float(self.atr[row] / price) if price > 0 else 0.0,
+                "volume_24h": float(self.quote_volume[row]),
+                "last_price": float(price),
+            }
+
+    def alternatives(self, exclude_symbols: Iterable[str] = (), min_atr_perc: float = 1.5,
+                     min_volume: float = 5_000_000, max_atr_perc: float = 15.0, limit: int = 10,
+                     candidates: Iterable[str] = None, now: Optional[float] = None) -> List[Dict]:
+        """Melhores substitutos (ATR% e volume em faixa) ordenados por quality_score, em memória."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            n = len(self.symbols)
+            symbols = np.asarray(self.symbols, dtype=object)
+            mask = self._fresh_mask(now)
+            if candidates is not None:
+                mask &= np.isin(symbols, list(candidates))
+            exclude = list(exclude_symbols)
+            if exclude:
+                mask &= ~np.isin(symbols, exclude)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                atr_perc = np.where(self.price[:n] > 0, self.atr[:n] / self.price[:n], 0.0) * 100
+            volume = self.quote_volume[:n]
+        mask &= (atr_perc >= min_atr_perc) & (atr_perc <= max_atr_perc) & (volume >= min_volume)
+        rows = np.flatnonzero(mask)
+        score = atr_perc[rows] * (volume[rows] / 1_000_000)
+        best = rows[np.argsort(-score, kind="stable")][:limit]
+        return [
+            {
+                "symbol": symbols[i],
+                "atr_percentage": float(atr_perc[i]),
+                "volume_24h": float(volume[i]),
+                "quality_score": float(atr_perc[i] * (volume[i] / 1_000_000)),
+            }
+            for i in best
+        ]
+
+    def should_seed(self, symbol: str, now: Optional[float] = None) -> bool:
+        """True se o símbolo ainda não tem ATR e não houve tentativa de seed recente (registra a tentativa).
+
+        Evita repetir o fallback REST a cada avaliação para símbolos sem histórico
+        (listagens novas, pares deslistados)."""
+        now = now if now is not None else time.time()
+        with self._lock:
+            row = self._rows.get(symbol)
+            if row is not None and not np.isnan(self.atr[row]):
+                return False
+            if now - self._seed_attempts.get(symbol, 0.0) < self.seed_retry_seconds:
+                return False
+            self._seed_attempts[symbol] = now
+            return True
+
+    def stale_symbols(self, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Símbolos já na tabela cujo último ticker é mais velho que max_ticker_age.
+
+        O stream pode estar ativo e ainda assim não cobrir um símbolo; a atualidade é por linha.
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            return [
+                symbol for symbol in symbols
+                if symbol in self._rows and now - self.updated_at[self._rows[symbol]] > self.max_ticker_age
+            ]
+
+    def stream_is_fresh(self, now: Optional[float] = None) -> bool:
+        now = now if now is not None else time.time()
+        return now - self.last_ticker_batch <= self.max_ticker_age
+
+    def evaluation_due(self, now: Optional[float] = None) -> bool:
+        """Respeita a cadência configurada de avaliação da rotação (e marca a avaliação)."""
+        now = now if now is not None else time.time()
+        if now - self._last_evaluation < self.evaluation_interval:
+            return False
+        self._last_evaluation = now
+        return True
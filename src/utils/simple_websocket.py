@@ -1,6 +1,10 @@
 #!/usr/bin/env python3
 """
 Simplified WebSocket client for real-time price data
+
+Usa combined streams (/stream?streams=...) com SUBSCRIBE/UNSUBSCRIBE enviados na
+conexão ativa, distribuindo streams em várias conexões (shards) quando o limite de
+streams por conexão da Binance (1024) se aproxima.
 """
 
 import json
@@ -9,78 +13,282 @@ import time
 import websocket
 from collections import defaultdict
 from decimal import Decimal
+from typing import Callable, Dict, Iterable, List
 
 from utils.logger import setup_logger
 
 log = setup_logger("simple_websocket")
 
 
+class _StreamConnection:
+    """Uma conexão combined-stream (shard) com seu conjunto de streams e reconexão própria."""
+
+    def __init__(self, parent: "SimpleBinanceWebSocket", shard_id: int):
+        self.parent = parent
+        self.shard_id = shard_id
+        self.streams = set()
+        self.ws = None
+        self.thread = None
+        self.connected = False
+        self._send_lock = threading.Lock()
+        self._last_send = 0.0
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True,
+                                       name=f"SimpleWS-shard-{self.shard_id}")
+        self.thread.start()
+
+    def stop(self):
+        self.connected = False
+        if self.ws:
+            self.ws.close()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=self.parent.join_timeout)
+
+    def subscribe(self, streams: List[str]):
+        new_streams = [s for s in streams if s not in self.streams]
+        if not new_streams:
+            return
+        self.streams.update(new_streams)
+        # Se ainda não conectado, _on_open envia o SUBSCRIBE de todos os streams
+        if self.connected:
+            self._send_method("SUBSCRIBE", new_streams)
+
+    def unsubscribe(self, streams: List[str]):
+        removed = [s for s in streams if s in self.streams]
+        if not removed:
+            return
+        self.streams.difference_update(removed)
+        if self.connected:
+            self._send_method("UNSUBSCRIBE", removed)
+
+    def _send_method(self, method: str, streams: List[str]):
+        """Envia frames SUBSCRIBE/UNSUBSCRIBE respeitando o limite de mensagens por segundo."""
+        max_params = self.parent.max_params_per_request
+        for i in range(0, len(streams), max_params):
+            params = streams[i:i + max_params]
+            with self._send_lock:
+                wait = self.parent.min_send_interval - (time.time() - self._last_send)
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    self.ws.send(json.dumps({
+                        "method": method,
+                        "params": params,
+                        "id": self.parent._next_request_id(),
+                    }))
+                    log.debug(f"[shard {self.shard_id}] {method} {len(params)} streams")
+                except Exception as e:
+                    # A reconexão reenvia todos os streams em _on_open
+                    log.warning(f"[shard {self.shard_id}] Falha ao enviar {method}: {e}")
+                self._last_send = time.time()
+
+    def _run(self):
+        """Mantém a conexão viva com reconexão exponencial sem perder as inscrições."""
+        delay = self.parent.reconnect_delay
+        while self.parent.is_running:
+            try:
+                if not self.streams:
+                    time.sleep(1)
+                    continue
+
+                log.info(f"[shard {self.shard_id}] Connecting to: {self.parent.stream_url} ({len(self.streams)} streams)")
+
+                self.ws = websocket.WebSocketApp(
+                    self.parent.stream_url,
+                    on_message=self.parent._on_message,
+                    on_error=self.parent._on_error,
+                    on_close=self._on_close,
+                    on_open=self._on_open,
+                )
+
+                connected_at = time.time()
+                self.ws.run_forever(ping_interval=self.parent.ping_interval)
+                # Conexão durou o suficiente: resetar backoff
+                if time.time() - connected_at > self.parent.max_reconnect_delay:
+                    delay = self.parent.reconnect_delay
+
+            except Exception as e:
+                log.error(f"[shard {self.shard_id}] WebSocket error: {e}")
+
+            self.connected = False
+            if self.parent.is_running:
+                self.parent.stats["reconnections"] += 1
+                log.info(f"[shard {self.shard_id}] Reconnecting in {delay:.1f}s...")
+                time.sleep(delay)
+                delay = min(delay * 2, self.parent.max_reconnect_delay)
+
+    def _on_open(self, ws):
+        self.connected = True
+        self.parent.stats["connection_time"] = time.time()
+        log.info(f"[shard {self.shard_id}] WebSocket connection opened")
+        if self.streams:
+            self._send_method("SUBSCRIBE", sorted(self.streams))
+
+    def _on_close(self, ws, close_status_code, close_msg):
+        self.connected = False
+        self.parent._on_close(ws, close_status_code, close_msg)
+
+
 class SimpleBinanceWebSocket:
     """Simplified WebSocket client for real-time Binance price data."""
-    
+
     def __init__(self, testnet: bool = False, config: dict = None):
         self.testnet = testnet
-        
+
         # Configuration
         self.config = config or {}
         websocket_config = self.config.get('websocket_config', {})
-        
+
         # Load URLs from config
         if testnet:
             self.base_url = websocket_config.get('testnet_url', "wss://testnet.binance.vision/ws/")
         else:
             self.base_url = websocket_config.get('production_url', "wss://stream.binance.com:9443/ws/")
+        # Combined stream endpoint (/stream) derivado da URL /ws/ se não configurado
+        stream_url_key = 'testnet_stream_url' if testnet else 'production_stream_url'
+        self.stream_url = websocket_config.get(
+            stream_url_key, self.base_url.rstrip("/").rsplit("/ws", 1)[0] + "/stream"
+        )
         self.join_timeout = websocket_config.get('join_timeout_seconds', 2)
-        
+        self.reconnect_delay = websocket_config.get('reconnect_delay_seconds', 5)
+        self.max_reconnect_delay = websocket_config.get('max_reconnect_delay_seconds', 60)
+        self.ping_interval = websocket_config.get('ping_interval_seconds', 20)
+        # Binance: 1024 streams por conexão, 5 mensagens de controle por segundo
+        self.max_streams_per_connection = websocket_config.get('max_streams_per_connection', 1000)
+        self.min_send_interval = 1.0 / websocket_config.get('max_control_messages_per_second', 4)
+        self.max_params_per_request = websocket_config.get('max_params_per_request', 200)
+
         # Real-time data storage
         self.ticker_data = {}
         self.subscribed_symbols = set()
+        self.stream_handlers: Dict[str, Callable] = {}  # stream -> callback(payload)
         self.is_running = False
-        self.ws = None
-        self.thread = None
-        
+        self.connections: List[_StreamConnection] = []
+        self._lock = threading.Lock()
+        self._request_id = 0
+
         # Statistics
         self.stats = {
             "messages_received": 0,
             "last_message_time": None,
-            "connection_time": None
+            "connection_time": None,
+            "reconnections": 0
         }
-    
+
     def start(self):
-        """Start WebSocket connection in background thread."""
+        """Start WebSocket connections in background threads."""
         if self.is_running:
             return
-            
+
         self.is_running = True
-        self.thread = threading.Thread(target=self._run_websocket, daemon=True)
-        self.thread.start()
+        with self._lock:
+            for conn in self.connections:
+                conn.start()
         log.info("SimpleBinanceWebSocket started")
-    
+
     def stop(self):
-        """Stop WebSocket connection."""
+        """Stop WebSocket connections."""
         self.is_running = False
-        if self.ws:
-            self.ws.close()
-        if self.thread and self.thread.is_alive():
-            self.thread.join(timeout=self.join_timeout)
+        with self._lock:
+            connections = list(self.connections)
+        for conn in connections:
+            conn.stop()
         log.info("SimpleBinanceWebSocket stopped")
-    
+
     def subscribe_ticker(self, symbol: str):
-        """Subscribe to ticker price updates for a symbol."""
-        symbol_lower = symbol.lower()
-        if symbol_lower not in self.subscribed_symbols:
-            self.subscribed_symbols.add(symbol_lower)
-            log.info(f"Subscribed to ticker updates for {symbol}")
-    
+        """Subscribe to ticker price updates for a symbol (SUBSCRIBE na conexão ativa)."""
+        self.subscribe_tickers([symbol])
+
     def unsubscribe_ticker(self, symbol: str):
-        """Unsubscribe from ticker price updates for a symbol."""
-        symbol_lower = symbol.lower()
-        if symbol_lower in self.subscribed_symbols:
-            self.subscribed_symbols.remove(symbol_lower)
-            log.info(f"Unsubscribed from ticker updates for {symbol}")
-            # Note: To fully unsubscribe, we would need to reconnect with new streams
-            # For now, we just remove from our tracked symbols
-    
+        """Unsubscribe from ticker price updates for a symbol (UNSUBSCRIBE na conexão ativa)."""
+        self.unsubscribe_tickers([symbol])
+
+    def subscribe_tickers(self, symbols: Iterable[str]):
+        """Subscribe a batch of symbols, one SUBSCRIBE frame per shard."""
+        new_symbols = [s.lower() for s in symbols if s.lower() not in self.subscribed_symbols]
+        if not new_symbols:
+            return
+
+        with self._lock:
+            by_shard = defaultdict(list)
+            for symbol_lower in new_symbols:
+                conn = self._connection_with_capacity()
+                # Reservar o slot já agora para o cálculo de capacidade do próximo símbolo
+                conn.streams.add(f"{symbol_lower}@ticker")
+                by_shard[conn].append(f"{symbol_lower}@ticker")
+                self.subscribed_symbols.add(symbol_lower)
+
+            for conn, streams in by_shard.items():
+                conn.streams.difference_update(streams)
+                conn.subscribe(streams)
+                if self.is_running:
+                    conn.start()
+
+        log.info(f"Subscribed to ticker updates for {', '.join(s.upper() for s in new_symbols)}")
+
+    def unsubscribe_tickers(self, symbols: Iterable[str]):
+        """Unsubscribe a batch of symbols, one UNSUBSCRIBE frame per shard."""
+        removed = [s.lower() for s in symbols if s.lower() in self.subscribed_symbols]
+        if not removed:
+            return
+
+        with self._lock:
+            for conn in self.connections:
+                streams = [f"{s}@ticker" for s in removed if f"{s}@ticker" in conn.streams]
+                if streams:
+                    conn.unsubscribe(streams)
+            for symbol_lower in removed:
+                self.subscribed_symbols.discard(symbol_lower)
+                self.ticker_data.pop(symbol_lower.upper(), None)
+
+        log.info(f"Unsubscribed from ticker updates for {', '.join(s.upper() for s in removed)}")
+
+    def subscribe_stream(self, stream: str, handler: Callable):
+        """Inscreve um stream arbitrário (ex.: "!ticker@arr") entregando o payload `data` ao handler."""
+        with self._lock:
+            self.stream_handlers[stream] = handler
+            conn = self._connection_with_capacity()
+            conn.subscribe([stream])
+            if self.is_running:
+                conn.start()
+        log.info(f"Subscribed to stream {stream}")
+
+    def unsubscribe_stream(self, stream: str):
+        """Remove um stream inscrito com subscribe_stream."""
+        with self._lock:
+            self.stream_handlers.pop(stream, None)
+            for conn in self.connections:
+                if stream in conn.streams:
+                    conn.unsubscribe([stream])
+        log.info(f"Unsubscribed from stream {stream}")
+
+    def set_ticker_subscriptions(self, symbols: Iterable[str]):
+        """Ajusta as inscrições para exatamente `symbols` (diff -> SUBSCRIBE/UNSUBSCRIBE)."""
+        target = {s.lower() for s in symbols}
+        to_remove = self.subscribed_symbols - target
+        to_add = target - self.subscribed_symbols
+        if to_remove:
+            self.unsubscribe_tickers(to_remove)
+        if to_add:
+            self.subscribe_tickers(to_add)
+
+    def _connection_with_capacity(self) -> _StreamConnection:
+        """Retorna um shard com espaço livre, criando um novo se necessário (chamado com _lock)."""
+        for conn in self.connections:
+            if len(conn.streams) < self.max_streams_per_connection:
+                return conn
+        conn = _StreamConnection(self, len(self.connections))
+        self.connections.append(conn)
+        log.info(f"Nova conexão WebSocket (shard {conn.shard_id}) - total de streams: {len(self.subscribed_symbols)}")
+        return conn
+
+    def _next_request_id(self) -> int:
+        self._request_id += 1
+        return self._request_id
+
     def get_price(self, symbol: str) -> float:
         """Get latest price for a symbol."""
         # Try both uppercase and lowercase versions
@@ -89,93 +297,81 @@ class SimpleBinanceWebSocket:
             price = self.ticker_data.get(symbol.lower(), {}).get('price', None)
         if price is None:
             price = self.ticker_data.get(symbol, {}).get('price', None)
-        
+
         # Debug logging if price is still None
         if price is None:
             available_symbols = list(self.ticker_data.keys())
             log.warning(f"No price data for {symbol}. Available symbols: {available_symbols[:5]}...")
-        
+
         return price
-    
-    def _run_websocket(self):
-        """Run WebSocket connection."""
-        while self.is_running:
-            try:
-                # Create stream URL for all subscribed symbols
-                if not self.subscribed_symbols:
-                    time.sleep(1)
-                    continue
-                
-                streams = [f"{symbol}@ticker" for symbol in self.subscribed_symbols]
-                stream_url = self.base_url + "/".join(streams)
-                
-                log.info(f"Connecting to: {stream_url}")
-                
-                self.ws = websocket.WebSocketApp(
-                    stream_url,
-                    on_message=self._on_message,
-                    on_error=self._on_error,
-                    on_close=self._on_close,
-                    on_open=self._on_open
-                )
-                
-                self.ws.run_forever()
-                
-            except Exception as e:
-                log.error(f"WebSocket error: {e}")
-                if self.is_running:
-                    reconnect_delay = websocket_config.get('reconnect_delay_seconds', 5)
-                    time.sleep(reconnect_delay)  # Wait before reconnecting
-                    
-    def _on_open(self, ws):
-        """Called when WebSocket connection opens."""
-        self.stats["connection_time"] = time.time()
-        log.info("WebSocket connection opened")
-    
+
+    def get_connection_stats(self) -> dict:
+        """Streams por shard e estado das conexões."""
+        return {
+            "connections": len(self.connections),
+            "connected": sum(1 for c in self.connections if c.connected),
+            "streams_per_connection": [len(c.streams) for c in self.connections],
+            "subscribed_symbols": len(self.subscribed_symbols),
+            **self.stats,
+        }
+
     def _on_message(self, ws, message):
         """Handle incoming WebSocket message."""
         try:
             data = json.loads(message)
-            
+
             # Handle single ticker message
             if 'c' in data and 's' in data:  # 'c' = current price, 's' = symbol
                 symbol = data['s']
                 price = float(data['c'])
-                
+
                 self.ticker_data[symbol] = {
                     'price': price,
                     'timestamp': time.time()
                 }
-                
+
                 self.stats["messages_received"] += 1
                 self.stats["last_message_time"] = time.time()
-                
+
                 log.debug(f"Price update: {symbol} = ${price}")
-            
+
+            # Streams com handler próprio (ex.: tickers de todo o mercado)
+            elif 'stream' in data and data['stream'] in self.stream_handlers:
+                self.stream_handlers[data['stream']](data['data'])
+                self.stats["messages_received"] += 1
+                self.stats["last_message_time"] = time.time()
+
             # Handle multiple streams
             elif 'stream' in data and 'data' in data:
                 ticker_data = data['data']
                 if 'c' in ticker_data and 's' in ticker_data:
                     symbol = ticker_data['s']
                     price = float(ticker_data['c'])
-                    
+
                     self.ticker_data[symbol] = {
                         'price': price,
                         'timestamp': time.time()
                     }
-                    
+
                     self.stats["messages_received"] += 1
                     self.stats["last_message_time"] = time.time()
-                    
+
                     log.debug(f"Price update: {symbol} = ${price}")
-                
+
+            # Respostas de SUBSCRIBE/UNSUBSCRIBE ({"result": null, "id": n} ou erro)
+            elif 'id' in data and ('result' in data or 'error' in data):
+                if data.get('error'):
+                    log.error(f"WebSocket request {data['id']} failed: {data['error']}")
+                else:
+                    log.debug(f"WebSocket request {data['id']} acknowledged")
+
         except Exception as e:
             log.error(f"Error processing WebSocket message: {e}")
-    
+
     def _on_error(self, ws, error):
         """Handle WebSocket error."""
         log.error(f"WebSocket error: {error}")
-    
+
     def _on_close(self, ws, close_status_code, close_msg):
         """Handle WebSocket close."""
         log.warning(f"WebSocket closed: {close_status_code} - {close_msg}")
@@ -189,4 +385,4 @@ def get_global_websocket():
     global _global_ws_client
     if _global_ws_client is None:
         _global_ws_client = SimpleBinanceWebSocket()
-    return _global_ws_client
\ No newline at end of file
+    return _global_ws_client
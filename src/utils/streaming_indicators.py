@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""
+Streaming Indicators - indicadores técnicos incrementais (O(1) por candle fechado).
+
+Implementa as mesmas recorrências do TA-Lib (seed por SMA + suavização de Wilder/EMA),
+de forma que, alimentados com a mesma série, os valores batem com talib.RSI/ATR/ADX/
+EMA/BBANDS dentro de tolerância numérica. Em vez de recalcular 100 klines a cada ciclo,
+cada consumidor (GridLogic, PairSelector, RiskManager) alimenta apenas os candles novos.
+
+O módulo também concentra os kernels NumPy da série inteira (ema, rsi, atr, macd,
+bollinger, wilder_adx), usados pelo IndicatorFeed, pelo ranking do universo e pelo
+RotationMonitor: uma única implementação de cada recorrência a manter igual ao TA-Lib.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.logger import setup_logger
+
+log = setup_logger("streaming_indicators")
+
+# Mesmo critério de zero usado internamente pelo TA-Lib (TA_IS_ZERO)
+_TA_EPSILON = 0.00000001
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000,
+}
+
+
+def _is_zero(value: float) -> bool:
+    return -_TA_EPSILON < value < _TA_EPSILON
+
+
+def wilder_step(value, x, period: int):
+    """Um passo da suavização de Wilder: (valor * (p-1) + x) / p (escalares ou arrays)."""
+    return (value * (period - 1) + x) / period
+
+
+class StreamingEMA:
+    """EMA com seed por SMA dos primeiros `period` valores (igual talib.EMA)."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.k = 2.0 / (period + 1)
+        self.value: Optional[float] = None
+        self._seed_sum = 0.0
+        self._count = 0
+
+    def update(self, x: float) -> Optional[float]:
+        self._count += 1
+        if self.value is None:
+            self._seed_sum += x
+            if self._count == self.period:
+                self.value = self._seed_sum / self.period
+            return self.value
+        self.value = (x - self.value) * self.k + self.value
+        return self.value
+
+
+class RollingMeanVar:
+    """Média e variância populacional em janela deslizante (Welford com remoção)."""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, x: float):
+        if len(self.window) == self.period:
+            old = self.window[0]
+            self.window.append(x)  # descarta `old`
+            old_mean = self.mean
+            self.mean += (x - old) / self.period
+            self._m2 += (x - old) * (x - self.mean + old - old_mean)
+        else:
+            self.window.append(x)
+            n = len(self.window)
+            delta = x - self.mean
+            self.mean += delta / n
+            self._m2 += delta * (x - self.mean)
+
+    @property
+    def ready(self) -> bool:
+        return len(self.window) == self.period
+
+    @property
+    def variance(self) -> float:
+        n = len(self.window)
+        return max(self._m2 / n, 0.0) if n else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+
+class WilderRSI:
+    """RSI de Wilder (talib.RSI): médias simples no seed, depois suavização (p-1)/p."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.value: Optional[float] = None
+        self._prev: Optional[float] = None
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+        self._count = 0
+
+    def update(self, close: float) -> Optional[float]:
+        if self._prev is None:
+            self._prev = close
+            return None
+        change = close - self._prev
+        self._prev = close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        self._count += 1
+
+        if self._count <= self.period:
+            self._avg_gain += gain
+            self._avg_loss += loss
+            if self._count < self.period:
+                return None
+            self._avg_gain /= self.period
+            self._avg_loss /= self.period
+        else:
+            self._avg_gain = wilder_step(self._avg_gain, gain, self.period)
+            self._avg_loss = wilder_step(self._avg_loss, loss, self.period)
+
+        total = self._avg_gain + self._avg_loss
+        self.value = 100.0 * (self._avg_gain / total) if not _is_zero(total) else 0.0
+        return self.value
+
+
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+
+class WilderATR:
+    """ATR de Wilder (talib.ATR): SMA dos primeiros `period` TRs, depois suavização."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.value: Optional[float] = None
+        self._prev_close: Optional[float] = None
+        self._tr_sum = 0.0
+        self._count = 0
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        if self._prev_close is None:
+            self._prev_close = close
+            return None
+        tr = _true_range(high, low, self._prev_close)
+        self._prev_close = close
+        self._count += 1
+
+        if self.value is None:
+            self._tr_sum += tr
+            if self._count == self.period:
+                self.value = self._tr_sum / self.period
+            return self.value
+        self.value = wilder_step(self.value, tr, self.period)
+        return self.value
+
+
+class WilderADX:
+    """ADX de Wilder (talib.ADX), incluindo +DI/-DI."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.value: Optional[float] = None
+        self.plus_di: Optional[float] = None
+        self.minus_di: Optional[float] = None
+        self._prev_high = self._prev_low = self._prev_close = None
+        self._plus_dm = self._minus_dm = self._tr = 0.0
+        self._dx_sum = 0.0
+        self._count = 0  # candles após o primeiro
+
+    def update(self, high: float, low: float, close: float) -> Optional[float]:
+        if self._prev_high is None:
+            self._prev_high, self._prev_low, self._prev_close = high, low, close
+            return None
+
+        diff_p = high - self._prev_high
+        diff_m = self._prev_low - low
+        tr = _true_range(high, low, self._prev_close)
+        self._prev_high, self._prev_low, self._prev_close = high, low, close
+        self._count += 1
+        p = self.period
+
+        plus_dm = diff_p if (diff_p > 0 and diff_p > diff_m) else 0.0
+        minus_dm = diff_m if (diff_m > 0 and diff_p < diff_m) else 0.0
+
+        if self._count < p:
+            # Acumula os primeiros p-1 movimentos
+            self._plus_dm += plus_dm
+            self._minus_dm += minus_dm
+            self._tr += tr
+            return None
+
+        self._plus_dm = self._plus_dm - self._plus_dm / p + plus_dm
+        self._minus_dm = self._minus_dm - self._minus_dm / p + minus_dm
+        self._tr = self._tr - self._tr / p + tr
+
+        dx = None
+        if not _is_zero(self._tr):
+            self.plus_di = 100.0 * (self._plus_dm / self._tr)
+            self.minus_di = 100.0 * (self._minus_dm / self._tr)
+            di_sum = self.plus_di + self.minus_di
+            if not _is_zero(di_sum):
+                dx = 100.0 * (abs(self.minus_di - self.plus_di) / di_sum)
+
+        if self._count < 2 * p - 1:
+            if dx is not None:
+                self._dx_sum += dx
+            return None
+        if self._count == 2 * p - 1:
+            if dx is not None:
+                self._dx_sum += dx
+            self.value = self._dx_sum / p
+            return self.value
+        if dx is not None:
+            self.value = wilder_step(self.value, dx, p)
+        return self.value
+
+
+class StreamingMACD:
+    """MACD (EMA rápida - EMA lenta) com linha de sinal. Converge para talib.MACD após o warm-up."""
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = StreamingEMA(fast)
+        self.slow = StreamingEMA(slow)
+        self.signal = StreamingEMA(signal)
+        self.macd: Optional[float] = None
+        self.signal_value: Optional[float] = None
+        self.hist: Optional[float] = None
+
+    def update(self, close: float) -> Optional[float]:
+        fast = self.fast.update(close)
+        slow = self.slow.update(close)
+        if fast is None or slow is None:
+            return None
+        self.macd = fast - slow
+        self.signal_value = self.signal.update(self.macd)
+        if self.signal_value is not None:
+            self.hist = self.macd - self.signal_value
+        return self.hist
+
+
+class CumulativeVWAP:
+    """VWAP cumulativo (preço típico), reiniciado a cada âncora de sessão (padrão: dia UTC)."""
+
+    def __init__(self, anchor_ms: Optional[int] = 86_400_000):
+        self.anchor_ms = anchor_ms
+        self.value: Optional[float] = None
+        self._pv = 0.0
+        self._volume = 0.0
+        self._session: Optional[int] = None
+
+    def update(self, high: float, low: float, close: float, volume: float,
+               open_time_ms: Optional[int] = None) -> Optional[float]:
+        if self.anchor_ms and open_time_ms is not None:
+            session = int(open_time_ms) // self.anchor_ms
+            if session != self._session:
+                self._session = session
+                self._pv = 0.0
+                self._volume = 0.0
+        self._pv += (high + low + close) / 3.0 * volume
+        self._volume += volume
+        if self._volume > 0:
+            self.value = self._pv / self._volume
+        return self.value
+
+
+# --- Kernels vetorizados (série inteira; o eixo dos candles é o último) --- #
+
+# Maior expoente acumulado por bloco na EMA vetorizada ((1-k)^-j <= e^230, sem overflow)
+_MAX_DECAY_EXPONENT = 230.0
+
+
+def bar_true_range(high: np.ndarray, low: np.ndarray, prev_close: np.ndarray) -> np.ndarray:
+    """True range elemento a elemento, dado o fechamento anterior de cada barra."""
+    return np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range a partir do segundo candle: um valor a menos no eixo dos candles."""
+    return bar_true_range(high[..., 1:], low[..., 1:], close[..., :-1])
+
+
+def smoothed(values: np.ndarray, period: int, k: float) -> np.ndarray:
+    """y[p-1] = média dos p primeiros; y[t] = y[t-1] + k*(x[t] - y[t-1]). NaN antes do seed.
+
+    A recorrência é resolvida por somas prefixadas ponderadas por (1-k)^-j, em blocos
+    curtos o bastante para que os pesos não estourem o float64.
+    """
+    values = np.asarray(values, dtype=float)
+    n = values.shape[-1]
+    out = np.full(values.shape, np.nan)
+    if n < period or period < 1:
+        return out
+    out[..., period - 1] = values[..., :period].mean(axis=-1)
+    decay = 1.0 - k
+    if decay <= 0:
+        out[..., period:] = values[..., period:]
+        return out
+
+    block = max(1, int(_MAX_DECAY_EXPONENT / -math.log(decay)))
+    start = period - 1
+    while start < n - 1:
+        chunk = values[..., start + 1:start + 1 + block]
+        j = np.arange(1, chunk.shape[-1] + 1)
+        acc = out[..., start, None] + np.cumsum(k * chunk * decay ** -j, axis=-1)
+        out[..., start + 1:start + 1 + chunk.shape[-1]] = acc * decay ** j
+        start += chunk.shape[-1]
+    return out
+
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """EMA com seed por SMA (talib.EMA)."""
+    return smoothed(values, period, 2.0 / (period + 1))
+
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        csum = np.cumsum(np.concatenate(([0.0], values)))
+        out[period - 1:] = (csum[period:] - csum[:-period]) / period
+    return out
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI de Wilder (talib.RSI), alinhado aos fechamentos (NaN no warm-up)."""
+    closes = np.asarray(closes, dtype=float)
+    out = np.full(len(closes), np.nan)
+    if len(closes) <= period:
+        return out
+    changes = np.diff(closes)
+    avg_gain = smoothed(np.clip(changes, 0.0, None), period, 1.0 / period)
+    avg_loss = smoothed(np.clip(-changes, 0.0, None), period, 1.0 / period)
+    total = avg_gain + avg_loss
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = np.where(np.abs(total) > _TA_EPSILON, 100.0 * avg_gain / total, 0.0)
+    out[1:] = np.where(np.isnan(avg_gain), np.nan, values)
+    return out
+
+
+def atr(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """ATR de Wilder (talib.ATR), alinhado aos candles (NaN no warm-up); aceita matrizes (símbolos x candles)."""
+    highs, lows, closes = (np.asarray(a, dtype=float) for a in (highs, lows, closes))
+    out = np.full(closes.shape, np.nan)
+    if closes.shape[-1] <= period:
+        return out
+    out[..., 1:] = smoothed(true_range(highs, lows, closes), period, 1.0 / period)
+    return out
+
+
+def wilder_adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Último valor do ADX de Wilder (talib.ADX) de cada linha; NaN sem candles suficientes."""
+    n, candles = close.shape
+    p = period
+    if candles < 2 * p:
+        return np.full(n, np.nan)
+    diff_p = high[:, 1:] - high[:, :-1]
+    diff_m = low[:, :-1] - low[:, 1:]
+    plus_dm = np.where((diff_p > 0) & (diff_p > diff_m), diff_p, 0.0)
+    minus_dm = np.where((diff_m > 0) & (diff_p < diff_m), diff_m, 0.0)
+    tr = true_range(high, low, close)
+
+    # Primeiros p-1 movimentos acumulados; depois suavização de Wilder candle a candle
+    sm_plus = plus_dm[:, :p - 1].sum(axis=1)
+    sm_minus = minus_dm[:, :p - 1].sum(axis=1)
+    sm_tr = tr[:, :p - 1].sum(axis=1)
+    dx_sum = np.zeros(n)
+    adx = np.full(n, np.nan)
+    for k in range(p - 1, candles - 1):
+        sm_plus = sm_plus - sm_plus / p + plus_dm[:, k]
+        sm_minus = sm_minus - sm_minus / p + minus_dm[:, k]
+        sm_tr = sm_tr - sm_tr / p + tr[:, k]
+
+        valid_tr = np.abs(sm_tr) >= _TA_EPSILON
+        safe_tr = np.where(valid_tr, sm_tr, 1.0)
+        plus_di = 100.0 * sm_plus / safe_tr
+        minus_di = 100.0 * sm_minus / safe_tr
+        di_sum = plus_di + minus_di
+        valid = valid_tr & (np.abs(di_sum) >= _TA_EPSILON)
+        dx = np.where(valid, 100.0 * np.abs(minus_di - plus_di) / np.where(valid, di_sum, 1.0), 0.0)
+
+        count = k + 1  # candles após o primeiro
+        if count < 2 * p - 1:
+            dx_sum += dx
+        elif count == 2 * p - 1:
+            adx = (dx_sum + dx) / p
+        else:
+            adx = np.where(valid, wilder_step(adx, dx, p), adx)
+    return adx
+
+
+def macd(closes: np.ndarray, fast: int = 12, slow: int = 26,
+         signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(macd, sinal, histograma) - sinal = EMA do MACD a partir do seed da EMA lenta."""
+    closes = np.asarray(closes, dtype=float)
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = np.full(len(closes), np.nan)
+    start = slow - 1
+    if len(closes) > start:
+        signal_line[start:] = ema(line[start:], signal)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(closes: np.ndarray, period: int = 20,
+              std_dev: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(superior, média, inferior) com desvio padrão populacional (talib.BBANDS)."""
+    closes = np.asarray(closes, dtype=float)
+    middle = np.full(len(closes), np.nan)
+    width = np.full(len(closes), np.nan)
+    if len(closes) >= period:
+        windows = sliding_window_view(closes, period)
+        middle[period - 1:] = windows.mean(axis=1)
+        width[period - 1:] = std_dev * windows.std(axis=1)
+    return middle + width, middle, middle - width
+
+
+def moving_average(values: np.ndarray, period: int, kind: str = "ema") -> np.ndarray:
+    return sma(values, period) if kind == "sma" else ema(values, period)
+
+
+class IndicatorSet:
+    """Conjunto de indicadores de um (símbolo, intervalo), alimentado por candles fechados."""
+
+    def __init__(self, symbol: str, interval: str = "3m", rsi_period: int = 14, atr_period: int = 14,
+                 keltner_atr_period: int = 10, adx_period: int = 14, ema_period: int = 20,
+                 bb_period: int = 20, bb_dev: float = 2.0, history: int = 100,
+                 vwap_anchor_ms: Optional[int] = 86_400_000):
+        self.symbol = symbol
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS.get(interval, 180_000)
+        self.bb_dev = bb_dev
+        self.history = history
+
+        self.rsi = WilderRSI(rsi_period)
+        self.atr = WilderATR(atr_period)
+        self.keltner_atr = WilderATR(keltner_atr_period)
+        self.adx = WilderADX(adx_period)
+        self.ema = StreamingEMA(ema_period)
+        self.bb = RollingMeanVar(bb_period)
+        self.macd = StreamingMACD()
+        self.vwap = CumulativeVWAP(vwap_anchor_ms)
+
+        # Janelas recentes (ordem cronológica) para features que precisam da série
+        self.closes = deque(maxlen=history)
+        self.highs = deque(maxlen=history)
+        self.lows = deque(maxlen=history)
+        self.volumes = deque(maxlen=history)
+
+        self.last_open_time: Optional[int] = None
+        self.candles_processed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def warmup(self) -> int:
+        """Candles necessários para todos os indicadores ficarem válidos."""
+        return max(2 * self.adx.period, self.macd.slow.period + self.macd.signal.period,
+                   self.bb.period, self.history)
+
+    def update(self, open_time: int, high: float, low: float, close: float, volume: float) -> bool:
+        """Alimenta um candle FECHADO. Ignora candles já processados. O(1)."""
+        open_time = int(open_time)
+        with self._lock:
+            if self.last_open_time is not None and open_time <= self.last_open_time:
+                return False
+            self.last_open_time = open_time
+            self.candles_processed += 1
+
+            self.rsi.update(close)
+            self.atr.update(high, low, close)
+            self.keltner_atr.update(high, low, close)
+            self.adx.update(high, low, close)
+            self.ema.update(close)
+            self.bb.update(close)
+            self.macd.update(close)
+            self.vwap.update(high, low, close, volume, open_time)
+
+            self.closes.append(close)
+            self.highs.append(high)
+            self.lows.append(low)
+            self.volumes.append(volume)
+            return True
+
+    def update_from_klines(self, klines: Iterable, now_ms: Optional[int] = None) -> int:
+        """Alimenta os candles fechados de uma lista de klines (formato Binance ou array).
+
+        Candles ainda em formação (close_time no futuro) são ignorados, assim como os
+        já processados. Retorna o número de candles novos aplicados.
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        applied = 0
+        for k in klines:
+            if int(k[6]) >= now_ms:
+                continue  # Candle em formação
+            if self.update(int(k[0]), float(k[2]), float(k[3]), float(k[4]), float(k[5])):
+                applied += 1
+        return applied
+
+    def update_from_series(self, series) -> int:
+        """Alimenta os candles fechados ainda não processados de uma KlineSeries (utils.kline_store)."""
+        closed = series.view(include_forming=False)
+        if self.last_open_time is not None:
+            closed = closed[closed["open_time"] > self.last_open_time]
+        applied = 0
+        for row in closed.tolist():
+            if self.update(int(row[0]), row[2], row[3], row[4], row[5]):
+                applied += 1
+        return applied
+
+    def klines_needed(self, now_ms: Optional[int] = None) -> int:
+        """Quantos klines buscar para ficar em dia (histórico completo no primeiro uso)."""
+        if self.last_open_time is None:
+            return self.warmup + 1
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        # Candles fechados desde o último processado + o candle em formação
+        missing = (now_ms - self.last_open_time) // self.interval_ms
+        return int(min(max(missing, 2), self.warmup + 1))
+
+    @property
+    def ready(self) -> bool:
+        return self.adx.value is not None and self.bb.ready
+
+    def bollinger(self) -> Optional[Tuple[float, float, float]]:
+        if not self.bb.ready:
+            return None
+        middle = self.bb.mean
+        dev = self.bb_dev * self.bb.std
+        return middle + dev, middle, middle - dev
+
+    def keltner(self, multiplier: float = 2.0) -> Optional[Tuple[float, float, float]]:
+        if self.ema.value is None or self.keltner_atr.value is None:
+            return None
+        middle = self.ema.value
+        return middle + self.keltner_atr.value * multiplier, middle, middle - self.keltner_atr.value * multiplier
+
+    def values(self) -> Dict[str, Optional[float]]:
+        """Snapshot dos valores atuais."""
+        bb = self.bollinger()
+        kc = self.keltner()
+        return {
+            "rsi": self.rsi.value,
+            "atr": self.atr.value,
+            "keltner_atr": self.keltner_atr.value,
+            "adx": self.adx.value,
+            "plus_di": self.adx.plus_di,
+            "minus_di": self.adx.minus_di,
+            "ema": self.ema.value,
+            "bb_upper": bb[0] if bb else None,
+            "bb_middle": bb[1] if bb else None,
+            "bb_lower": bb[2] if bb else None,
+            "kc_upper": kc[0] if kc else None,
+            "kc_middle": kc[1] if kc else None,
+            "kc_lower": kc[2] if kc else None,
+            "macd": self.macd.macd,
+            "macd_signal": self.macd.signal_value,
+            "macd_hist": self.macd.hist,
+            "vwap": self.vwap.value,
+            "last_close": self.closes[-1] if self.closes else None,
+            "last_open_time": self.last_open_time,
+        }
+
+
+class IndicatorEngine:
+    """Registro de IndicatorSets por (mercado, símbolo, intervalo, períodos) compartilhado no processo.
+
+    Spot e futuros do mesmo símbolo têm séries diferentes: cada mercado tem seus próprios sets.
+    """
+
+    def __init__(self):
+        self._sets: Dict[tuple, IndicatorSet] = {}
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, interval: str = "3m", market_type: str = "futures", **params) -> IndicatorSet:
+        key = (market_type, symbol.upper(), interval, tuple(sorted(params.items())))
+        with self._lock:
+            indicator_set = self._sets.get(key)
+            if indicator_set is None:
+                indicator_set = IndicatorSet(symbol.upper(), interval, **params)
+                self._sets[key] = indicator_set
+            return indicator_set
+
+    def find(self, symbol: str, interval: str = "3m", market_type: str = "futures") -> Optional[IndicatorSet]:
+        """Retorna o primeiro IndicatorSet existente para (mercado, símbolo, intervalo), se houver."""
+        symbol = symbol.upper()
+        for (m, s, i, _), indicator_set in list(self._sets.items()):
+            if m == market_type and s == symbol and i == interval:
+                return indicator_set
+        return None
+
+    def on_closed_kline(self, symbol: str, interval: str, kline: dict, market_type: str = "futures"):
+        """Evento de kline fechado (formato do BinanceWebSocketClient) -> todos os sets do símbolo no mercado."""
+        symbol = symbol.upper()
+        for (m, s, i, _), indicator_set in list(self._sets.items()):
+            if m == market_type and s == symbol and i == interval:
+                indicator_set.update(kline["open_time"], kline["high"], kline["low"],
+                                     kline["close"], kline["volume"])
+
+    async def on_ws_kline(self, symbol: str, kline_info: dict):
+        """Callback para BinanceWebSocketClient.add_callback("kline", ...) (só recebe klines fechados)."""
+        self.on_closed_kline(symbol, kline_info.get("interval", "1m"), kline_info)
+
+    def remove(self, symbol: str, market_type: Optional[str] = None):
+        """Remove os sets do símbolo (de um mercado ou de ambos)."""
+        symbol = symbol.upper()
+        with self._lock:
+            for key in [k for k in self._sets if k[1] == symbol and market_type in (None, k[0])]:
+                del self._sets[key]
+
+
+# Global instance for easy access
+_global_indicator_engine = None
+
+def get_indicator_engine() -> IndicatorEngine:
+    """Get global indicator engine instance."""
+    global _global_indicator_engine
+    if _global_indicator_engine is None:
+        _global_indicator_engine = IndicatorEngine()
+    return _global_indicator_engine
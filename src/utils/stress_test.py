@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Stress Test - simulação Monte Carlo do portfólio (posições + ordens de grid em aberto).
+
+Gera milhares de caminhos de preço correlacionados (GBM com a covariância dos retornos
+recentes), opcionalmente com choques ("BTC -10% no horizonte") propagados aos demais
+pares pelo beta de cada um, e reavalia a conta em cada passo:
+
+- ordens de grid em repouso são executadas quando o mínimo/máximo corrente do caminho
+  cruza o preço (searchsorted sobre os preços ordenados + somas prefixadas);
+- PnL por símbolo e do portfólio, margem inicial usada e margem de manutenção;
+- probabilidade de o preço cruzar o preço de liquidação de cada posição e de a conta
+  (margem cruzada) atingir a margem de manutenção em algum passo.
+
+Tudo vetorizado em NumPy; os caminhos são processados em blocos (chunk_size) para
+limitar a memória, com um gerador seeded para resultados reproduzíveis.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.logger import setup_logger
+
+log = setup_logger("stress_test")
+
+_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+@dataclass
+class Exposure:
+    """Posição atual de um símbolo e suas ordens limite em repouso (quantidades positivas)."""
+
+    symbol: str
+    mark_price: float
+    quantity: float = 0.0              # positivo = long, negativo = short
+    entry_price: float = 0.0
+    leverage: float = 1.0
+    market_type: str = "futures"
+    liquidation_price: float = 0.0     # 0 = estimar pela alavancagem
+    buy_prices: np.ndarray = field(default_factory=lambda: np.empty(0))
+    buy_quantities: np.ndarray = field(default_factory=lambda: np.empty(0))
+    sell_prices: np.ndarray = field(default_factory=lambda: np.empty(0))
+    sell_quantities: np.ndarray = field(default_factory=lambda: np.empty(0))
+
+    def estimated_liquidation_price(self, maintenance_margin_rate: float) -> float:
+        """Preço de liquidação informado pela exchange ou estimado (margem isolada)."""
+        if self.market_type != "futures" or self.quantity == 0:
+            return 0.0
+        if self.liquidation_price > 0:
+            return self.liquidation_price
+        entry = self.entry_price or self.mark_price
+        leverage = max(self.leverage, 1.0)
+        if self.quantity > 0:
+            return entry * (1 - 1 / leverage) / (1 - maintenance_margin_rate)
+        return entry * (1 + 1 / leverage) / (1 + maintenance_margin_rate)
+
+
+def _orders_by_side(orders: Iterable[dict]) -> Dict[str, Dict[str, List[float]]]:
+    books: Dict[str, Dict[str, List[float]]] = {}
+    for order in orders or []:
+        price = float(order.get("price", 0) or 0)
+        remaining = float(order.get("origQty", 0) or 0) - float(order.get("executedQty", 0) or 0)
+        if price <= 0 or remaining <= 0:
+            continue  # ordens stop/market não ficam no book
+        side = "buy" if str(order.get("side", "")).upper() == "BUY" else "sell"
+        book = books.setdefault(order["symbol"], {"buy": [], "buy_qty": [], "sell": [], "sell_qty": []})
+        book[side].append(price)
+        book[f"{side}_qty"].append(remaining)
+    return books
+
+
+def exposures_from_account(positions: Iterable[dict], open_orders: Iterable[dict] = (),
+                           default_leverage: float = 10.0,
+                           mark_prices: Optional[Dict[str, float]] = None,
+                           include: Iterable[str] = ()) -> List[Exposure]:
+    """Monta as exposições a partir do positionRisk e das ordens abertas da Binance Futures.
+
+    `include` adiciona símbolos sem exposição (ex.: o par do choque) para que entrem na simulação.
+    """
+    marks = dict(mark_prices or {})
+    by_symbol = {p["symbol"]: p for p in positions or [] if isinstance(p, dict) and p.get("symbol")}
+    books = _orders_by_side(open_orders)
+    open_positions = {s for s, p in by_symbol.items() if float(p.get("positionAmt", 0) or 0) != 0}
+
+    exposures = []
+    for symbol in sorted(set(books) | open_positions | set(include)):
+        position = by_symbol.get(symbol, {})
+        mark = float(position.get("markPrice", 0) or 0) or marks.get(symbol, 0.0)
+        if mark <= 0:
+            log.warning(f"Stress test: sem preço de marcação para {symbol}, ignorado")
+            continue
+        book = books.get(symbol, {})
+        exposures.append(Exposure(
+            symbol=symbol,
+            mark_price=mark,
+            quantity=float(position.get("positionAmt", 0) or 0),
+            entry_price=float(position.get("entryPrice", 0) or 0),
+            leverage=float(position.get("leverage", 0) or default_leverage),
+            liquidation_price=float(position.get("liquidationPrice", 0) or 0),
+            buy_prices=np.asarray(book.get("buy", []), dtype=float),
+            buy_quantities=np.asarray(book.get("buy_qty", []), dtype=float),
+            sell_prices=np.asarray(book.get("sell", []), dtype=float),
+            sell_quantities=np.asarray(book.get("sell_qty", []), dtype=float),
+        ))
+    return exposures
+
+
+def account_equity(futures_balance) -> float:
+    """Patrimônio em USDT (saldo + PnL não realizado) a partir do futures_account_balance."""
+    for asset in futures_balance or []:
+        if isinstance(asset, dict) and asset.get("asset") == "USDT":
+            return float(asset.get("balance", 0) or 0) + float(asset.get("crossUnPnl", 0) or 0)
+    return 0.0
+
+
+def aligned_close_returns(closes: Dict[str, np.ndarray], min_length: int = 30):
+    """Retornos simples alinhados pelo fim a partir dos fechamentos (klines) de cada símbolo."""
+    available = [s for s, c in closes.items() if c is not None and len(c) > min_length]
+    if not available:
+        return [], np.empty((0, 0))
+    length = min(len(closes[s]) for s in available)
+    prices = np.array([np.asarray(closes[s], dtype=float)[-length:] for s in available])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(prices, axis=1) / prices[:, :-1]
+    return available, np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class _Book:
+    """Ordens de um lado ordenadas por preço com quantidade/valor acumulados."""
+
+    def __init__(self, prices: np.ndarray, quantities: np.ndarray, descending: bool):
+        order = np.argsort(prices)[::-1] if descending else np.argsort(prices)
+        self.sorted_prices = np.sort(prices)  # ascendente, para searchsorted
+        self.cum_qty = np.concatenate(([0.0], np.cumsum(quantities[order])))
+        self.cum_value = np.concatenate(([0.0], np.cumsum(prices[order] * quantities[order])))
+
+
+class StressTester:
+    """Monte Carlo de caminhos correlacionados contra posições e ordens de grid em repouso."""
+
+    def __init__(self, config: dict):
+        stress_config = config.get("risk_agent", {}).get("stress_test", {})
+        self.paths = int(stress_config.get("paths", 10000))
+        self.horizon_steps = int(stress_config.get("horizon_steps", 10))
+        self.chunk_size = int(stress_config.get("chunk_size", 2000))
+        self.seed = stress_config.get("seed", 42)
+        self.maintenance_margin_rate = float(stress_config.get("maintenance_margin_rate", 0.004))
+        self.confidence_level = float(stress_config.get("confidence_level", 0.99))
+        self.default_step_volatility = float(stress_config.get("default_step_volatility", 0.005))
+
+    # --- Covariância --- #
+
+    def covariance_for(self, symbols: List[str], history_symbols: List[str] = (),
+                       returns: Optional[np.ndarray] = None) -> np.ndarray:
+        """Covariância por passo: amostral para quem tem histórico, volatilidade padrão (sem correlação) para o resto."""
+        cov = np.diag(np.full(len(symbols), self.default_step_volatility ** 2))
+        index = {s: i for i, s in enumerate(symbols)}
+        known = [s for s in history_symbols if s in index]
+        if returns is not None and len(known) >= 1 and returns.shape[1] >= 2:
+            rows = [list(history_symbols).index(s) for s in known]
+            block = np.atleast_2d(np.cov(returns[rows]))
+            positions = [index[s] for s in known]
+            cov[np.ix_(positions, positions)] = block
+        return cov
+
+    @staticmethod
+    def _cholesky(cov: np.ndarray) -> np.ndarray:
+        try:
+            return np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-14)
+        except np.linalg.LinAlgError:
+            # Matriz semidefinida (séries colineares): raiz pela decomposição espectral
+            values, vectors = np.linalg.eigh(cov)
+            return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+    @staticmethod
+    def _shock_drift(cov: np.ndarray, symbols: List[str], shocks: Dict[str, float]) -> np.ndarray:
+        """Movimento log total no horizonte: choques diretos + beta * choque nos demais pares."""
+        total = np.zeros(len(symbols))
+        shocked = [i for i, s in enumerate(symbols) if s in shocks]
+        if not shocked:
+            return total
+        moves = np.log1p(np.array([shocks[symbols[i]] for i in shocked], dtype=float))
+        block = cov[np.ix_(shocked, shocked)]
+        betas = cov[:, shocked] @ np.linalg.pinv(block)
+        total = betas @ moves
+        total[shocked] = moves
+        return total
+
+    # --- Simulação --- #
+
+    def run(self, exposures: List[Exposure], covariance: np.ndarray, equity: float,
+            shocks: Optional[Dict[str, float]] = None, paths: Optional[int] = None,
+            horizon_steps: Optional[int] = None, seed: Optional[int] = None) -> Dict:
+        """Simula os caminhos e retorna distribuição de PnL, uso de margem e probabilidades de liquidação."""
+        started = time.perf_counter()
+        paths = int(paths or self.paths)
+        steps = int(horizon_steps or self.horizon_steps)
+        seed = self.seed if seed is None else seed
+        shocks = {s: float(v) for s, v in (shocks or {}).items()}
+        symbols = [e.symbol for e in exposures]
+        if not exposures:
+            return {"symbols": [], "paths": 0, "message": "Sem posições ou ordens em aberto"}
+
+        covariance = np.asarray(covariance, dtype=float)
+        chol = self._cholesky(covariance)
+        # Correção de Itô: o preço esperado sem choque é o preço de marcação atual
+        drift = -0.5 * np.diag(covariance) + self._shock_drift(covariance, symbols, shocks) / steps
+        marks = np.array([e.mark_price for e in exposures])
+        mmr = self.maintenance_margin_rate
+        futures = np.array([e.market_type == "futures" for e in exposures])
+        leverage = np.array([max(e.leverage, 1.0) for e in exposures])
+        liquidation = np.array([e.estimated_liquidation_price(mmr) for e in exposures])
+        direction = np.sign([e.quantity for e in exposures])
+        buys = [_Book(e.buy_prices, e.buy_quantities, descending=True) for e in exposures]
+        sells = [_Book(e.sell_prices, e.sell_quantities, descending=False) for e in exposures]
+
+        S = len(exposures)
+        terminal_pnl = np.empty((paths, S))
+        liquidated = np.zeros((paths, S), dtype=bool)
+        buy_fills = np.zeros(S)
+        sell_fills = np.zeros(S)
+        account_liquidated = np.empty(paths, dtype=bool)
+        peak_usage = np.empty(paths)
+        terminal_usage = np.empty(paths)
+
+        rng = np.random.default_rng(seed)
+        for start in range(0, paths, self.chunk_size):
+            n = min(self.chunk_size, paths - start)
+            chunk = slice(start, start + n)
+            # Layout (símbolo, caminho, passo): cada símbolo é um bloco contíguo
+            z = rng.standard_normal((S, n * steps))
+            log_returns = (chol @ z).reshape(S, n, steps) + drift[:, None, None]
+            prices = marks[:, None, None] * np.exp(np.cumsum(log_returns, axis=2))
+
+            pnl_total = np.zeros((n, steps))
+            margin_total = np.zeros((n, steps))
+            notional_total = np.zeros((n, steps))
+            for s, exposure in enumerate(exposures):
+                price = prices[s]
+                # PnL = quantidade atual * preço - custo líquido (posição a mercado + fills do grid)
+                quantity = exposure.quantity
+                basis = exposure.quantity * exposure.mark_price
+                low = high = None
+                # Compras executadas: preço >= mínimo corrente; vendas: preço <= máximo corrente
+                if len(buys[s].sorted_prices):
+                    low = np.minimum.accumulate(price, axis=1)
+                    filled = len(buys[s].sorted_prices) - np.searchsorted(buys[s].sorted_prices, low, side="left")
+                    quantity = quantity + buys[s].cum_qty[filled]
+                    basis = basis + buys[s].cum_value[filled]
+                    buy_fills[s] += filled[:, -1].sum()
+                if len(sells[s].sorted_prices):
+                    high = np.maximum.accumulate(price, axis=1)
+                    filled = np.searchsorted(sells[s].sorted_prices, high, side="right")
+                    quantity = quantity - sells[s].cum_qty[filled]
+                    basis = basis - sells[s].cum_value[filled]
+                    sell_fills[s] += filled[:, -1].sum()
+                value = quantity * price
+                pnl = value - basis
+                pnl_total += pnl
+                terminal_pnl[chunk, s] = pnl[:, -1]
+
+                if futures[s]:
+                    notional = np.abs(value)
+                    notional_total += notional
+                    margin_total += notional / leverage[s]
+                    if direction[s] > 0:
+                        path_low = low[:, -1] if low is not None else price.min(axis=1)
+                        liquidated[chunk, s] = path_low <= liquidation[s]
+                    elif direction[s] < 0:
+                        path_high = high[:, -1] if high is not None else price.max(axis=1)
+                        liquidated[chunk, s] = path_high >= liquidation[s]
+
+            account = equity + pnl_total
+            account_liquidated[chunk] = np.any(account <= mmr * notional_total, axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                usage = np.where(account > 0, margin_total / account, np.inf)
+            peak_usage[chunk] = usage.max(axis=1)
+            terminal_usage[chunk] = usage[:, -1]
+
+        report = self._report(symbols, terminal_pnl, liquidated, liquidation, buy_fills / paths,
+                              sell_fills / paths, account_liquidated, peak_usage, terminal_usage, equity)
+        report.update({
+            "paths": paths,
+            "horizon_steps": steps,
+            "seed": seed,
+            "shocks": shocks,
+            "elapsed_ms": (time.perf_counter() - started) * 1000,
+        })
+        return report
+
+    def _report(self, symbols, terminal_pnl, liquidated, liquidation, buy_fills, sell_fills,
+                account_liquidated, peak_usage, terminal_usage, equity) -> Dict:
+        tail = (1 - self.confidence_level) * 100
+        portfolio = terminal_pnl.sum(axis=1)
+
+        def var_cvar(values):
+            var = float(np.percentile(values, tail))
+            return var, float(values[values <= var].mean())
+
+        var, cvar = var_cvar(portfolio)
+        per_symbol = {}
+        for s, symbol in enumerate(symbols):
+            symbol_var, symbol_cvar = var_cvar(terminal_pnl[:, s])
+            per_symbol[symbol] = {
+                "pnl_mean": float(terminal_pnl[:, s].mean()),
+                "pnl_var": symbol_var,
+                "pnl_cvar": symbol_cvar,
+                "liquidation_price": float(liquidation[s]) or None,
+                "liquidation_probability": float(liquidated[:, s].mean()),
+                "expected_buy_fills": float(buy_fills[s]),
+                "expected_sell_fills": float(sell_fills[s]),
+            }
+
+        def finite(values):
+            return float(values) if np.isfinite(values) else None
+
+        return {
+            "symbols": symbols,
+            "equity": float(equity),
+            "confidence_level": self.confidence_level,
+            "pnl": {
+                "mean": float(portfolio.mean()),
+                "std": float(portfolio.std()),
+                "var": var,
+                "cvar": cvar,
+                "worst": float(portfolio.min()),
+                "percentiles": {str(p): float(v) for p, v in zip(_PERCENTILES, np.percentile(portfolio, _PERCENTILES))},
+            },
+            "margin": {
+                "terminal_usage_mean": finite(np.mean(terminal_usage)),
+                # "nearest": caminhos com patrimônio <= 0 têm uso infinito (sem interpolar inf)
+                "peak_usage_p50": finite(np.percentile(peak_usage, 50, method="nearest")),
+                "peak_usage_p99": finite(np.percentile(peak_usage, 99, method="nearest")),
+                "margin_call_probability": float(np.mean(peak_usage >= 1.0)),
+            },
+            "account_liquidation_probability": float(account_liquidated.mean()),
+            "per_symbol": per_symbol,
+        }
+
+
+_global_stress_tester = None
+
+
+def get_stress_tester(config: dict) -> StressTester:
+    """Instância compartilhada (loop de risco e API)."""
+    global _global_stress_tester
+    if _global_stress_tester is None:
+        _global_stress_tester = StressTester(config)
+    return _global_stress_tester
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Tick Math - preços e quantidades como contagens inteiras de tickSize/stepSize.
+
+As regras do símbolo (PRICE_FILTER, LOT_SIZE, MIN_NOTIONAL) são convertidas uma vez
+em escalas inteiras. A geração de níveis do grid, o arredondamento e a checagem de
+notional mínimo passam a ser aritmética inteira vetorizada com NumPy; Decimal e
+strings só aparecem na fronteira com a exchange.
+"""
+
+import math
+from decimal import ROUND_CEILING, ROUND_DOWN, ROUND_HALF_UP, Decimal
+from typing import Optional, Tuple
+
+import numpy as np
+
+# Folga para arredondamento half-up em float (x.4999999999 de 0.12345 / 0.0001)
+_HALF_UP_EPSILON = 1e-9
+
+
+def _integer_scale(size: Decimal) -> Tuple[int, int]:
+    """Decompõe tickSize/stepSize em (mantissa inteira, casas decimais): 0.0005 -> (5, 4)."""
+    size = size.normalize()
+    exponent = size.as_tuple().exponent
+    if exponent >= 0:
+        return int(size), 0
+    return int(size.scaleb(-exponent)), -exponent
+
+
+def _format_units(units: int, decimals: int) -> str:
+    """Inteiro em unidades de 10^-decimals -> string decimal, sem passar por Decimal."""
+    if decimals == 0:
+        return str(units)
+    sign = "-" if units < 0 else ""
+    whole, frac = divmod(abs(units), 10 ** decimals)
+    return f"{sign}{whole}.{frac:0{decimals}d}"
+
+
+class TickRules:
+    """Regras de preço/quantidade de um símbolo em escala inteira.
+
+    Preços são representados em ticks (preço / tickSize) e quantidades em steps
+    (quantidade / stepSize). O notional mínimo vira um limite inteiro sobre o
+    produto ticks * steps.
+    """
+
+    def __init__(self, tick_size, step_size, min_notional=None,
+                 price_precision: Optional[int] = None, quantity_precision: Optional[int] = None):
+        self.tick_size = Decimal(str(tick_size))
+        self.step_size = Decimal(str(step_size))
+        self.min_notional = Decimal(str(min_notional)) if min_notional else Decimal("5")
+        self.tick_mantissa, self.price_decimals = _integer_scale(self.tick_size)
+        self.step_mantissa, self.quantity_decimals = _integer_scale(self.step_size)
+        self.tick_float = float(self.tick_size)
+        self.step_float = float(self.step_size)
+        # ticks * steps >= min_notional_units  <=>  preço * quantidade >= min_notional
+        self.min_notional_units = int(
+            (self.min_notional / (self.tick_size * self.step_size)).to_integral_value(rounding=ROUND_CEILING)
+        )
+        # Se a exchange declara precisão menor que a do tick, o caminho Decimal continua responsável
+        self.supported = (
+            (price_precision is None or int(price_precision) >= self.price_decimals)
+            and (quantity_precision is None or int(quantity_precision) >= self.quantity_decimals)
+        )
+
+    # --- Preço --- #
+
+    def price_to_ticks(self, price) -> int:
+        """Preço -> ticks (arredondamento half-up, como o _format_price legado)."""
+        if isinstance(price, (Decimal, str)):
+            return int((Decimal(price) / self.tick_size).to_integral_value(rounding=ROUND_HALF_UP))
+        return int(math.floor(float(price) / self.tick_float + 0.5 + _HALF_UP_EPSILON))
+
+    def prices_to_ticks(self, prices) -> np.ndarray:
+        """Versão vetorizada de price_to_ticks para arrays float."""
+        prices = np.asarray(prices, dtype=np.float64)
+        return np.floor(prices / self.tick_float + 0.5 + _HALF_UP_EPSILON).astype(np.int64)
+
+    def ticks_to_str(self, ticks: int) -> str:
+        return _format_units(int(ticks) * self.tick_mantissa, self.price_decimals)
+
+    def ticks_to_decimal(self, ticks: int) -> Decimal:
+        return Decimal(int(ticks) * self.tick_mantissa).scaleb(-self.price_decimals)
+
+    def ticks_to_float(self, ticks):
+        return ticks * self.tick_float
+
+    # --- Quantidade --- #
+
+    def qty_to_steps(self, quantity, price=None) -> int:
+        """Quantidade -> steps, arredondando para baixo (nunca excede o saldo).
+
+        Quantidade positiva menor que um step vira um step. Se `price` for informado,
+        a quantidade é elevada até atender ao notional mínimo.
+        """
+        if isinstance(quantity, (Decimal, str)):
+            steps = int((Decimal(quantity) / self.step_size).to_integral_value(rounding=ROUND_DOWN))
+            positive = Decimal(quantity) > 0
+        else:
+            steps = int(math.floor(float(quantity) / self.step_float + _HALF_UP_EPSILON))
+            positive = float(quantity) > 0
+        if steps == 0 and positive:
+            steps = 1
+        if price is not None and steps > 0:
+            steps = max(steps, self.min_steps_for_notional(self.price_to_ticks(price)))
+        return steps
+
+    def min_steps_for_notional(self, price_ticks: int) -> int:
+        """Menor número de steps que atende ao notional mínimo no preço dado."""
+        if price_ticks <= 0:
+            return 0
+        return -(-self.min_notional_units // int(price_ticks))
+
+    def steps_to_str(self, steps: int) -> str:
+        return _format_units(int(steps) * self.step_mantissa, self.quantity_decimals)
+
+    def steps_to_decimal(self, steps: int) -> Decimal:
+        return Decimal(int(steps) * self.step_mantissa).scaleb(-self.quantity_decimals)
+
+    # --- Notional --- #
+
+    def meets_min_notional(self, price_ticks, qty_steps):
+        """ticks * steps >= limite inteiro; aceita escalares ou arrays (retorna máscara)."""
+        if isinstance(price_ticks, np.ndarray) or isinstance(qty_steps, np.ndarray):
+            return np.asarray(price_ticks, dtype=np.int64) * np.asarray(qty_steps, dtype=np.int64) >= self.min_notional_units
+        return int(price_ticks) * int(qty_steps) >= self.min_notional_units
+
+    def notional(self, price_ticks, qty_steps):
+        return price_ticks * self.tick_float * qty_steps * self.step_float
+
+    # --- Grid --- #
+
+    def geometric_levels(self, center_ticks: int, spacing: float, levels_below: int,
+                         levels_above: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Níveis geométricos centro * (1 -/+ spacing)^n arredondados ao tick.
+
+        Retorna (compras, vendas) em ticks, ambos em ordem crescente. Níveis que
+        colapsam no mesmo tick (espaçamento menor que o tick) ou não positivos são
+        descartados em vez de duplicados.
+        """
+        spacing = float(spacing)
+        center = float(center_ticks)
+        below = np.floor(center * (1.0 - spacing) ** np.arange(1, levels_below + 1) + 0.5 + _HALF_UP_EPSILON)
+        above = np.floor(center * (1.0 + spacing) ** np.arange(1, levels_above + 1) + 0.5 + _HALF_UP_EPSILON)
+        below = below.astype(np.int64)
+        above = above.astype(np.int64)
+        buys = np.unique(below[(below > 0) & (below < center_ticks)])
+        sells = np.unique(above[above > center_ticks])
+        return buys, sells
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Universe Metrics - métricas de seleção de pares calculadas para o universo inteiro de uma vez.
+
+Os OHLC de todos os símbolos são empilhados numa matriz (símbolos x candles) e ATR%,
+ADX, volatilidade realizada, rank de volume e flags de padrões de candle saem de uma
+única passada vetorizada. O resultado é uma tabela colunar (MetricsTable) sobre a qual
+filtros e ranking operam com máscaras NumPy, sem dicts de Decimal por símbolo.
+
+ATR e ADX usam os kernels de Wilder de utils.streaming_indicators (paridade com o
+TA-Lib), aplicados à janela de klines informada.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from utils.logger import setup_logger
+from utils.streaming_indicators import atr, wilder_adx
+
+log = setup_logger("universe_metrics")
+
+# CDLDOJI do TA-Lib: corpo <= 10% da média do range dos 10 candles anteriores
+_DOJI_AVG_PERIOD = 10
+_DOJI_FACTOR = 0.1
+
+
+# --- Kernels vetorizados (linhas = símbolos, colunas = candles em ordem cronológica) --- #
+
+def realized_volatility(close: np.ndarray) -> np.ndarray:
+    """Desvio padrão dos log-retornos por candle (não anualizado)."""
+    if close.shape[1] < 3:
+        return np.full(close.shape[0], np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(close), axis=1)
+    return np.std(returns, axis=1, ddof=1)
+
+
+def doji_flags(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """CDLDOJI no último candle: corpo <= 10% da média do range dos 10 candles anteriores."""
+    if close.shape[1] < _DOJI_AVG_PERIOD + 1:
+        return np.zeros(close.shape[0], dtype=bool)
+    avg_range = (high[:, -_DOJI_AVG_PERIOD - 1:-1] - low[:, -_DOJI_AVG_PERIOD - 1:-1]).mean(axis=1)
+    body = np.abs(close[:, -1] - open_[:, -1])
+    return body <= _DOJI_FACTOR * avg_range
+
+
+def engulfing_flags(open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """CDLENGULFING no último candle: corpo atual de cor oposta engolfa o corpo anterior."""
+    if close.shape[1] < 2:
+        return np.zeros(close.shape[0], dtype=bool)
+    o1, c1, o2, c2 = open_[:, -2], close[:, -2], open_[:, -1], close[:, -1]
+    bullish = (c1 < o1) & (c2 > o2) & (o2 < c1) & (c2 > o1)
+    bearish = (c1 > o1) & (c2 < o2) & (o2 > c1) & (c2 < o1)
+    return bullish | bearish
+
+
+PATTERN_KERNELS = {
+    "CDLDOJI": doji_flags,
+    "CDLENGULFING": engulfing_flags,
+}
+
+
+class MetricsTable:
+    """Tabela colunar de métricas: `symbols` + um array NumPy por coluna, mesma ordem."""
+
+    def __init__(self, symbols: Iterable[str], columns: Dict[str, np.ndarray]):
+        self.symbols = np.asarray(list(symbols), dtype=object)
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        self._index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._symbol_index()
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def _symbol_index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        return self._index
+
+    def filter(self, mask: np.ndarray) -> "MetricsTable":
+        return MetricsTable(self.symbols[mask], {name: values[mask] for name, values in self.columns.items()})
+
+    def take(self, order: np.ndarray) -> "MetricsTable":
+        return MetricsTable(self.symbols[order], {name: values[order] for name, values in self.columns.items()})
+
+    def row(self, symbol: str) -> Optional[Dict]:
+        i = self._symbol_index().get(symbol)
+        if i is None:
+            return None
+        return {name: values[i].item() if hasattr(values[i], "item") else values[i]
+                for name, values in self.columns.items()}
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {symbol: self.row(symbol) for symbol in self.symbols}
+
+    def to_arrays(self, prefix: str = "metric_") -> Dict[str, np.ndarray]:
+        """Colunas como arrays sem objetos Python (np.savez sem pickle)."""
+        arrays = {f"{prefix}symbols": self.symbols.astype(str)}
+        for name, values in self.columns.items():
+            arrays[prefix + name] = values.astype(str) if values.dtype == object else values
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str = "metric_") -> "MetricsTable":
+        columns = {}
+        for key in arrays.keys():
+            if key.startswith(prefix) and key != f"{prefix}symbols":
+                values = arrays[key]
+                columns[key[len(prefix):]] = values.astype(object) if values.dtype.kind == "U" else values
+        return cls(arrays[f"{prefix}symbols"].tolist(), columns)
+
+
+def _stack(views: List[np.ndarray], length: int) -> Dict[str, np.ndarray]:
+    """Empilha os últimos `length` candles de cada view em matrizes (n, length)."""
+    stacked = np.stack([view[-length:] for view in views])
+    return {field: np.ascontiguousarray(stacked[field]) for field in ("open", "high", "low", "close", "volume")}
+
+
+def compute_universe_metrics(kline_data: Dict, tickers: Dict, period: int = 14, limit: int = 100,
+                             patterns: Iterable[str] = ()) -> MetricsTable:
+    """Métricas de todos os símbolos de `kline_data` (KlineSeries) numa passada vetorizada.
+
+    Usa os últimos `limit` candles fechados de cada série. Colunas: volume (quote 24h), last_price, atr, atr_perc, adx, realized_vol,
+    volume_rank (0-1, 1 = maior volume), uma flag booleana por padrão em `patterns`
+    e last_pattern (primeiro padrão detectado no último candle, "None" se nenhum).
+    """
+    symbols = [symbol for symbol in kline_data if symbol in tickers]
+    n = len(symbols)
+    patterns = list(patterns)
+    unsupported = [name for name in patterns if name not in PATTERN_KERNELS]
+    if unsupported:
+        log.warning(f"Candlestick patterns without vectorized kernel ignored: {unsupported}")
+    patterns = [name for name in patterns if name in PATTERN_KERNELS]
+    columns = {
+        "volume": np.array([float(tickers[s].get("quoteVolume", 0) or 0) for s in symbols], dtype=np.float64),
+        "last_price": np.array([float(tickers[s].get("lastPrice", 0) or 0) for s in symbols], dtype=np.float64),
+        "atr": np.full(n, np.nan),
+        "adx": np.full(n, np.nan),
+        "realized_vol": np.full(n, np.nan),
+        "last_close": np.full(n, np.nan),
+    }
+    flags = {name: np.zeros(n, dtype=bool) for name in patterns}
+
+    # Só candles fechados, como os indicadores incrementais; séries de tamanhos diferentes
+    # (listagens recentes) são processadas em blocos por tamanho
+    views = [kline_data[s].view(limit, include_forming=False) for s in symbols]
+    lengths = np.array([len(view) for view in views], dtype=np.int64)
+    for length in np.unique(lengths):
+        rows = np.flatnonzero(lengths == length)
+        if length < 2:
+            continue
+        ohlc = _stack([views[i] for i in rows], int(length))
+        columns["atr"][rows] = atr(ohlc["high"], ohlc["low"], ohlc["close"], period)[:, -1]
+        columns["adx"][rows] = wilder_adx(ohlc["high"], ohlc["low"], ohlc["close"], period)
+        columns["realized_vol"][rows] = realized_volatility(ohlc["close"])
+        columns["last_close"][rows] = ohlc["close"][:, -1]
+        for name in patterns:
+            flags[name][rows] = PATTERN_KERNELS[name](ohlc["open"], ohlc["high"], ohlc["low"], ohlc["close"])
+
+    # Mesmos defaults do cálculo por símbolo: ATR 0 e ADX 100 quando não há candles suficientes
+    columns["atr"] = np.nan_to_num(columns["atr"], nan=0.0)
+    columns["adx"] = np.nan_to_num(columns["adx"], nan=100.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        columns["atr_perc"] = np.where(columns["last_close"] > 0, columns["atr"] / columns["last_close"], 0.0)
+    columns["volume_rank"] = (
+        np.argsort(np.argsort(columns["volume"], kind="stable"), kind="stable") / max(n - 1, 1)
+        if n else np.zeros(0)
+    )
+
+    last_pattern = np.full(n, "None", dtype=object)
+    for name in reversed(patterns):  # o primeiro padrão da lista tem prioridade
+        last_pattern[flags[name]] = name
+    columns["last_pattern"] = last_pattern
+    columns.update(flags)
+    return MetricsTable(symbols, columns)
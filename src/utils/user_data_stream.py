@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+User Data Stream - eventos de ordens em tempo real via listenKey.
+
+Substitui o polling REST de status de ordens (1 chamada por ordem aberta a cada ciclo)
+por eventos ORDER_TRADE_UPDATE (futuros) / executionReport (spot) entregues via WebSocket.
+Os eventos são normalizados no mesmo formato retornado por futures_get_order e
+roteados para uma fila por símbolo, consumida pelo GridLogic. ACCOUNT_UPDATE (posições e
+saldos de futuros) é entregue aos account_callbacks.
+"""
+
+import json
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import websocket
+
+from utils.logger import setup_logger
+
+log = setup_logger("user_data_stream")
+
+
+class UserDataStream:
+    """Cliente do user data stream da Binance (listenKey) com roteamento por símbolo."""
+
+    def __init__(self, api_client, config: dict = None, market_type: str = "futures", testnet: bool = False):
+        self.api_client = api_client
+        self.market_type = market_type.lower()
+        self.testnet = testnet
+
+        # Configuration
+        self.config = config or {}
+        stream_config = self.config.get("user_data_stream", {})
+
+        if self.market_type == "futures":
+            default_url = "wss://stream.binancefuture.com/ws/" if testnet else "wss://fstream.binance.com/ws/"
+            url_key = "futures_testnet_url" if testnet else "futures_url"
+        else:
+            default_url = "wss://testnet.binance.vision/ws/" if testnet else "wss://stream.binance.com:9443/ws/"
+            url_key = "spot_testnet_url" if testnet else "spot_url"
+        self.base_url = stream_config.get(url_key, default_url)
+        self.keepalive_interval = stream_config.get("keepalive_interval_seconds", 1800)
+        self.reconnect_delay = stream_config.get("reconnect_delay_seconds", 5)
+        self.max_reconnect_delay = stream_config.get("max_reconnect_delay_seconds", 60)
+        self.queue_max_size = stream_config.get("queue_max_size", 10000)
+        self.join_timeout = self.config.get("websocket_config", {}).get("join_timeout_seconds", 2)
+
+        # Connection state
+        self.listen_key = None
+        self.ws = None
+        self.thread = None
+        self.keepalive_thread = None
+        self.is_running = False
+        self.is_connected = False
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        # Roteamento: símbolo -> fila de eventos / callbacks
+        self.symbol_queues: Dict[str, queue.Queue] = {}
+        self.callbacks: List[Callable[[dict], None]] = []
+        self.account_callbacks: List[Callable[[dict], None]] = []  # ACCOUNT_UPDATE (posições/saldos)
+
+        # Statistics
+        self.stats = {
+            "messages_received": 0,
+            "order_updates": 0,
+            "fills": 0,
+            "dropped_events": 0,
+            "account_updates": 0,
+            "reconnections": 0,
+            "last_message_time": None,
+            "connection_time": None,
+        }
+
+    def start(self) -> bool:
+        """Obtém o listenKey e inicia WebSocket + keepalive em threads de background."""
+        if self.is_running:
+            return True
+
+        if not self._refresh_listen_key():
+            log.error("❌ Não foi possível obter listenKey - user data stream desativado")
+            return False
+
+        self.is_running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run_websocket, daemon=True)
+        self.thread.start()
+        self.keepalive_thread = threading.Thread(target=self._run_keepalive, daemon=True)
+        self.keepalive_thread.start()
+        log.info(f"UserDataStream started ({self.market_type.upper()})")
+        return True
+
+    def stop(self, close_listen_key: bool = True):
+        """Encerra o stream e (opcionalmente) invalida o listenKey.
+
+        Em futuros o listenKey é compartilhado por conta: processos que dividem a mesma
+        conta devem passar close_listen_key=False para não derrubar o stream dos demais.
+        """
+        self.is_running = False
+        self._stop_event.set()
+        if self.ws:
+            self.ws.close()
+        for t in (self.thread, self.keepalive_thread):
+            if t and t.is_alive():
+                t.join(timeout=self.join_timeout)
+        if self.listen_key and close_listen_key:
+            try:
+                self.api_client.close_user_data_stream(self.listen_key, market_type=self.market_type)
+            except Exception as e:
+                log.debug(f"Erro ao fechar listenKey: {e}")
+            self.listen_key = None
+        self.is_connected = False
+        log.info("UserDataStream stopped")
+
+    def is_healthy(self) -> bool:
+        """True quando o stream está conectado e pode substituir o polling REST."""
+        return self.is_running and self.is_connected
+
+    def register_symbol(self, symbol: str) -> queue.Queue:
+        """Registra um símbolo e retorna a fila onde seus eventos de ordem serão entregues."""
+        symbol = symbol.upper()
+        with self._lock:
+            if symbol not in self.symbol_queues:
+                self.symbol_queues[symbol] = queue.Queue(maxsize=self.queue_max_size)
+                log.info(f"[{symbol}] Registrado no user data stream")
+            return self.symbol_queues[symbol]
+
+    def unregister_symbol(self, symbol: str):
+        """Remove a fila de eventos de um símbolo."""
+        with self._lock:
+            self.symbol_queues.pop(symbol.upper(), None)
+
+    def add_callback(self, callback: Callable[[dict], None]):
+        """Adiciona callback chamado (na thread do WebSocket) para cada atualização de ordem."""
+        self.callbacks.append(callback)
+
+    def add_account_callback(self, callback: Callable[[dict], None]):
+        """Registra um callback para ACCOUNT_UPDATE (futuros), já no formato de parse_futures_account_update."""
+        self.account_callbacks.append(callback)
+
+    def _refresh_listen_key(self) -> bool:
+        listen_key = self.api_client.start_user_data_stream(market_type=self.market_type)
+        if not listen_key:
+            return False
+        self.listen_key = listen_key
+        return True
+
+    def _run_keepalive(self):
+        """Renova o listenKey periodicamente (expira em 60 min sem keepalive)."""
+        while not self._stop_event.wait(self.keepalive_interval):
+            if not self.listen_key:
+                continue
+            try:
+                result = self.api_client.keepalive_user_data_stream(self.listen_key, market_type=self.market_type)
+                if result is None:
+                    log.warning("⚠️ Keepalive do listenKey falhou - forçando reconexão")
+                    self._force_reconnect()
+                else:
+                    log.debug("listenKey keepalive OK")
+            except Exception as e:
+                log.error(f"Erro no keepalive do listenKey: {e}")
+
+    def _force_reconnect(self):
+        """Invalida a conexão atual; o loop principal obtém um novo listenKey e reconecta."""
+        self.listen_key = None
+        self.is_connected = False
+        if self.ws:
+            self.ws.close()
+
+    def _run_websocket(self):
+        """Loop de conexão com reconexão exponencial."""
+        delay = self.reconnect_delay
+        while self.is_running:
+            try:
+                if not self.listen_key and not self._refresh_listen_key():
+                    raise ConnectionError("listenKey indisponível")
+
+                stream_url = self.base_url + self.listen_key
+                log.info(f"Connecting user data stream ({self.market_type.upper()})")
+
+                self.ws = websocket.WebSocketApp(
+                    stream_url,
+                    on_message=self._on_message,
+                    on_error=self._on_error,
+                    on_close=self._on_close,
+                    on_open=self._on_open,
+                )
+                self.ws.run_forever(ping_interval=20, ping_timeout=10)
+                delay = self.reconnect_delay
+
+            except Exception as e:
+                log.error(f"User data stream error: {e}")
+
+            self.is_connected = False
+            if self.is_running:
+                self.stats["reconnections"] += 1
+                log.info(f"Reconnecting user data stream in {delay}s...")
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _on_open(self, ws):
+        self.is_connected = True
+        self.stats["connection_time"] = time.time()
+        log.info("✅ User data stream connection opened")
+
+    def _on_message(self, ws, message):
+        try:
+            data = json.loads(message)
+            self.stats["messages_received"] += 1
+            self.stats["last_message_time"] = time.time()
+
+            event_type = data.get("e")
+            if event_type == "ORDER_TRADE_UPDATE":
+                update = self.parse_futures_order_update(data)
+            elif event_type == "executionReport":
+                update = self.parse_spot_execution_report(data)
+            elif event_type == "ACCOUNT_UPDATE":
+                self._dispatch_account(self.parse_futures_account_update(data))
+                return
+            elif event_type == "listenKeyExpired":
+                log.warning("⚠️ listenKey expirado - renovando")
+                self._force_reconnect()
+                return
+            else:
+                return
+
+            self._dispatch(update)
+
+        except Exception as e:
+            log.error(f"Error processing user data message: {e}")
+
+    def _dispatch(self, update: dict):
+        self.stats["order_updates"] += 1
+        if update["status"] == "FILLED":
+            self.stats["fills"] += 1
+
+        q = self.symbol_queues.get(update["symbol"])
+        if q is not None:
+            try:
+                q.put_nowait(update)
+            except queue.Full:
+                # A reconciliação REST periódica cobre eventos descartados
+                self.stats["dropped_events"] += 1
+                log.warning(f"[{update['symbol']}] Fila de eventos cheia - evento {update['orderId']} descartado")
+
+        for callback in self.callbacks:
+            try:
+                callback(update)
+            except Exception as e:
+                log.error(f"Error in user data callback: {e}")
+
+    def _dispatch_account(self, update: dict):
+        self.stats["account_updates"] += 1
+        for callback in self.account_callbacks:
+            try:
+                callback(update)
+            except Exception as e:
+                log.error(f"Error in account update callback: {e}")
+
+    def _on_error(self, ws, error):
+        log.error(f"User data stream error: {error}")
+
+    def _on_close(self, ws, close_status_code, close_msg):
+        self.is_connected = False
+        log.warning(f"User data stream closed: {close_status_code} - {close_msg}")
+
+    @staticmethod
+    def parse_futures_order_update(data: dict) -> dict:
+        """Converte ORDER_TRADE_UPDATE no formato de futures_get_order."""
+        o = data["o"]
+        executed_qty = o.get("z", "0")
+        avg_price = o.get("ap", "0")
+        return {
+            "symbol": o["s"],
+            "orderId": int(o["i"]),
+            "clientOrderId": o.get("c"),
+            "side": o["S"],
+            "type": o.get("o"),
+            "status": o["X"],
+            "executionType": o.get("x"),
+            "price": o.get("p", "0"),
+            "origQty": o.get("q", "0"),
+            "executedQty": executed_qty,
+            "avgPrice": avg_price,
+            "cummulativeQuoteQty": str(float(executed_qty) * float(avg_price)),
+            "lastFilledQty": o.get("l", "0"),
+            "lastFilledPrice": o.get("L", "0"),
+            "commission": o.get("n", "0"),
+            "commissionAsset": o.get("N"),
+            "realizedProfit": o.get("rp", "0"),
+            "reduceOnly": o.get("R", False),
+            "updateTime": o.get("T", data.get("E")),
+            "source": "user_stream",
+        }
+
+    @staticmethod
+    def parse_futures_account_update(data: dict) -> dict:
+        """Converte ACCOUNT_UPDATE (futuros) em saldos e posições no formato do positionRisk."""
+        account = data.get("a", {})
+        update_time = data.get("T", data.get("E"))
+        return {
+            "reason": account.get("m"),
+            "updateTime": update_time,
+            "balances": [
+                {
+                    "asset": b["a"],
+                    "balance": b.get("wb", "0"),
+                    "crossWalletBalance": b.get("cw", "0"),
+                }
+                for b in account.get("B", [])
+            ],
+            "positions": [
+                {
+                    "symbol": p["s"],
+                    "positionAmt": p.get("pa", "0"),
+                    "entryPrice": p.get("ep", "0"),
+                    "unRealizedProfit": p.get("up", "0"),
+                    "marginType": p.get("mt"),
+                    "positionSide": p.get("ps", "BOTH"),
+                    "updateTime": update_time,
+                }
+                for p in account.get("P", [])
+            ],
+            "source": "user_stream",
+        }
+
+    @staticmethod
+    def parse_spot_execution_report(data: dict) -> dict:
+        """Converte executionReport (spot) no formato de get_order."""
+        executed_qty = data.get("z", "0")
+        cumulative_quote = data.get("Z", "0")
+        avg_price = float(cumulative_quote) / float(executed_qty) if float(executed_qty) > 0 else 0.0
+        return {
+            "symbol": data["s"],
+            "orderId": int(data["i"]),
+            "clientOrderId": data.get("c"),
+            "side": data["S"],
+            "type": data.get("o"),
+            "status": data["X"],
+            "executionType": data.get("x"),
+            "price": data.get("p", "0"),
+            "origQty": data.get("q", "0"),
+            "executedQty": executed_qty,
+            "avgPrice": str(avg_price),
+            "cummulativeQuoteQty": cumulative_quote,
+            "lastFilledQty": data.get("l", "0"),
+            "lastFilledPrice": data.get("L", "0"),
+            "commission": data.get("n", "0"),
+            "commissionAsset": data.get("N"),
+            "updateTime": data.get("T", data.get("E")),
+            "source": "user_stream",
+        }
+
+    def get_statistics(self) -> dict:
+        stats = self.stats.copy()
+        stats["connected"] = self.is_connected
+        stats["registered_symbols"] = list(self.symbol_queues.keys())
+        return stats
+
+
+# Global instances (one per market type) for easy access
+_global_user_streams = {}
+
+def get_global_user_data_stream(api_client=None, config: dict = None, market_type: str = "futures",
+                                testnet: bool = False) -> Optional[UserDataStream]:
+    """Get (or create) the global user data stream for a market type."""
+    market_type = market_type.lower()
+    if market_type not in _global_user_streams:
+        if api_client is None:
+            return None
+        _global_user_streams[market_type] = UserDataStream(api_client, config, market_type, testnet)
+    return _global_user_streams[market_type]
@@ -275,6 +275,7 @@ class BinanceWebSocketClient:
             
             kline_info = {
                 'symbol': symbol,
+                'interval': kline_data['i'],
                 'open_time': int(kline_data['t']),
                 'close_time': int(kline_data['T']),
                 'open': float(kline_data['o']),
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Teste do AccountSnapshotService e do alocador puro (compute_allocations): uma rodada de
+alocação custa um número fixo de chamadas REST, independente do número de símbolos,
+e workers semeados com o snapshot do processo principal não fazem nenhuma.
+"""
+
+import os
+import sys
+from collections import Counter
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core.capital_management import CapitalManager, compute_allocations, decide_market
+from utils.account_snapshot import AccountSnapshot, AccountSnapshotService
+
+
+def load_config():
+    config_path = os.path.join(os.path.dirname(__file__), 'src', 'config', 'config.yaml')
+    with open(config_path, 'r') as f:
+        return yaml.safe_load(f)
+
+
+class CountingAPIClient:
+    """APIClient falso: respostas no formato da Binance e contagem de chamadas REST."""
+
+    operation_mode = "shadow"
+
+    def __init__(self, symbols, spot_usdt=400.0, futures_usdt=600.0, futures_wallet=650.0):
+        self.symbols = list(symbols)
+        self.spot_usdt = spot_usdt
+        self.futures_usdt = futures_usdt
+        self.futures_wallet = futures_wallet
+        self.calls = Counter()
+        self.transfers = []
+
+    def get_spot_account_balance(self):
+        self.calls["get_spot_account_balance"] += 1
+        return {"balances": [
+            {"asset": "USDT", "free": str(self.spot_usdt), "locked": "0"},
+            {"asset": "ADA", "free": "25", "locked": "5"},
+            {"asset": "BRL", "free": "3", "locked": "0"},
+        ]}
+
+    def get_futures_account_balance(self):
+        self.calls["get_futures_account_balance"] += 1
+        return [{"asset": "USDT", "balance": str(self.futures_wallet),
+                 "availableBalance": str(self.futures_usdt)}]
+
+    def get_futures_ticker(self, symbol=None):
+        self.calls["get_futures_ticker"] += 1
+        tickers = [{"symbol": s, "volume": str(1000 * (i + 1))} for i, s in enumerate(self.symbols)]
+        return [t for t in tickers if t["symbol"] == symbol][0] if symbol else tickers
+
+    def get_spot_24hr_ticker(self, symbol=None):
+        self.calls["get_spot_24hr_ticker"] += 1
+        # Pares de índice par têm muito mais volume no spot
+        return [{"symbol": s, "volume": str(5000 * (i + 1) if i % 2 == 0 else 10)}
+                for i, s in enumerate(self.symbols)]
+
+    def transfer_between_markets(self, asset, amount, transfer_type):
+        self.calls["transfer_between_markets"] += 1
+        self.transfers.append((amount, transfer_type))
+        if transfer_type == "1":
+            self.spot_usdt -= amount
+            self.futures_usdt += amount
+        else:
+            self.futures_usdt -= amount
+            self.spot_usdt += amount
+        return {"status": "CONFIRMED"}
+
+    def __getattr__(self, name):
+        raise AssertionError(f"chamada REST inesperada: {name}")
+
+
+def _symbols(count):
+    return [f"SYM{i}USDT" for i in range(count)]
+
+
+def test_allocation_round_rest_calls_are_constant():
+    config = load_config()
+    config["trading"]["max_concurrent_pairs"] = 200
+    config["capital_management_advanced"]["min_capital_per_pair_usd"] = 1.0
+
+    per_round = set()
+    for count in (5, 50, 150):
+        api = CountingAPIClient(_symbols(count))
+        manager = CapitalManager(api, config, snapshot_service=AccountSnapshotService(api, config))
+        allocations = manager.calculate_optimal_allocations(_symbols(count))
+        assert len(allocations) == count
+        per_round.add(sum(api.calls.values()))
+    assert per_round == {4}, per_round
+
+    # Workers semeados com o snapshot do processo principal: nenhuma chamada REST
+    api = CountingAPIClient(_symbols(20))
+    main = CapitalManager(api, config, snapshot_service=AccountSnapshotService(api, config))
+    snapshot = main.get_account_snapshot()
+    for symbol in _symbols(20):
+        worker_service = AccountSnapshotService(api, config)
+        worker_service.seed(snapshot)
+        worker = CapitalManager(api, config, snapshot_service=worker_service)
+        assert worker.calculate_optimal_allocations([symbol])[0].symbol == symbol
+    assert sum(api.calls.values()) == 4
+    print("✅ Rodada de alocação: 4 chamadas REST para 5/50/150 símbolos, 0 por worker semeado")
+
+
+def test_pure_allocator_matches_snapshot():
+    config = load_config()
+    snapshot = AccountSnapshot(
+        spot_usdt=1800.0, futures_usdt=1200.0, futures_wallet_usdt=1250.0,
+        spot_assets={"USDT": 1800.0, "ADA": 30.0}, spot_free={"USDT": 1800.0, "ADA": 25.0},
+        futures_volume={"BTCUSDT": 100.0, "XUSDT": 100.0, "YUSDT": 1000.0},
+        spot_volume={"BTCUSDT": 10.0, "XUSDT": 1000.0, "YUSDT": 10.0},
+    )
+    assert snapshot.positions_value == 51.0  # 50 de margem em uso + placeholder do ADA
+    assert decide_market("BTCUSDT", snapshot)[0] == "futures"
+    assert decide_market("XUSDT", snapshot) == ("spot", "More capital available in spot")
+    assert decide_market("YUSDT", snapshot)[0] == "futures"
+
+    plan = compute_allocations(snapshot, ["BTCUSDT", "XUSDT"], config)
+    assert plan.status == "ok" and not plan.transfers_needed
+    per_pair = min(3000 * 0.9 / 2, 3000 * config["capital_management_advanced"]["max_capital_per_pair_percentage"] / 100)
+    assert [a.allocated_amount for a in plan.allocations] == [per_pair] * 2
+    assert [a.market_type for a in plan.allocations] == ["futures", "spot"]
+    assert plan.allocations[0].leverage == config["grid"]["futures"]["leverage"]
+
+    # Sem saldo spot: o par de spot precisa de transferência, ou cai para futures
+    futures_only = AccountSnapshot(futures_usdt=1000.0, futures_wallet_usdt=1000.0)
+    plan = compute_allocations(futures_only, ["XUSDT"], config, market_types={"XUSDT": "spot"})
+    assert plan.transfers_needed and plan.required_capital["spot"] == plan.capital_per_pair
+    fallback = compute_allocations(futures_only, ["XUSDT"], config, market_types={"XUSDT": "spot"},
+                                   allow_transfers=False)
+    assert fallback.allocations[0].market_type == "futures" and not fallback.transfers_needed
+
+    # Capital abaixo do mínimo por par
+    assert compute_allocations(AccountSnapshot(spot_usdt=1.0), ["XUSDT"], config).status == "insufficient_capital"
+    print("✅ Alocador puro: decisão de mercado, proporção e transferências a partir do snapshot")
+
+
+def test_transfer_round_is_single_call():
+    config = load_config()
+    config["trading"]["max_concurrent_pairs"] = 50
+    symbols = _symbols(10)
+    api = CountingAPIClient(symbols, spot_usdt=0.0, futures_usdt=1000.0, futures_wallet=1000.0)
+    manager = CapitalManager(api, config, snapshot_service=AccountSnapshotService(api, config))
+    # Metade dos pares forçada no spot, que está sem saldo
+    allocations = manager.calculate_optimal_allocations(symbols, market_types={s: "spot" for s in symbols[::2]})
+    assert len(allocations) == 10
+    assert api.calls["transfer_between_markets"] == 1
+    assert {a.market_type for a in allocations} == {"spot", "futures"}
+    # Snapshot inicial + releitura após a transferência
+    assert api.calls["get_spot_account_balance"] == 2
+    print(f"✅ Transferência única por rodada: {api.transfers}")
+
+
+if __name__ == "__main__":
+    test_allocation_round_rest_calls_are_constant()
+    test_pure_allocator_matches_snapshot()
+    test_transfer_round_is_single_call()
+    print("\n🎉 Todos os testes do snapshot de conta passaram!")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Teste dos motores de alocação (risk parity e média-variância com limites por par) e da
+integração com compute_allocations / retornos alinhados no tempo a partir do KlineStore.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core.capital_management import (MeanVarianceEngine, RiskParityEngine, compute_allocations,
+                                     project_capped_simplex, shrunk_covariance, time_aligned_returns)
+from test_account_snapshot import load_config
+from utils.account_snapshot import AccountSnapshot
+from utils.kline_store import KLINE_DTYPE
+
+
+def _returns(count=12, samples=120, seed=4):
+    """Retornos com volatilidades distintas e um fator comum (correlação)."""
+    rng = np.random.default_rng(seed)
+    vols = np.linspace(0.002, 0.02, count)
+    market = rng.normal(0, 0.004, samples)
+    return vols[:, None] * rng.standard_normal((count, samples)) + 0.5 * market
+
+
+def test_projection_respects_box():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        v = rng.normal(0, 1, 20)
+        w = project_capped_simplex(v, 0.02, 0.12)
+        assert abs(w.sum() - 1) < 1e-12 and w.min() >= 0.02 - 1e-15 and w.max() <= 0.12 + 1e-15
+    assert np.allclose(project_capped_simplex(np.ones(4), 0.0, 0.2), 0.2)  # teto abaixo de 1/n
+    print("✅ Projeção no simplex com limites OK")
+
+
+def test_risk_parity_equalizes_contributions():
+    config = load_config()
+    engine = RiskParityEngine(config)
+    returns = _returns()
+    w = engine.weights(returns, 0.0, 1.0)
+    cov = shrunk_covariance(returns, engine.shrinkage)
+    contributions = w * (cov @ w)
+    assert np.ptp(contributions / contributions.sum()) < 1e-8, contributions
+    assert w[0] > w[-1], "par menos volátil recebe mais capital"
+    print(f"✅ Risk parity: pesos {w.min():.3f}-{w.max():.3f}, contribuições iguais")
+
+
+def test_mean_variance_is_optimal_under_constraints():
+    config = load_config()
+    engine = MeanVarianceEngine(config)
+    returns = _returns(count=8)
+    returns[2] += 0.002  # um par com retorno esperado claramente maior
+    lower, upper = 0.05, 0.3
+    w = engine.weights(returns, lower, upper)
+    cov, mu = shrunk_covariance(returns, engine.shrinkage), returns.mean(axis=1)
+
+    def objective(x):
+        return mu @ x - 0.5 * engine.risk_aversion * x @ cov @ x
+
+    assert abs(w.sum() - 1) < 1e-9 and w.min() >= lower - 1e-12 and w.max() <= upper + 1e-12
+    assert abs(w[2] - upper) < 1e-9, "par de maior retorno esperado vai ao teto"
+    rng = np.random.default_rng(2)
+    for _ in range(200):
+        candidate = project_capped_simplex(rng.dirichlet(np.ones(8)), lower, upper)
+        assert objective(w) >= objective(candidate) - 1e-12
+    print(f"✅ Média-variância: ótimo dentro dos limites (peso máx {w.max():.2f})")
+
+
+class _History:
+    """Mesma interface de RiskMetrics.aligned_returns."""
+
+    def __init__(self, symbols, returns):
+        self.symbols, self.returns = symbols, returns
+
+    def aligned_returns(self, symbols, window=None, min_length=30):
+        rows = [self.symbols.index(s) for s in symbols if s in self.symbols]
+        return [self.symbols[i] for i in rows], self.returns[rows]
+
+
+def test_compute_allocations_with_engine():
+    config = load_config()
+    advanced = config["capital_management_advanced"]
+    symbols = [f"P{i}USDT" for i in range(10)]
+    returns = _returns(count=9)
+    history = _History(symbols[:9], returns)  # P9USDT sem histórico
+    snapshot = AccountSnapshot(spot_usdt=0.0, futures_usdt=2000.0, futures_wallet_usdt=2000.0)
+
+    plan = compute_allocations(snapshot, symbols, config, engine=RiskParityEngine(config),
+                               returns=history.aligned_returns(symbols))
+    amounts = {a.symbol: a.allocated_amount for a in plan.allocations}
+    budget = plan.capital_per_pair * plan.effective_max_pairs
+    cap = 2000.0 * advanced["max_capital_per_pair_percentage"] / 100
+    floor = max(advanced["min_capital_per_pair_usd"], *advanced["min_notional_limits"].values())
+    assert len(amounts) == 10 and abs(sum(amounts.values()) - budget) < 1e-6
+    assert max(amounts.values()) <= cap + 1e-9 and min(amounts.values()) >= floor - 1e-9
+    assert amounts["P0USDT"] > amounts["P8USDT"]
+    assert abs(amounts["P9USDT"] - budget / 10) < 1e-6
+    # Sem histórico o motor mantém a divisão igual original
+    equal = compute_allocations(snapshot, symbols, config)
+    assert {a.allocated_amount for a in equal.allocations} == {equal.capital_per_pair}
+    print(f"✅ Alocação risk parity: ${min(amounts.values()):.2f} - ${max(amounts.values()):.2f} por par")
+
+
+def _closed_klines(closes, first_open_time, interval_ms=900_000):
+    klines = np.zeros(len(closes), dtype=KLINE_DTYPE)
+    klines["open_time"] = first_open_time + interval_ms * np.arange(len(closes))
+    klines["close"] = closes
+    return klines
+
+
+def test_time_aligned_returns_uses_common_open_times():
+    step = 900_000
+    a = _closed_klines(100 + np.arange(60.0), 0)          # candles 0..59
+    b = _closed_klines(50 + np.arange(50.0), 15 * step)   # candles 15..64 (mais recente)
+    c = _closed_klines(np.ones(10), 0)                    # histórico curto
+    symbols, returns = time_aligned_returns({"AUSDT": a, "BUSDT": b, "CUSDT": c}, window=30, min_history=20)
+
+    assert symbols == ["AUSDT", "BUSDT"] and returns.shape == (2, 30)
+    # Último retorno comum: candle 59 sobre 58 nas duas séries (não o fim de cada uma)
+    assert abs(returns[0, -1] - (159 / 158 - 1)) < 1e-12
+    assert abs(returns[1, -1] - (94 / 93 - 1)) < 1e-12
+    print("✅ Retornos alinhados pela grade comum de open_time")
+
+
+def test_risk_metrics_aligned_returns():
+    from agents.risk_agent import RiskMetrics
+
+    metrics = RiskMetrics(history_length=100)
+    for i in range(60):
+        metrics.update_data("AUSDT", 100 + i, 0.0, 1.0)
+        if i >= 20:
+            metrics.update_data("BUSDT", 50 + (i % 3), 0.0, 1.0)
+    symbols, returns = metrics.aligned_returns(["AUSDT", "BUSDT", "CUSDT"], window=30)
+    assert symbols == ["AUSDT", "BUSDT"] and returns.shape == (2, 30)
+    assert abs(returns[0, -1] - (159 / 158 - 1)) < 1e-12
+    print("✅ RiskMetrics.aligned_returns alinha as séries pelo fim")
+
+
+if __name__ == "__main__":
+    test_projection_respects_box()
+    test_risk_parity_equalizes_contributions()
+    test_mean_variance_is_optimal_under_constraints()
+    test_compute_allocations_with_engine()
+    test_time_aligned_returns_uses_common_open_times()
+    test_risk_metrics_aligned_returns()
+    print("\n🎉 Todos os testes do motor de alocação passaram!")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Teste do modo de execução async: vários pares como tasks em um único event loop,
+com start/stop por símbolo via filas e handles com interface de Process.
+Usa um trader falso - nenhuma requisição real é feita.
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.async_trading_runtime import AsyncRuntimePool, AsyncTradingRuntime
+
+CONFIG = {
+    "operation_mode": "shadow",
+    "trading": {"cycle_interval_seconds": 0.05},
+    "multi_agent_system": {"async_runtime": {"io_threads": 4}},
+}
+
+
+class _FakeTrader:
+    """Etapas do ciclo com I/O bloqueante simulado (como o GridLogic síncrono)."""
+
+    def __init__(self, events=None):
+        self.events = events if events is not None else multiprocessing.Manager().list()
+        self.decide_threads = set()
+
+    def _setup_symbol_trader(self, symbol, config, api_client, capital_manager, alerter, shared_resources):
+        return {"symbol": symbol, "pair_logger": None, "cycles": 0}
+
+    def _log_worker_heartbeat(self, ctx):
+        pass
+
+    def _prepare_trading_cycle(self, ctx):
+        time.sleep(0.02)  # REST síncrono
+        return {}
+
+    async def _decide_trading_action(self, ctx, cycle, shared_resources):
+        self.decide_threads.add(threading.get_ident())
+        return None, None
+
+    def _finish_trading_cycle(self, ctx, cycle, rl_action, ai_decision, global_trade_counter):
+        self.events.append(("cycle", ctx["symbol"]))
+
+    def _cleanup_symbol_trader(self, ctx):
+        self.events.append(("cleanup", ctx["symbol"]))
+
+
+class _TestRuntime(AsyncTradingRuntime):
+    def _create_shared_clients(self):
+        pass
+
+
+def _spawn(trader, stop_event):
+    def spawn(index, command_queue, status_queue):
+        runtime = _TestRuntime(trader, index, CONFIG, command_queue, status_queue,
+                               stop_event, multiprocessing.Value("i", 0))
+        process = multiprocessing.Process(target=runtime.run, daemon=True)
+        process.start()
+        return process
+    return spawn
+
+
+def test_many_symbols_share_one_event_loop():
+    trader = _FakeTrader(events=[])
+    commands, statuses = multiprocessing.Queue(), multiprocessing.Queue()
+    stop_event = multiprocessing.Event()
+    runtime = _TestRuntime(trader, 0, CONFIG, commands, statuses, stop_event, multiprocessing.Value("i", 0))
+    symbols = [f"PAIR{i}USDT" for i in range(30)]
+    for symbol in symbols:
+        commands.put(("start", symbol))
+
+    thread = threading.Thread(target=runtime.run, daemon=True)
+    thread.start()
+    time.sleep(1.5)
+    commands.put(("stop", symbols[0]))
+    assert statuses.get(timeout=5) == ("stopped", symbols[0])
+    commands.put(("shutdown", None))
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+
+    cycles = {s: sum(1 for e in trader.events if e == ("cycle", s)) for s in symbols}
+    # 30 pares x 20ms de I/O bloqueante em 4 threads: todos avançam em paralelo
+    assert min(cycles.values()) >= 2, cycles
+    assert len(trader.decide_threads) == 1, "decisões rodam no event loop, não em threads"
+    assert sorted(e[1] for e in trader.events if e[0] == "cleanup") == sorted(symbols)
+    print(f"✅ {len(symbols)} pares em um event loop ({sum(cycles.values())} ciclos)")
+
+
+class _FakeStream:
+    def __init__(self, market_type):
+        self.market_type = market_type
+        self.symbols = set()
+        self.stopped = False
+
+    def stop(self, close_listen_key=True):
+        self.stopped = True
+
+
+class _StreamTrader(_FakeTrader):
+    """Setup que, como o real, reaproveita os streams do runtime em vez de abrir um por par."""
+
+    def __init__(self):
+        super().__init__(events=[])
+        self.created = []
+
+    def _setup_symbol_trader(self, symbol, config, api_client, capital_manager, alerter, shared_resources):
+        market_type = "spot" if symbol.startswith("SPOT") else "futures"
+        user_streams = shared_resources["market_streams"]["user_streams"]
+        if market_type not in user_streams:
+            user_streams[market_type] = _FakeStream(market_type)
+            self.created.append(user_streams[market_type])
+        user_streams[market_type].symbols.add(symbol)
+        return {"symbol": symbol, "pair_logger": None, "user_stream": user_streams[market_type]}
+
+    def _cleanup_symbol_trader(self, ctx):
+        ctx["user_stream"].symbols.discard(ctx["symbol"])
+        super()._cleanup_symbol_trader(ctx)
+
+
+def test_symbols_share_one_user_stream_per_market():
+    trader = _StreamTrader()
+    commands, statuses = multiprocessing.Queue(), multiprocessing.Queue()
+    runtime = _TestRuntime(trader, 0, CONFIG, commands, statuses, multiprocessing.Event(), multiprocessing.Value("i", 0))
+    symbols = [f"PAIR{i}USDT" for i in range(10)] + [f"SPOT{i}USDT" for i in range(5)]
+    for symbol in symbols:
+        commands.put(("start", symbol))
+
+    thread = threading.Thread(target=runtime.run, daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    streams = dict(runtime.market_streams["user_streams"])
+    assert sorted(streams) == ["futures", "spot"] and len(trader.created) == 2
+    assert len(streams["futures"].symbols) == 10 and len(streams["spot"].symbols) == 5
+
+    commands.put(("shutdown", None))
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert all(stream.stopped and not stream.symbols for stream in trader.created)
+    assert runtime.market_streams["user_streams"] == {}
+    print(f"✅ {len(symbols)} pares em {len(trader.created)} user data streams (um por mercado)")
+
+
+def test_pool_handles_behave_like_processes():
+    stop_event = multiprocessing.Event()
+    trader = _FakeTrader()
+    pool = AsyncRuntimePool(_spawn(trader, stop_event), num_processes=2)
+    try:
+        handles = [pool.start_symbol(symbol) for symbol in ("ADAUSDT", "XRPUSDT", "DOGEUSDT")]
+        assert all(handle.is_alive() for handle in handles)
+        assert handles[0].pid != handles[1].pid, "símbolos distribuídos entre runtimes"
+        time.sleep(0.5)
+
+        handles[0].set()  # stop event do símbolo
+        handles[0].join(timeout=5)
+        assert not handles[0].is_alive() and handles[1].is_alive()
+        assert ("cleanup", "ADAUSDT") in list(trader.events)
+    finally:
+        pool.shutdown(timeout=5)
+    assert not any(handle.is_alive() for handle in handles)
+    print("✅ Handles com interface de Process OK")
+
+
+if __name__ == "__main__":
+    test_many_symbols_share_one_event_loop()
+    test_symbols_share_one_user_stream_per_market()
+    test_pool_handles_behave_like_processes()
+    print("\n🎉 Todos os testes do runtime async passaram!")
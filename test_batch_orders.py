@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Teste de ordens em lote (futures batchOrders): divisão em lotes de 5/10, alinhamento
+das respostas por ordem e mapeamento de volta para active_grid_orders.
+Usa um cliente Binance falso - nenhuma requisição real é feita.
+"""
+
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from binance.exceptions import BinanceRequestException
+
+from utils.api_client import APIClient
+from core.grid_logic import GridLogic
+
+
+class _FakeBinanceClient:
+    def __init__(self):
+        self.batch_calls = []
+        self.cancel_calls = []
+        self._next_id = 1000
+        self._lock = threading.Lock()
+
+    def futures_place_batch_order(self, batchOrders):
+        with self._lock:
+            self.batch_calls.append(batchOrders)
+            responses = []
+            for order in batchOrders:
+                if order["price"] == "0.666":
+                    responses.append({"code": -4131, "msg": "PERCENT_PRICE filter"})
+                    continue
+                self._next_id += 1
+                responses.append({"orderId": self._next_id, "status": "NEW", **order})
+            return responses
+
+    def futures_cancel_orders(self, symbol, orderIdList):
+        ids = json.loads(orderIdList)
+        with self._lock:
+            self.cancel_calls.append(ids)
+        return [{"orderId": oid, "status": "CANCELED"} if oid % 2 else {"code": -2011, "msg": "Unknown order sent."}
+                for oid in ids]
+
+
+def _api_client():
+    client = APIClient.__new__(APIClient)
+    client.client = _FakeBinanceClient()
+    client.config = {"api_client": {}}
+    client.operation_mode = "production"
+    client.batch_pipeline_workers = 3
+    client._cache = {}
+    client._cache_ttl = {}
+    return client
+
+
+def test_batch_orders_are_chunked_and_aligned():
+    api = _api_client()
+    orders = [
+        {"symbol": "ADAUSDT", "side": "BUY", "type": "LIMIT", "quantity": "10",
+         "price": "0.666" if i == 7 else f"0.{500 + i}", "timeInForce": "GTC"}
+        for i in range(12)
+    ]
+    results = api.place_futures_batch_orders(orders)
+
+    assert sorted(len(call) for call in api.client.batch_calls) == [2, 5, 5]
+    assert len(results) == 12
+    assert results[7]["code"] == -4131
+    assert all("orderId" in r for i, r in enumerate(results) if i != 7)
+    assert [r["price"] for i, r in enumerate(results) if i != 7] == [o["price"] for i, o in enumerate(orders) if i != 7]
+    print("✅ batchOrders em lotes de 5 com respostas alinhadas")
+
+
+def test_batch_cancel_chunks_of_ten():
+    api = _api_client()
+    results = api.cancel_futures_batch_orders("ADAUSDT", list(range(1, 24)))
+    assert sorted(len(call) for call in api.client.cancel_calls) == [3, 10, 10]
+    assert len(results) == 23
+    print("✅ Cancelamento em lotes de 10")
+
+
+def test_grid_maps_batch_results_to_levels():
+    api = _api_client()
+    grid = GridLogic.__new__(GridLogic)
+    grid.symbol = "ADAUSDT"
+    grid.market_type = "futures"
+    grid.operation_mode = "production"
+    grid.api_client = api
+    grid.market_order_manager = None
+    grid.open_orders = {}
+    grid.active_grid_orders = {}
+    grid._get_position = lambda: None
+    grid._futures_margin_insufficient = lambda: False
+    grid.pair_logger = type("_PairLogger", (), {"log_order_event": lambda self, **kw: None,
+                                               "log_error": lambda self, msg: None})()
+
+    levels = [0.5 + i / 1000 for i in range(8)]
+    orders = [("BUY", "0.666" if i == 3 else f"{price:.3f}", "10") for i, price in enumerate(levels)]
+    order_ids = grid._place_orders_batch(orders)
+    assert order_ids[3] is None and all(order_ids[i] for i in range(8) if i != 3)
+    assert set(grid.open_orders) == {oid for oid in order_ids if oid}
+
+    cancel_results = grid._cancel_orders_batch([1, 2, 3])
+    assert cancel_results == [True, True, True], "-2011 (já inexistente) conta como cancelada"
+    print("✅ GridLogic mapeia resultados do lote por ordem")
+
+
+def test_uncertain_batch_post_is_not_retried():
+    api = _api_client()
+    calls = []
+
+    def failing_batch(batchOrders):
+        calls.append(batchOrders)
+        raise BinanceRequestException("Read timed out")
+
+    api.client.futures_place_batch_order = failing_batch
+    orders = [{"symbol": "ADAUSDT", "side": "BUY", "type": "LIMIT", "quantity": "10",
+               "price": "0.500", "timeInForce": "GTC"}]
+    assert api.place_futures_batch_orders(orders) == [None]
+    assert len(calls) == 1, "POST batchOrders com resultado incerto não deve ser reenviado"
+    print("✅ Lote de ordens com envio incerto não é repetido")
+
+
+def test_response_headers_are_per_thread():
+    api = _api_client()
+    api._thread_state = threading.local()
+    api.client.session = type("_Session", (), {"hooks": {"response": []}})()
+    api._install_response_hook()
+    hook = api.client.session.hooks["response"][0]
+
+    seen = {}
+    barrier = threading.Barrier(2)
+
+    def worker(name):
+        hook(type("_Response", (), {"headers": {"X-MBX-USED-WEIGHT-1M": name}})())
+        api.client.response = None  # Outra thread sobrescreve a resposta compartilhada
+        barrier.wait()
+        seen[name] = api._last_response().headers["X-MBX-USED-WEIGHT-1M"]
+
+    threads = [threading.Thread(target=worker, args=(name,)) for name in ("10", "20")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {"10": "10", "20": "20"}
+    print("✅ Headers de weight lidos da resposta da própria thread")
+
+
+if __name__ == "__main__":
+    test_batch_orders_are_chunked_and_aligned()
+    test_batch_cancel_chunks_of_ten()
+    test_grid_maps_batch_results_to_levels()
+    test_uncertain_batch_post_is_not_retried()
+    test_response_headers_are_per_thread()
+    print("\n🎉 Todos os testes de ordens em lote passaram!")
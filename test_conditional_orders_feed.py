@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Teste das ordens condicionais sobre o IndicatorFeed: indicadores vetorizados iguais aos
+streaming_indicators, grupos (símbolo, indicador, intervalo) com um cálculo por versão dos
+klines, avaliação pulada sem dados novos e ordens de preço disparadas por tick.
+"""
+
+import math
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils import streaming_indicators as kernels
+from utils.conditional_orders import (ConditionalOrderConfig, ConditionalOrderManager,
+                                      ConditionType, OrderType)
+from utils.indicator_feed import IndicatorFeed
+from utils.kline_store import KlineStore
+from utils.streaming_indicators import StreamingEMA, StreamingMACD, WilderATR, WilderRSI
+
+INTERVAL_MS = 3_600_000
+
+
+def _closes(n, seed=3):
+    rng = np.random.default_rng(seed)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+class _FeedAPIClient:
+    """APIClient falso: klines 1h dos fechamentos dados e contagem das chamadas REST."""
+
+    def __init__(self, closes):
+        self.closes = list(closes)
+        self.volumes = [100.0] * len(self.closes)
+        self.calls = Counter()
+        self.orders = []
+
+    def _kline(self, i):
+        close = self.closes[i]
+        return [i * INTERVAL_MS, str(close), str(close * 1.01), str(close * 0.99), str(close),
+                str(self.volumes[i]), (i + 1) * INTERVAL_MS - 1, "0", 10, "0", "0", "0"]
+
+    def get_futures_klines(self, symbol, interval, limit):
+        self.calls["get_futures_klines"] += 1
+        last = len(self.closes)
+        return [self._kline(i) for i in range(max(0, last - limit), last)]
+
+    def get_futures_ticker(self, symbol):
+        self.calls["get_futures_ticker"] += 1
+        return {"symbol": symbol, "price": str(self.closes[-1])}
+
+    def get_spot_ticker(self, symbol):
+        self.calls["get_spot_ticker"] += 1
+        return {"symbol": symbol, "price": str(self.closes[-1] * 1.001)}
+
+    def place_futures_order(self, **order):
+        self.orders.append(order)
+        return {"orderId": len(self.orders)}
+
+
+def _manager(closes, market_type="futures"):
+    api = _FeedAPIClient(closes)
+    feed = IndicatorFeed(KlineStore())
+    return ConditionalOrderManager(api, feed=feed, market_type=market_type), api, feed
+
+
+def _order(order_id, condition_type, side="BUY", value=0.0, **params):
+    return ConditionalOrderConfig(order_id=order_id, symbol="ADAUSDT", side=side, order_type=OrderType.MARKET,
+                                  quantity="10", condition_type=condition_type, condition_value=value,
+                                  condition_params=params or None, check_interval=10)
+
+
+def _run_due(manager):
+    for key in list(manager.groups):
+        manager._process_group(key, time.time())
+
+
+def test_vectorized_indicators_match_streaming():
+    closes = _closes(400)
+    highs, lows = closes * 1.01, closes * 0.99
+
+    def streamed(indicator, values):
+        out = [indicator.update(*v) if isinstance(v, tuple) else indicator.update(v) for v in values]
+        return np.array([np.nan if v is None else v for v in out])
+
+    pairs = [
+        (kernels.ema(closes, 20), streamed(StreamingEMA(20), closes)),
+        (kernels.rsi(closes, 14), streamed(WilderRSI(14), closes)),
+        (kernels.atr(highs, lows, closes, 14), streamed(WilderATR(14), list(zip(highs, lows, closes)))),
+        (kernels.macd(closes)[2], streamed(StreamingMACD(), closes)),
+    ]
+    for vectorized, reference in pairs:
+        assert np.array_equal(np.isnan(vectorized), np.isnan(reference))
+        assert np.allclose(vectorized[~np.isnan(vectorized)], reference[~np.isnan(reference)], rtol=1e-10)
+
+    # EMA longa com k pequeno: vários blocos da recorrência sem overflow
+    long_ema = kernels.ema(_closes(5000), 2)
+    assert np.all(np.isfinite(long_ema[1:]))
+    # Mesmo kernel do ranking do universo: matriz (símbolos x candles) == série a série
+    matrix = np.stack([closes, closes[::-1]])
+    stacked_atr = kernels.atr(matrix * 1.01, matrix * 0.99, matrix, 14)
+    assert np.allclose(stacked_atr[1], kernels.atr(closes[::-1] * 1.01, closes[::-1] * 0.99, closes[::-1], 14),
+                       equal_nan=True)
+    upper, middle, lower = kernels.bollinger(closes, 20, 2.0)
+    assert math.isclose(middle[-1], closes[-20:].mean()) and math.isclose(upper[-1] - middle[-1], 2 * closes[-20:].std())
+    print("✅ Indicadores vetorizados iguais aos streaming_indicators")
+
+
+def test_orders_share_one_computation_per_version():
+    closes = _closes(300)
+    manager, api, feed = _manager(closes)
+    rsi_now = kernels.rsi(closes, 14)[-1]
+    for i in range(100):
+        threshold = rsi_now - 49.5 + i  # metade acima do RSI atual
+        assert manager.add_conditional_order(_order(f"rsi{i}", ConditionType.RSI_OVERSOLD, rsi_threshold=threshold))
+    assert len(manager.groups) == 1
+
+    _run_due(manager)
+    assert feed.stats["computations"] == 1 and api.calls["get_futures_klines"] == 1
+    assert len(api.orders) == 50
+
+    # Sem candle novo a versão não muda: grupo não é reavaliado
+    checks = sum(s.checks_performed for s in manager.orders.values())
+    _run_due(manager)
+    assert manager.stats["skipped_unchanged"] == 1 and feed.stats["computations"] == 1
+    assert sum(s.checks_performed for s in manager.orders.values()) == checks
+
+    # Candle novo: um cálculo para todas as ordens restantes
+    api.closes.append(closes[-1] * 0.9)
+    api.volumes.append(100.0)
+    feed.refresh(api, "ADAUSDT", "1h", 100)
+    _run_due(manager)
+    assert feed.stats["computations"] == 2 and manager.stats["group_evaluations"] == 2
+    print(f"✅ 100 ordens de RSI = 1 cálculo por versão (stats {manager.get_statistics()['indicator_feed']})")
+
+
+def test_indicator_handlers():
+    # Queda forte no último candle: breakout de ATR para baixo, fechamento abaixo da banda inferior
+    closes = list(_closes(200))
+    closes[-1] = closes[-2] * 0.9
+    manager, api, feed = _manager(closes)
+    api.volumes[-1] = 1000.0
+    orders = [
+        _order("atr_down", ConditionType.ATR_BREAKOUT, side="SELL", value=1.5),
+        _order("atr_up", ConditionType.ATR_BREAKOUT, side="BUY", value=1.5),
+        _order("bb_lower", ConditionType.BOLLINGER_BREAK, side="BUY"),
+        _order("bb_upper", ConditionType.BOLLINGER_BREAK, side="SELL"),
+        _order("volume", ConditionType.VOLUME_SPIKE, volume_multiplier=3.0),
+        _order("rsi_high", ConditionType.RSI_OVERBOUGHT),
+    ]
+    for config in orders:
+        manager.add_conditional_order(config)
+    _run_due(manager)
+    executed = {oid for oid, s in manager.orders.items() if s.executed}
+    assert executed == {"atr_down", "bb_lower", "volume"}, executed
+
+    # Cruzamentos: queda acelerando e depois alta no último candle
+    trend = [120 - 0.005 * i ** 2 for i in range(80)] + [130.0]
+    manager, api, feed = _manager(trend)
+    manager.add_conditional_order(_order("ma_up", ConditionType.MA_CROSS_ABOVE, fast_period=5, slow_period=20))
+    manager.add_conditional_order(_order("ma_down", ConditionType.MA_CROSS_BELOW, fast_period=5, slow_period=20))
+    manager.add_conditional_order(_order("macd_bull", ConditionType.MACD_SIGNAL, side="BUY"))
+    manager.add_conditional_order(_order("macd_bear", ConditionType.MACD_SIGNAL, side="SELL"))
+    _run_due(manager)
+    executed = {oid for oid, s in manager.orders.items() if s.executed}
+    assert executed == {"ma_up", "macd_bull"}, executed
+    print("✅ Handlers de ATR, Bollinger, volume, médias e MACD")
+
+
+def test_price_orders_fire_on_ticks():
+    manager, api, feed = _manager(_closes(50))
+    manager.add_conditional_order(_order("below", ConditionType.PRICE_BELOW, value=90.0))
+    manager.add_conditional_order(_order("above", ConditionType.PRICE_ABOVE, side="SELL", value=120.0))
+    feed.on_price("ADAUSDT", 100.0)
+    manager.start_monitoring()
+    try:
+        time.sleep(0.05)
+        assert not manager.orders["below"].triggered
+        feed.on_price("ADAUSDT", 89.0)
+        deadline = time.time() + 2
+        while not manager.orders["below"].executed and time.time() < deadline:
+            time.sleep(0.01)
+        assert manager.orders["below"].executed and not manager.orders["above"].triggered
+    finally:
+        manager.stop_monitoring()
+    assert api.calls["get_futures_ticker"] == 0  # preço veio do feed
+    manager.remove_conditional_order("above")
+    manager.remove_conditional_order("below")
+    assert not manager.groups and not feed._subscribers[("futures", "ADAUSDT")]
+    print("✅ Ordens de preço disparadas pelo tick do feed, sem ticker REST")
+
+
+def test_spot_prices_are_separate_from_futures():
+    manager, api, feed = _manager(_closes(50), market_type="spot")
+    manager.add_conditional_order(_order("above", ConditionType.PRICE_ABOVE, side="SELL", value=1000.0))
+    assert list(feed._subscribers) == [("spot", "ADAUSDT")]
+
+    feed.on_price("ADAUSDT", 100.0)  # tick de futuros não alimenta a ordem spot
+    assert not manager._dirty_symbols
+    _run_due(manager)
+    assert api.calls["get_spot_ticker"] == 1 and api.calls["get_futures_ticker"] == 0
+    assert feed.get_price("ADAUSDT", market_type="spot") == api.closes[-1] * 1.001
+    assert feed.get_price("ADAUSDT") == 100.0
+    print("✅ Preços spot e futuros separados no feed, ticker spot para ordens spot")
+
+
+if __name__ == "__main__":
+    test_vectorized_indicators_match_streaming()
+    test_orders_share_one_computation_per_version()
+    test_indicator_handlers()
+    test_price_orders_fire_on_ticks()
+    test_spot_prices_are_separate_from_futures()
+    print("\n🎉 Todos os testes das ordens condicionais passaram!")
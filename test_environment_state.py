@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Teste do estado pré-calculado do TradingEnvironment: _get_state (linha do tensor de
+janelas + features de posição) idêntico ao cálculo anterior por passo sobre o DataFrame,
+com e sem sentimento, ao longo de episódios com compras e vendas.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.environment import TradingEnvironment
+from rl.features import add_indicators
+
+
+def _legacy_state(env, current_sentiment_score=0.0):
+    """Cálculo anterior: fatia do DataFrame e normalização min/max a cada passo."""
+    frame = env.data.iloc[env.current_step - env.features_window: env.current_step]
+    features = []
+    close_prices = frame["close"].values
+    first_price = close_prices[0] if close_prices[0] != 0 else 1
+    features.extend(close_prices / first_price - 1)
+    for indicator in ["rsi", "macd", "macd_hist", "volatility"]:
+        values = frame[indicator].values
+        if len(values) > 0 and not np.isnan(values).all():
+            min_val, max_val = np.nanmin(values), np.nanmax(values)
+            if max_val > min_val:
+                normalized = (values - min_val) / (max_val - min_val) * 2 - 1
+            else:
+                normalized = np.zeros_like(values)
+            features.extend(normalized)
+        else:
+            features.extend(np.zeros(env.features_window))
+    current_price = env.data.iloc[env.current_step]["close"] if env.current_step < len(env.data) else 0
+    position_value = env.shares_held * current_price
+    mean_close = env.data["close"].mean() if env.data["close"].mean() != 0 else 1
+    features.append(np.clip(env.shares_held / (env.initial_balance / mean_close), -1, 1))
+    features.append(np.clip((env.balance / env.initial_balance) * 2 - 1, -1, 1))
+    features.append(np.clip((position_value / env.initial_balance) * 2 - 1, -1, 1))
+    if env.include_sentiment:
+        features.append(np.clip(current_sentiment_score, -1.0, 1.0))
+    features.extend([1.0 if env.current_market == m else 0.0 for m in env.market_types])
+    return np.array(features, dtype=np.float32)
+
+
+def _data(n, seed=0, flat_volatility=False):
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+    data = add_indicators(pd.DataFrame({
+        "open": close, "high": close * 1.02, "low": close * 0.98, "close": close,
+        "volume": rng.uniform(10, 100, n),
+    }))
+    if flat_volatility:
+        data.loc[40:70, "volatility"] = 0.01  # janelas constantes -> zeros
+        data.loc[90:, "rsi"] = np.nan  # janelas com NaN
+    return data
+
+
+def test_precomputed_state_matches_dataframe_state():
+    for include_sentiment, flat in ((False, False), (True, True)):
+        env = TradingEnvironment(_data(150, seed=int(flat), flat_volatility=flat), features_window=20,
+                                 include_sentiment=include_sentiment)
+        assert env.window_features.shape == (150 - 20 + 1, 5 * 20)
+        assert env.window_features.dtype == np.float32
+        rng = np.random.default_rng(3)
+        state, _ = env.reset()
+        assert np.array_equal(state, _legacy_state(env), equal_nan=True)
+        checked = 0
+        for _ in range(3):
+            done = False
+            while not done:
+                sentiment = float(rng.uniform(-2, 2))
+                state, _, done, _, _ = env.step(int(rng.integers(0, 6)), current_sentiment_score=sentiment)
+                assert np.array_equal(state, _legacy_state(env, sentiment), equal_nan=True), env.current_step
+                checked += 1
+            env.reset()
+        assert env.total_shares_bought >= 0 and checked > 300
+    print("✅ Estado pré-calculado idêntico ao cálculo por passo no DataFrame")
+
+
+def test_raw_ohlcv_gets_indicators():
+    raw = _data(60)[["open", "high", "low", "close", "volume"]]
+    env = TradingEnvironment(raw, features_window=10)
+    state, info = env.reset()
+    assert "rsi" in env.data.columns and state.shape == env.observation_space.shape
+    assert info["current_price"] == raw["close"].iloc[10]
+    print("✅ OHLCV sem indicadores calculado na criação do ambiente")
+
+
+if __name__ == "__main__":
+    test_precomputed_state_matches_dataframe_state()
+    test_raw_ohlcv_gets_indicators()
+    print("\n🎉 Todos os testes do estado do ambiente passaram!")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Teste do KlineStore: ring buffer colunar, append-on-close, views sem cópia e busca incremental.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.kline_store import KlineSeries, KlineStore
+
+INTERVAL_MS = 180_000
+
+
+def _kline(i, close=None):
+    # Formato da API Binance (strings), 12 colunas
+    close = close if close is not None else 1.0 + i
+    return [i * INTERVAL_MS, str(close), str(close + 1), str(close - 1), str(close), "100",
+            i * INTERVAL_MS + INTERVAL_MS - 1, "1000", 10, "50", "500", "0"]
+
+
+class _FakeAPI:
+    """Simula a API retornando os últimos `limit` klines até o candle em formação `current`."""
+
+    def __init__(self, current):
+        self.current = current
+        self.calls = []
+
+    def get_futures_klines(self, symbol, interval, limit):
+        self.calls.append(limit)
+        return [_kline(i) for i in range(self.current - limit + 1, self.current + 1)]
+
+    def get_spot_klines(self, symbol, interval, limit):
+        self.calls.append(("spot", limit))
+        return [_kline(i, close=1000.0 + i) for i in range(self.current - limit + 1, self.current + 1)]
+
+
+def test_append_on_close_and_zero_copy_views():
+    series = KlineSeries("ADAUSDT", "3m", capacity=5)
+    now = 7 * INTERVAL_MS + 10  # candle 7 em formação
+    assert series.merge([_kline(i) for i in range(8)], now_ms=now) == 7
+
+    assert series.count == 5 and series.has_forming
+    view = series.view()
+    assert list(view["open_time"]) == [i * INTERVAL_MS for i in range(2, 8)]
+    assert np.shares_memory(view, series._buf), "view deve ser sem cópia"
+    assert list(series.closes(3, include_forming=False)) == [5.0, 6.0, 7.0]
+
+    # Candle em formação é sobrescrito no lugar; ao fechar vira registro definitivo
+    series.merge([_kline(7, close=42.0)], now_ms=now)
+    assert series.closes()[-1] == 42.0 and series.count == 5
+    series.merge([_kline(7, close=43.0), _kline(8)], now_ms=now + INTERVAL_MS)
+    assert list(series.closes(include_forming=False)[-2:]) == [7.0, 43.0]
+    assert series.to_list(1)[0][0] == 8 * INTERVAL_MS
+    print("✅ Append-on-close e views sem cópia OK")
+
+
+def test_gap_resets_series():
+    series = KlineSeries("ADAUSDT", "3m", capacity=10)
+    series.merge([_kline(i) for i in range(5)], now_ms=10 ** 12)
+    series.merge([_kline(i) for i in range(20, 23)], now_ms=10 ** 12)
+    assert list(series.view()["open_time"]) == [i * INTERVAL_MS for i in range(20, 23)]
+    print("✅ Lacuna reinicia a série OK")
+
+
+def test_incremental_fetch():
+    store = KlineStore(default_capacity=10)
+    api = _FakeAPI(current=50)
+
+    import utils.kline_store as kline_store_module
+    original_time = kline_store_module.time.time
+    kline_store_module.time.time = lambda: (50 * INTERVAL_MS + 10) / 1000
+    try:
+        series = store.fetch(api, "ADAUSDT", "3m", limit=100)
+        assert api.calls == [100]
+        assert series.capacity == 100 and len(series) == 100
+
+        # Mesmo candle em formação: só ele é buscado
+        store.fetch(api, "ADAUSDT", "3m", limit=100)
+        # Dois candles depois: 2 fechados novos + o em formação
+        api.current = 52
+        kline_store_module.time.time = lambda: (52 * INTERVAL_MS + 10) / 1000
+        series = store.fetch(api, "ADAUSDT", "3m", limit=100)
+        assert api.calls == [100, 1, 3]
+        assert series.view(include_forming=False)["open_time"][-1] == 51 * INTERVAL_MS
+        assert store.get_series("adausdt", "3m") is series
+    finally:
+        kline_store_module.time.time = original_time
+    print("✅ Busca incremental OK")
+
+
+def test_spot_and_futures_series_are_separate():
+    store = KlineStore(default_capacity=10)
+    api = _FakeAPI(current=50)
+    now_ms = 50 * INTERVAL_MS + 10
+
+    import utils.kline_store as kline_store_module
+    original_time = kline_store_module.time.time
+    kline_store_module.time.time = lambda: now_ms / 1000
+    try:
+        futures = store.fetch(api, "ADAUSDT", "3m", limit=20, market_type="futures")
+        spot = store.fetch(api, "ADAUSDT", "3m", limit=20, market_type="spot")
+        # O spot não aproveita a série de futuros: busca a janela inteira
+        assert api.calls == [20, ("spot", 20)]
+        assert futures is not spot
+        assert futures.closes()[-1] == 51.0 and spot.closes()[-1] == 1050.0
+
+        exported = store.export_arrays("3m", market_type="spot")
+        assert list(exported["symbols"]) == ["ADAUSDT"]
+        assert exported["klines"]["close"][-1] == 1049.0
+
+        store.remove("ADAUSDT", market_type="spot")
+        assert store.get_series("ADAUSDT", "3m") is futures
+        assert len(store.get_series("ADAUSDT", "3m", market_type="spot")) == 0
+    finally:
+        kline_store_module.time.time = original_time
+    print("✅ Séries spot e futuros separadas OK")
+
+
+if __name__ == "__main__":
+    test_append_on_close_and_zero_copy_views()
+    test_gap_resets_series()
+    test_incremental_fetch()
+    test_spot_and_futures_series_are_separate()
+    print("\n🎉 Todos os testes do KlineStore passaram!")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Teste do treinamento offline do agente de RL: leitura de klines do banco SQLite (tabelas
+do MarketDataManager e do LocalDataStorage) e dos estados do shadow mode, split temporal,
+varredura de hiperparâmetros em paralelo (ProcessPoolExecutor) e diretório versionado.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.offline_data import (list_sqlite_symbols, load_shadow_klines, load_sqlite_klines,
+                             split_by_time)
+from rl.train_rl_agent import base_params, expand_grid, main, parse_grid, run_sweep
+
+START_MS = 1_700_000_000_000
+
+
+def _closes(n, seed):
+    rng = np.random.default_rng(seed)
+    return 30 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+
+
+def _write_db(path, table, symbols, n=120):
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"""CREATE TABLE {table} (symbol TEXT, interval TEXT, open_time INTEGER,
+                         open_price REAL, high_price REAL, low_price REAL, close_price REAL,
+                         volume REAL, close_time INTEGER)""")
+        for seed, symbol in enumerate(symbols):
+            for i, close in enumerate(_closes(n, seed)):
+                open_time = START_MS + i * 60_000
+                conn.execute(f"INSERT INTO {table} VALUES (?, '1m', ?, ?, ?, ?, ?, ?, ?)",
+                             (symbol, open_time, close, close * 1.01, close * 0.99, close, 100.0 + i,
+                              open_time + 59_999))
+            conn.execute(f"INSERT INTO {table} VALUES (?, '5m', ?, 1, 1, 1, 1, 1, 1)", (symbol, START_MS))
+
+
+def test_sqlite_loader_and_time_split():
+    with tempfile.TemporaryDirectory() as tmp:
+        for table in ("klines", "kline_data"):
+            db_path = os.path.join(tmp, f"{table}.db")
+            _write_db(db_path, table, ["ETHUSDT", "BTCUSDT"])
+            assert list_sqlite_symbols(db_path) == ["BTCUSDT", "ETHUSDT"]
+            df = load_sqlite_klines(db_path, "ETHUSDT")
+            assert list(df.columns) == ["timestamp", "open", "high", "low", "close", "volume"]
+            assert len(df) == 120 and df["timestamp"].is_monotonic_increasing
+            assert df["timestamp"].iloc[0] == pd.Timestamp(START_MS, unit="ms")
+            assert np.allclose(df["close"], _closes(120, 0))
+
+            train, validation = split_by_time(df, validation_fraction=0.25)
+            assert len(train) == 90 and len(validation) == 30
+            assert train["timestamp"].iloc[-1] < validation["timestamp"].iloc[0]
+            split = df["timestamp"].iloc[100]
+            train, validation = split_by_time(df, split_time=split)
+            assert len(train) == 100 and validation["timestamp"].iloc[0] == split
+
+        # Somente leitura: o banco do bot não é criado nem alterado
+        missing = os.path.join(tmp, "missing.db")
+        try:
+            load_sqlite_klines(missing, "BTCUSDT")
+            assert False, "banco inexistente deveria falhar"
+        except FileNotFoundError:
+            assert not os.path.exists(missing)
+    print("✅ Klines do SQLite (klines/kline_data) e split temporal treino/validação")
+
+
+def test_shadow_states_to_candles():
+    with tempfile.TemporaryDirectory() as tmp:
+        start = datetime(2026, 1, 1, 12, 0, 0)
+        with open(os.path.join(tmp, "market_states.jsonl"), "w") as f:
+            for i, price in enumerate([10, 12, 9, 11, 20, 21, 19]):
+                symbol = "BTCUSDT" if i != 2 else "ETHUSDT"
+                f.write(json.dumps({"timestamp": (start + timedelta(seconds=20 * i)).isoformat(),
+                                    "symbol": symbol, "current_price": price,
+                                    "state_vector": [0.0], "state_size": 1}) + "\n")
+        df = load_shadow_klines(tmp, "BTCUSDT", interval="1m")
+        assert list(df.columns) == ["timestamp", "open", "high", "low", "close", "volume"]
+        assert df[["open", "high", "low", "close"]].values.tolist() == [[10, 12, 10, 12], [11, 21, 11, 21], [19, 19, 19, 19]]
+        assert df["timestamp"].iloc[1] == pd.Timestamp(start + timedelta(minutes=1))
+    print("✅ Estados do shadow mode agregados em candles")
+
+
+def test_parallel_sweep_writes_versioned_results():
+    grid = parse_grid(["gamma=0.9,0.99", "prioritized_replay=false,true"])
+    assert grid == {"gamma": [0.9, 0.99], "prioritized_replay": [False, True]}
+    configs = expand_grid({**base_params({"batch_size": 8}), "features_window": 10}, grid)
+    assert len(configs) == 4 and all(c["batch_size"] == 8 for c in configs)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "market_data.db")
+        _write_db(db_path, "klines", ["BTCUSDT", "ETHUSDT"])
+        datasets = {s: load_sqlite_klines(db_path, s) for s in ("BTCUSDT", "ETHUSDT")}
+        datasets["SHORTUSDT"] = datasets["BTCUSDT"].iloc[:30]
+        output_dir = os.path.join(tmp, "offline")
+
+        manifest = run_sweep(datasets, configs, output_dir, episodes=2, workers=2, validation_fraction=0.25)
+        version_dir = os.path.join(output_dir, manifest["version"])
+        assert open(os.path.join(output_dir, "LATEST")).read().strip() == manifest["version"]
+        with open(os.path.join(version_dir, "manifest.json")) as f:
+            assert json.load(f)["best"].keys() == {"BTCUSDT", "ETHUSDT"}
+
+        # SHORTUSDT: validação curta demais para features_window=10 -> pulado, não falha
+        assert {s["symbol"] for s in manifest["skipped"]} == {"SHORTUSDT"}
+        runs = manifest["runs"]
+        assert len(runs) == 8 and all(run["status"] == "completed" for run in runs)
+        assert manifest["symbols"]["BTCUSDT"]["train"]["rows"] == 90
+        for run in runs:
+            assert run["model_path"].endswith("model.weights.h5") and os.path.exists(run["model_path"])
+            with open(os.path.join(version_dir, run["symbol"], run["run_id"], "metrics.json")) as f:
+                metrics = json.load(f)
+            assert metrics["params"] == configs[int(run["run_id"][-3:])]
+            assert len(metrics["train"]["episode_rewards"]) == 2 and metrics["train"]["train_steps"] > 0
+            assert metrics["validation"]["steps"] == 30 - 10 - 1
+
+        # Nova execução no próprio processo (workers=1) -> nova versão; LATEST aponta para ela
+        serial = run_sweep(datasets, configs[:1], output_dir, episodes=1, workers=1, validation_fraction=0.25)
+        assert serial["version"] != manifest["version"] and len(serial["runs"]) == 2
+        assert open(os.path.join(output_dir, "LATEST")).read().strip() == serial["version"]
+    print("✅ Varredura paralela: 2 símbolos x 4 configurações em diretório versionado")
+
+
+def test_cli_from_csv():
+    with tempfile.TemporaryDirectory() as tmp:
+        close = _closes(100, 5)
+        csv_path = os.path.join(tmp, "adausdt.csv")
+        pd.DataFrame({"open_time": START_MS + np.arange(100) * 60_000, "open": close, "high": close,
+                      "low": close, "close": close, "volume": 1.0}).to_csv(csv_path, index=False)
+        manifest = main(["--source", "csv", "--csv", csv_path, "--episodes", "1", "--workers", "1",
+                         "--grid", "features_window=10", "learning_rate=0.001,0.01",
+                         "--output-dir", os.path.join(tmp, "out")])
+        assert [run["run_id"] for run in manifest["runs"]] == ["cfg_000", "cfg_001"]
+        assert manifest["source"]["type"] == "csv" and manifest["symbols"]["ADAUSDT"]["validation"]["rows"] == 20
+    print("✅ CLI com dados em CSV")
+
+
+if __name__ == "__main__":
+    test_sqlite_loader_and_time_split()
+    test_shadow_states_to_candles()
+    test_parallel_sweep_writes_versioned_results()
+    test_cli_from_csv()
+    print("\n🎉 Todos os testes do treinamento offline passaram!")
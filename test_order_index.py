@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Teste do OrderIndex: índice bidirecional nível <-> orderId (+ clientOrderId) das ordens do grid.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.order_index import OrderIndex
+
+
+def test_place_fill_cancel():
+    index = OrderIndex()
+    index[0.50] = 101
+    index.set(0.51, 102, client_order_id="grid_b_102")
+    assert len(index) == 2 and index[0.51] == 102
+    assert index.level_of(101) == 0.50 and index.has_order(102)
+    assert index.order_id_for_client("grid_b_102") == 102
+
+    # Fill: remove pelo orderId e devolve o nível
+    assert index.pop_order(102) == 0.51
+    assert 0.51 not in index and index.level_of(102) is None
+    assert index.order_id_for_client("grid_b_102") is None
+    assert index.pop_order(102) is None, "ordem desconhecida não é erro"
+
+    # Cancelamento via dict continua consistente
+    del index[0.50]
+    assert not index and not index.has_order(101)
+    print("✅ Place/fill/cancel OK")
+
+
+def test_reassignment_keeps_both_sides_consistent():
+    index = OrderIndex()
+    index.set(0.50, 1, client_order_id="a")
+    # Nova ordem no mesmo nível (TP recolocado) substitui a antiga
+    index.set(0.50, 2, client_order_id="b")
+    assert index.level_of(1) is None and index.order_id_for_client("a") is None
+    assert index[0.50] == 2
+    # A mesma ordem movida para outro nível não deixa o nível antigo órfão
+    index.set(0.52, 2)
+    assert 0.50 not in index and index.level_of(2) == 0.52
+    assert index.order_id_for_client("b") == 2, "clientOrderId preservado ao mover"
+    assert dict(index) == {0.52: 2}
+    print("✅ Reatribuições consistentes nos dois sentidos OK")
+
+
+def test_recovery_ids_and_state_roundtrip():
+    # Estado salvo em JSON pode trazer orderId como string
+    index = OrderIndex({"0.50": "123", "0.51": 124})
+    assert index.level_of(123) == "0.50" and index.level_of("124") == "0.51"
+    assert index.pop_order(123) == "0.50"
+    assert json.loads(json.dumps(dict(index))) == {"0.51": 124}
+
+    index.clear()
+    assert len(index) == 0 and not index.has_order(124)
+    print("✅ Recuperação e serialização OK")
+
+
+if __name__ == "__main__":
+    test_place_fill_cancel()
+    test_reassignment_keeps_both_sides_consistent()
+    test_recovery_ids_and_state_roundtrip()
+    print("\n🎉 Todos os testes do OrderIndex passaram!")
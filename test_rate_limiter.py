@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Teste do rate limiter de request weight compartilhado entre processos (shared memory).
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.rate_limiter import (
+    F_TOKENS, PRIORITY_ACCOUNT, PRIORITY_MARKET_DATA, PRIORITY_ORDER, SharedRateLimiter, request_profile,
+)
+
+
+def _config(weight_per_minute=600, **extra):
+    return {"api_client": {"rate_limiting": {
+        "futures_weight_per_minute": weight_per_minute, "safety_margin": 1.0, **extra,
+    }}}
+
+
+def _consume(limiter, weight, count, result_queue):
+    """Roda em outro processo: consome do mesmo bucket."""
+    for _ in range(count):
+        limiter.acquire(weight, PRIORITY_ORDER, "futures")
+    result_queue.put(os.getpid())
+
+
+def test_bucket_is_shared_across_processes():
+    limiter = SharedRateLimiter(_config(weight_per_minute=6000))
+    try:
+        result_queue = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_consume, args=(limiter, 100, 10, result_queue)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for _ in workers:
+            result_queue.get(timeout=30)
+        for worker in workers:
+            worker.join(timeout=10)
+
+        stats = limiter.get_statistics()["futures"]
+        assert stats["requests"] == 30
+        # 3000 consumidos pelos filhos (mais um pequeno refill durante o teste)
+        assert stats["available_weight"] < 3100
+        print("✅ Bucket compartilhado entre processos OK")
+    finally:
+        limiter.close()
+
+
+def test_priorities_reserve_budget_for_orders():
+    limiter = SharedRateLimiter(_config(weight_per_minute=600, max_wait_seconds=0.2))
+    try:
+        # Consome até restar 20% do bucket
+        limiter.acquire(480, PRIORITY_ORDER, "futures")
+        # Analytics precisam deixar 25% livres -> esperam (liberados pelo timeout curto)
+        waited = limiter.acquire(10, PRIORITY_MARKET_DATA, "futures")
+        assert waited >= 0.2
+        # Conta precisa deixar 10% -> passa; ordens passam direto
+        assert limiter.acquire(10, PRIORITY_ACCOUNT, "futures") == 0.0
+        assert limiter.acquire(50, PRIORITY_ORDER, "futures") == 0.0
+        # Spot é um pool independente
+        assert limiter.acquire(100, PRIORITY_MARKET_DATA, "spot") == 0.0
+        print("✅ Prioridades e reservas OK")
+    finally:
+        limiter.close()
+
+
+def test_headers_and_ban_sync():
+    limiter = SharedRateLimiter(_config(weight_per_minute=2400))
+    try:
+        limiter.update_from_headers({"x-mbx-used-weight-1m": "2300"}, "futures")
+        assert limiter.get_statistics()["futures"]["available_weight"] <= 101
+        limiter.penalize("futures", retry_after=0.3)
+        started = time.time()
+        limiter.acquire(1, PRIORITY_ORDER, "futures", timeout=5)
+        assert time.time() - started >= 0.25, "deve respeitar Retry-After"
+        print("✅ Sincronização por headers e Retry-After OK")
+    finally:
+        limiter.close()
+
+
+def _wait_for_order_and_die(limiter, ready):
+    """Roda em outro processo: fica esperando orçamento de ordem e é morto no meio da espera."""
+    ready.set()
+    limiter.acquire(1000, PRIORITY_ORDER, "futures", timeout=60)
+
+
+def test_killed_order_waiter_does_not_block_market_data():
+    limiter = SharedRateLimiter(_config(weight_per_minute=600, max_wait_seconds=5))
+    try:
+        limiter.acquire(500, PRIORITY_ORDER, "futures")
+        ready = multiprocessing.Event()
+        worker = multiprocessing.Process(target=_wait_for_order_and_die, args=(limiter, ready))
+        worker.start()
+        ready.wait(timeout=10)
+        deadline = time.time() + 5
+        while limiter.get_statistics()["futures"]["orders_waiting"] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert limiter.get_statistics()["futures"]["orders_waiting"] == 1
+
+        worker.kill()  # SIGKILL no meio da espera (ex.: rotação de pares)
+        worker.join(timeout=10)
+
+        # Com o bucket cheio de novo, dados de mercado não devem ceder a um PID morto
+        limiter.state[0, F_TOKENS] = limiter.capacity[0]
+        started = time.time()
+        assert limiter.acquire(10, PRIORITY_MARKET_DATA, "futures", timeout=2) < 1.0
+        assert time.time() - started < 1.0
+        assert limiter.get_statistics()["futures"]["orders_waiting"] == 0
+        print("✅ Slot de ordem de processo morto é ignorado OK")
+    finally:
+        limiter.close()
+
+
+def test_request_profile():
+    assert request_profile("futures_create_order", {"symbol": "ADAUSDT"})[2:] == (PRIORITY_ORDER, 1)
+    assert request_profile("futures_place_batch_order", {"batchOrders": [{}] * 5}) == ("futures", 5, PRIORITY_ORDER, 5)
+    assert request_profile("futures_ticker", {}) == ("futures", 40, PRIORITY_MARKET_DATA, 0)
+    assert request_profile("futures_klines", {"limit": 2})[1] == 1
+    assert request_profile("futures_position_information", {})[2] == PRIORITY_ACCOUNT
+    assert request_profile("get_klines", {"symbol": "ADAUSDT"})[0] == "spot"
+    print("✅ Perfil de peso/prioridade OK")
+
+
+if __name__ == "__main__":
+    test_bucket_is_shared_across_processes()
+    test_priorities_reserve_budget_for_orders()
+    test_headers_and_ban_sync()
+    test_killed_order_waiter_does_not_block_market_data()
+    test_request_profile()
+    print("\n🎉 Todos os testes do rate limiter passaram!")
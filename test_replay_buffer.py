@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Teste do ReplayBuffer: ring buffer em arrays float32, sum-tree da amostragem priorizada,
+pesos de importance sampling e save/load (arrays em memória e em memmap).
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.replay_buffer import ReplayBuffer, SumTree
+
+
+def _fill(buffer, count):
+    for i in range(count):
+        buffer.append(np.full(buffer.state_size, i), (i % 2, 2 + i % 10), float(i), np.full(buffer.state_size, i + 1), i % 5 == 0)
+
+
+def test_ring_buffer_wraps_and_samples_arrays():
+    buffer = ReplayBuffer(100, 4, seed=1)
+    _fill(buffer, 250)
+    assert len(buffer) == 100 and buffer.position == 50
+    assert buffer.states.dtype == np.float32 and buffer.states.shape == (100, 4)
+    assert buffer.rewards.min() == 150 and buffer.rewards.max() == 249  # só as 100 mais recentes
+
+    batch = buffer.sample(32)
+    assert batch["states"].shape == (32, 4) and np.all(batch["weights"] == 1)
+    assert np.array_equal(batch["states"][:, 0], batch["rewards"])
+    assert np.array_equal(batch["next_states"][:, 0], batch["rewards"] + 1)
+    assert np.array_equal(batch["dones"], batch["rewards"] % 5 == 0)
+    print("✅ Ring buffer em arrays contíguos")
+
+
+def test_sum_tree_matches_cumulative_search():
+    rng = np.random.default_rng(2)
+    tree = SumTree(1000)
+    priorities = rng.random(1000)
+    tree.update(np.arange(1000), priorities)
+    changed = rng.choice(1000, 50, replace=False)
+    priorities[changed] = rng.random(50) * 10
+    tree.update(changed, priorities[changed])
+    assert np.isclose(tree.total, priorities.sum())
+
+    values = rng.random(5000) * tree.total
+    expected = np.searchsorted(np.cumsum(priorities), values, side="right")
+    assert np.array_equal(tree.find(values), expected)
+    print("✅ Sum-tree igual à busca na soma acumulada")
+
+
+def test_prioritized_sampling_and_weights():
+    buffer = ReplayBuffer(64, 2, prioritized=True, alpha=1.0, beta=0.5, seed=3)
+    _fill(buffer, 64)
+    errors = np.ones(64)
+    errors[7] = 63.0  # metade da massa total
+    buffer.update_priorities(np.arange(64), errors - buffer.epsilon)
+
+    counts = np.zeros(64)
+    for _ in range(200):
+        batch = buffer.sample(32)
+        counts += np.bincount(batch["indices"], minlength=64)
+        assert batch["weights"].max() == 1.0
+    assert abs(counts[7] / counts.sum() - 0.5) < 0.02
+    # Transição mais amostrada tem o menor peso de importance sampling
+    batch = buffer.sample(32)
+    assert batch["weights"][batch["indices"] == 7].max() < batch["weights"][batch["indices"] != 7].min()
+    print("✅ Amostragem proporcional à prioridade com pesos de IS")
+
+
+def test_save_load_roundtrip_and_memmap():
+    with tempfile.TemporaryDirectory() as tmp:
+        buffer = ReplayBuffer(50, 3, prioritized=True, seed=4)
+        _fill(buffer, 70)
+        buffer.update_priorities(np.arange(10), np.arange(10.0))
+        buffer.save(os.path.join(tmp, "plain"), extra={"epsilon": 0.2})
+        restored = ReplayBuffer.load(os.path.join(tmp, "plain"))
+        assert (restored.size, restored.position, restored.extra) == (50, 20, {"epsilon": 0.2})
+        assert np.array_equal(restored.states, buffer.states) and np.array_equal(restored.tree.tree, buffer.tree.tree)
+
+        # Memmap: arrays no disco, save só faz flush; load reabre em r+ e continua gravando
+        path = os.path.join(tmp, "mmap")
+        mapped = ReplayBuffer(100000, 3, memmap_dir=path)
+        assert isinstance(mapped.states, np.memmap)
+        _fill(mapped, 10)
+        mapped.save(path)
+        reopened = ReplayBuffer.load(path, mmap=True)
+        assert isinstance(reopened.states, np.memmap) and len(reopened) == 10
+        _fill(reopened, 1)
+        assert reopened.states[10, 0] == 0 and reopened.rewards[9] == 9
+    print("✅ Save/load do buffer (memória e memmap)")
+
+
+if __name__ == "__main__":
+    test_ring_buffer_wraps_and_samples_arrays()
+    test_sum_tree_matches_cumulative_search()
+    test_prioritized_sampling_and_weights()
+    test_save_load_roundtrip_and_memmap()
+    print("\n🎉 Todos os testes do replay buffer passaram!")
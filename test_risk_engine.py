@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Teste do RiskEngine: ring buffers alinhados (símbolos x janela), paridade com as fórmulas
+anteriores do RiskMetrics (VaR, Sharpe, drawdown, correlação par a par) e VaR/CVaR do
+portfólio em uma chamada.
+"""
+
+import os
+import sys
+from collections import deque
+from statistics import NormalDist
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.risk_engine import RiskEngine
+
+
+def _series(count=6, samples=150, seed=7):
+    """Preços (random walk com fator comum) e PnL por símbolo, comprimentos distintos."""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, samples)
+    prices, pnls = {}, {}
+    for i in range(count):
+        length = samples - 15 * i
+        moves = 0.6 * market[-length:] + rng.normal(0, 0.005 * (i + 1), length)
+        prices[f"S{i}USDT"] = 100 * np.cumprod(1 + moves)
+        pnls[f"S{i}USDT"] = np.cumsum(rng.normal(0.1, 2.0, length)) + 50
+    return prices, pnls
+
+
+def _legacy_var(pnl, confidence=0.95, horizon=1):
+    returns = np.diff(pnl) / np.abs(pnl[:-1])
+    returns = returns[~np.isnan(returns)]
+    return np.percentile(returns, (1 - confidence) * 100) * np.sqrt(horizon)
+
+
+def _legacy_sharpe(pnl, risk_free_rate=0.02):
+    returns = np.diff(pnl) / np.abs(pnl[:-1])
+    returns = returns[~np.isnan(returns)]
+    return (np.mean(returns) * 365 - risk_free_rate) / (np.std(returns) * np.sqrt(365))
+
+
+def _legacy_drawdown(pnl):
+    cumulative = np.cumsum(pnl)
+    running_max = np.maximum.accumulate(cumulative)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = (cumulative - running_max) / np.abs(running_max)
+    return np.min(np.where(running_max == 0, 0, drawdown))
+
+
+def _filled_engine(window=100):
+    prices, pnls = _series()
+    engine = RiskEngine(window=window, capacity=2)  # força o crescimento das linhas
+    history = {s: (deque(maxlen=window), deque(maxlen=window)) for s in prices}
+    for t in range(150):
+        for symbol in prices:
+            offset = 150 - len(prices[symbol])
+            if t >= offset:
+                engine.update(symbol, prices[symbol][t - offset], pnls[symbol][t - offset])
+                history[symbol][0].append(prices[symbol][t - offset])
+                history[symbol][1].append(pnls[symbol][t - offset])
+    return engine, {s: (np.array(p), np.array(q)) for s, (p, q) in history.items()}
+
+
+def test_pnl_metrics_match_legacy():
+    engine, history = _filled_engine()
+    metrics = engine.pnl_metrics(confidence=0.99, horizon=3)
+    assert set(metrics) == set(history)
+    for symbol, (_, pnl) in history.items():
+        assert abs(metrics[symbol]["var"] - _legacy_var(pnl, 0.99, 3)) < 1e-12
+        assert abs(metrics[symbol]["sharpe"] - _legacy_sharpe(pnl)) < 1e-9
+        assert abs(metrics[symbol]["max_drawdown"] - _legacy_drawdown(pnl)) < 1e-12
+    assert engine.count.max() == 100 and engine.capacity >= 6  # ring cheio e linhas realocadas
+
+    # Histórico curto: mesmos limites mínimos (30 para VaR/Sharpe, 10 para drawdown)
+    short = RiskEngine(window=100)
+    for value in range(1, 16):
+        short.update("XUSDT", 1.0, float(value))
+    assert short.pnl_metrics()["XUSDT"]["var"] is None
+    assert short.pnl_metrics()["XUSDT"]["max_drawdown"] == 0.0
+    print("✅ VaR, Sharpe e drawdown iguais às fórmulas anteriores (com wraparound do ring)")
+
+
+def test_correlation_matches_pairwise_corrcoef():
+    engine, history = _filled_engine()
+    symbols, corr = engine.correlation(min_length=30)
+    length = min(len(history[s][0]) for s in symbols)
+    for i, a in enumerate(symbols):
+        for j, b in enumerate(symbols):
+            pa, pb = history[a][0][-length:], history[b][0][-length:]
+            expected = np.corrcoef(np.diff(pa) / pa[:-1], np.diff(pb) / pb[:-1])[0, 1]
+            assert abs(corr[i, j] - expected) < 1e-10
+    print(f"✅ Correlação {len(symbols)}x{len(symbols)} igual ao np.corrcoef par a par")
+
+
+def test_tail_risk_and_portfolio_var():
+    engine, history = _filled_engine()
+    weights = {"S0USDT": 0.5, "S1USDT": 0.3, "S2USDT": 0.2}
+    report = engine.risk_report(confidence=0.95, weights=weights)
+    z = NormalDist().inv_cdf(0.05)
+    for symbol, (prices, _) in history.items():
+        returns = np.diff(prices) / prices[:-1]
+        var = np.percentile(returns, 5)
+        assert abs(report["historical_var"][symbol] - var) < 1e-12
+        assert abs(report["cvar"][symbol] - returns[returns <= var].mean()) < 1e-12
+        assert abs(report["parametric_var"][symbol] - (returns.mean() + z * returns.std())) < 1e-12
+        assert report["cvar"][symbol] <= report["historical_var"][symbol]
+
+    symbols = report["correlation_symbols"]
+    length = min(len(history[s][0]) for s in symbols)
+    aligned = np.array([np.diff(history[s][0][-length:]) / history[s][0][-length:-1] for s in symbols])
+    w = np.array([weights.get(s, 0.0) for s in symbols])
+    portfolio = w @ aligned
+    var = np.percentile(portfolio, 5)
+    cov = np.cov(aligned)
+    assert abs(report["portfolio"]["historical_var"] - var) < 1e-12
+    assert abs(report["portfolio"]["cvar"] - portfolio[portfolio <= var].mean()) < 1e-12
+    assert abs(report["portfolio"]["parametric_var"] - (portfolio.mean() + z * np.sqrt(w @ cov @ w))) < 1e-12
+    print(f"✅ VaR/CVaR por símbolo e do portfólio: {report['portfolio']}")
+
+
+def test_risk_metrics_uses_engine():
+    from agents.risk_agent import PortfolioRiskManager, RiskMetrics
+    from test_account_snapshot import load_config
+
+    engine, history = _filled_engine()
+    metrics = RiskMetrics(history_length=100)
+    metrics.engine = engine
+    symbol = "S1USDT"
+    assert abs(metrics.calculate_var(symbol) - _legacy_var(history[symbol][1])) < 1e-12
+    assert np.array_equal(metrics.pnl_history[symbol], history[symbol][1])
+    correlation = metrics.calculate_correlation(["S0USDT", "S1USDT", "S9USDT"])
+    assert set(correlation) == {"S0USDT", "S1USDT"} and correlation["S0USDT"]["S0USDT"] == 1.0
+
+    manager = PortfolioRiskManager(load_config())
+    manager.update_positions({s: {"notional": 100 * (i + 1)} for i, s in enumerate(history)})
+    risk = manager.calculate_portfolio_risk(metrics, list(history))
+    assert risk["portfolio_var"] > 0 and risk["portfolio_cvar"] <= risk["portfolio_historical_var"]
+    print(f"✅ RiskMetrics/PortfolioRiskManager sobre o RiskEngine (VaR portfólio {risk['portfolio_var']:.4f})")
+
+
+if __name__ == "__main__":
+    test_pnl_metrics_match_legacy()
+    test_correlation_matches_pairwise_corrcoef()
+    test_tail_risk_and_portfolio_var()
+    test_risk_metrics_uses_engine()
+    print("\n🎉 Todos os testes do motor de risco passaram!")
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Teste do replay vetorizado do RLTradingAgent: alvos do minibatch iguais aos do laço por
+amostra (cabeças de mercado/grid e ações inteiras antigas), um único train_on_batch por
+replay, sincronização da rede alvo a cada N passos e replay priorizado com a memória
+salva/restaurada.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.agent import RLTradingAgent
+
+STATE_SIZE = 8
+
+
+def _fill(agent, count, seed=0):
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        if i % 4 == 0:
+            action = int(rng.integers(agent.market_choice_actions + agent.grid_actions))  # formato antigo
+        else:
+            market, grid = int(rng.integers(2)), int(rng.integers(10))
+            action = {"market_action": market, "grid_action": grid,
+                      "combined_action": market * agent.grid_actions + grid}
+        agent.remember(rng.normal(size=agent.state_size), action, float(rng.normal()),
+                       rng.normal(size=agent.state_size), bool(i % 7 == 0))
+
+
+def _reference_targets(agent, batch):
+    """Alvos calculados amostra a amostra (uma predição por estado)."""
+    targets = []
+    for state, (first, grid), reward, next_state, done in zip(
+            batch["states"], batch["actions"], batch["rewards"], batch["next_states"], batch["dones"]):
+        next_q = agent.model.predict(np.reshape(next_state, [1, STATE_SIZE, 1]), verbose=0)[0]
+        target_f = agent.model.predict(np.reshape(state, [1, STATE_SIZE, 1]), verbose=0)[0].copy()
+        if grid >= 0:
+            m = agent.market_choice_actions
+            target_f[first] = reward + (0 if done else agent.gamma * next_q[:m].max())
+            target_f[grid] = reward + (0 if done else agent.gamma * next_q[m:].max())
+        else:
+            target_f[first] = reward + (0 if done else agent.gamma * next_q.max())
+        targets.append(target_f)
+    return np.array(targets)
+
+
+def test_batched_targets_match_per_sample():
+    agent = RLTradingAgent(STATE_SIZE, 3)
+    _fill(agent, 200)
+    calls, expected = [], []
+    train_on_batch, sample = agent.model.train_on_batch, agent.memory.sample
+    agent.model.train_on_batch = lambda x, y: calls.append((x, y)) or train_on_batch(x, y)
+
+    def sample_with_reference(n):
+        batch = sample(n)
+        expected.append(_reference_targets(agent, batch))  # antes do treino alterar os pesos
+        return batch
+
+    agent.memory.sample = sample_with_reference
+    agent.replay(32)
+
+    (states, targets), = calls
+    assert states.shape == (32, STATE_SIZE, 1)
+    assert np.allclose(targets, expected[0], atol=1e-5)
+    assert agent.epsilon < 1.0 and agent.train_steps == 1
+    print("✅ Alvos do replay vetorizado iguais ao laço por amostra (1 train_on_batch)")
+
+
+def test_target_network_sync():
+    agent = RLTradingAgent(STATE_SIZE, 3, target_update_steps=3)
+    _fill(agent, 100)
+    agent.replay(16)
+    synced = agent.target_model.get_weights()
+    agent.replay(16)
+    agent.replay(16)
+    assert agent.train_steps == 3
+    assert all(np.array_equal(a, b) for a, b in zip(agent.target_model.get_weights(), agent.model.get_weights()))
+    assert any(not np.array_equal(a, b) for a, b in zip(synced, agent.model.get_weights()))
+    assert RLTradingAgent(STATE_SIZE, 3).target_model is None
+    print("✅ Rede alvo sincronizada a cada N replays")
+
+
+def test_prioritized_replay_and_resume():
+    agent = RLTradingAgent(STATE_SIZE, 3, prioritized_replay=True, memory_size=500)
+    _fill(agent, 300)
+    weights = []
+    train_on_batch = agent.model.train_on_batch
+    agent.model.train_on_batch = lambda x, y, sample_weight=None: weights.append(sample_weight) or train_on_batch(x, y)
+    before = agent.memory.tree.total
+    agent.replay(32)
+    assert weights[0] is not None and weights[0].shape == (32,)
+    assert agent.memory.tree.total != before  # prioridades atualizadas pelo erro TD
+
+    with tempfile.TemporaryDirectory() as tmp:
+        agent.save_memory(tmp)
+        resumed = RLTradingAgent(STATE_SIZE, 3)
+        resumed.load_memory(tmp)
+        assert len(resumed.memory) == 300 and resumed.memory.prioritized
+        assert resumed.epsilon == agent.epsilon and resumed.train_steps == 1
+    print("✅ Replay priorizado e memória retomada após restart")
+
+
+def test_rl_agent_resumes_memmap_memory_only_for_training():
+    from core.rl_agent import RLAgent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {"models_directory": tmp,
+                  "rl_agent": {"state_size": STATE_SIZE, "action_size": 3, "replay_memmap": True,
+                               "experience_replay_buffer_size": 100}}
+        trainer = RLAgent(config, "ADAUSDT")
+        assert trainer.setup_agent(training=True)
+        _fill(trainer.agent, 40)
+        trainer.agent.save_memory(trainer.replay_path)
+
+        # Novo processo de treino: memmap reaberto sem truncar as transições
+        resumed = RLAgent(config, "ADAUSDT")
+        assert resumed.setup_agent(training=True)
+        memory = resumed.agent.memory
+        assert len(memory) == 40 and memory.memmap_dir == resumed.replay_path
+        assert np.array_equal(memory.states[:40], trainer.agent.memory.states[:40])
+        assert np.any(memory.states[:40] != 0)
+
+        # Inferência: não carrega a memória de replay
+        live = RLAgent(config, "ADAUSDT")
+        live.setup_agent(training=False)
+        assert len(live.agent.memory) == 0 and live.agent.memory.memmap_dir is None
+    print("✅ Treino retoma a memória em memmap; inferência não a carrega")
+
+
+if __name__ == "__main__":
+    test_batched_targets_match_per_sample()
+    test_target_network_sync()
+    test_prioritized_replay_and_resume()
+    test_rl_agent_resumes_memmap_memory_only_for_training()
+    print("\n🎉 Todos os testes do replay passaram!")
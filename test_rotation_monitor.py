@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Teste do RotationMonitor: ATR de Wilder montado a partir de ticks do stream de tickers
+e avaliação de rotação do PairSelector como consulta em memória, sem REST em regime.
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.rotation_monitor import RotationMonitor
+from utils.streaming_indicators import WilderATR
+
+BAR_MS = 300_000
+START_MS = 1_700_000_100_000 // BAR_MS * BAR_MS
+
+
+def _feed(monitor, paths, bars, ticks_per_bar=6, volumes=None):
+    """Alimenta lotes no formato !ticker@arr; retorna as barras OHLC de referência por símbolo."""
+    reference = {symbol: [] for symbol in paths}
+    for b in range(bars):
+        for t in range(ticks_per_bar):
+            event_ms = START_MS + b * BAR_MS + t * (BAR_MS // ticks_per_bar)
+            batch = []
+            for symbol, path in paths.items():
+                price = path[b * ticks_per_bar + t]
+                batch.append({"e": "24hrTicker", "E": event_ms, "s": symbol, "c": str(price),
+                              "q": str((volumes or {}).get(symbol, 10_000_000))})
+            monitor.on_ticker_batch(batch, now=event_ms / 1000)
+        for symbol, path in paths.items():
+            ticks = path[b * ticks_per_bar:(b + 1) * ticks_per_bar]
+            reference[symbol].append((max(ticks), min(ticks), ticks[-1]))
+    return reference
+
+
+def test_atr_from_ticks_matches_wilder():
+    rng = np.random.default_rng(5)
+    monitor = RotationMonitor({"pair_selection": {"rotation_monitor": {"max_ticker_age_seconds": 1e12}}})
+    paths = {f"T{i}USDT": 10 + np.cumsum(rng.normal(0, 0.05 * (i + 1), 40 * 6)) for i in range(20)}
+    reference = _feed(monitor, paths, bars=40)
+
+    for symbol, bars in reference.items():
+        atr = WilderATR(14)
+        for high, low, close in bars[:-1]:  # a última barra ainda está aberta
+            atr.update(high, low, close)
+        row = monitor._rows[symbol]
+        assert abs(monitor.atr[row] - atr.value) < 1e-12, symbol
+        metrics = monitor.metrics(symbol, now=START_MS / 1000 + 40 * 300)
+        assert abs(metrics["atr_perc"] - atr.value / bars[-1][2]) < 1e-12
+    assert monitor.metrics("T0USDT", now=time.time() + 1e13) is None, "dado velho não é usado"
+    print(f"✅ ATR por ticks igual ao Wilder ({monitor.stats['bars_closed']} barras fechadas)")
+
+
+class _RecordingAPIClient:
+    """Registra qualquer endpoint REST chamado."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return None
+        return call
+
+
+def test_rotation_is_in_memory_query():
+    from core.pair_selector import PairSelector
+
+    rng = np.random.default_rng(9)
+    config = {"pair_selection": {"rotation_monitor": {"max_ticker_age_seconds": 1e12,
+                                                       "evaluation_interval_seconds": 60}}}
+    selector = PairSelector.__new__(PairSelector)
+    selector.config = config
+    selector.api_client = _RecordingAPIClient()
+    selector.market_type = "futures"
+    selector.rotation_monitor = RotationMonitor(config)
+
+    # FLATUSDT: ATR quase zero (problemático); ADA/XRP: bons substitutos; DOGE: volume baixo
+    paths = {
+        "FLATUSDT": 1.0 + np.cumsum(rng.normal(0, 0.00001, 30 * 6)),
+        "ADAUSDT": 1.0 + np.cumsum(rng.normal(0, 0.01, 30 * 6)),
+        "XRPUSDT": 1.0 + np.cumsum(rng.normal(0, 0.008, 30 * 6)),
+        "DOGEUSDT": 1.0 + np.cumsum(rng.normal(0, 0.01, 30 * 6)),
+        "LINKUSDT": 1.0 + np.cumsum(rng.normal(0, 0.009, 30 * 6)),
+    }
+    selector.rotation_monitor_config = {"candidate_symbols": list(paths)}
+    _feed(selector.rotation_monitor, paths, bars=30, volumes={"DOGEUSDT": 1000})
+
+    started = time.perf_counter()
+    result = selector.monitor_atr_quality(["FLATUSDT", "LINKUSDT"], trade_activity_data={})
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    assert list(result["problematic_pairs"]) == ["FLATUSDT"]
+    suggestion = result["replacement_suggestions"]["FLATUSDT"]["symbol"]
+    assert suggestion in ("ADAUSDT", "XRPUSDT")
+    assert elapsed_ms < 50, f"avaliação levou {elapsed_ms:.1f}ms"
+    assert selector.api_client.calls == [], selector.api_client.calls
+
+    alternatives = selector._get_high_atr_alternatives(exclude_symbols=["FLATUSDT", "LINKUSDT"])
+    assert {a["symbol"] for a in alternatives} == {"ADAUSDT", "XRPUSDT"}
+    scores = [a["quality_score"] for a in alternatives]
+    assert scores == sorted(scores, reverse=True)
+
+    # Dentro da cadência configurada não há nova avaliação
+    assert selector.monitor_atr_quality(["FLATUSDT"], trade_activity_data={}).get("skipped")
+
+    # Símbolo sem histórico: um único fallback REST, não repetido a cada avaliação
+    assert selector.rotation_monitor.should_seed("NEWUSDT")
+    assert not selector.rotation_monitor.should_seed("NEWUSDT")
+    assert not selector.rotation_monitor.should_seed("ADAUSDT")
+    assert selector.api_client.calls == []
+    print(f"✅ Rotação avaliada em {elapsed_ms:.2f}ms sem chamadas REST -> {suggestion}")
+
+
+def test_symbol_missing_from_stream_is_refreshed():
+    from core.pair_selector import PairSelector
+
+    class _TickerAPI:
+        def __init__(self):
+            self.calls = 0
+
+        def get_futures_ticker(self):
+            self.calls += 1
+            return [{"symbol": "FUTONLYUSDT", "lastPrice": "2.0", "quoteVolume": "9000000"}]
+
+    config = {"pair_selection": {"rotation_monitor": {"max_ticker_age_seconds": 30}}}
+    selector = PairSelector.__new__(PairSelector)
+    selector.api_client = _TickerAPI()
+    selector.market_type = "futures"
+    selector.rotation_monitor = RotationMonitor(config)
+    monitor = selector.rotation_monitor
+
+    now = time.time()
+    monitor.on_ticker_batch([{"s": "FUTONLYUSDT", "c": "1.0", "q": "1", "E": int((now - 120) * 1000)}], now=now - 120)
+    monitor.on_ticker_batch([{"s": "ADAUSDT", "c": "0.5", "q": "1", "E": int(now * 1000)}], now=now)
+    assert monitor.stream_is_fresh()
+    assert monitor.stale_symbols(["ADAUSDT", "FUTONLYUSDT", "NEWUSDT"]) == ["FUTONLYUSDT"]
+
+    # Stream ativo, mas sem ticks para FUTONLYUSDT: a linha velha é atualizada via REST bulk
+    selector._refresh_rotation_tickers(["ADAUSDT", "FUTONLYUSDT"])
+    assert selector.api_client.calls == 1
+    assert monitor.price[monitor._rows["FUTONLYUSDT"]] == 2.0
+    selector._refresh_rotation_tickers(["ADAUSDT", "FUTONLYUSDT"])
+    assert selector.api_client.calls == 1
+    print("✅ Símbolo fora do stream é atualizado por REST bulk")
+
+
+if __name__ == "__main__":
+    test_atr_from_ticks_matches_wilder()
+    test_rotation_is_in_memory_query()
+    test_symbol_missing_from_stream_is_refreshed()
+    print("\n🎉 Todos os testes do monitor de rotação passaram!")
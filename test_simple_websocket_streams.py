@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Teste do combined-stream do SimpleBinanceWebSocket: sharding e frames SUBSCRIBE/UNSUBSCRIBE
+(sem conexão real - o socket é substituído por um fake que registra os frames).
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.simple_websocket import SimpleBinanceWebSocket
+
+
+class _FakeSocket:
+    def __init__(self):
+        self.frames = []
+
+    def send(self, payload):
+        self.frames.append(json.loads(payload))
+
+    def close(self):
+        pass
+
+
+def _client(max_streams=3):
+    config = {"websocket_config": {
+        "max_streams_per_connection": max_streams,
+        "max_control_messages_per_second": 1000,
+    }}
+    return SimpleBinanceWebSocket(testnet=False, config=config)
+
+
+def test_stream_url_derived_from_ws_url():
+    ws = SimpleBinanceWebSocket(testnet=False, config={})
+    assert ws.stream_url == "wss://stream.binance.com:9443/stream"
+    print("✅ URL de combined stream OK")
+
+
+def test_sharding_respects_limit():
+    """Streams são distribuídos em novas conexões ao atingir o limite."""
+    ws = _client(max_streams=3)
+    ws.subscribe_tickers([f"COIN{i}USDT" for i in range(7)])
+
+    assert [len(c.streams) for c in ws.connections] == [3, 3, 1]
+    assert len(ws.subscribed_symbols) == 7
+    print("✅ Sharding por limite de streams OK")
+
+
+def test_live_subscribe_and_unsubscribe_frames():
+    """Com a conexão ativa, mudanças viram frames na mesma conexão (sem reconectar)."""
+    ws = _client(max_streams=10)
+    ws.subscribe_tickers(["BTCUSDT", "ETHUSDT"])
+    conn = ws.connections[0]
+
+    # Simula abertura: deve reenviar todas as inscrições existentes
+    fake = _FakeSocket()
+    conn.ws = fake
+    conn._on_open(fake)
+    assert fake.frames[-1]["method"] == "SUBSCRIBE"
+    assert set(fake.frames[-1]["params"]) == {"btcusdt@ticker", "ethusdt@ticker"}
+
+    # Rotação de pares: 1 UNSUBSCRIBE + 1 SUBSCRIBE na conexão viva
+    ws.set_ticker_subscriptions(["BTCUSDT", "ADAUSDT"])
+    assert fake.frames[-2] == {"method": "UNSUBSCRIBE", "params": ["ethusdt@ticker"], "id": fake.frames[-2]["id"]}
+    assert fake.frames[-1]["method"] == "SUBSCRIBE"
+    assert fake.frames[-1]["params"] == ["adausdt@ticker"]
+    assert ws.subscribed_symbols == {"btcusdt", "adausdt"}
+    assert len(ws.connections) == 1
+    print("✅ SUBSCRIBE/UNSUBSCRIBE na conexão ativa OK")
+
+
+def test_combined_payload_updates_price():
+    ws = _client()
+    ws._on_message(None, json.dumps({"stream": "btcusdt@ticker", "data": {"s": "BTCUSDT", "c": "50000.5"}}))
+    ws._on_message(None, json.dumps({"result": None, "id": 1}))
+    assert ws.get_price("BTCUSDT") == 50000.5
+    print("✅ Payload combinado OK")
+
+
+if __name__ == "__main__":
+    test_stream_url_derived_from_ws_url()
+    test_sharding_respects_limit()
+    test_live_subscribe_and_unsubscribe_frames()
+    test_combined_payload_updates_price()
+    print("\n🎉 Todos os testes do combined stream passaram!")
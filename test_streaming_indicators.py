@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Teste dos indicadores incrementais: valores devem bater com o TA-Lib sobre a mesma série
+de candles (gravada de forma determinística), e a atualização candle a candle deve
+produzir o mesmo resultado que o processamento em lote.
+"""
+
+import os
+import sys
+
+import numpy as np
+import talib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.streaming_indicators import IndicatorEngine, IndicatorSet, WilderADX, WilderATR, WilderRSI
+
+INTERVAL_MS = 180_000
+
+
+def _recorded_candles(n=500, seed=42):
+    """Série OHLCV determinística (random walk com volatilidade variável e candles 'doji')."""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.004, n) * np.where(np.arange(n) % 97 < 20, 3.0, 1.0)
+    close = 0.5 * np.exp(np.cumsum(returns))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n))
+    high[::50] = low[::50] = close[::50] = open_[::50]  # candles sem range
+    volume = rng.uniform(1_000, 50_000, n)
+    open_time = np.arange(n, dtype=np.int64) * INTERVAL_MS
+    return open_time, open_, high, low, close, volume
+
+
+def _feed(candles):
+    open_time, _, high, low, close, volume = candles
+    indicator_set = IndicatorSet("ADAUSDT", "3m", history=len(close))
+    history = {"rsi": [], "atr": [], "adx": [], "ema": [], "bb_upper": [], "bb_lower": [], "macd_hist": []}
+    for i in range(len(close)):
+        indicator_set.update(open_time[i], high[i], low[i], close[i], volume[i])
+        values = indicator_set.values()
+        for key in history:
+            history[key].append(np.nan if values[key] is None else values[key])
+    return indicator_set, {k: np.array(v) for k, v in history.items()}
+
+
+def _assert_matches(streaming, reference, name, rtol=1e-9, atol=1e-9, start=0):
+    reference = reference[start:]
+    streaming = streaming[start:]
+    assert np.array_equal(np.isnan(streaming), np.isnan(reference)), f"{name}: warm-up diverge do TA-Lib"
+    mask = ~np.isnan(reference)
+    np.testing.assert_allclose(streaming[mask], reference[mask], rtol=rtol, atol=atol, err_msg=name)
+
+
+def test_matches_talib():
+    candles = _recorded_candles()
+    _, _, high, low, close, _ = candles
+    _, history = _feed(candles)
+
+    _assert_matches(history["rsi"], talib.RSI(close, 14), "RSI")
+    _assert_matches(history["atr"], talib.ATR(high, low, close, 14), "ATR")
+    _assert_matches(history["adx"], talib.ADX(high, low, close, 14), "ADX")
+    _assert_matches(history["ema"], talib.EMA(close, 20), "EMA")
+    upper, _, lower = talib.BBANDS(close, 20, 2, 2, 0)
+    _assert_matches(history["bb_upper"], upper, "BB upper", rtol=1e-7)
+    _assert_matches(history["bb_lower"], lower, "BB lower", rtol=1e-7)
+    # TA-Lib semeia o MACD de outra forma; após o warm-up os valores convergem
+    _, _, hist = talib.MACD(close, 12, 26, 9)
+    _assert_matches(history["macd_hist"], hist, "MACD hist", rtol=1e-4, atol=1e-7, start=200)
+    print("✅ Indicadores incrementais batem com o TA-Lib")
+
+
+def test_other_periods_match_talib():
+    _, _, high, low, close, _ = _recorded_candles(n=300, seed=7)
+    for period in (5, 10, 21):
+        rsi, atr, adx = WilderRSI(period), WilderATR(period), WilderADX(period)
+        out = np.array([[rsi.update(c) or np.nan, atr.update(h, l, c) or np.nan, adx.update(h, l, c) or np.nan]
+                        for h, l, c in zip(high, low, close)])
+        _assert_matches(out[:, 0], talib.RSI(close, period), f"RSI{period}")
+        _assert_matches(out[:, 1], talib.ATR(high, low, close, period), f"ATR{period}")
+        _assert_matches(out[:, 2], talib.ADX(high, low, close, period), f"ADX{period}")
+    print("✅ Outros períodos batem com o TA-Lib")
+
+
+def test_vwap_resets_per_session():
+    candles = _recorded_candles(n=1000)
+    open_time, _, high, low, close, volume = candles
+    indicator_set, _ = _feed(candles)
+
+    session = open_time // 86_400_000
+    last = session == session[-1]
+    typical = (high + low + close) / 3
+    expected = np.sum(typical[last] * volume[last]) / np.sum(volume[last])
+    assert abs(indicator_set.vwap.value - expected) < 1e-12
+    print("✅ VWAP cumulativo por sessão OK")
+
+
+def test_incremental_klines_equal_batch():
+    """Alimentar em pedaços (como o GridLogic faz) é igual a processar tudo de uma vez."""
+    open_time, open_, high, low, close, volume = _recorded_candles(n=300)
+    klines = [[int(t), str(o), str(h), str(l), str(c), str(v), int(t) + INTERVAL_MS - 1]
+              for t, o, h, l, c, v in zip(open_time, open_, high, low, close, volume)]
+    now_ms = int(open_time[-1]) + INTERVAL_MS  # último candle já fechado
+
+    batch = IndicatorSet("ADAUSDT", "3m")
+    batch.update_from_klines(klines, now_ms=now_ms)
+
+    incremental = IndicatorSet("ADAUSDT", "3m")
+    assert incremental.klines_needed() == incremental.warmup + 1
+    incremental.update_from_klines(klines[:150], now_ms=now_ms)
+    for i in range(150, 300, 3):
+        # Sobreposição proposital: candles repetidos são ignorados
+        applied = incremental.update_from_klines(klines[i - 2:i + 3], now_ms=now_ms)
+        assert applied == len(klines[i:i + 3])
+
+    assert incremental.values() == batch.values()
+    assert list(incremental.closes) == list(batch.closes)
+    # Candle em formação não é aplicado
+    assert batch.update_from_klines(klines[-1:], now_ms=int(open_time[-1])) == 0
+    assert batch.klines_needed(now_ms=now_ms + INTERVAL_MS) == 2
+    print("✅ Atualização incremental == lote")
+
+
+def test_engine_shares_sets_and_routes_ws_events():
+    engine = IndicatorEngine()
+    a = engine.get("adausdt", "3m")
+    assert engine.get("ADAUSDT", "3m") is a
+    assert engine.get("ADAUSDT", "3m", atr_period=7) is not a
+    engine.on_closed_kline("ADAUSDT", "3m", {"open_time": 0, "high": 1.1, "low": 0.9, "close": 1.0, "volume": 10})
+    assert a.candles_processed == 1
+    assert engine.find("ADAUSDT", "3m") is a
+
+    # Spot e futuros do mesmo símbolo não compartilham estados de Wilder
+    spot = engine.get("ADAUSDT", "3m", "spot")
+    assert spot is not a and engine.find("ADAUSDT", "3m", "spot") is spot
+    engine.on_closed_kline("ADAUSDT", "3m", {"open_time": 180_000, "high": 1.2, "low": 1.0, "close": 1.1,
+                                             "volume": 5}, market_type="spot")
+    assert spot.candles_processed == 1 and a.candles_processed == 1
+    engine.remove("ADAUSDT", "spot")
+    assert engine.find("ADAUSDT", "3m", "spot") is None and engine.find("ADAUSDT", "3m") is a
+    print("✅ IndicatorEngine OK")
+
+
+if __name__ == "__main__":
+    test_matches_talib()
+    test_other_periods_match_talib()
+    test_vwap_resets_per_session()
+    test_incremental_klines_equal_batch()
+    test_engine_shares_sets_and_routes_ws_events()
+    print("\n🎉 Todos os testes de indicadores incrementais passaram!")
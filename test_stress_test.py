@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Teste do stress test Monte Carlo: execução das ordens de grid em repouso, propagação de
+choques pelo beta, liquidação, reprodutibilidade (seed) e integração com o RiskAgent.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from test_account_snapshot import load_config
+from utils.stress_test import Exposure, StressTester, account_equity, exposures_from_account
+
+TINY_VOL = 1e-6  # caminhos praticamente determinísticos
+
+
+def _tester(**overrides):
+    config = load_config()
+    config["risk_agent"]["stress_test"].update(overrides)
+    return StressTester(config)
+
+
+def test_grid_fills_and_shock_propagation():
+    tester = _tester(paths=500, chunk_size=128)
+    btc = Exposure("BTCUSDT", 100.0, quantity=0.0)
+    alt = Exposure(
+        "ALTUSDT", 10.0, quantity=2.0, entry_price=10.0, leverage=5,
+        buy_prices=np.array([9.9, 9.5, 8.0]), buy_quantities=np.array([1.0, 1.0, 1.0]),
+        sell_prices=np.array([10.5]), sell_quantities=np.array([1.0]),
+    )
+    # ALT com beta 2 em relação ao BTC
+    cov = np.array([[1.0, 2.0], [2.0, 4.0 + 1e-4]]) * TINY_VOL ** 2
+    report = tester.run([btc, alt], cov, equity=100.0, shocks={"BTCUSDT": -0.05})
+
+    final = 10.0 * np.exp(2 * np.log(0.95))  # ~9.025
+    expected_pnl = 2.0 * (final - 10.0) + (final - 9.9) + (final - 9.5)
+    metrics = report["per_symbol"]["ALTUSDT"]
+    assert abs(metrics["pnl_mean"] - expected_pnl) < 1e-3, (metrics, expected_pnl)
+    assert metrics["expected_buy_fills"] == 2.0 and metrics["expected_sell_fills"] == 0.0
+    assert abs(report["per_symbol"]["BTCUSDT"]["pnl_mean"]) < 1e-9
+    # Liquidação isolada estimada (long 5x): 10 * 0.8 / 0.996 ~ 8.03 -> não atingida
+    assert metrics["liquidation_probability"] == 0.0
+    assert report["account_liquidation_probability"] == 0.0
+    usage = 4.0 * final / 5 / (100.0 + expected_pnl)
+    assert abs(report["margin"]["terminal_usage_mean"] - usage) < 1e-4
+
+    # Choque maior: o preço cruza a liquidação estimada e a conta vai à manutenção
+    crash = tester.run([btc, alt], cov, equity=5.0, shocks={"BTCUSDT": -0.12})
+    assert crash["per_symbol"]["ALTUSDT"]["liquidation_probability"] == 1.0
+    assert crash["account_liquidation_probability"] == 1.0
+    assert crash["per_symbol"]["ALTUSDT"]["expected_buy_fills"] == 3.0
+    print(f"✅ Ordens do grid executadas e choque propagado pelo beta (PnL {expected_pnl:.3f})")
+
+
+def test_distribution_and_reproducibility():
+    tester = _tester(paths=20000, chunk_size=3000)
+    sigma = 0.01
+    position = Exposure("ETHUSDT", 2000.0, quantity=1.0, entry_price=2000.0, leverage=10)
+    cov = np.array([[sigma ** 2]])
+    report = tester.run([position], cov, equity=1000.0, horizon_steps=4)
+
+    # Martingale: PnL médio ~0, desvio ~ preço * sigma * sqrt(passos)
+    std = 2000.0 * sigma * 2
+    assert abs(report["pnl"]["mean"]) < 4 * std / np.sqrt(20000)
+    assert abs(report["pnl"]["std"] / std - 1) < 0.03
+    assert report["pnl"]["cvar"] <= report["pnl"]["var"] < 0
+    assert abs(report["pnl"]["var"] / (std * -2.326) - 1) < 0.05
+
+    again = tester.run([position], cov, equity=1000.0, horizon_steps=4)
+    other = tester.run([position], cov, equity=1000.0, horizon_steps=4, seed=7)
+    assert again["pnl"] == report["pnl"] and other["pnl"] != report["pnl"]
+    print(f"✅ Distribuição de PnL (VaR 99% {report['pnl']['var']:.1f}) reproduzível pela seed")
+
+
+def test_twenty_pairs_ten_thousand_paths_under_a_second():
+    tester = _tester(paths=10000)
+    rng = np.random.default_rng(3)
+    exposures = []
+    for i in range(20):
+        mark = 10.0 * (i + 1)
+        levels = np.arange(1, 13)
+        exposures.append(Exposure(
+            f"P{i}USDT", mark, quantity=rng.choice([-1.0, 1.0]), entry_price=mark, leverage=10,
+            buy_prices=mark * (1 - 0.004 * levels), buy_quantities=np.full(12, 0.1),
+            sell_prices=mark * (1 + 0.004 * levels), sell_quantities=np.full(12, 0.1),
+        ))
+    factors = rng.normal(0, 0.003, (20, 3))
+    cov = factors @ factors.T + np.eye(20) * 1e-5
+    report = tester.run(exposures, cov, equity=500.0)
+    assert report["paths"] == 10000 and len(report["per_symbol"]) == 20
+    assert report["elapsed_ms"] < 1000, report["elapsed_ms"]
+    print(f"✅ 20 pares x 10k caminhos em {report['elapsed_ms']:.0f} ms")
+
+
+class _StressAPIClient:
+    operation_mode = "production"
+
+    def get_futures_positions(self):
+        return [
+            {"symbol": "ADAUSDT", "positionAmt": "100", "entryPrice": "0.50", "markPrice": "0.48",
+             "leverage": "20", "liquidationPrice": "0.465"},
+            {"symbol": "BTCUSDT", "positionAmt": "0", "entryPrice": "0", "markPrice": "60000", "leverage": "10"},
+        ]
+
+    def get_open_futures_orders(self, symbol=None):
+        return [
+            {"symbol": "ADAUSDT", "side": "BUY", "price": "0.47", "origQty": "50", "executedQty": "10"},
+            {"symbol": "ADAUSDT", "side": "SELL", "price": "0.50", "origQty": "50", "executedQty": "0"},
+            {"symbol": "ADAUSDT", "side": "SELL", "price": "0", "origQty": "100", "executedQty": "0"},  # stop
+        ]
+
+    def get_futures_account_balance(self):
+        return [{"asset": "USDT", "balance": "10", "crossUnPnl": "-2"}]
+
+
+def test_risk_agent_stress_test():
+    from agents.risk_agent import RiskAgent
+
+    api = _StressAPIClient()
+    exposures = exposures_from_account(api.get_futures_positions(), api.get_open_futures_orders())
+    assert [e.symbol for e in exposures] == ["ADAUSDT"]
+    assert exposures[0].buy_quantities.tolist() == [40.0] and exposures[0].sell_prices.tolist() == [0.5]
+    assert account_equity(api.get_futures_account_balance()) == 8.0
+
+    config = load_config()
+    config["risk_agent"]["alerts"]["enable_telegram"] = False
+    agent = RiskAgent(config, api, alerter=None)
+    for i in range(40):
+        agent.risk_metrics.update_data("ADAUSDT", 0.48 * (1 + 0.01 * np.sin(i)), 0.0, 1.0)
+
+    report = agent.run_stress_test(paths=2000)
+    assert report["symbols"] == ["ADAUSDT"] and agent.last_stress_report is report
+    assert report["per_symbol"]["ADAUSDT"]["liquidation_price"] == 0.465
+
+    shocked = agent.run_stress_test(shocks={"BTCUSDT": -0.10}, paths=2000)
+    assert shocked["symbols"] == ["ADAUSDT", "BTCUSDT"] and agent.last_stress_report is report
+
+    sent = []
+    agent._send_risk_alert = lambda context, message, level="WARNING": sent.append((context, level))
+    agent.max_liquidation_probability = 0.0
+    agent._monitor_stress_risks()
+    assert ("ADAUSDT", "WARNING") in sent
+    print(f"✅ RiskAgent: stress test com posições e ordens da exchange, alertas {sent}")
+
+
+if __name__ == "__main__":
+    test_grid_fills_and_shock_propagation()
+    test_distribution_and_reproducibility()
+    test_twenty_pairs_ten_thousand_paths_under_a_second()
+    test_risk_agent_stress_test()
+    print("\n🎉 Todos os testes do stress test passaram!")
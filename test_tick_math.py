@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Teste do TickRules: preços/quantidades em ticks/steps inteiros e equivalência com a
+formatação Decimal legada do GridLogic.
+"""
+
+import os
+import random
+import sys
+from decimal import Decimal
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.tick_math import TickRules
+
+
+def _grid(tick_rules=None):
+    from core.grid_logic import GridLogic
+
+    grid = GridLogic.__new__(GridLogic)
+    grid.symbol = "ADAUSDT"
+    grid.tick_size = Decimal("0.0001")
+    grid.step_size = Decimal("1")
+    grid.min_notional = Decimal("5")
+    grid.price_precision = 4
+    grid.quantity_precision = 0
+    grid.tick_rules = tick_rules
+    grid.grid_levels = []
+    return grid
+
+
+def test_rounding_and_formatting():
+    rules = TickRules("0.0005", "0.001", "5", price_precision=4, quantity_precision=3)
+    assert (rules.tick_mantissa, rules.price_decimals) == (5, 4)
+    assert rules.price_to_ticks(0.12345) == 247  # 0.12345 / 0.0005 = 246.9 -> 247
+    assert rules.price_to_ticks(Decimal("0.12375")) == 248  # meio tick arredonda para cima
+    assert rules.ticks_to_str(247) == "0.1235"
+    assert rules.ticks_to_decimal(247) == Decimal("0.1235")
+
+    assert rules.qty_to_steps(1.23456) == 1234
+    assert rules.qty_to_steps("0.0004") == 1, "quantidade positiva menor que um step vira um step"
+    assert rules.steps_to_str(1234) == "1.234"
+    # Quantidade elevada até o notional mínimo no preço informado
+    steps = rules.qty_to_steps(1, price=2.0)
+    assert steps == 2500 and rules.meets_min_notional(rules.price_to_ticks(2.0), steps)
+    assert not rules.meets_min_notional(rules.price_to_ticks(2.0), steps - 1)
+
+    mask = rules.meets_min_notional(np.array([3000, 4000, 5000], dtype=np.int64), 2000)
+    assert list(mask) == [False, False, True]  # 1.5, 2.0, 2.5 * 2.0 >= 5
+    assert not TickRules("0.001", "1", price_precision=2).supported
+    print("✅ Arredondamento e formatação em ticks OK")
+
+
+def test_matches_legacy_decimal_formatting():
+    legacy = _grid()
+    fast = _grid(TickRules(legacy.tick_size, legacy.step_size, legacy.min_notional, 4, 0))
+    rng = random.Random(7)
+    for _ in range(2000):
+        price = round(rng.uniform(0.05, 3.0), 6)
+        assert Decimal(fast._format_price(price)) == Decimal(legacy._format_price(price)), price
+        qty = rng.uniform(0.5, 500)
+        assert fast._format_quantity(qty, price) == legacy._format_quantity(qty, price), (qty, price)
+    print("✅ Equivalente à formatação Decimal legada")
+
+
+def test_vectorized_levels_match_legacy_grid():
+    legacy = _grid()
+    fast = _grid(TickRules(legacy.tick_size, legacy.step_size, legacy.min_notional, 4, 0))
+    spacing = Decimal("0.005")
+    old_levels = legacy._grid_levels_from_decimal(0.6123, spacing, 50, 50)
+    new_levels = fast._grid_levels_from_ticks(0.6123, spacing, 50, 50)
+    assert len(new_levels) == len(old_levels) == 100
+    assert [level["type"] for level in new_levels] == [level["type"] for level in old_levels]
+    # O legado acumula arredondamento nível a nível; a forma fechada difere no máximo alguns ticks
+    diffs = [abs(n["price"] - o["price"]) for n, o in zip(new_levels, old_levels)]
+    assert max(diffs) <= Decimal("0.0005")
+    prices = [level["price"] for level in new_levels]
+    assert prices == sorted(prices) and len(set(prices)) == len(prices)
+
+    # Espaçamento menor que o tick: níveis colapsados são descartados, não duplicados
+    tight = fast._grid_levels_from_ticks(0.6123, Decimal("0.00005"), 5, 5)
+    assert len({level["price"] for level in tight}) == len(tight) < 10
+    print("✅ Níveis vetorizados equivalentes ao grid legado")
+
+
+if __name__ == "__main__":
+    test_rounding_and_formatting()
+    test_matches_legacy_decimal_formatting()
+    test_vectorized_levels_match_legacy_grid()
+    print("\n🎉 Todos os testes de tick math passaram!")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Teste dos gatilhos por tick do AggressiveTPSLManager: TriggerIndex (bisect por símbolo),
+avaliação só das posições cruzadas com o preço do stream e status das posições pelo
+ACCOUNT_UPDATE (sem REST enquanto o user data stream está saudável).
+"""
+
+import os
+import random
+import sys
+from collections import Counter
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from test_account_snapshot import load_config
+from utils.aggressive_tp_sl import AggressiveTPSLManager, TriggerIndex
+from utils.user_data_stream import UserDataStream
+
+
+class _TPSLAPIClient:
+    """APIClient falso de futuros com contagem das chamadas REST."""
+
+    def __init__(self, positions):
+        self.positions = dict(positions)  # symbol -> positionAmt
+        self.update_time = 1
+        self.calls = Counter()
+        self.orders = []
+
+    def get_futures_positions(self):
+        self.calls["get_futures_positions"] += 1
+        return [{"symbol": s, "positionAmt": str(a), "positionSide": "BOTH",
+                 "updateTime": self.update_time}
+                for s, a in self.positions.items()]
+
+    def get_futures_position(self, symbol):
+        self.calls["get_futures_position"] += 1
+        return {"symbol": symbol, "positionAmt": str(self.positions.get(symbol, 0))}
+
+    def get_futures_ticker(self, symbol):
+        self.calls["get_futures_ticker"] += 1
+        return {"symbol": symbol, "price": "1.0"}
+
+    def futures_exchange_info(self):
+        return {"symbols": [{"symbol": s, "pricePrecision": 6, "quantityPrecision": 3, "filters": []}
+                            for s in self.positions]}
+
+    def place_futures_order(self, **order):
+        self.orders.append(order)
+        return {"orderId": len(self.orders)}
+
+    def cancel_futures_order(self, symbol, order_id):
+        return {"orderId": order_id}
+
+
+class _FakeAccountStream:
+    def __init__(self):
+        self.healthy = True
+        self.account_callbacks = []
+
+    def is_healthy(self):
+        return self.healthy
+
+    def add_account_callback(self, callback):
+        self.account_callbacks.append(callback)
+
+
+class _FakePriceStream:
+    is_running = True
+
+    def __init__(self):
+        self.streams = {}
+
+    def subscribe_stream(self, stream, handler):
+        self.streams[stream] = handler
+
+    def unsubscribe_stream(self, stream):
+        self.streams.pop(stream, None)
+
+
+def _drain(manager):
+    events = []
+    while not manager.trigger_events.empty():
+        events.append(manager.trigger_events.get_nowait())
+    return events
+
+
+def test_trigger_index_matches_linear_scan():
+    rng = random.Random(5)
+    index = TriggerIndex()
+    bands = {}
+    for i in range(2000):
+        symbol = "AUSDT" if i % 2 else "BUSDT"
+        low = rng.uniform(90, 100) if i % 7 else float("-inf")
+        high = rng.uniform(100, 110) if i % 5 else float("inf")
+        index.arm(symbol, f"p{i}", low, high)
+        bands[f"p{i}"] = (symbol, low, high)
+    index.arm("AUSDT", "p1", 99.0, 101.0)  # rearmar substitui a faixa anterior
+    bands["p1"] = ("AUSDT", 99.0, 101.0)
+
+    for price in (95.0, 104.0, 100.0, 89.0):
+        fired = index.crossed("AUSDT", price)
+        expected = {k for k, (s, low, high) in bands.items() if s == "AUSDT" and (price <= low or price >= high)}
+        assert set(fired) == expected and len(fired) == len(expected)
+        for key in fired:
+            del bands[key]
+            assert index.band(key) is None
+    assert len(index) == len(bands)
+    assert index.crossed("AUSDT", 89.0) == [] and index.disarm("p1") is False
+    print(f"✅ TriggerIndex igual à varredura linear ({len(bands)} posições ainda armadas)")
+
+
+def _manager(positions):
+    config = load_config()
+    api = _TPSLAPIClient(positions)
+    manager = AggressiveTPSLManager(api, config)
+    account, prices = _FakeAccountStream(), _FakePriceStream()
+    manager.attach_streams(prices, account)
+    return manager, api, account, prices
+
+
+def test_ticks_touch_only_crossed_positions():
+    manager, api, account, prices = _manager({"ADAUSDT": 100, "BTCUSDT": -1})
+    ada = manager.add_position("ADAUSDT", "LONG", Decimal("1.0"), Decimal("100"))
+    btc = manager.add_position("BTCUSDT", "SHORT", Decimal("100"), Decimal("1"))
+    assert set(prices.streams) == {"adausdt@aggTrade", "btcusdt@aggTrade"}
+    assert api.calls["get_futures_positions"] == 1  # só a foto inicial do attach_streams
+    _drain(manager)
+    api.calls.clear()
+
+    low, high = manager.trigger_index.band(ada)
+    assert low < 1.0 < high
+    manager.on_stream_message({"e": "aggTrade", "s": "ADAUSDT", "p": str((1.0 + high) / 2)})
+    manager.on_stream_message({"e": "aggTrade", "s": "BTCUSDT", "p": "100.01"})
+    assert _drain(manager) == [] and manager.trigger_stats["ticks"] == 2
+
+    # Preço salta para a faixa de TP imediato (0.2% do TP 1.005): só a posição ADA é reavaliada
+    manager.on_stream_message({"e": "aggTrade", "s": "ADAUSDT", "p": "1.004"})
+    events = _drain(manager)
+    assert [e[0] for e in events] == [ada] and manager.trigger_index.band(ada) is None
+    assert manager.trigger_index.band(btc) is not None
+
+    manager._evaluate_position(ada, manager.active_orders[ada], 0.0, events[0][1])
+    assert ada not in manager.active_orders and api.orders[-1]["order_type"] == "MARKET"
+    assert "adausdt@aggTrade" not in prices.streams
+    assert sum(api.calls.values()) == 0, api.calls  # preço do tick e status do cache: zero REST
+
+    # SHORT: queda abaixo do gatilho de ativação do trailing
+    low, _ = manager.trigger_index.band(btc)
+    manager.on_price("BTCUSDT", low - 0.01)
+    (position_id, price), = _drain(manager)
+    manager._evaluate_position(position_id, manager.active_orders[btc], 0.0, price)
+    order = manager.active_orders[btc]
+    assert order.trailing_stop_price == Decimal(str(price)) + order.trailing_distance
+    new_low, new_high = manager.trigger_index.band(btc)
+    assert new_low < price < new_high <= float(order.trailing_stop_price)
+    assert sum(api.calls.values()) == 0, api.calls
+    print(f"✅ Ticks reavaliam só as posições cruzadas (stats {manager.trigger_stats})")
+
+
+def test_account_updates_drive_position_status():
+    manager, api, account, prices = _manager({"ETHUSDT": 2})
+    eth = manager.add_position("ETHUSDT", "LONG", Decimal("2000"), Decimal("2"))
+    _drain(manager)
+    api.calls.clear()
+
+    update = UserDataStream.parse_futures_account_update({
+        "e": "ACCOUNT_UPDATE", "E": 5, "T": 5,
+        "a": {"m": "ORDER", "B": [{"a": "USDT", "wb": "100", "cw": "100"}],
+              "P": [{"s": "ETHUSDT", "pa": "0", "ep": "0", "up": "0", "mt": "cross", "ps": "BOTH"}]},
+    })
+    account.account_callbacks[0](update)
+    assert _drain(manager) == [(eth, None)] and not manager._is_position_open("ETHUSDT", "LONG")
+    manager.on_price("ETHUSDT", 2001.0)
+    manager._evaluate_position(eth, manager.active_orders[eth], 0.0)
+    assert eth not in manager.active_orders and sum(api.calls.values()) == 0, api.calls
+
+    # Foto REST mais velha não sobrescreve o evento; stream caído -> fallback REST
+    manager._sync_positions([{"symbol": "ETHUSDT", "positionAmt": "2", "updateTime": 1}])
+    assert manager._current_position("ETHUSDT")["positionAmt"] == "0"
+    account.healthy = False
+    api.update_time = 10
+    assert manager._is_position_open("ETHUSDT", "LONG") and api.calls["get_futures_positions"] == 1
+    account.healthy = True
+    assert manager._is_position_open("ETHUSDT", "LONG")  # ressincronizado via REST
+    assert api.calls["get_futures_positions"] == 2
+    assert manager._is_position_open("ETHUSDT", "LONG") and api.calls["get_futures_positions"] == 2
+    print("✅ ACCOUNT_UPDATE atualiza o status das posições sem polling REST")
+
+
+def test_account_update_opens_monitoring_for_new_positions():
+    manager, api, account, prices = _manager({"SOLUSDT": 0})
+    api.calls.clear()
+
+    update = UserDataStream.parse_futures_account_update({
+        "e": "ACCOUNT_UPDATE", "E": 7, "T": 7,
+        "a": {"m": "ORDER", "B": [],
+              "P": [{"s": "SOLUSDT", "pa": "-3", "ep": "150", "up": "0", "mt": "cross", "ps": "BOTH"}]},
+    })
+    account.account_callbacks[0](update)
+    (position_id, order), = manager.active_orders.items()
+    assert order.symbol == "SOLUSDT" and order.position_side == "SHORT"
+    assert order.entry_price == Decimal("150") and order.quantity == Decimal("3")
+    assert "solusdt@aggTrade" in prices.streams and manager.trigger_index.band(position_id) is not None
+    assert api.calls["get_futures_positions"] == 0  # status pelo cache do stream
+
+    account.account_callbacks[0](update)  # evento repetido não duplica o monitoramento
+    assert list(manager.active_orders) == [position_id]
+    print("✅ ACCOUNT_UPDATE inclui posições novas no TP/SL pelo preço de entrada")
+
+
+if __name__ == "__main__":
+    test_trigger_index_matches_linear_scan()
+    test_ticks_touch_only_crossed_positions()
+    test_account_updates_drive_position_status()
+    test_account_update_opens_monitoring_for_new_positions()
+    print("\n🎉 Todos os testes dos gatilhos TP/SL passaram!")
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Teste do cache do universo (warm start do PairSelector): klines e métricas persistidos
+em .npz são restaurados na inicialização e o scan seguinte busca só os candles faltantes.
+Nenhuma requisição real é feita - AsyncAPIClient._make_request é substituído.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+import utils.kline_store as kline_store_module
+from core.pair_selector import PairSelector
+from test_universe_scan import CONFIG, _fake_klines
+from utils.async_client import AsyncAPIClient
+
+SYMBOLS = [f"WARM{i}USDT" for i in range(200)]
+
+
+def _selector(cache_file):
+    selector = PairSelector.__new__(PairSelector)
+    selector._init_started = time.time()
+    selector.config = {**CONFIG, "market_analysis": {**CONFIG["market_analysis"], "kline_limit": 100,
+                                                     "ta_timeperiod": 14}}
+    selector.api_client = type("FakeAPIClient", (), {"use_testnet": False})()
+    selector.last_scan_stats = {}
+    selector.last_metrics_table = None
+    selector.startup_stats = {}
+    selector.use_candlestick_filter = False
+    selector.avoid_patterns = []
+    selector.universe_cache_enabled = True
+    selector.universe_cache_max_age = 3600
+    selector.universe_cache_file = cache_file
+    selector._warm_ranking_pending = False
+    selector._rescan_thread = None
+    # Filtros do ranking (_filter_and_rank_pairs)
+    selector.sentiment_filtering_enabled = False
+    selector.min_volume_usd_24h = Decimal("1000000")
+    selector.min_atr_perc_24h = Decimal("0")
+    selector.max_adx = Decimal("100")
+    selector.max_price_usdt = Decimal("1000")
+    selector.max_pairs = 5
+    return selector
+
+
+def _scan(selector, requested):
+    async def fake_request(self, method, url, params=None, signed=False):
+        requested.append(params["limit"])
+        await asyncio.sleep(0.005)
+        return _fake_klines(params["symbol"], params["limit"], int(time.time() * 1000))
+
+    with patch.object(AsyncAPIClient, "_make_request", fake_request):
+        kline_data = selector._scan_universe_klines(SYMBOLS, "3m", 100)
+    tickers = {s: {"quoteVolume": "5000000", "lastPrice": "1.5"} for s in SYMBOLS}
+    cache_file = selector.universe_cache_file
+    before = os.stat(cache_file).st_mtime_ns if os.path.exists(cache_file) else None
+    table = selector._calculate_metrics(tickers, kline_data)
+    # O cache é escrito pelo rescan periódico (get_selected_pairs), não a cada cálculo de métricas
+    assert (os.stat(cache_file).st_mtime_ns if os.path.exists(cache_file) else None) == before
+    selector._save_universe_cache(kline_data, table)
+    return table
+
+
+def test_warm_start_fetches_only_missing_candles():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = os.path.join(tmp, "universe_cache.npz")
+        kline_store_module._global_kline_store = None
+        cold_requests = []
+        cold_table = _scan(_selector(cache_file), cold_requests)
+        assert os.path.exists(cache_file) and sum(cold_requests) == 100 * len(SYMBOLS)
+
+        # "Reinício": KlineStore vazio, cache carregado na inicialização
+        kline_store_module._global_kline_store = None
+        warm = _selector(cache_file)
+        warm._load_universe_cache()
+        assert warm.startup_stats["warm_start"] and warm.startup_stats["series_restored"] == len(SYMBOLS)
+        assert list(warm.last_metrics_table.symbols) == list(cold_table.symbols)
+        assert np.allclose(warm.last_metrics_table["atr_perc"], cold_table["atr_perc"])
+        assert set(warm.last_metrics_table["last_pattern"]) == {"N/A"}
+
+        warm_requests = []
+        warm_table = _scan(warm, warm_requests)
+        assert len(warm_requests) == len(SYMBOLS) and max(warm_requests) <= 2, "só a cauda é buscada"
+        assert np.allclose(warm_table["adx"], cold_table["adx"], atol=5)
+        warm._record_first_ranking()
+        assert warm.startup_stats["first_ranking_s"] >= 0
+        print(f"✅ Warm start: {sum(warm_requests)} klines pedidos (cold: {sum(cold_requests)}), "
+              f"cache carregado em {warm.startup_stats['cache_load_s']:.3f}s")
+        kline_store_module._global_kline_store = None
+
+
+def test_stale_cache_is_ignored():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = os.path.join(tmp, "universe_cache.npz")
+        kline_store_module._global_kline_store = None
+        _scan(_selector(cache_file), [])
+
+        kline_store_module._global_kline_store = None
+        stale = _selector(cache_file)
+        stale.universe_cache_max_age = 0
+        stale._load_universe_cache()
+        assert not stale.startup_stats["warm_start"] and stale.last_metrics_table is None
+        assert len(kline_store_module.get_kline_store()._series) == 0
+        kline_store_module._global_kline_store = None
+    print("✅ Cache velho é ignorado (cold start)")
+
+
+def test_first_selection_ranks_cached_table_then_rescans():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_file = os.path.join(tmp, "universe_cache.npz")
+        kline_store_module._global_kline_store = None
+        cold = _selector(cache_file)
+        cold_ranking = cold._filter_and_rank_pairs(_scan(cold, []))
+
+        kline_store_module._global_kline_store = None
+        warm = _selector(cache_file)
+        warm._load_universe_cache()
+        warm.selector_config = {"futures_pairs": {"preferred_symbols": []}, "use_social_feed_analysis": False}
+        warm.selected_pairs, warm.last_update_time, warm.update_interval_hours = [], 0, 1
+        warm._get_pairs_with_open_positions = lambda: []
+        warm._save_cache = lambda: None
+        scan_started, release = threading.Event(), threading.Event()
+
+        def full_market_analysis():
+            scan_started.set()
+            release.wait(5)
+            return ["FRESHUSDT"]
+
+        warm._full_market_analysis = full_market_analysis
+        # Primeira seleção: ranking da tabela do cache, sem esperar tickers nem klines
+        assert warm.get_selected_pairs() == cold_ranking[:5]
+        assert "first_ranking_s" in warm.startup_stats and scan_started.wait(5)
+        # Durante o rescan em segundo plano as chamadas devolvem o ranking do cache
+        assert warm.get_selected_pairs(force_update=True) == cold_ranking[:5]
+        release.set()
+        warm._rescan_thread.join(5)
+        assert warm.selected_pairs == ["FRESHUSDT"] and warm._warm_start_ranking() is None
+        kline_store_module._global_kline_store = None
+    print("✅ Warm start ranqueia a tabela do cache e atualiza com o rescan em segundo plano")
+
+
+if __name__ == "__main__":
+    test_warm_start_fetches_only_missing_candles()
+    test_stale_cache_is_ignored()
+    test_first_selection_ranks_cached_table_then_rescans()
+    print("\n🎉 Todos os testes do cache do universo passaram!")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Teste das métricas vetorizadas do universo (utils.universe_metrics) e do ranking
+colunar do PairSelector.
+"""
+
+import os
+import sys
+from decimal import Decimal
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.kline_store import KlineStore
+from utils.streaming_indicators import WilderADX, WilderATR
+from utils.universe_metrics import compute_universe_metrics, doji_flags, engulfing_flags
+
+INTERVAL_MS = 180_000
+NOW_MS = 1_700_000_000_000
+
+
+def _klines(rng, count, base, drift=0.0, noise=1.0):
+    last_closed = (NOW_MS // INTERVAL_MS - 1) * INTERVAL_MS
+    close = base + np.cumsum(rng.normal(drift, noise, count))
+    close = np.maximum(close, base * 0.2)
+    rows = []
+    for i in range(count):
+        open_time = last_closed - (count - 1 - i) * INTERVAL_MS
+        o = close[i - 1] if i else close[0]
+        c = close[i]
+        h = max(o, c) + rng.random() * noise
+        low = min(o, c) - rng.random() * noise
+        rows.append([open_time, str(o), str(h), str(low), str(c), "100", open_time + INTERVAL_MS - 1,
+                     "1000", 10, "50", "500", "0"])
+    return rows
+
+
+def _universe(count=40, seed=3):
+    rng = np.random.default_rng(seed)
+    store = KlineStore()
+    kline_data, tickers = {}, {}
+    for i in range(count):
+        symbol = f"S{i}USDT"
+        candles = 100 if i % 5 else 60  # listagens recentes com menos histórico
+        series = store.update(symbol, "3m", _klines(rng, candles, 10 + i, noise=0.05 + 0.01 * i), now_ms=NOW_MS)
+        kline_data[symbol] = series
+        tickers[symbol] = {"quoteVolume": str(1_000_000 * (i + 1)), "lastPrice": str(10 + i)}
+    return kline_data, tickers
+
+
+def test_matches_streaming_wilder_indicators():
+    kline_data, tickers = _universe()
+    table = compute_universe_metrics(kline_data, tickers, period=14, limit=100)
+    assert len(table) == len(kline_data)
+    for symbol, series in kline_data.items():
+        atr, adx = WilderATR(14), WilderADX(14)
+        for row in series.view(100, include_forming=False).tolist():
+            atr.update(row[2], row[3], row[4])
+            adx.update(row[2], row[3], row[4])
+        row = table.row(symbol)
+        last_close = series.closes(include_forming=False)[-1]
+        assert abs(row["atr_perc"] - atr.value / last_close) < 1e-12, symbol
+        assert abs(row["adx"] - adx.value) < 1e-9, symbol
+        assert row["realized_vol"] > 0
+    ranks = table["volume_rank"]
+    assert ranks[table["volume"].argmax()] == 1.0 and ranks[table["volume"].argmin()] == 0.0
+    print("✅ ATR/ADX vetorizados batem com os indicadores de Wilder")
+
+
+def test_pattern_flags():
+    # Doji: corpo mínimo no último candle; engolfo de alta: corpo branco cobre o preto anterior
+    o = np.array([[10.0] * 10 + [10.0, 10.00], [10.0] * 10 + [10.5, 9.8]])
+    c = np.array([[10.5] * 10 + [10.4, 10.01], [10.5] * 10 + [10.0, 10.7]])
+    h = np.maximum(o, c) + 0.2
+    low = np.minimum(o, c) - 0.2
+    assert list(doji_flags(o, h, low, c)) == [True, False]
+    assert list(engulfing_flags(o, h, low, c)) == [False, True]
+    print("✅ Flags de padrões de candle OK")
+
+
+def test_selector_ranks_on_columnar_table():
+    from core.pair_selector import PairSelector
+
+    kline_data, tickers = _universe()
+    selector = PairSelector.__new__(PairSelector)
+    selector.config = {"market_analysis": {"kline_limit": 100, "ta_timeperiod": 14}}
+    selector.use_candlestick_filter = False
+    selector.avoid_patterns = ["CDLDOJI", "CDLENGULFING"]
+    selector.sentiment_filtering_enabled = False
+    selector.min_volume_usd_24h = Decimal("5000000")
+    selector.min_atr_perc_24h = Decimal("0")
+    selector.max_adx = Decimal("100")
+    selector.max_price_usdt = Decimal("45")
+    selector.max_pairs = 5
+    selector.universe_cache_enabled = False
+
+    table = selector._calculate_metrics(tickers, kline_data)
+    ranked = selector._filter_and_rank_pairs(table)
+
+    # Referência: filtros e ordenação por símbolo, como no ranking antigo
+    expected = [
+        (symbol, row) for symbol, row in table.to_dict().items()
+        if row["volume"] >= 5_000_000 and row["last_price"] <= 45
+    ]
+    expected.sort(key=lambda item: (-item[1]["atr_perc"], item[1]["adx"]))
+    assert ranked == [symbol for symbol, _ in expected]
+    assert "S0USDT" not in ranked and "S39USDT" not in ranked  # volume baixo / preço alto
+    assert set(table["last_pattern"]) == {"N/A"}
+    print(f"✅ Ranking colunar: {len(ranked)} pares, top {ranked[:3]}")
+
+
+if __name__ == "__main__":
+    test_matches_streaming_wilder_indicators()
+    test_pattern_flags()
+    test_selector_ranks_on_columnar_table()
+    print("\n🎉 Todos os testes de métricas do universo passaram!")
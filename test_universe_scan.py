@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Teste do scan concorrente do universo no PairSelector: centenas de símbolos buscados
+em paralelo (asyncio) com latência simulada, incorporados no KlineStore.
+Nenhuma requisição real é feita - AsyncAPIClient._make_request é substituído.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from core.pair_selector import PairSelector
+from utils.async_client import AsyncAPIClient
+from utils.kline_store import get_kline_store
+
+INTERVAL_MS = 3 * 60 * 1000
+LATENCY = 0.05
+CONFIG = {
+    "market_analysis": {"concurrent_scan": True, "scan_concurrency": 50},
+    "api_client": {"rate_limiting": {"enabled": True}},  # orçamento de weight compartilhado
+}
+
+
+def _fake_klines(symbol, limit, now_ms):
+    last_closed = (now_ms // INTERVAL_MS - 1) * INTERVAL_MS
+    base = 1.0 + (sum(map(ord, symbol)) % 100)
+    rows = []
+    for i in range(limit):
+        open_time = last_closed - (limit - 1 - i) * INTERVAL_MS
+        price = base + i * 0.01
+        rows.append([open_time, str(price), str(price + 0.02), str(price - 0.02), str(price + 0.01),
+                     "100", open_time + INTERVAL_MS - 1, "1000", 10, "50", "500", "0"])
+    return rows
+
+
+class _FakeAPIClient:
+    use_testnet = False
+
+
+def _selector():
+    selector = PairSelector.__new__(PairSelector)
+    selector.config = CONFIG
+    selector.api_client = _FakeAPIClient()
+    selector.last_scan_stats = {}
+    return selector
+
+
+def test_concurrent_scan_of_large_universe():
+    requests = []
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_request(self, method, url, params=None, signed=False):
+        requests.append(params["limit"])
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(LATENCY)
+        in_flight["now"] -= 1
+        return _fake_klines(params["symbol"], params["limit"], int(time.time() * 1000))
+
+    symbols = [f"SCAN{i}USDT" for i in range(300)]
+    selector = _selector()
+    with patch.object(AsyncAPIClient, "_make_request", fake_request):
+        started = time.time()
+        series = selector._scan_universe_klines(symbols, "3m", 100)
+        elapsed = time.time() - started
+
+    # Serial seriam 300 x (50ms + 100ms de sleep) = 45s
+    assert elapsed < 5, f"scan levou {elapsed:.2f}s"
+    assert in_flight["max"] <= CONFIG["market_analysis"]["scan_concurrency"]
+    assert set(series) == set(symbols)
+    assert all(s is not None and len(s) >= 99 for s in series.values())
+    assert selector.last_scan_stats["symbols"] == 300 and selector.last_scan_stats["responses"] == 300
+    assert get_kline_store().get_series(symbols[0], "3m").closes()[-1] > 0
+
+    # Segundo scan: o KlineStore já tem o histórico, só os candles que faltam são pedidos
+    requests.clear()
+    with patch.object(AsyncAPIClient, "_make_request", fake_request):
+        selector._scan_universe_klines(symbols, "3m", 100)
+    assert len(requests) == 300 and max(requests) < 100
+    print(f"✅ 300 símbolos em {elapsed:.2f}s (máx. {in_flight['max']} requisições em voo)")
+
+
+def test_failed_symbols_are_skipped():
+    async def flaky_request(self, method, url, params=None, signed=False):
+        await asyncio.sleep(0.01)
+        if params["symbol"].startswith("BAD"):
+            return None
+        return _fake_klines(params["symbol"], params["limit"], int(time.time() * 1000))
+
+    symbols = ["OKAUSDT", "BADAUSDT", "OKBUSDT"]
+    with patch.object(AsyncAPIClient, "_make_request", flaky_request):
+        series = _selector()._scan_universe_klines(symbols, "3m", 50)
+    assert series["BADAUSDT"] is None
+    assert series["OKAUSDT"] is not None and series["OKBUSDT"] is not None
+    print("✅ Símbolos sem resposta são descartados")
+
+
+if __name__ == "__main__":
+    test_concurrent_scan_of_large_universe()
+    test_failed_symbols_are_skipped()
+    print("\n🎉 Todos os testes do scan concorrente passaram!")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Teste do parsing/roteamento de eventos do user data stream (sem conexão real).
+"""
+
+import json
+import os
+import queue
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from utils.user_data_stream import UserDataStream
+
+
+class _FakeAPIClient:
+    def start_user_data_stream(self, market_type="futures"):
+        return "test-listen-key"
+
+
+def _futures_event(order_id, status, symbol="ADAUSDT"):
+    return {
+        "e": "ORDER_TRADE_UPDATE",
+        "E": 1700000000000,
+        "T": 1700000000000,
+        "o": {
+            "s": symbol, "c": "grid_1", "S": "BUY", "o": "LIMIT", "f": "GTC",
+            "q": "10", "p": "0.5000", "ap": "0.4999", "x": "TRADE", "X": status,
+            "i": order_id, "l": "10", "z": "10", "L": "0.4999", "n": "0.002",
+            "N": "USDT", "T": 1700000000000, "R": False, "rp": "0",
+        },
+    }
+
+
+def test_parse_futures_order_update():
+    """ORDER_TRADE_UPDATE deve virar um dict compatível com futures_get_order."""
+    update = UserDataStream.parse_futures_order_update(_futures_event(12345, "FILLED"))
+
+    assert update["orderId"] == 12345
+    assert update["status"] == "FILLED"
+    assert update["side"] == "BUY"
+    assert update["executedQty"] == "10"
+    assert update["avgPrice"] == "0.4999"
+    assert abs(float(update["cummulativeQuoteQty"]) - 4.999) < 1e-9
+    print("✅ ORDER_TRADE_UPDATE parse OK")
+
+
+def test_parse_spot_execution_report():
+    """executionReport deve calcular avgPrice a partir de Z / z."""
+    event = {
+        "e": "executionReport", "E": 1700000000000, "s": "BTCUSDT", "c": "x",
+        "S": "SELL", "o": "LIMIT", "q": "0.002", "p": "50000", "x": "TRADE",
+        "X": "FILLED", "i": 987, "l": "0.002", "z": "0.002", "L": "50000",
+        "n": "0.1", "N": "USDT", "T": 1700000000000, "Z": "100",
+    }
+    update = UserDataStream.parse_spot_execution_report(event)
+
+    assert update["orderId"] == 987
+    assert abs(float(update["avgPrice"]) - 50000.0) < 1e-9
+    assert update["cummulativeQuoteQty"] == "100"
+    print("✅ executionReport parse OK")
+
+
+def test_routing_by_symbol():
+    """Eventos só chegam na fila do símbolo correspondente."""
+    stream = UserDataStream(_FakeAPIClient(), {}, market_type="futures")
+    ada_queue = stream.register_symbol("ADAUSDT")
+    btc_queue = stream.register_symbol("btcusdt")
+
+    stream._on_message(None, json.dumps(_futures_event(1, "NEW")))
+    stream._on_message(None, json.dumps(_futures_event(1, "FILLED")))
+    stream._on_message(None, json.dumps(_futures_event(2, "FILLED", symbol="ETHUSDT")))
+
+    assert ada_queue.qsize() == 2
+    assert btc_queue.qsize() == 0
+    assert ada_queue.get_nowait()["status"] == "NEW"
+    assert ada_queue.get_nowait()["status"] == "FILLED"
+    try:
+        ada_queue.get_nowait()
+        assert False, "fila deveria estar vazia"
+    except queue.Empty:
+        pass
+    assert stream.stats["fills"] == 2
+    print("✅ Roteamento por símbolo OK")
+
+
+def test_account_update_callbacks():
+    """ACCOUNT_UPDATE vai para os account_callbacks no formato do positionRisk (sem tocar nas filas)."""
+    stream = UserDataStream(_FakeAPIClient(), {}, market_type="futures")
+    ada_queue = stream.register_symbol("ADAUSDT")
+    received = []
+    stream.add_account_callback(received.append)
+
+    stream._on_message(None, json.dumps({
+        "e": "ACCOUNT_UPDATE", "E": 1700000000001, "T": 1700000000000,
+        "a": {
+            "m": "ORDER",
+            "B": [{"a": "USDT", "wb": "122.6", "cw": "100.8", "bc": "0"}],
+            "P": [{"s": "ADAUSDT", "pa": "-20", "ep": "0.5", "cr": "0", "up": "0.1", "mt": "isolated",
+                   "iw": "1.0", "ps": "BOTH"}],
+        },
+    }))
+
+    assert len(received) == 1 and ada_queue.qsize() == 0
+    position = received[0]["positions"][0]
+    assert position["symbol"] == "ADAUSDT" and position["positionAmt"] == "-20"
+    assert position["entryPrice"] == "0.5" and position["updateTime"] == 1700000000000
+    assert received[0]["balances"][0]["balance"] == "122.6" and received[0]["reason"] == "ORDER"
+    assert stream.stats["account_updates"] == 1 and stream.stats["order_updates"] == 0
+    print("✅ ACCOUNT_UPDATE parse + callbacks OK")
+
+
+if __name__ == "__main__":
+    test_parse_futures_order_update()
+    test_parse_spot_execution_report()
+    test_routing_by_symbol()
+    test_account_update_callbacks()
+    print("\n🎉 Todos os testes do user data stream passaram!")
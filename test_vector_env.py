@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Teste do VectorTradingEnv: episódios em lockstep idênticos ao TradingEnvironment passo a
+passo (estado, recompensa, término), autoreset next-step, vários datasets de tamanhos
+diferentes e inícios aleatórios reproduzíveis pela seed.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from rl.environment import TradingEnvironment
+from rl.features import add_indicators
+from rl.vector_env import VectorTradingEnv
+
+WINDOW = 10
+
+
+def _ohlcv(n, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    return add_indicators(pd.DataFrame({
+        "open": close, "high": close * 1.01, "low": close * 0.99, "close": close,
+        "volume": rng.uniform(100, 1000, n),
+    }))
+
+
+def test_lockstep_matches_single_environments():
+    data = _ohlcv(80)
+    actions = np.random.default_rng(1).integers(0, 6, (3, 200))
+    actions[:, :5] = 1  # começa comprando para exercitar vendas com lucro/prejuízo
+    singles = [TradingEnvironment(data, features_window=WINDOW) for _ in range(3)]
+    vector = VectorTradingEnv(data, num_envs=3, features_window=WINDOW)
+    assert vector.single_observation_space.shape == singles[0].observation_space.shape
+
+    obs, _ = vector.reset(seed=0)
+    expected = [env.reset()[0] for env in singles]
+    assert np.array_equal(obs, np.array(expected))
+
+    pending_reset = [False] * 3
+    episodes = 0
+    for t in range(actions.shape[1]):
+        obs, rewards, terminated, truncated, infos = vector.step(actions[:, t])
+        for k, env in enumerate(singles):
+            if pending_reset[k]:
+                # Autoreset next-step: ação ignorada, estado inicial, recompensa 0
+                state, info = env.reset()
+                reward, done = 0.0, False
+                pending_reset[k] = False
+            else:
+                state, reward, done, _, info = env.step(int(actions[k, t]))
+                pending_reset[k] = done
+                episodes += done
+            assert np.array_equal(obs[k], state), (t, k)
+            assert np.isclose(rewards[k], reward, rtol=0, atol=1e-12) and terminated[k] == done
+            assert np.isclose(infos["portfolio_value"][k], info["portfolio_value"])
+        assert not truncated.any()
+    assert episodes >= 6
+    print(f"✅ {actions.shape[1]} passos em lockstep iguais a 3 TradingEnvironment ({episodes} episódios)")
+
+
+def test_multiple_datasets_and_random_starts():
+    datasets = [_ohlcv(60, seed=2), _ohlcv(120, seed=3)]
+    env = VectorTradingEnv(datasets, num_envs=4, features_window=WINDOW, random_start=True,
+                           max_episode_steps=15)
+    obs, infos = env.reset(seed=7)
+    assert obs.shape == (4, env.observation_space_size) and list(env.dataset_index) == [0, 1, 0, 1]
+    starts = infos["step"].copy()
+    assert np.all(starts >= WINDOW) and np.all(starts <= env.lengths - 2)
+    assert np.array_equal(VectorTradingEnv(datasets, num_envs=4, features_window=WINDOW,
+                                           random_start=True).reset(seed=7)[1]["step"], starts)
+
+    # Preço do estado vem do dataset de cada ambiente
+    expected_prices = [datasets[i % 2]["close"].iloc[s] for i, s in enumerate(starts)]
+    assert np.allclose(infos["current_price"], expected_prices)
+
+    ended = np.zeros(4, dtype=bool)
+    for _ in range(15):
+        _, _, terminated, truncated, _ = env.step(np.zeros(4, dtype=np.int64))
+        ended |= terminated | truncated
+    assert ended.all() and env.action_space.shape == (4,)
+    print("✅ Datasets de tamanhos diferentes, inícios aleatórios e truncamento")
+
+
+if __name__ == "__main__":
+    test_lockstep_matches_single_environments()
+    test_multiple_datasets_and_random_starts()
+    print("\n🎉 Todos os testes do ambiente vetorizado passaram!")